@@ -0,0 +1,50 @@
+"""
+Security API - Database connection pool
+
+Um único pool por processo, criado no startup da app e compartilhado
+por todos os endpoints. A implementação é a de lib/db_pool.py (a mesma do
+skill runner); aqui só fica a configuração via POSTGRES_* / DB_POOL_*.
+"""
+import os
+import sys
+from pathlib import Path
+
+# Repo: <root>/api/db_pool.py → <root>/lib; imagem Docker: /app/lib ao lado
+_ROOT = Path(__file__).resolve().parents[1]
+if (_ROOT / "lib").is_dir() and str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from lib.db_pool import DatabasePool, PoolTimeout  # noqa: E402,F401
+
+
+def load_env_file():
+    """Load .env once at startup (current dir first, then parent)."""
+    env_file = Path(".env")
+    if not env_file.exists():
+        env_file = Path("../.env")
+    if not env_file.exists():
+        return
+
+    with open(env_file, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, v = line.split("=", 1)
+                os.environ[k] = v.strip()
+
+
+def pool_from_env() -> DatabasePool:
+    """Build the pool from POSTGRES_* env vars (sizes via DB_POOL_MIN/DB_POOL_MAX)."""
+    load_env_file()
+    return DatabasePool(
+        minconn=int(os.getenv("DB_POOL_MIN", "2")),
+        maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+        acquire_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        max_idle_s=float(os.getenv("DB_POOL_MAX_IDLE", "30")),
+        host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        database=os.getenv("POSTGRES_DB"),
+        connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
+    )
@@ -0,0 +1,153 @@
+"""
+Security API - Response cache for materialized-view backed endpoints
+
+TTL + LRU cache of serialized JSON bodies with ETag support. Each entry is
+tagged with the materialized view that backs it; a refresh of that view
+(NOTIFY sofia_mv_refresh, see sql/migrations/105_mv_refresh_versions.sql)
+drops exactly those entries. TTL is only a safety net for missed notifies.
+"""
+import hashlib
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.extensions
+
+NOTIFY_CHANNEL = "sofia_mv_refresh"
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "view", "expires_at")
+
+    def __init__(self, body: bytes, view: str, ttl_sec: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.view = view
+        self.expires_at = time.monotonic() + ttl_sec
+
+
+class ResponseCache:
+    """Thread-safe TTL/LRU cache keyed by request path + query string."""
+
+    def __init__(self, max_entries: int = 256, ttl_sec: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidated": 0}
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def generation(self, view: str) -> tuple:
+        """Invalidation counter for view; read it before querying, pass it to put()."""
+        with self._lock:
+            return self._epoch, self._generations.get(view, 0)
+
+    def put(self, key: str, view: str, body: bytes, generation: tuple) -> CacheEntry:
+        """Store body unless view was invalidated after generation was read."""
+        with self._lock:
+            entry = CacheEntry(body, view, self.ttl_sec)
+            if (self._epoch, self._generations.get(view, 0)) != generation:
+                # A refresh landed while this response was being built
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def invalidate_view(self, view: str, version=None) -> int:
+        """Drop entries backed by view. With a version, keep entries already at it."""
+        with self._lock:
+            if version is not None:
+                if self._versions.get(view) == version:
+                    return 0
+                self._versions[view] = version
+            self._generations[view] = self._generations.get(view, 0) + 1
+            stale = [k for k, e in self._entries.items() if e.view == view]
+            for k in stale:
+                del self._entries[k]
+            self.stats["invalidated"] += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "ttl_sec": self.ttl_sec, **self.stats}
+
+
+class RefreshListener(threading.Thread):
+    """
+    LISTEN sofia_mv_refresh on a dedicated connection and invalidate cache entries.
+
+    On every (re)connect the version table is re-read, so refreshes that
+    happened while the listener was down still invalidate their views.
+    """
+
+    def __init__(self, cache: ResponseCache, connect_kwargs: dict, retry_sec: float = 10.0):
+        super().__init__(name="mv-refresh-listener", daemon=True)
+        self.cache = cache
+        self.connect_kwargs = connect_kwargs
+        self.retry_sec = retry_sec
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _sync_versions(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT view_name, version FROM sofia.mv_refresh_versions")
+            for view, version in cur.fetchall():
+                self.cache.invalidate_view(view, version)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.connect_kwargs)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                try:
+                    self._sync_versions(conn)
+                except psycopg2.Error:
+                    # Table missing (migration 105 not applied) - NOTIFY still works
+                    pass
+
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        # payload: "<view_name>:<version>"
+                        view, _, version = note.payload.partition(":")
+                        self.cache.invalidate_view(view, int(version) if version else None)
+            except psycopg2.Error as e:
+                print(f"⚠️  MV refresh listener error: {e} (retrying in {self.retry_sec}s)")
+                # Listener down: we can't trust cached entries anymore
+                self.cache.clear()
+                self._stop_event.wait(self.retry_sec)
+            finally:
+                if conn is not None:
+                    conn.close()
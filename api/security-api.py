@@ -3,17 +3,125 @@
 Security Hybrid Model - API Endpoints v2.1
 FastAPI implementation - 100% spec compliant
 """
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, Path, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import Optional, List
 import psycopg2
 import psycopg2.extras
+import json
+import math
 import os
-from pathlib import Path
+from anyio import to_thread
 from datetime import datetime
 
+from db_pool import PoolTimeout, pool_from_env
+from response_cache import ResponseCache, RefreshListener
+
 app = FastAPI(title="Sofia Security Hybrid Model API", version="2.1")
 
+# Database connection pool - created once at startup, shared by all endpoints
+db_pool = pool_from_env()
+
+# Response cache - by-country endpoints serve MV aggregates that only change
+# on REFRESH MATERIALIZED VIEW (invalidated via NOTIFY, see response_cache.py)
+CACHE_ENABLED = os.getenv("API_CACHE_ENABLED", "true").lower() == "true"
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("API_CACHE_MAX_ENTRIES", "256")),
+    ttl_sec=float(os.getenv("API_CACHE_TTL", "3600")),
+)
+refresh_listener = RefreshListener(response_cache, db_pool.connect_kwargs)
+
+# Endpoint path -> backing materialized view
+CACHED_VIEWS = {
+    "/api/security/countries": "mv_security_country_combined",
+    "/api/security/map": "mv_security_map_clusters",
+    "/api/capital/by-country": "mv_capital_analytics",
+    "/api/opportunity/by-country": "mv_opportunity_by_country",
+    "/api/brain-drain/by-country": "mv_brain_drain_by_country",
+    "/api/ai-density/by-country": "mv_ai_capability_density_by_country",
+    "/api/research-velocity/by-country": "mv_research_velocity_by_country",
+    "/api/conference-gravity/by-country": "mv_conference_gravity_by_country",
+    "/api/tool-demand/by-country": "mv_tool_demand_by_country",
+    "/api/industry-signals/by-country": "mv_industry_signals_heat_by_country",
+    "/api/cyber-risk/by-country": "mv_cyber_risk_by_country",
+    "/api/clinical-trials/by-country": "mv_clinical_trials_by_country",
+    "/api/women/by-country": "mv_women_intelligence_by_country",
+    "/api/ngo/by-country": "mv_ngo_coverage_by_country",
+}
+
+MAP_TILES_PREFIX = "/api/security/map/tiles/"
+
+# Path prefix -> backing materialized view (tile endpoints)
+CACHED_PREFIXES = {
+    MAP_TILES_PREFIX: "mv_security_map_clusters",
+}
+
+
+def _cached_view(request: Request) -> Optional[str]:
+    path = request.url.path
+    view = CACHED_VIEWS.get(path)
+    if view is None:
+        view = next((v for prefix, v in CACHED_PREFIXES.items() if path.startswith(prefix)), None)
+    # Points mode (map and tiles) reads sofia.security_observations directly, not the clusters MV
+    if path == "/api/security/map":
+        zoom = request.query_params.get("zoom")
+    elif path.startswith(MAP_TILES_PREFIX):
+        zoom = path[len(MAP_TILES_PREFIX):].split("/", 1)[0]
+    else:
+        return view
+    return view if _map_request_uses_clusters(zoom, request.query_params) else None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison: "*" or any listed tag, W/ ignored
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _cacheable(body: bytes) -> bool:
+    # Endpoints report DB errors as 200 + success=false; never cache those
+    try:
+        return json.loads(body).get("success", True) is True
+    except ValueError:
+        return False
+
+
+# NOTE: registered before CORS so CORSMiddleware stays outermost and also
+# decorates cached/304 responses.
+@app.middleware("http")
+async def mv_response_cache(request: Request, call_next):
+    view = _cached_view(request)
+    if not CACHE_ENABLED or view is None or request.method != "GET":
+        return await call_next(request)
+
+    key = f"{request.url.path}?{request.url.query}"
+    entry = response_cache.get(key)
+    cache_status = "HIT"
+    if entry is None:
+        cache_status = "MISS"
+        generation = response_cache.generation(view)
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        if response.status_code != 200 or not _cacheable(body):
+            return Response(body, status_code=response.status_code,
+                            headers=dict(response.headers), media_type=response.media_type)
+        entry = response_cache.put(key, view, body, generation)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "X-Cache": cache_status}
+    if _etag_matches(request.headers.get("if-none-match", ""), entry.etag):
+        response_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
 # CORS - Fixed: wildcard + credentials is invalid
 app.add_middleware(
     CORSMiddleware,
@@ -23,36 +131,162 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database connection
-def get_db():
-    # Try current dir first, then parent dir
-    env_file = Path(".env")
-    if not env_file.exists():
-        env_file = Path("../.env")
-    
-    if env_file.exists():
-        with open(env_file, encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    k, v = line.split("=", 1)
-                    os.environ[k] = v.strip()
-    
-    return psycopg2.connect(
-        host=os.getenv("POSTGRES_HOST"),
-        port=os.getenv("POSTGRES_PORT"),
-        user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD"),
-        database=os.getenv("POSTGRES_DB")
+
+@app.on_event("startup")
+def open_db_pool():
+    db_pool.open()
+    # Sync endpoints run in anyio's threadpool; cap it at the pool size so
+    # blocked threads never outnumber available connections.
+    to_thread.current_default_thread_limiter().total_tokens = db_pool.maxconn
+    if CACHE_ENABLED:
+        refresh_listener.start()
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    refresh_listener.stop()
+    db_pool.close()
+
+
+@app.exception_handler(PoolTimeout)
+async def pool_exhausted(request: Request, exc: PoolTimeout):
+    # Pool saturated: tell clients to back off instead of a generic 500
+    retry_after = max(1, math.ceil(db_pool.acquire_timeout))
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "error": "Database busy, retry later", "data": []},
+        headers={"Retry-After": str(retry_after)},
     )
 
 
+def get_db():
+    return db_pool.getconn()
+
+
+def release_db(conn):
+    db_pool.putconn(conn)
+
+
+# Below this zoom /api/security/map serves grid clusters (migration 106)
+CLUSTER_MAX_ZOOM = 8
+
+# ?sources= token -> observation sources aggregated in mv_security_map_clusters.
+# 'local' (BRASIL_*) is local_only and never clustered.
+CLUSTER_SOURCES = {
+    "acled": ["ACLED", "ACLED_AGGREGATED"],
+}
+
+
+def _map_uses_clusters(zoom: Optional[int], country: Optional[str], mode: str) -> bool:
+    include_local = (zoom and zoom >= 8) or (country and country.upper() == 'BR')
+    return mode == "clusters" or bool(mode == "auto" and zoom and zoom < CLUSTER_MAX_ZOOM and not include_local)
+
+
+def _map_request_uses_clusters(zoom: Optional[str], query) -> bool:
+    # Same decision as get_security_map, taken from the raw request (zoom: query or tile z)
+    try:
+        zoom = int(zoom) if zoom else None
+    except ValueError:
+        return False
+    return _map_uses_clusters(zoom, query.get("country"), query.get("mode", "auto"))
+
+
+def _parse_bbox(bbox: str):
+    try:
+        w, s, e, n = map(float, bbox.split(','))
+        return w, s, e, n
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid bbox format. Use: w,s,e,n")
+
+
+def _get_map_clusters(zoom: Optional[int], country: Optional[str], bbox: Optional[str], source_list: list):
+    """Pre-aggregated clusters from sofia.mv_security_map_clusters (global_comparable only)."""
+    cluster_zoom = min(zoom or 2, CLUSTER_MAX_ZOOM - 1)
+
+    cluster_sources = [src for token in source_list for src in CLUSTER_SOURCES.get(token, [])]
+    filters = ["zoom = %s", "sources && %s::text[]"]
+    params = [cluster_zoom, cluster_sources]
+    if country:
+        filters.append("country_code = %s")
+        params.append(country.upper())
+    if bbox:
+        w, s, e, n = _parse_bbox(bbox)
+        filters.append("latitude BETWEEN %s AND %s")
+        filters.append("longitude BETWEEN %s AND %s")
+        params.extend([s, n, w, e])
+
+    conn = get_db()
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(f"""
+            SELECT
+                cell_x, cell_y, country_code, country_name,
+                incidents, fatalities, severity_avg, severity_max,
+                latitude, longitude, top_event_type, sources,
+                last_event, coverage_score_global
+            FROM sofia.mv_security_map_clusters
+            WHERE {" AND ".join(filters)}
+            ORDER BY incidents DESC
+        """, tuple(params))
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        release_db(conn)
+
+    features = []
+    total_incidents = 0
+    for row in rows:
+        coverage = float(row['coverage_score_global']) if row['coverage_score_global'] else 0
+        total_incidents += row['incidents']
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [float(row['longitude']), float(row['latitude'])]
+            },
+            "properties": {
+                "id": f"c{cluster_zoom}:{row['cell_x']}:{row['cell_y']}:{row['country_code']}",
+                "cluster": True,
+                "countryName": row['country_name'],
+                "countryCode": row['country_code'],
+                "latitude": float(row['latitude']),
+                "longitude": float(row['longitude']),
+                "incidents": row['incidents'],
+                "fatalities": int(row['fatalities'] or 0),
+                "severityNorm": float(row['severity_avg']) if row['severity_avg'] else 0,
+                "severityMax": float(row['severity_max']) if row['severity_max'] else 0,
+                "topEventType": row['top_event_type'],
+                "windowDays": 90,
+                "dataSource": ",".join(row['sources'] or []),
+                "asOfDate": row['last_event'].isoformat() if row['last_event'] else None,
+                "coverage_score": coverage,
+                "coverage_scope": "global_comparable",
+                "warning": "Baixa cobertura — risco pode estar subestimado" if coverage < 50 else None
+            }
+        })
+
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "metadata": {
+            "total_points": len(features),
+            "total_incidents": total_incidents,
+            "mode": "clusters",
+            "cluster_zoom": cluster_zoom,
+            "sources_used": source_list,
+            "zoom_level": zoom,
+            "limit_applied": None
+        }
+    }
+
+
 @app.get("/api/security/map")
-async def get_security_map(
+def get_security_map(
     zoom: Optional[int] = Query(None, ge=1, le=20),
     country: Optional[str] = Query(None, max_length=3),
     bbox: Optional[str] = Query(None),
-    sources: Optional[str] = Query("acled,local")
+    sources: Optional[str] = Query("acled,local"),
+    mode: Optional[str] = Query("auto", regex="^(auto|points|clusters)$")
 ):
     """
     Get security points for map display
@@ -61,11 +295,12 @@ async def get_security_map(
     - ACLED (always)
     - Brasil local (only if zoom >= 8 OR country=BR)
     
+    Mode:
+    - auto: clusters below zoom 8 (global data only), raw points otherwise
+    - points / clusters: force one representation
+    
     Returns: GeoJSON FeatureCollection
     """
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    
     # Parse sources
     source_list = sources.split(',') if sources else ['acled']
     
@@ -108,6 +343,11 @@ async def get_security_map(
     # FIXED: Pagination by zoom level
     limit = 10000 if zoom and zoom >= 10 else 5000 if zoom and zoom >= 6 else 1000
     
+    # Low zoom: precomputed grid clusters instead of a truncated sample of raw rows
+    include_local = (zoom and zoom >= 8) or (country and country.upper() == 'BR')
+    if _map_uses_clusters(zoom, country, mode):
+        return _get_map_clusters(zoom, country, bbox, source_list)
+    
     # Query based on view type
     # For GEO view:
     # - Global/Regional (ACLED): Must have lat/lon
@@ -137,9 +377,6 @@ async def get_security_map(
         WHERE event_time_start >= CURRENT_DATE - INTERVAL '90 days'
     """
     
-    # Determine if we should include local data
-    include_local = (zoom and zoom >= 8) or (country and country.upper() == 'BR')
-    
     filters = []
     query_params = [] # Use a new list for params for this new query structure
     
@@ -180,8 +417,14 @@ async def get_security_map(
     
     # print(f"Executing Map Query: {query} | Params: {query_params}") # Debug
         
-    cur.execute(query + " ORDER BY event_time_start DESC LIMIT %s", tuple(query_params))
-    rows = cur.fetchall()
+    conn = get_db()
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(query + " ORDER BY event_time_start DESC LIMIT %s", tuple(query_params))
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        release_db(conn)
     
     features = []
     for row in rows:
@@ -226,9 +469,6 @@ async def get_security_map(
                 "warning": warning
             }
         })
-        
-    cur.close()
-    conn.close()
     
     return {
         "type": "FeatureCollection",
@@ -236,14 +476,44 @@ async def get_security_map(
         "metadata": {
             "total_points": len(features),
             "sources_used": source_list,
+            "mode": "points",
             "zoom_level": zoom,
             "limit_applied": limit
         }
     }
 
 
+@app.get("/api/security/map/tiles/{z}/{x}/{y}")
+def get_security_map_tile(
+    z: int = Path(..., ge=1, le=20),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    country: Optional[str] = Query(None, max_length=3),
+    sources: Optional[str] = Query("acled,local"),
+    mode: Optional[str] = Query("auto", regex="^(auto|points|clusters)$")
+):
+    """
+    Slippy-map tile (z/x/y) of /api/security/map as GeoJSON
+
+    Clusters below zoom 8, raw points per tile at higher zoom.
+    """
+    n_tiles = 2 ** z
+    if x >= n_tiles or y >= n_tiles:
+        raise HTTPException(status_code=400, detail=f"Tile {x}/{y} out of range for zoom {z}")
+
+    def tile_lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n_tiles))))
+
+    w = x / n_tiles * 360.0 - 180.0
+    e = (x + 1) / n_tiles * 360.0 - 180.0
+    n = tile_lat(y)
+    s = tile_lat(y + 1)
+    return get_security_map(zoom=z, country=country, bbox=f"{w},{s},{e},{n}",
+                            sources=sources, mode=mode)
+
+
 @app.get("/api/security/countries")
-async def get_security_countries(
+def get_security_countries(
     sort: Optional[str] = Query("total_risk", regex="^(total_risk|acute_risk|structural_risk)$"),
     min_coverage: Optional[int] = Query(None, ge=0, le=100),
     risk_level: Optional[str] = Query(None, regex="^(Critical|High|Elevated|Moderate|Low)$")
@@ -256,9 +526,6 @@ async def get_security_countries(
     
     Returns: Country scores with breakdown
     """
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    
     # Build WHERE conditions with PARAMETERIZED queries
     where_conditions = []
     params = []
@@ -312,10 +579,17 @@ async def get_security_countries(
         ORDER BY c.{sort_column} DESC NULLS LAST
     """
     
-    cur.execute(query, params)
+    conn = get_db()
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        release_db(conn)
     
     countries = []
-    for row in cur.fetchall():
+    for row in rows:
         coverage = float(row['coverage_score_global']) if row['coverage_score_global'] else 0
         
         # Apply min_coverage filter if specified
@@ -343,9 +617,6 @@ async def get_security_countries(
             }
         })
     
-    cur.close()
-    conn.close()
-    
     # Calculate avg coverage
     avg_coverage = sum(c["coverage_score_global"] for c in countries) / len(countries) if countries else 0
     
@@ -359,7 +630,7 @@ async def get_security_countries(
 
 
 @app.get("/api/security/countries/{country_code}/local")
-async def get_country_local_detail(country_code: str):
+def get_country_local_detail(country_code: str):
     """
     Get local detail for a specific country (Brasil)
     
@@ -369,98 +640,100 @@ async def get_country_local_detail(country_code: str):
     Returns: Local risk breakdown
     """
     conn = get_db()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     
-    country_code = country_code.upper()
+        country_code = country_code.upper()
     
-    # PARAMETERIZED query to prevent SQL injection
-    # Check if country has local data
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM sofia.security_observations
-        WHERE country_code = %s AND coverage_scope = 'local_only'
-    """, (country_code,))
+        # PARAMETERIZED query to prevent SQL injection
+        # Check if country has local data
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM sofia.security_observations
+            WHERE country_code = %s AND coverage_scope = 'local_only'
+        """, (country_code,))
     
-    if cur.fetchone()['count'] == 0:
-        raise HTTPException(status_code=404, detail=f"No local data for country {country_code}")
+        if cur.fetchone()['count'] == 0:
+            raise HTTPException(status_code=404, detail=f"No local data for country {country_code}")
     
-    # Get country name
-    cur.execute("""
-        SELECT DISTINCT country_name
-        FROM sofia.security_observations
-        WHERE country_code = %s
-        LIMIT 1
-    """, (country_code,))
+        # Get country name
+        cur.execute("""
+            SELECT DISTINCT country_name
+            FROM sofia.security_observations
+            WHERE country_code = %s
+            LIMIT 1
+        """, (country_code,))
     
-    result = cur.fetchone()
-    country_name = result['country_name'] if result else country_code
+        result = cur.fetchone()
+        country_name = result['country_name'] if result else country_code
     
-    # Get local risk score (average of all local sources)
-    cur.execute("""
-        SELECT AVG(severity_norm) as avg_severity
-        FROM sofia.security_observations
-        WHERE country_code = %s AND coverage_scope = 'local_only'
-    """, (country_code,))
+        # Get local risk score (average of all local sources)
+        cur.execute("""
+            SELECT AVG(severity_norm) as avg_severity
+            FROM sofia.security_observations
+            WHERE country_code = %s AND coverage_scope = 'local_only'
+        """, (country_code,))
     
-    local_risk = float(cur.fetchone()['avg_severity'] or 0)
+        local_risk = float(cur.fetchone()['avg_severity'] or 0)
     
-    # Get coverage score local
-    cur.execute("""
-        SELECT MAX(coverage_score_local) as max_coverage
-        FROM sofia.security_observations
-        WHERE country_code = %s AND coverage_scope = 'local_only'
-    """, (country_code,))
+        # Get coverage score local
+        cur.execute("""
+            SELECT MAX(coverage_score_local) as max_coverage
+            FROM sofia.security_observations
+            WHERE country_code = %s AND coverage_scope = 'local_only'
+        """, (country_code,))
     
-    coverage_local = float(cur.fetchone()['max_coverage'] or 0)
+        coverage_local = float(cur.fetchone()['max_coverage'] or 0)
     
-    # Get breakdown by source (single query)
-    cur.execute("""
-        SELECT 
-            source,
-            AVG(severity_norm) as avg_severity,
-            MAX(event_time_start) as last_update,
-            COUNT(*) as record_count
-        FROM sofia.security_observations
-        WHERE country_code = %s AND coverage_scope = 'local_only'
-        GROUP BY source
-        ORDER BY avg_severity DESC
-    """, (country_code,))
+        # Get breakdown by source (single query)
+        cur.execute("""
+            SELECT 
+                source,
+                AVG(severity_norm) as avg_severity,
+                MAX(event_time_start) as last_update,
+                COUNT(*) as record_count
+            FROM sofia.security_observations
+            WHERE country_code = %s AND coverage_scope = 'local_only'
+            GROUP BY source
+            ORDER BY avg_severity DESC
+        """, (country_code,))
     
-    breakdown = {}
-    sources_used = []
-    for row in cur.fetchall():
-        sources_used.append(row['source'])
-        breakdown[row['source'].lower().replace('_', '-')] = {
-            "severity_norm": float(row['avg_severity']) if row['avg_severity'] else 0,
-            "source": row['source'],
-            "last_update": row['last_update'].isoformat() if row['last_update'] else None,
-            "record_count": row['record_count']
-        }
+        breakdown = {}
+        sources_used = []
+        for row in cur.fetchall():
+            sources_used.append(row['source'])
+            breakdown[row['source'].lower().replace('_', '-')] = {
+                "severity_norm": float(row['avg_severity']) if row['avg_severity'] else 0,
+                "source": row['source'],
+                "last_update": row['last_update'].isoformat() if row['last_update'] else None,
+                "record_count": row['record_count']
+            }
     
-    # Get states breakdown (if admin1 exists)
-    cur.execute("""
-        SELECT 
-            admin1,
-            AVG(severity_norm) as avg_severity
-        FROM sofia.security_observations
-        WHERE country_code = %s 
-          AND coverage_scope = 'local_only'
-          AND admin1 IS NOT NULL
-        GROUP BY admin1
-        ORDER BY avg_severity DESC
-        LIMIT 10
-    """, (country_code,))
+        # Get states breakdown (if admin1 exists)
+        cur.execute("""
+            SELECT 
+                admin1,
+                AVG(severity_norm) as avg_severity
+            FROM sofia.security_observations
+            WHERE country_code = %s 
+              AND coverage_scope = 'local_only'
+              AND admin1 IS NOT NULL
+            GROUP BY admin1
+            ORDER BY avg_severity DESC
+            LIMIT 10
+        """, (country_code,))
     
-    states = []
-    for row in cur.fetchall():
-        states.append({
-            "state_code": row['admin1'],
-            "state_name": row['admin1'],
-            "local_risk": float(row['avg_severity']) if row['avg_severity'] else 0
-        })
+        states = []
+        for row in cur.fetchall():
+            states.append({
+                "state_code": row['admin1'],
+                "state_name": row['admin1'],
+                "local_risk": float(row['avg_severity']) if row['avg_severity'] else 0
+            })
     
-    cur.close()
-    conn.close()
+        cur.close()
+    finally:
+        release_db(conn)
     
     return {
         "country_code": country_code,
@@ -475,7 +748,7 @@ async def get_country_local_detail(country_code: str):
 
 
 @app.get("/api/capital/by-country")
-async def get_capital_by_country():
+def get_capital_by_country():
     """
     Capital Intelligence by Country (Anti-Mock, Enterprise)
     Returns: Real data with deterministic narratives
@@ -569,11 +842,11 @@ async def get_capital_by_country():
         print(f"Error fetching capital data: {e}")
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/opportunity/by-country")
-async def get_opportunity_by_country():
+def get_opportunity_by_country():
     """
     Opportunity Composite Index (Capital + Talent - Security Risk)
     """
@@ -633,11 +906,11 @@ async def get_opportunity_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/brain-drain/by-country")
-async def get_brain_drain_by_country():
+def get_brain_drain_by_country():
     """Brain Drain Index - Talent Export vs Import"""
     conn = get_db()
     try:
@@ -673,11 +946,11 @@ async def get_brain_drain_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/ai-density/by-country")
-async def get_ai_density_by_country():
+def get_ai_density_by_country():
     """AI Capability Density"""
     conn = get_db()
     try:
@@ -706,7 +979,7 @@ async def get_ai_density_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 # ============================================================================
@@ -714,7 +987,7 @@ async def get_ai_density_by_country():
 # ============================================================================
 
 @app.get("/api/research-velocity/by-country")
-async def get_research_velocity_by_country():
+def get_research_velocity_by_country():
     """Research Velocity Index - Papers momentum and volume by country"""
     conn = get_db()
     try:
@@ -770,11 +1043,11 @@ async def get_research_velocity_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/conference-gravity/by-country")
-async def get_conference_gravity_by_country():
+def get_conference_gravity_by_country():
     """Conference Gravity Index - Tech conference density and activity"""
     conn = get_db()
     try:
@@ -821,11 +1094,11 @@ async def get_conference_gravity_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/tool-demand/by-country")
-async def get_tool_demand_by_country():
+def get_tool_demand_by_country():
     """Tool Demand Index - Developer stack modernity from job postings"""
     conn = get_db()
     try:
@@ -872,7 +1145,7 @@ async def get_tool_demand_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 # ============================================================================
@@ -880,7 +1153,7 @@ async def get_tool_demand_by_country():
 # ============================================================================
 
 @app.get("/api/industry-signals/by-country")
-async def get_industry_signals_by_country():
+def get_industry_signals_by_country():
     """Industry Signals Heat - Business activity and sector momentum"""
     conn = get_db()
     try:
@@ -936,11 +1209,11 @@ async def get_industry_signals_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/cyber-risk/by-country")
-async def get_cyber_risk_by_country():
+def get_cyber_risk_by_country():
     """Cyber Risk Density - Cybersecurity threat concentration"""
     conn = get_db()
     try:
@@ -991,11 +1264,11 @@ async def get_cyber_risk_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/clinical-trials/by-country")
-async def get_clinical_trials_by_country():
+def get_clinical_trials_by_country():
     """Clinical Trial Activity - Pharma innovation density"""
     conn = get_db()
     try:
@@ -1046,7 +1319,7 @@ async def get_clinical_trials_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 # ============================================================================
@@ -1054,7 +1327,7 @@ async def get_clinical_trials_by_country():
 # ============================================================================
 
 @app.get("/api/women/by-country")
-async def get_women_intelligence_by_country():
+def get_women_intelligence_by_country():
     """Violence Risk Proxy - General violence data (ACLED). NOT gender-specific."""
     conn = get_db()
     try:
@@ -1131,11 +1404,11 @@ async def get_women_intelligence_by_country():
     except Exception as e:
         return {"success": False, "error": str(e), "data": []}
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 @app.get("/api/ngo/by-country")
-async def get_ngo_coverage_by_country():
+def get_ngo_coverage_by_country():
     """NGO/Civil Society Coverage - Sector density by country"""
     conn = get_db()
     try:
@@ -1204,7 +1477,7 @@ async def get_ngo_coverage_by_country():
         return {"success": False, "error": str(e), "data": []}
 
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 
 # ============================================================================
@@ -1230,7 +1503,8 @@ async def get_infrastructure_by_country():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "ok", "version": "2.5-enterprise", "spec": "compliant", "domains": 14}
+    return {"status": "ok", "version": "2.5-enterprise", "spec": "compliant", "domains": 14,
+            "db_pool": db_pool.snapshot(), "response_cache": response_cache.snapshot()}
 
 
 if __name__ == "__main__":
@@ -5,6 +5,7 @@ Normalizes acled_aggregated data into security_events table
 Maps country names to country_id and ensures proper geo data
 """
 
+import io
 import os
 import sys
 import json
@@ -73,18 +74,20 @@ def build_country_mapping(conn) -> Tuple[Dict[str, int], Dict[str, str]]:
     """Build country name -> id and country name -> iso2 mappings"""
     cursor = conn.cursor()
 
-    # Get all countries with their names and codes
+    # Get all countries with their names and codes (single scan)
     cursor.execute("""
         SELECT id, common_name, iso_alpha2
         FROM sofia.countries
-        WHERE common_name IS NOT NULL
     """)
 
     name_to_id = {}
     name_to_iso2 = {}
+    iso2_to_id = {}
 
     for row in cursor.fetchall():
         country_id, name, iso2 = row
+        if iso2:
+            iso2_to_id[iso2] = country_id
         if name:
             name_lower = name.lower().strip()
             name_to_id[name_lower] = country_id
@@ -95,14 +98,9 @@ def build_country_mapping(conn) -> Tuple[Dict[str, int], Dict[str, str]]:
     # Add manual overrides
     for name_var, iso2 in COUNTRY_NAME_TO_ISO2.items():
         name_lower = name_var.lower().strip()
-        # Find id for this iso2
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM sofia.countries WHERE iso_alpha2 = %s", (iso2,))
-        result = cursor.fetchone()
-        if result:
-            name_to_id[name_lower] = result[0]
+        if iso2 in iso2_to_id:
+            name_to_id[name_lower] = iso2_to_id[iso2]
             name_to_iso2[name_lower] = iso2
-        cursor.close()
 
     return name_to_id, name_to_iso2
 
@@ -113,8 +111,125 @@ def generate_source_id(row: Dict) -> str:
     return hashlib.md5(key.encode()).hexdigest()[:16]
 
 
-def normalize_acled_to_security(batch_size: int = 5000) -> int:
-    """Normalize acled_aggregated into security_events"""
+# Staging table for COPY (ON COMMIT DELETE ROWS → emptied after each batch)
+STAGE_COLUMNS = (
+    'acled_id', 'source_id', 'week', 'country_name', 'country_code', 'country_id',
+    'admin1', 'latitude', 'longitude', 'event_type', 'sub_event_type',
+    'severity_score', 'fatalities', 'event_count', 'raw_payload',
+)
+
+CREATE_STAGE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS acled_security_stage (
+        acled_id BIGINT,
+        source_id TEXT,
+        week DATE,
+        country_name TEXT,
+        country_code TEXT,
+        country_id INTEGER,
+        admin1 TEXT,
+        latitude DOUBLE PRECISION,
+        longitude DOUBLE PRECISION,
+        event_type TEXT,
+        sub_event_type TEXT,
+        severity_score NUMERIC,
+        fatalities INTEGER,
+        event_count INTEGER,
+        raw_payload JSONB
+    ) ON COMMIT DELETE ROWS
+"""
+
+# Last row per source_id wins (same as the old row-by-row upsert in id order)
+MERGE_SQL = """
+    INSERT INTO sofia.security_events
+    (source, source_id, event_date, week_start, country_name, country_code,
+     country_id, admin1, latitude, longitude, event_type, sub_event_type,
+     severity_score, fatalities, event_count, raw_payload)
+    SELECT DISTINCT ON (source_id)
+        'ACLED', source_id, week, week, country_name, country_code,
+        country_id, admin1, latitude, longitude, event_type, sub_event_type,
+        severity_score, fatalities, event_count, raw_payload
+    FROM acled_security_stage
+    ORDER BY source_id, acled_id DESC
+    ON CONFLICT (source, source_id) DO UPDATE SET
+        severity_score = EXCLUDED.severity_score,
+        fatalities = EXCLUDED.fatalities,
+        event_count = EXCLUDED.event_count,
+        country_id = EXCLUDED.country_id,
+        ingested_at = now()
+"""
+
+BACKFILL_COUNTRY_SQL = """
+    UPDATE sofia.acled_aggregated a
+    SET country_id = s.country_id
+    FROM acled_security_stage s
+    WHERE a.id = s.acled_id
+      AND a.country_id IS NULL
+      AND s.country_id IS NOT NULL
+"""
+
+
+def _copy_text(value) -> str:
+    """Encode one value for COPY text format"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def transform_batch(rows: List[tuple], name_to_id: Dict[str, int], name_to_iso2: Dict[str, str]) -> List[tuple]:
+    """Map a batch of acled_aggregated rows to staging tuples (skips rows without geo)"""
+    staged = []
+    for row in rows:
+        try:
+            (acled_id, week, region, country, admin1, event_type, sub_event_type, events,
+             fatalities, population_exposure, disorder_type, lat, lon, source_file, _) = row
+
+            # Skip if no geo
+            latitude = float(lat) if lat else None
+            longitude = float(lon) if lon else None
+            if not latitude or not longitude:
+                continue
+
+            events = events or 1
+            fatalities = fatalities or 0
+            country_lower = (country or '').lower().strip()
+
+            staged.append((
+                acled_id,
+                generate_source_id({'week': week, 'country': country, 'latitude': latitude,
+                                    'longitude': longitude, 'event_type': event_type}),
+                week,
+                country,
+                name_to_iso2.get(country_lower),
+                name_to_id.get(country_lower),
+                admin1,
+                latitude,
+                longitude,
+                event_type,
+                sub_event_type,
+                fatalities if fatalities > 0 else events,  # severity
+                fatalities,
+                events,
+                json.dumps({
+                    'region': region,
+                    'disorder_type': disorder_type,
+                    'population_exposure': population_exposure,
+                    'source_file': source_file
+                }),
+            ))
+        except Exception as e:
+            logger.warning(f"Error processing record {row[0]}: {e}")
+    return staged
+
+
+def normalize_acled_to_security(batch_size: int = 5000) -> Tuple[int, int]:
+    """
+    Normalize acled_aggregated into security_events
+
+    Keyset pagination (id > last_id) → transform batch in memory → COPY into
+    a temp staging table → one set-based upsert + one set-based country_id
+    backfill per batch.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -128,115 +243,52 @@ def normalize_acled_to_security(batch_size: int = 5000) -> int:
     total = cursor.fetchone()[0]
     logger.info(f"Total ACLED aggregated records: {total}")
 
-    # Process in batches
-    offset = 0
+    cursor.execute(CREATE_STAGE_SQL)
+    conn.commit()
+
+    last_id = 0
+    processed = 0
     inserted = 0
     updated_country_ids = 0
 
-    while offset < total:
+    while True:
         cursor.execute("""
             SELECT id, week, region, country, admin1, event_type, sub_event_type,
                    events, fatalities, population_exposure, disorder_type,
                    centroid_latitude, centroid_longitude, source_file, country_id
             FROM sofia.acled_aggregated
+            WHERE id > %s
             ORDER BY id
-            LIMIT %s OFFSET %s
-        """, (batch_size, offset))
+            LIMIT %s
+        """, (last_id, batch_size))
 
         rows = cursor.fetchall()
         if not rows:
             break
+        last_id = rows[-1][0]
+        processed += len(rows)
+
+        staged = transform_batch(rows, name_to_id, name_to_iso2)
+        if staged:
+            buffer = io.StringIO()
+            for rec in staged:
+                buffer.write('\t'.join(_copy_text(v) for v in rec))
+                buffer.write('\n')
+            buffer.seek(0)
 
-        for row in rows:
             try:
-                record = {
-                    'id': row[0],
-                    'week': row[1],
-                    'region': row[2],
-                    'country': row[3],
-                    'admin1': row[4],
-                    'event_type': row[5],
-                    'sub_event_type': row[6],
-                    'events': row[7] or 1,
-                    'fatalities': row[8] or 0,
-                    'population_exposure': row[9],
-                    'disorder_type': row[10],
-                    'latitude': float(row[11]) if row[11] else None,
-                    'longitude': float(row[12]) if row[12] else None,
-                    'source_file': row[13],
-                    'existing_country_id': row[14]
-                }
-
-                # Skip if no geo
-                if not record['latitude'] or not record['longitude']:
-                    continue
-
-                # Generate source_id
-                source_id = generate_source_id(record)
-
-                # Map country
-                country_lower = (record['country'] or '').lower().strip()
-                country_id = name_to_id.get(country_lower)
-                country_code = name_to_iso2.get(country_lower)
-
-                # Calculate severity
-                fatalities = record['fatalities'] or 0
-                event_count = record['events'] or 1
-                severity = fatalities if fatalities > 0 else event_count
-
-                # Insert into security_events
-                cursor.execute("""
-                    INSERT INTO sofia.security_events
-                    (source, source_id, event_date, week_start, country_name, country_code,
-                     country_id, admin1, latitude, longitude, event_type, sub_event_type,
-                     severity_score, fatalities, event_count, raw_payload)
-                    VALUES ('ACLED', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (source, source_id) DO UPDATE SET
-                        severity_score = EXCLUDED.severity_score,
-                        fatalities = EXCLUDED.fatalities,
-                        event_count = EXCLUDED.event_count,
-                        country_id = EXCLUDED.country_id,
-                        ingested_at = now()
-                """, (
-                    source_id,
-                    record['week'],  # event_date = week start
-                    record['week'],  # week_start
-                    record['country'],
-                    country_code,
-                    country_id,
-                    record['admin1'],
-                    record['latitude'],
-                    record['longitude'],
-                    record['event_type'],
-                    record['sub_event_type'],
-                    severity,
-                    record['fatalities'],
-                    record['events'],
-                    json.dumps({
-                        'region': record['region'],
-                        'disorder_type': record['disorder_type'],
-                        'population_exposure': record['population_exposure'],
-                        'source_file': record['source_file']
-                    })
-                ))
-                inserted += 1
-
-                # Also update country_id in acled_aggregated if missing
-                if country_id and not record['existing_country_id']:
-                    cursor.execute("""
-                        UPDATE sofia.acled_aggregated
-                        SET country_id = %s
-                        WHERE id = %s AND country_id IS NULL
-                    """, (country_id, record['id']))
-                    updated_country_ids += 1
-
-            except Exception as e:
-                logger.warning(f"Error processing record {row[0]}: {e}")
-                continue
+                cursor.copy_from(buffer, 'acled_security_stage', columns=STAGE_COLUMNS, null='\\N')
+                cursor.execute(MERGE_SQL)
+                inserted += cursor.rowcount
+                cursor.execute(BACKFILL_COUNTRY_SQL)
+                updated_country_ids += cursor.rowcount
+            except psycopg2.Error as e:
+                conn.rollback()
+                logger.error(f"Batch ending at id {last_id} failed: {e}")
+                raise
 
         conn.commit()
-        offset += batch_size
-        logger.info(f"Processed {min(offset, total)}/{total} records...")
+        logger.info(f"Processed {processed}/{total} records...")
 
     cursor.close()
     conn.close()
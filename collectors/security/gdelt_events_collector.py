@@ -8,14 +8,17 @@ Uses BigQuery public dataset or CSV exports for proper lat/lon data
 import os
 import sys
 import json
-import hashlib
+import time
 import logging
+import argparse
 import requests
 import zipfile
-import csv
-from io import StringIO, BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO, TextIOWrapper
+from operator import itemgetter
+from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional, Union
 import psycopg2
 from psycopg2.extras import execute_values
 
@@ -77,235 +80,277 @@ def fetch_latest_gdelt_url() -> Optional[str]:
         return None
 
 
-def fetch_gdelt_events(hours_back: int = 24) -> List[Dict]:
-    """Fetch GDELT events from the last N hours"""
-    events = []
+# GDELT 2.0 export columns actually used (column-subset parsing)
+COL_GLOBAL_EVENT_ID = 0
+COL_EVENT_DATE = 1
+COL_EVENT_CODE = 26
+COL_EVENT_ROOT_CODE = 28
+COL_GOLDSTEIN = 30
+COL_NUM_MENTIONS = 31
+COL_AVG_TONE = 34
+COL_ACTION_GEO_FULLNAME = 51
+COL_ACTION_GEO_COUNTRY = 52
+COL_ACTION_GEO_ADM1 = 53
+COL_ACTION_GEO_LAT = 55
+COL_ACTION_GEO_LON = 56
+COL_SOURCE_URL = 57
+MIN_COLUMNS = 58
+
+_pick_columns = itemgetter(
+    COL_GLOBAL_EVENT_ID, COL_EVENT_DATE, COL_EVENT_CODE, COL_EVENT_ROOT_CODE,
+    COL_GOLDSTEIN, COL_NUM_MENTIONS, COL_AVG_TONE, COL_ACTION_GEO_FULLNAME,
+    COL_ACTION_GEO_COUNTRY, COL_ACTION_GEO_ADM1, COL_ACTION_GEO_LAT,
+    COL_ACTION_GEO_LON, COL_SOURCE_URL,
+)
+
+INSERT_SQL = """
+    INSERT INTO sofia.security_events
+    (source, source_id, event_date, country_code, country_id, admin1,
+     latitude, longitude, event_type, sub_event_type, severity_score,
+     source_url, raw_payload)
+    VALUES %s
+    ON CONFLICT (source, source_id) DO UPDATE SET
+        event_date = EXCLUDED.event_date,
+        severity_score = EXCLUDED.severity_score,
+        raw_payload = EXCLUDED.raw_payload,
+        ingested_at = now()
+"""
+INSERT_TEMPLATE = "('GDELT', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
 
-    # Get list of export files to fetch
+def export_urls(hours_back: int) -> List[str]:
+    """Every 15-minute export slot in the last N hours (96 files per day), newest first"""
     now = datetime.utcnow()
-    urls_to_fetch = []
-
-    # GDELT updates every 15 minutes, so for 24 hours we need ~96 files
-    # Let's be practical and fetch every hour (24 files max)
-    for h in range(min(hours_back, 24)):
-        dt = now - timedelta(hours=h)
-        # Round to nearest 15-minute interval
-        minute = (dt.minute // 15) * 15
-        timestamp = dt.strftime(f"%Y%m%d%H{minute:02d}00")
-        url = f"{GDELT_EXPORT_BASE}/{timestamp}.export.CSV.zip"
-        urls_to_fetch.append(url)
+    slot = now.replace(minute=(now.minute // 15) * 15, second=0, microsecond=0)
+    urls = []
+    for i in range(hours_back * 4):
+        ts = (slot - timedelta(minutes=15 * i)).strftime("%Y%m%d%H%M%S")
+        urls.append(f"{GDELT_EXPORT_BASE}/{ts}.export.CSV.zip")
 
     # Also try the latest
     latest_url = fetch_latest_gdelt_url()
-    if latest_url and latest_url not in urls_to_fetch:
-        urls_to_fetch.insert(0, latest_url)
-
-    logger.info(f"Fetching {len(urls_to_fetch)} GDELT export files...")
+    if latest_url and latest_url not in urls:
+        urls.insert(0, latest_url)
+    return urls
 
-    for url in urls_to_fetch[:12]:  # Limit to 12 files (3 hours) to avoid timeout
-        try:
-            response = requests.get(url, timeout=60)
-            if response.status_code == 200:
-                events.extend(parse_gdelt_export(response.content))
-                logger.info(f"Parsed {url.split('/')[-1]}")
-            else:
-                logger.debug(f"File not found: {url}")
-        except Exception as e:
-            logger.warning(f"Error fetching {url}: {e}")
 
-    return events
+def download_export(url: str) -> Optional[bytes]:
+    """Download one export zip (None if the slot does not exist)"""
+    try:
+        response = requests.get(url, timeout=60)
+        if response.status_code == 200:
+            return response.content
+        logger.debug(f"File not found: {url}")
+    except Exception as e:
+        logger.warning(f"Error fetching {url}: {e}")
+    return None
 
 
-def parse_gdelt_export(zip_content: bytes) -> List[Dict]:
-    """Parse GDELT export CSV from zip file"""
-    events = []
+def iter_gdelt_export(zip_source: Union[bytes, str, Path]) -> Iterator[tuple]:
+    """
+    Stream a GDELT export zip (bytes or path) and yield security_events rows.
 
+    Lines are decoded incrementally from the zip member and only the needed
+    columns are picked - the file is never materialized as a str or list.
+    """
+    source = BytesIO(zip_source) if isinstance(zip_source, bytes) else zip_source
     try:
-        with zipfile.ZipFile(BytesIO(zip_content)) as zf:
+        with zipfile.ZipFile(source) as zf:
             for filename in zf.namelist():
-                if filename.endswith('.CSV'):
-                    with zf.open(filename) as f:
-                        content = f.read().decode('utf-8', errors='ignore')
-                        reader = csv.reader(StringIO(content), delimiter='\t')
-
-                        for row in reader:
-                            if len(row) < 58:
-                                continue
-
-                            try:
-                                # GDELT 2.0 column indices
-                                global_event_id = row[0]
-                                event_date = row[1]  # YYYYMMDD
-                                event_code = row[26]  # CAMEO event code
-                                event_root_code = row[28]
-                                goldstein = row[30]
-                                num_mentions = row[31]
-                                num_sources = row[32]
-                                num_articles = row[33]
-                                avg_tone = row[34]
-
-                                # Actor geo
-                                actor1_geo_type = row[35]
-                                actor1_geo_fullname = row[36]
-                                actor1_geo_country = row[37]
-                                actor1_geo_lat = row[39]
-                                actor1_geo_lon = row[40]
-
-                                # Action geo (primary location)
-                                action_geo_type = row[50]
-                                action_geo_fullname = row[51]
-                                action_geo_country = row[52]
-                                action_geo_adm1 = row[53]
-                                action_geo_lat = row[55]
-                                action_geo_lon = row[56]
-
-                                source_url = row[57] if len(row) > 57 else None
-
-                                # Filter: only events with geo and relevant types
-                                if not action_geo_lat or not action_geo_lon:
-                                    continue
-
-                                try:
-                                    lat = float(action_geo_lat)
-                                    lon = float(action_geo_lon)
-                                    if lat == 0 and lon == 0:
-                                        continue
-                                except:
-                                    continue
-
-                                # Filter by CAMEO root code (optional - can remove for more data)
-                                # if event_root_code not in RELEVANT_CAMEO_ROOTS:
-                                #     continue
-
-                                # Parse date
-                                try:
-                                    parsed_date = datetime.strptime(event_date[:8], '%Y%m%d').date()
-                                except:
-                                    parsed_date = datetime.utcnow().date()
-
-                                # Calculate severity score
-                                try:
-                                    goldstein_val = float(goldstein) if goldstein else 0
-                                    tone_val = float(avg_tone) if avg_tone else 0
-                                    mentions = int(num_mentions) if num_mentions else 1
-                                    # Severity: negative goldstein = conflict, amplified by mentions
-                                    severity = max(1, abs(min(0, goldstein_val)) * (1 + mentions / 10))
-                                except:
-                                    severity = 1.0
-
-                                event = {
-                                    'source_id': global_event_id,
-                                    'event_date': parsed_date,
-                                    'country_code': action_geo_country[:2] if action_geo_country else None,
-                                    'admin1': action_geo_adm1,
-                                    'latitude': lat,
-                                    'longitude': lon,
-                                    'event_type': RELEVANT_CAMEO_ROOTS.get(event_root_code, f'CAMEO_{event_root_code}'),
-                                    'sub_event_type': event_code,
-                                    'severity_score': severity,
-                                    'source_url': source_url,
-                                    'raw_payload': {
-                                        'global_event_id': global_event_id,
-                                        'event_code': event_code,
-                                        'goldstein': goldstein,
-                                        'avg_tone': avg_tone,
-                                        'num_mentions': num_mentions,
-                                        'action_geo_fullname': action_geo_fullname
-                                    }
-                                }
-                                events.append(event)
-
-                            except Exception as e:
-                                continue
-
-    except Exception as e:
+                if not filename.upper().endswith('.CSV'):
+                    continue
+                with zf.open(filename) as raw:
+                    for line in TextIOWrapper(raw, encoding='utf-8', errors='ignore', newline='\n'):
+                        row = line.rstrip('\r\n').split('\t')
+                        if len(row) < MIN_COLUMNS:
+                            continue
+                        event = _event_row(_pick_columns(row))
+                        if event is not None:
+                            yield event
+    except zipfile.BadZipFile as e:
         logger.error(f"Error parsing GDELT zip: {e}")
 
-    return events
 
+def _event_row(cols: tuple) -> Optional[tuple]:
+    """Column subset → row tuple (country_id filled at write time), None to skip"""
+    (global_event_id, event_date, event_code, event_root_code, goldstein, num_mentions,
+     avg_tone, action_geo_fullname, action_geo_country, action_geo_adm1,
+     action_geo_lat, action_geo_lon, source_url) = cols
 
-def save_to_security_events(events: List[Dict], country_mapping: Dict[str, int]) -> int:
-    """Save events to security_events table"""
-    if not events:
-        return 0
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # Filter: only events with geo
+    if not action_geo_lat or not action_geo_lon:
+        return None
+    try:
+        lat = float(action_geo_lat)
+        lon = float(action_geo_lon)
+    except ValueError:
+        return None
+    if lat == 0 and lon == 0:
+        return None
 
-    inserted = 0
+    # Parse date
+    try:
+        parsed_date = datetime.strptime(event_date[:8], '%Y%m%d').date()
+    except ValueError:
+        parsed_date = datetime.utcnow().date()
 
-    for event in events:
+    # Severity: negative goldstein = conflict, amplified by mentions
+    try:
+        goldstein_val = float(goldstein) if goldstein else 0
+        mentions = int(num_mentions) if num_mentions else 1
+        severity = max(1, abs(min(0, goldstein_val)) * (1 + mentions / 10))
+    except ValueError:
+        severity = 1.0
+
+    return (
+        global_event_id,
+        parsed_date,
+        action_geo_country[:2] if action_geo_country else None,
+        action_geo_adm1,
+        lat,
+        lon,
+        RELEVANT_CAMEO_ROOTS.get(event_root_code, f'CAMEO_{event_root_code}'),
+        event_code,
+        severity,
+        source_url,
+        json.dumps({
+            'global_event_id': global_event_id,
+            'event_code': event_code,
+            'goldstein': goldstein,
+            'avg_tone': avg_tone,
+            'num_mentions': num_mentions,
+            'action_geo_fullname': action_geo_fullname
+        }),
+    )
+
+
+class EventWriter:
+    """Batched execute_values upserts into security_events on one connection"""
+
+    def __init__(self, conn, country_mapping: Dict[str, int], batch_size: int = 5000):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.country_mapping = country_mapping
+        self.batch_size = batch_size
+        self.pending = {}  # source_id -> row (dedupe: ON CONFLICT can't hit a row twice)
+        self.written = 0
+        self.countries = {}
+
+    def add(self, event: tuple):
+        self.pending[event[0]] = event
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = []
+        for (source_id, event_date, country_code, admin1, lat, lon, event_type,
+             sub_event_type, severity, source_url, raw_payload) in self.pending.values():
+            rows.append((source_id, event_date, country_code, self.country_mapping.get(country_code),
+                         admin1, lat, lon, event_type, sub_event_type, severity, source_url, raw_payload))
+            key = country_code or 'XX'
+            self.countries[key] = self.countries.get(key, 0) + 1
         try:
-            country_id = country_mapping.get(event['country_code'])
-
-            cursor.execute("""
-                INSERT INTO sofia.security_events
-                (source, source_id, event_date, country_code, country_id, admin1,
-                 latitude, longitude, event_type, sub_event_type, severity_score,
-                 source_url, raw_payload)
-                VALUES ('GDELT', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (source, source_id) DO UPDATE SET
-                    event_date = EXCLUDED.event_date,
-                    severity_score = EXCLUDED.severity_score,
-                    raw_payload = EXCLUDED.raw_payload,
-                    ingested_at = now()
-            """, (
-                event['source_id'],
-                event['event_date'],
-                event['country_code'],
-                country_id,
-                event.get('admin1'),
-                event['latitude'],
-                event['longitude'],
-                event.get('event_type'),
-                event.get('sub_event_type'),
-                event['severity_score'],
-                event.get('source_url'),
-                json.dumps(event['raw_payload'])
-            ))
-            inserted += 1
-
-        except Exception as e:
-            logger.warning(f"Error inserting event {event.get('source_id')}: {e}")
-            continue
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-    return inserted
+            execute_values(self.cursor, INSERT_SQL, rows, template=INSERT_TEMPLATE, page_size=1000)
+            self.conn.commit()
+            self.written += len(rows)
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            logger.warning(f"Error inserting batch of {len(rows)} events: {e}")
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.cursor.close()
+
+
+def ingest_gdelt_exports(conn, country_mapping: Dict[str, int], hours_back: int = 6,
+                         local_dir: Optional[Path] = None, workers: int = 8,
+                         batch_size: int = 5000, max_files: Optional[int] = None) -> Dict:
+    """
+    Pipelined ingestion: bounded-concurrency downloads run in a thread pool
+    while the main thread streams each finished zip straight into batched
+    upserts. With local_dir, reads *.export.CSV.zip files from disk instead
+    (offline benchmarking).
+    """
+    start = time.time()
+    writer = EventWriter(conn, country_mapping, batch_size=batch_size)
+    files_parsed = 0
+    events_seen = 0
+
+    if local_dir:
+        sources = sorted(Path(local_dir).glob('*.export.CSV.zip'), reverse=True)
+        if max_files:
+            sources = sources[:max_files]
+        logger.info(f"Reading {len(sources)} local GDELT export files from {local_dir}...")
+        for path in sources:
+            for event in iter_gdelt_export(path):
+                writer.add(event)
+                events_seen += 1
+            files_parsed += 1
+            logger.info(f"Parsed {path.name}")
+    else:
+        urls = export_urls(hours_back)
+        if max_files:
+            urls = urls[:max_files]
+        logger.info(f"Fetching {len(urls)} GDELT export files ({workers} concurrent downloads)...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(download_export, url): url for url in urls}
+            for future in as_completed(futures):
+                content = future.result()
+                if content is None:
+                    continue
+                for event in iter_gdelt_export(content):
+                    writer.add(event)
+                    events_seen += 1
+                files_parsed += 1
+                logger.info(f"Parsed {futures[future].split('/')[-1]}")
+
+    writer.close()
+    return {
+        'files': files_parsed,
+        'events': events_seen,
+        'written': writer.written,
+        'countries': writer.countries,
+        'seconds': round(time.time() - start, 1),
+    }
 
 
 def main():
+    parser = argparse.ArgumentParser(description='GDELT Events Collector - Security Layer')
+    parser.add_argument('--hours', type=int, default=6, help='hours of 15-min exports to fetch (default: 6)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('GDELT_DOWNLOAD_WORKERS', '8')),
+                        help='concurrent downloads (default: 8)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per upsert batch')
+    parser.add_argument('--max-files', type=int, default=None, help='cap number of export files')
+    parser.add_argument('--local-dir', type=Path, default=None,
+                        help='ingest *.export.CSV.zip from this directory instead of downloading')
+    args = parser.parse_args()
+
     logger.info("=" * 60)
     logger.info("GDELT Events Collector - Security Layer")
     logger.info("=" * 60)
 
     conn = get_db_connection()
-    country_mapping = get_country_mapping(conn)
-    conn.close()
-    logger.info(f"Loaded {len(country_mapping)} country mappings")
+    try:
+        country_mapping = get_country_mapping(conn)
+        logger.info(f"Loaded {len(country_mapping)} country mappings")
 
-    # Fetch events
-    events = fetch_gdelt_events(hours_back=6)
-    logger.info(f"Fetched {len(events)} geolocated events")
+        stats = ingest_gdelt_exports(conn, country_mapping, hours_back=args.hours,
+                                     local_dir=args.local_dir, workers=args.workers,
+                                     batch_size=args.batch_size, max_files=args.max_files)
+    finally:
+        conn.close()
 
-    if not events:
+    logger.info(f"Parsed {stats['files']} files, {stats['events']} geolocated events in {stats['seconds']}s")
+    if not stats['events']:
         logger.warning("No events collected")
         return
-
-    # Save to database
-    inserted = save_to_security_events(events, country_mapping)
-    logger.info(f"Inserted/updated {inserted} events in security_events")
-
-    # Summary
-    countries = {}
-    for e in events:
-        c = e.get('country_code', 'XX')
-        countries[c] = countries.get(c, 0) + 1
+    logger.info(f"Inserted/updated {stats['written']} events in security_events")
 
     logger.info("\nTop countries:")
-    for c, count in sorted(countries.items(), key=lambda x: -x[1])[:10]:
+    for c, count in sorted(stats['countries'].items(), key=lambda x: -x[1])[:10]:
         logger.info(f"  {c}: {count}")
 
     logger.info("=" * 60)
@@ -0,0 +1,298 @@
+"""Sofia Pulse — Warm collector runtime
+
+Pool de processos worker de vida longa para collect.run (modo "warm").
+Cada worker pré-importa os módulos pesados (psycopg2, requests, pandas...)
+e mantém um pool de conexões; collectors que expõem
+
+    def run(params: dict) -> dict   # {"fetched": n, "saved": n, "skipped": n}
+
+são importados e executados dentro do worker em vez de `python3 path`.
+Eventos de lib/metrics_channel.emitter() vão para um snapshot local e
+voltam junto com o resultado.
+
+Isolamento:
+- timeout por tarefa: worker que estoura é morto e substituído
+- reciclagem: worker é reiniciado após SOFIA_WARM_MAX_TASKS tarefas
+- exceção no collector não derruba o worker (vira erro da tarefa)
+
+Dentro do collector, use db_connection() — no worker vem do pool
+(lib.db_pool.DatabasePool, o mesmo do skills kit e da API), na linha de
+comando abre uma conexão avulsa:
+
+    from lib.collector_runtime import db_connection
+    with db_connection() as conn:
+        ...
+"""
+
+import contextlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import threading
+import traceback
+
+from lib.db_pool import DatabasePool
+from lib.metrics_channel import MetricsSnapshot, local_sink
+
+PRELOAD_MODULES = ["psycopg2", "psycopg2.extras", "requests", "dotenv", "pandas", "numpy"]
+
+_RUN_ENTRY_RE = re.compile(r"^def run\(", re.MULTILINE)
+
+# Pool de conexões do worker: DatabasePool (None fora de um worker)
+_db_pool = None
+
+
+def _connect_kwargs():
+    if os.getenv("DATABASE_URL"):
+        return {"dsn": os.environ["DATABASE_URL"]}
+    return {
+        "host": os.getenv("POSTGRES_HOST", "localhost"),
+        "port": int(os.getenv("POSTGRES_PORT", "5432")),
+        "user": os.getenv("POSTGRES_USER", "sofia"),
+        "password": os.getenv("POSTGRES_PASSWORD", ""),
+        "database": os.getenv("POSTGRES_DB", "sofia_db"),
+    }
+
+
+@contextlib.contextmanager
+def db_connection():
+    """Conexão do pool do worker (ou avulsa fora do worker). Rollback se não commitada."""
+    if _db_pool is None:
+        import psycopg2
+
+        conn = psycopg2.connect(**_connect_kwargs())
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    with _db_pool.connection() as conn:
+        yield conn
+
+
+def has_run_entry(path: str) -> bool:
+    """Collector .py com `def run(` no nível do módulo (sem importar)."""
+    if not path.endswith(".py"):
+        return False
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            return bool(_RUN_ENTRY_RE.search(f.read()))
+    except OSError:
+        return False
+
+
+# ----------------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------------
+
+def _load_collector(path, cache):
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    name = "sofia_collector_" + re.sub(r"\W", "_", os.path.basename(path)[:-3])
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    cache[path] = (mtime, module)
+    return module
+
+
+def _classify(exc):
+    name = type(exc).__name__.lower()
+    text = str(exc).lower()
+    if isinstance(exc, ImportError):
+        return "DEPENDENCY_MISSING"
+    if isinstance(exc, (FileNotFoundError, PermissionError)):
+        return "FS_ERROR"
+    if any(x in name or x in text for x in ["connectionerror", "timeout", "timed out", "unreachable", "503", "502", "504"]):
+        return "COLLECT_SOURCE_DOWN"
+    return "SCRIPT_ERROR"
+
+
+def _worker_main(conn, pool_max):
+    """Loop do worker: recebe (path, params, env) e devolve o resultado."""
+    global _db_pool
+
+    for mod in PRELOAD_MODULES:
+        try:
+            importlib.import_module(mod)
+        except ImportError:
+            pass
+    try:
+        import psycopg2.pool  # noqa: F401  (DatabasePool abre as conexões sob demanda)
+        _db_pool = DatabasePool(maxconn=pool_max, **_connect_kwargs())
+    except ImportError:
+        _db_pool = None  # collectors caem para conexão avulsa
+
+    modules = {}
+    base_env = dict(os.environ)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+
+        path, params, env = task
+        os.environ.clear()
+        os.environ.update(base_env)
+        os.environ.update(env)
+        output = io.StringIO()
+        channel = MetricsSnapshot()
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output), local_sink(channel):
+                metrics = _load_collector(path, modules).run(params)
+            conn.send({"ok": True, "metrics": metrics, "output": output.getvalue(),
+                       "channel": channel.to_dict()})
+        except SystemExit as e:
+            # sys.exit() dentro do collector: respeita o exit code
+            if e.code in (None, 0):
+                conn.send({"ok": True, "metrics": None, "output": output.getvalue(),
+                           "channel": channel.to_dict()})
+            else:
+                conn.send({"ok": False, "error_code": "SCRIPT_ERROR", "error": f"exit {e.code}",
+                           "output": output.getvalue(), "channel": channel.to_dict()})
+        except Exception as e:
+            conn.send({"ok": False, "error_code": _classify(e),
+                       "error": f"{type(e).__name__}: {e}",
+                       "output": output.getvalue() + traceback.format_exc(),
+                       "channel": channel.to_dict()})
+
+    if _db_pool is not None:
+        _db_pool.close()
+
+
+# ----------------------------------------------------------------------------
+# Parent side
+# ----------------------------------------------------------------------------
+
+class TaskTimeout(Exception):
+    pass
+
+
+class _Worker:
+    def __init__(self, ctx, pool_max):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, pool_max), daemon=True)
+        self.proc.start()
+        child.close()
+        self.tasks = 0
+
+    def stop(self, kill=False):
+        if kill:
+            self.proc.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.proc.join(5)
+            if self.proc.is_alive():
+                self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+
+class WarmWorkerPool:
+    """Pool de workers; submit() é bloqueante e thread-safe (1 tarefa por worker)."""
+
+    def __init__(self, size=4, max_tasks=25, db_pool_max=2):
+        self.size = size
+        self.max_tasks = max_tasks
+        self.db_pool_max = db_pool_max
+        self._ctx = multiprocessing.get_context("spawn")  # sem fork com threads vivas
+        self._idle = []
+        self._spawned = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {"tasks": 0, "timeouts": 0, "recycled": 0, "crashed": 0}
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("WarmWorkerPool closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._spawned < self.size:
+                    self._spawned += 1
+                    break
+                self._cond.wait()
+        try:
+            return _Worker(self._ctx, self.db_pool_max)
+        except Exception:
+            with self._cond:
+                self._spawned -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker):
+        with self._cond:
+            if not self._closed:
+                self._idle.append(worker)
+                self._cond.notify()
+                return
+        self._discard(worker)
+
+    def _discard(self, worker, kill=False):
+        worker.stop(kill=kill)
+        with self._cond:
+            self._spawned -= 1
+            self._cond.notify()
+
+    def submit(self, path, params, timeout_s, env=None):
+        """Executa run(params) do collector num worker. Levanta TaskTimeout."""
+        worker = self._acquire()
+        try:
+            worker.conn.send((path, params, env or {}))
+            if not worker.conn.poll(timeout_s):
+                self.stats["timeouts"] += 1
+                self._discard(worker, kill=True)
+                raise TaskTimeout(f"Collector exceeded {timeout_s}s")
+            result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self.stats["crashed"] += 1
+            self._discard(worker, kill=True)
+            return {"ok": False, "error_code": "SCRIPT_ERROR", "error": f"Worker died: {e}", "output": ""}
+
+        worker.tasks += 1
+        self.stats["tasks"] += 1
+        if worker.tasks >= self.max_tasks:
+            self.stats["recycled"] += 1
+            self._discard(worker)
+        else:
+            self._release(worker)
+        return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in idle:
+            worker.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_warm_pool() -> WarmWorkerPool:
+    """Pool por processo (criado sob demanda; env SOFIA_WARM_WORKERS / SOFIA_WARM_MAX_TASKS)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import atexit
+            _pool = WarmWorkerPool(
+                size=int(os.getenv("SOFIA_WARM_WORKERS", "4")),
+                max_tasks=int(os.getenv("SOFIA_WARM_MAX_TASKS", "25")),
+                db_pool_max=int(os.getenv("SOFIA_WARM_DB_POOL_MAX", "2")),
+            )
+            atexit.register(_pool.close)
+        return _pool
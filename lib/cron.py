@@ -0,0 +1,144 @@
+"""Sofia Pulse — Cron expressions (5 campos, sem dependências)
+
+Mesma semântica do cron do servidor (Vixie):
+- campos: minuto hora dia-do-mês mês dia-da-semana (0 ou 7 = domingo)
+- listas, faixas, passos e nomes: "0 8,11,14 * * 1-5", "*/15 * * * *", "0 9 * * mon"
+- macros: @hourly @daily @midnight @weekly @monthly @yearly @annually
+- dia-do-mês E dia-da-semana restritos → casa se QUALQUER um casar
+  ("0 14 1-7 * 1" = dias 1-7 OU segundas, como no crontab)
+
+Uso:
+    from lib.cron import CronExpression
+    cron = CronExpression("0 10 * * 1-5")
+    cron.next_after(now)     # próximo disparo > now
+    cron.prev_before(now)    # último disparo <= now
+"""
+
+from datetime import datetime, timedelta
+
+MACROS = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+
+MONTH_NAMES = {n: i for i, n in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+DOW_NAMES = {n: i for i, n in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+
+# (nome, mínimo, máximo, nomes)
+FIELDS = [
+    ("minute", 0, 59, {}),
+    ("hour", 0, 23, {}),
+    ("day", 1, 31, {}),
+    ("month", 1, 12, MONTH_NAMES),
+    ("weekday", 0, 7, DOW_NAMES),
+]
+
+MAX_SEARCH_YEARS = 5
+
+
+def _parse_value(token, names, field):
+    token = token.lower()
+    if token in names:
+        return names[token]
+    if not token.isdigit():
+        raise ValueError(f"invalid {field} value: {token!r}")
+    return int(token)
+
+
+def _parse_field(expr, field, lo, hi, names):
+    values = set()
+    for part in expr.split(","):
+        step = 1
+        if "/" in part:
+            part, step_s = part.split("/", 1)
+            if not step_s.isdigit() or int(step_s) == 0:
+                raise ValueError(f"invalid {field} step: {step_s!r}")
+            step = int(step_s)
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            a, b = part.split("-", 1)
+            start, end = _parse_value(a, names, field), _parse_value(b, names, field)
+        else:
+            start = _parse_value(part, names, field)
+            end = hi if step > 1 else start  # "5/10" = 5, 15, 25...
+        if not (lo <= start <= hi and lo <= end <= hi) or start > end:
+            raise ValueError(f"{field} out of range {lo}-{hi}: {part!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """Expressão cron de 5 campos, resolução de minuto."""
+
+    def __init__(self, expr: str):
+        self.expr = expr.strip()
+        fields = MACROS.get(self.expr.lower(), self.expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expr!r}")
+        parsed = [_parse_field(f, name, lo, hi, names) for f, (name, lo, hi, names) in zip(fields, FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}  # 7 → 0 (domingo)
+        self._dom_any = fields[2] == "*"
+        self._dow_any = fields[4] == "*"
+        self._minutes_sorted = sorted(self.minutes)
+
+    def __repr__(self):
+        return f"CronExpression({self.expr!r})"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        dom = dt.day in self.days
+        dow = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._dom_any and self._dow_any:
+            return True
+        if self._dom_any:
+            return dow
+        if self._dow_any:
+            return dom
+        return dom or dow
+
+    def matches(self, dt: datetime) -> bool:
+        return (dt.minute in self.minutes and dt.hour in self.hours
+                and dt.month in self.months and self._day_matches(dt))
+
+    def next_after(self, dt: datetime) -> datetime:
+        """Primeiro disparo estritamente depois de dt."""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt.year + MAX_SEARCH_YEARS
+        while t.year <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            else:
+                later = [m for m in self._minutes_sorted if m >= t.minute]
+                if later:
+                    return t.replace(minute=later[0])
+                t = t.replace(minute=0) + timedelta(hours=1)
+        raise ValueError(f"{self.expr!r} never fires")
+
+    def prev_before(self, dt: datetime) -> datetime:
+        """Último disparo <= dt."""
+        t = dt.replace(second=0, microsecond=0)
+        limit = dt.year - MAX_SEARCH_YEARS
+        while t.year >= limit:
+            if t.month not in self.months:
+                t = t.replace(day=1, hour=23, minute=59) - timedelta(days=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=23, minute=59) - timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=59) - timedelta(hours=1)
+            else:
+                earlier = [m for m in self._minutes_sorted if m <= t.minute]
+                if earlier:
+                    return t.replace(minute=earlier[-1])
+                t = t.replace(minute=59) - timedelta(hours=1)
+        raise ValueError(f"{self.expr!r} never fired")
@@ -0,0 +1,197 @@
+"""Sofia Pulse — Pool de conexões (skills kit e API)
+
+Uma única implementação para o processo inteiro: o skill runner usa o pool
+global (lazy, DATABASE_URL) injetado em context["db"]; a API (api/db_pool.py)
+cria o seu a partir de POSTGRES_* e abre no startup. Skills pegam conexão com:
+
+    from lib.db_pool import db_connection
+    with db_connection(context) as conn:
+        cur = conn.cursor(); ...; conn.commit()
+
+Fora do runner (record_usage, ingest, scripts) db_connection() sem context usa
+o mesmo pool global. A conexão volta ao pool com rollback (nunca com transação
+aberta); conexões ociosas há mais de max_idle_s recebem um ping antes de sair.
+
+Tamanho: SOFIA_DB_POOL_MAX (4), espera máxima SOFIA_DB_POOL_TIMEOUT (10s).
+stats: connects (conexões físicas abertas), acquired, wait_ms_total/max, ...
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from lib.helpers import DB_URL
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão livre dentro de acquire_timeout."""
+
+
+class DatabasePool:
+    """ThreadedConnectionPool lazy + semáforo (espera em vez de PoolError).
+
+    Conexão por dsn (default DATABASE_URL) ou por kwargs do psycopg2.connect.
+    """
+
+    def __init__(self, dsn: str = None, minconn: int = 0, maxconn: int = 4, acquire_timeout: float = 10.0,
+                 max_idle_s: float = 30.0, **connect_kwargs):
+        self.connect_kwargs = connect_kwargs
+        self.dsn = dsn or (None if connect_kwargs else DB_URL)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.max_idle_s = max_idle_s
+        self._pool = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._last_used = {}
+        self.stats = {"connects": 0, "acquired": 0, "discarded": 0, "timeouts": 0,
+                      "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    def _ensure_open(self):
+        # Depois de fork o pool do pai não serve (sockets compartilhados): recomeça
+        if self._pool is not None and self._pid == os.getpid():
+            return
+        from psycopg2.pool import ThreadedConnectionPool
+
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                kwargs = dict(self.connect_kwargs, dsn=self.dsn) if self.dsn else self.connect_kwargs
+                self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **kwargs)
+                self._pid = os.getpid()
+                self._seen.clear()
+                self._last_used.clear()
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._last_used.get(id(conn), 0)
+        if idle < self.max_idle_s:
+            return True
+        import psycopg2
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        conn = self._pool.getconn()
+        if id(conn) not in self._seen:
+            self._seen.add(id(conn))
+            self.stats["connects"] += 1
+            self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    def getconn(self):
+        self._ensure_open()
+        t0 = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise PoolTimeout(f"No DB connection available after {self.acquire_timeout}s")
+        try:
+            with self._lock:
+                conn = self._checkout()
+            if not self._healthy(conn):  # ping fora do lock
+                with self._lock:
+                    self.stats["discarded"] += 1
+                    self._seen.discard(id(conn))
+                    self._pool.putconn(conn, close=True)
+                    conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        wait_ms = (time.monotonic() - t0) * 1000
+        with self._lock:
+            self.stats["acquired"] += 1
+            self.stats["wait_ms_total"] += wait_ms
+            self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+        return conn
+
+    def putconn(self, conn):
+        if conn is None:
+            return
+        import psycopg2
+        try:
+            broken = bool(conn.closed)
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            with self._lock:
+                if broken:
+                    self._seen.discard(id(conn))
+                    self._last_used.pop(id(conn), None)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                if self._pool is not None and self._pid == os.getpid():
+                    self._pool.putconn(conn, close=broken)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def open(self):
+        """Abre já (minconn conexões); sem isso o pool abre no primeiro getconn."""
+        self._ensure_open()
+
+    def warm(self, n: int = 1) -> int:
+        """Abre n conexões antes do primeiro uso (warmup do skill runner)."""
+        conns = []
+        try:
+            for _ in range(min(n, self.maxconn)):
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+        return len(conns)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+
+    def snapshot(self) -> dict:
+        in_use = len(self._pool._used) if self._pool is not None else 0
+        acquired = self.stats["acquired"]
+        return {"minconn": self.minconn, "maxconn": self.maxconn, "in_use": in_use, **self.stats,
+                "wait_ms_avg": round(self.stats["wait_ms_total"] / acquired, 2) if acquired else 0.0}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> DatabasePool:
+    """Pool global do processo (criado no primeiro uso)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DatabasePool(
+                    maxconn=int(os.getenv("SOFIA_DB_POOL_MAX", "4")),
+                    acquire_timeout=float(os.getenv("SOFIA_DB_POOL_TIMEOUT", "10")),
+                    max_idle_s=float(os.getenv("SOFIA_DB_POOL_MAX_IDLE", "30")),
+                )
+    return _pool
+
+
+def db_connection(context: dict = None):
+    """Conexão do pool injetado em context["db"] (ou do pool global)."""
+    pool = (context or {}).get("db") or get_pool()
+    return pool.connection()
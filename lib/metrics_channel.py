@@ -0,0 +1,241 @@
+"""Sofia Pulse — Metrics channel (collectors → runners)
+
+Protocolo tipado de métricas, NDJSON num fd lateral herdado pelo collector
+(env SOFIA_METRICS_FD). Não passa por stdout: o runner não precisa bufferizar
+nem fazer regex na saída, e recebe progresso ao vivo.
+
+Eventos (uma linha JSON cada, "v": 1):
+    {"type": "counter",  "name": "fetched", "inc": 120}
+    {"type": "phase",    "name": "fetch", "ms": 812}
+    {"type": "progress", "done": 3, "total": 7, "unit": "series"}
+    {"type": "result",   "status": "ok", "source": "...", "items_inserted": 10, ...}
+
+Collector (sem fd → no-op, roda igual na linha de comando):
+
+    from lib.metrics_channel import emitter
+    m = emitter()
+    with m.phase("fetch"):
+        rows = fetch()
+    m.count("fetched", len(rows))
+
+Runner:
+
+    with MetricsChannel(on_event=print_progress) as channel:
+        subprocess.run(cmd, env={**os.environ, **channel.env}, pass_fds=channel.pass_fds)
+    snapshot = channel.snapshot()   # {"counters", "phases_ms", "progress", "result", ...}
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+ENV_FD = "SOFIA_METRICS_FD"
+PROTOCOL_VERSION = 1
+MAX_LINE_BYTES = 64 * 1024
+EVENT_TYPES = ("counter", "phase", "progress", "result")
+
+# Contadores padrão usados por collect.run / collector_runs
+STANDARD_COUNTERS = ("fetched", "saved", "skipped")
+
+
+class MetricsSnapshot:
+    """Agregado dos eventos recebidos (thread-safe)."""
+
+    def __init__(self):
+        self.counters = {}
+        self.phases_ms = {}
+        self.progress = None
+        self.result = None
+        self.events = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def apply(self, event: dict) -> bool:
+        kind = event.get("type")
+        if kind not in EVENT_TYPES:
+            self.drop()
+            return False
+        with self._lock:
+            self.events += 1
+            if kind == "counter":
+                name = str(event.get("name"))
+                self.counters[name] = self.counters.get(name, 0) + int(event.get("inc", 1))
+            elif kind == "phase":
+                name = str(event.get("name"))
+                self.phases_ms[name] = self.phases_ms.get(name, 0) + int(event.get("ms", 0))
+            elif kind == "progress":
+                self.progress = {k: event.get(k) for k in ("done", "total", "unit")}
+            else:
+                self.result = {k: v for k, v in event.items() if k not in ("v", "type", "ts")}
+        return True
+
+    def drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "phases_ms": dict(self.phases_ms),
+                "progress": self.progress,
+                "result": self.result,
+                "events": self.events,
+                "dropped": self.dropped,
+            }
+
+
+# ----------------------------------------------------------------------------
+# Emitter (collector side)
+# ----------------------------------------------------------------------------
+
+class MetricsEmitter:
+    """Escreve eventos no fd (ou num MetricsSnapshot local, modo warm). Sem destino = no-op."""
+
+    def __init__(self, fd=None, sink: MetricsSnapshot = None):
+        self.fd = fd
+        self.sink = sink
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.fd is not None or self.sink is not None
+
+    def emit(self, kind: str, **fields):
+        if not self.enabled:
+            return
+        event = {"v": PROTOCOL_VERSION, "type": kind, "ts": round(time.time(), 3), **fields}
+        if self.sink is not None:
+            self.sink.apply(event)
+            return
+        line = (json.dumps(event, default=str) + "\n").encode()
+        if len(line) > MAX_LINE_BYTES:
+            return
+        with self._lock:
+            try:
+                os.write(self.fd, line)
+            except OSError:
+                self.fd = None  # runner foi embora; segue sem métricas
+
+    def count(self, name: str, inc: int = 1):
+        self.emit("counter", name=name, inc=int(inc))
+
+    def progress(self, done: int, total: int = None, unit: str = "items"):
+        self.emit("progress", done=done, total=total, unit=unit)
+
+    def result(self, **payload):
+        self.emit("result", **payload)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Cronometra uma fase (fetch / transform / write). Fases repetidas somam."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.emit("phase", name=name, ms=round((time.perf_counter() - start) * 1000))
+
+
+_emitter = None
+_local = threading.local()
+
+
+def emitter() -> MetricsEmitter:
+    """Emitter do processo: sink local (worker warm) > fd de SOFIA_METRICS_FD > no-op."""
+    global _emitter
+    sink = getattr(_local, "sink", None)
+    if sink is not None:
+        return MetricsEmitter(sink=sink)
+    if _emitter is None:
+        fd = os.getenv(ENV_FD)
+        _emitter = MetricsEmitter(fd=int(fd) if fd and fd.isdigit() else None)
+    return _emitter
+
+
+@contextlib.contextmanager
+def local_sink(snapshot: MetricsSnapshot):
+    """Direciona emitter() desta thread para snapshot (execução in-process)."""
+    _local.sink = snapshot
+    try:
+        yield snapshot
+    finally:
+        _local.sink = None
+
+
+# ----------------------------------------------------------------------------
+# Channel (runner side)
+# ----------------------------------------------------------------------------
+
+class MetricsChannel:
+    """
+    Pipe + thread leitora. Use em volta do subprocess; env/pass_fds vão pro filho.
+    on_event(event) é chamado a cada evento válido (progresso ao vivo).
+    """
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.env = {}
+        self.pass_fds = ()
+        self._snapshot = MetricsSnapshot()
+        self._read_fd = self._write_fd = None
+        self._thread = None
+
+    def __enter__(self):
+        if os.name == "nt":
+            return self  # sem pass_fds no Windows: runner cai no parse de stdout
+        self._read_fd, self._write_fd = os.pipe()
+        self.env = {ENV_FD: str(self._write_fd)}
+        self.pass_fds = (self._write_fd,)
+        self._thread = threading.Thread(target=self._read_loop, name="metrics-channel", daemon=True)
+        self._thread.start()
+        return self
+
+    def close_writer(self):
+        """Fecha a ponta de escrita do runner (chame logo após o Popen se quiser EOF cedo)."""
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+            self._write_fd = None
+
+    def __exit__(self, *exc):
+        self.close_writer()
+        if self._thread is not None:
+            # Netos que herdaram o fd podem segurar o EOF; não trava o runner
+            self._thread.join(timeout=5)
+        return False
+
+    def _read_loop(self):
+        with os.fdopen(self._read_fd, "rb") as stream:
+            for raw in stream:
+                if len(raw) > MAX_LINE_BYTES:
+                    self._snapshot.drop()
+                    continue
+                try:
+                    event = json.loads(raw)
+                except ValueError:
+                    self._snapshot.drop()
+                    continue
+                if not isinstance(event, dict) or not self._snapshot.apply(event):
+                    continue
+                if self.on_event is not None:
+                    try:
+                        self.on_event(event)
+                    except Exception:
+                        pass
+
+    def snapshot(self) -> dict:
+        return self._snapshot.to_dict()
+
+
+def format_event(event: dict) -> str:
+    """Linha curta para log de progresso ao vivo."""
+    kind = event.get("type")
+    if kind == "counter":
+        return f"{event.get('name')} +{event.get('inc')}"
+    if kind == "phase":
+        return f"phase {event.get('name')}: {event.get('ms')}ms"
+    if kind == "progress":
+        total = event.get("total")
+        return f"progress {event.get('done')}{'/' + str(total) if total else ''} {event.get('unit', '')}".rstrip()
+    return f"result {event.get('status', '')}".rstrip()
@@ -0,0 +1,289 @@
+"""Sofia Pulse — Process supervisor (streaming log capture, anti-OOM)
+
+Executa um collector em subprocess sem nunca segurar a saída em RAM:
+- stdout/stderr são bombeados por threads em chunks de 64KB para arquivos
+  com rotação por tamanho (segmentos antigos .1.gz, .2.gz... comprimidos)
+- um ring buffer limitado por stream guarda só o fim (tails para DB/erros)
+- on_line(stream, line) recebe cada linha (progresso ao vivo, com
+  LineProgress para collectors que ainda não usam lib/metrics_channel)
+- timeout mata o grupo de processos inteiro (bash → npx → node)
+
+Usado por scripts/tracked_runner.py, scripts/intelligent_scheduler.py e
+skills/collect_run.
+
+    from lib.process_supervisor import supervise
+    result = supervise(cmd, timeout=300, env=env, log_prefix="logs/acled/<run_id>")
+    result.returncode, result.timed_out, result.stdout_tail, result.stderr_tail
+"""
+
+import collections
+import gzip
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+CHUNK_BYTES = 64 * 1024
+MAX_LINE_BYTES = 8 * 1024
+DEFAULT_TAIL_BYTES = 64 * 1024
+MAX_LOG_BYTES = int(float(os.getenv("SOFIA_RUN_LOG_MAX_MB", "20")) * 1024 * 1024)
+LOG_BACKUPS = int(os.getenv("SOFIA_RUN_LOG_BACKUPS", "3"))
+KILL_GRACE_S = 5
+
+
+class RingBuffer:
+    """Últimos max_bytes de um stream (thread-safe)."""
+
+    def __init__(self, max_bytes: int = DEFAULT_TAIL_BYTES):
+        self.max_bytes = max_bytes
+        self._chunks = collections.deque()
+        self._size = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes):
+        with self._lock:
+            self.total += len(data)
+            if len(data) >= self.max_bytes:
+                self._chunks.clear()
+                data = data[-self.max_bytes:]
+                self._size = 0
+            self._chunks.append(data)
+            self._size += len(data)
+            while self._size - len(self._chunks[0]) >= self.max_bytes:
+                self._size -= len(self._chunks.popleft())
+
+    def tail(self, max_bytes: Optional[int] = None) -> str:
+        with self._lock:
+            data = b"".join(self._chunks)
+        limit = min(max_bytes or self.max_bytes, self.max_bytes)
+        return data[-limit:].decode("utf-8", errors="replace")
+
+
+class RotatingLogWriter:
+    """Arquivo com rotação por tamanho: path, path.1.gz ... path.N.gz."""
+
+    def __init__(self, path: str, max_bytes: int = MAX_LOG_BYTES, backups: int = LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.rotations = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, "wb")
+        self._size = 0
+
+    def write(self, data: bytes):
+        if self.max_bytes and self._size + len(data) > self.max_bytes and self._size:
+            self._rotate()
+        self._f.write(data)
+        self._size += len(data)
+
+    def _rotate(self):
+        self._f.close()
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}.gz"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}.gz")
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, CHUNK_BYTES)
+        self._f = open(self.path, "wb")
+        self._size = 0
+        self.rotations += 1
+
+    def append_note(self, text: str):
+        """Linha do runner (timeout, abort) no fim do log."""
+        self.write(text.encode("utf-8", errors="replace"))
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+class _Pump(threading.Thread):
+    """Lê um pipe em chunks → arquivo + ring buffer + on_line."""
+
+    def __init__(self, pipe, name, writer, ring, on_line):
+        super().__init__(name=f"pump-{name}", daemon=True)
+        self.pipe, self.stream, self.writer, self.ring, self.on_line = pipe, name, writer, ring, on_line
+        self._partial = b""
+
+    def run(self):
+        fd = self.pipe.fileno()
+        try:
+            while True:
+                chunk = os.read(fd, CHUNK_BYTES)
+                if not chunk:
+                    break
+                if self.writer is not None:
+                    self.writer.write(chunk)
+                self.ring.write(chunk)
+                if self.on_line is not None:
+                    self._lines(chunk)
+        except OSError:
+            pass
+        finally:
+            if self.on_line is not None and self._partial:
+                self._emit(self._partial)
+            self.pipe.close()
+
+    def _lines(self, chunk):
+        data = self._partial + chunk
+        *lines, self._partial = data.split(b"\n")
+        if len(self._partial) > MAX_LINE_BYTES:
+            self._partial = b""  # linha gigante (JSON dump, barra de progresso) - descarta
+        for line in lines:
+            self._emit(line[:MAX_LINE_BYTES])
+
+    def _emit(self, line):
+        try:
+            self.on_line(self.stream, line.decode("utf-8", errors="replace").rstrip("\r"))
+        except Exception:
+            pass
+
+
+@dataclass
+class SupervisedResult:
+    returncode: int
+    timed_out: bool
+    duration_s: float
+    stdout_tail: str
+    stderr_tail: str
+    stdout_bytes: int
+    stderr_bytes: int
+    log_paths: List[str] = field(default_factory=list)
+    rotations: int = 0
+
+    @property
+    def output_tail(self) -> str:
+        return self.stdout_tail + self.stderr_tail
+
+
+def _kill_tree(proc):
+    """SIGTERM no grupo (collector + netos), SIGKILL depois de KILL_GRACE_S."""
+    if os.name == "nt":
+        proc.kill()
+        return
+    for sig, grace in ((signal.SIGTERM, KILL_GRACE_S), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        if grace is None:
+            return
+        try:
+            proc.wait(grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def supervise(cmd, *, timeout: Optional[float] = None, env: Optional[dict] = None, cwd: Optional[str] = None,
+              pass_fds=(), log_prefix: Optional[str] = None, tail_bytes: int = DEFAULT_TAIL_BYTES,
+              max_log_bytes: int = MAX_LOG_BYTES, backups: int = LOG_BACKUPS,
+              on_line: Optional[Callable[[str, str], None]] = None,
+              on_start: Optional[Callable[[subprocess.Popen], None]] = None) -> SupervisedResult:
+    """
+    Roda cmd com stdout/stderr em streaming. log_prefix → <prefix>.out / <prefix>.err
+    (rotacionados); sem log_prefix só os tails ficam (ring buffers).
+    Timeout não levanta: result.timed_out=True e o grupo de processos é morto.
+    """
+    start = time.time()
+    writers = {}
+    if log_prefix:
+        writers = {s: RotatingLogWriter(f"{log_prefix}.{ext}", max_log_bytes, backups)
+                   for s, ext in (("stdout", "out"), ("stderr", "err"))}
+    rings = {"stdout": RingBuffer(tail_bytes), "stderr": RingBuffer(tail_bytes)}
+
+    try:
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+            env=env, cwd=cwd, pass_fds=pass_fds, start_new_session=os.name != "nt",
+        )
+    except BaseException:
+        for w in writers.values():
+            w.close()
+        raise
+
+    pumps = [_Pump(proc.stdout, "stdout", writers.get("stdout"), rings["stdout"], on_line),
+             _Pump(proc.stderr, "stderr", writers.get("stderr"), rings["stderr"], on_line)]
+    for p in pumps:
+        p.start()
+    if on_start is not None:
+        on_start(proc)
+
+    timed_out = False
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill_tree(proc)
+        proc.wait()
+    except BaseException:
+        # SIGTERM / Ctrl+C no runner: não deixa o collector órfão
+        _kill_tree(proc)
+        proc.wait()
+        raise
+    finally:
+        for p in pumps:
+            p.join(10)  # neto daemonizado segurando o pipe não trava o runner
+        for s, w in writers.items():
+            if timed_out and s == "stderr":
+                w.append_note(f"\n[Runner] Timeout after {timeout}s\n")
+            if not any(p.is_alive() and p.stream == s for p in pumps):
+                w.close()
+
+    return SupervisedResult(
+        returncode=proc.returncode,
+        timed_out=timed_out,
+        duration_s=time.time() - start,
+        stdout_tail=rings["stdout"].tail(),
+        stderr_tail=rings["stderr"].tail(),
+        stdout_bytes=rings["stdout"].total,
+        stderr_bytes=rings["stderr"].total,
+        log_paths=[w.path for w in writers.values()],
+        rotations=sum(w.rotations for w in writers.values()),
+    )
+
+
+# ----------------------------------------------------------------------------
+# Progresso ao vivo a partir do stdout (collectors sem metrics_channel)
+# ----------------------------------------------------------------------------
+
+_PROGRESS_RE = re.compile(r"\b(\d+)\s*/\s*(\d+)\b")
+_COUNTER_RE = re.compile(r"\b(fetched|collected|saved|inserted|upserted)[:\s]+(\d+)", re.IGNORECASE)
+
+
+class LineProgress:
+    """
+    on_line que converte "12/40" e "saved: 120" em eventos no formato do
+    metrics_channel e chama on_event no máximo a cada min_interval_s.
+    """
+
+    def __init__(self, on_event: Callable[[dict], None], min_interval_s: float = 5.0):
+        self.on_event = on_event
+        self.min_interval_s = min_interval_s
+        self._last = 0.0
+
+    def __call__(self, stream: str, line: str):
+        if stream != "stdout":
+            return
+        now = time.monotonic()
+        if now - self._last < self.min_interval_s:
+            return
+        m = _PROGRESS_RE.search(line)
+        if m and int(m.group(1)) <= int(m.group(2)):
+            event = {"type": "progress", "done": int(m.group(1)), "total": int(m.group(2)), "unit": "items"}
+        else:
+            m = _COUNTER_RE.search(line)
+            if not m:
+                return
+            event = {"type": "progress", "done": int(m.group(2)), "total": None, "unit": m.group(1).lower()}
+        self._last = now
+        self.on_event(event)
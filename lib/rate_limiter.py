@@ -0,0 +1,251 @@
+"""Sofia Pulse — Rate limiter (token bucket compartilhado entre processos)
+
+Um bucket por rate_limit_key, com estado num SQLite (WAL) compartilhado por
+todos os processos da máquina: vários collectors batendo no mesmo provedor
+dividem a mesma cota.
+
+- Reserva não-bloqueante: reserve() debita 1 token (pode ficar negativo =
+  fila no futuro) e devolve quanto esperar. O sleep acontece FORA de qualquer
+  lock; chaves diferentes nunca se bloqueiam.
+- Backoff adaptativo: 429 / Retry-After abrem uma janela de pausa e reduzem
+  a taxa efetiva (x0.5, mínimo 10%); respostas OK recuperam aos poucos (x1.1).
+- Métricas por chave: requests, waits, wait_ms_total, max_wait_ms, throttled
+  (429), fator atual. `python3 -m lib.rate_limiter` imprime a tabela.
+
+Uso:
+    from lib.rate_limiter import get_limiter
+    limiter = get_limiter()
+    waited = limiter.acquire("github", rpm=60)      # dorme se preciso, retorna segundos
+    ...
+    limiter.penalize("github", retry_after_s=30)     # em 429
+    limiter.success("github")                        # em resposta OK
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from lib.helpers import SOFIA_LOG_DIR
+
+DB_PATH = os.getenv("SOFIA_RATE_LIMIT_DB", os.path.join(SOFIA_LOG_DIR, "rate_limits.sqlite"))
+
+MIN_FACTOR = 0.1
+PENALTY_FACTOR = 0.5
+RECOVERY_FACTOR = 1.1
+DEFAULT_PENALTY_S = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    factor REAL NOT NULL DEFAULT 1.0,
+    penalty_until REAL NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    waits INTEGER NOT NULL DEFAULT 0,
+    wait_ms_total INTEGER NOT NULL DEFAULT 0,
+    max_wait_ms INTEGER NOT NULL DEFAULT 0,
+    throttled INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+STAT_FIELDS = ("requests", "waits", "wait_ms_total", "max_wait_ms", "throttled", "factor", "penalty_until")
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After em segundos (aceita número ou HTTP-date). None se ausente/ inválido."""
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.replace(".", "", 1).isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _refill(tokens, updated_at, now, rate, capacity):
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+def _reserve_math(row, now, rpm, burst):
+    """Aplica uma reserva a (tokens, updated_at, factor, penalty_until). Retorna (tokens, wait_s)."""
+    tokens, updated_at, factor, penalty_until = row
+    rate = (rpm / 60.0) * factor
+    capacity = burst if burst is not None else max(1.0, rpm * factor / 60.0 * 5)  # ~5s de rajada
+    tokens = _refill(tokens, updated_at, now, rate, capacity) - 1.0
+    # Débito agendado DEPOIS da pausa: a fila de um 429 sai espaçada em 1/rate, não em rajada
+    wait = max(0.0, penalty_until - now) + (-tokens / rate if tokens < 0 else 0.0)
+    return tokens, wait
+
+
+class SQLiteRateLimiter:
+    """Backend compartilhado entre processos (uma transação curta por reserva)."""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().execute(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _tx(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reserve(self, key: str, rpm: float, burst: float = None) -> float:
+        now = time.time()
+
+        def tx(conn):
+            row = conn.execute(
+                "SELECT tokens, updated_at, factor, penalty_until FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                row = (burst if burst is not None else max(1.0, rpm / 60.0 * 5), now, 1.0, 0.0)
+                conn.execute("INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)", (key, row[0], now))
+            tokens, wait = _reserve_math(row, now, rpm, burst)
+            wait_ms = int(wait * 1000)
+            conn.execute(
+                """UPDATE buckets SET tokens = ?, updated_at = ?, requests = requests + 1,
+                       waits = waits + ?, wait_ms_total = wait_ms_total + ?,
+                       max_wait_ms = MAX(max_wait_ms, ?)
+                   WHERE key = ?""",
+                (tokens, now, 1 if wait_ms else 0, wait_ms, wait_ms, key),
+            )
+            return wait
+
+        return self._tx(tx)
+
+    def penalize(self, key: str, retry_after_s: float = None):
+        pause = retry_after_s if retry_after_s is not None else DEFAULT_PENALTY_S
+        until = time.time() + pause
+        self._tx(lambda conn: conn.execute(
+            """UPDATE buckets SET throttled = throttled + 1,
+                   factor = MAX(?, factor * ?), penalty_until = MAX(penalty_until, ?)
+               WHERE key = ?""",
+            (MIN_FACTOR, PENALTY_FACTOR, until, key),
+        ))
+
+    def success(self, key: str):
+        conn = self._conn()
+        # Barato: só escreve quando há algo a recuperar
+        conn.execute("UPDATE buckets SET factor = MIN(1.0, factor * ?) WHERE key = ? AND factor < 1.0",
+                     (RECOVERY_FACTOR, key))
+
+    def stats(self) -> dict:
+        rows = self._conn().execute(f"SELECT key, {', '.join(STAT_FIELDS)} FROM buckets ORDER BY key").fetchall()
+        return {r[0]: dict(zip(STAT_FIELDS, r[1:])) for r in rows}
+
+
+class MemoryRateLimiter:
+    """Fallback por processo (mesma semântica) quando o SQLite não está disponível."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, rpm, burst, now):
+        if key not in self._buckets:
+            tokens = burst if burst is not None else max(1.0, rpm / 60.0 * 5)
+            self._buckets[key] = {"tokens": tokens, "updated_at": now, "factor": 1.0, "penalty_until": 0.0,
+                                  "requests": 0, "waits": 0, "wait_ms_total": 0, "max_wait_ms": 0, "throttled": 0}
+        return self._buckets[key]
+
+    def reserve(self, key: str, rpm: float, burst: float = None) -> float:
+        now = time.time()
+        with self._lock:
+            b = self._bucket(key, rpm, burst, now)
+            tokens, wait = _reserve_math((b["tokens"], b["updated_at"], b["factor"], b["penalty_until"]), now, rpm, burst)
+            wait_ms = int(wait * 1000)
+            b.update(tokens=tokens, updated_at=now)
+            b["requests"] += 1
+            b["waits"] += 1 if wait_ms else 0
+            b["wait_ms_total"] += wait_ms
+            b["max_wait_ms"] = max(b["max_wait_ms"], wait_ms)
+            return wait
+
+    def penalize(self, key: str, retry_after_s: float = None):
+        pause = retry_after_s if retry_after_s is not None else DEFAULT_PENALTY_S
+        with self._lock:
+            b = self._buckets.get(key)
+            if b:
+                b["throttled"] += 1
+                b["factor"] = max(MIN_FACTOR, b["factor"] * PENALTY_FACTOR)
+                b["penalty_until"] = max(b["penalty_until"], time.time() + pause)
+
+    def success(self, key: str):
+        with self._lock:
+            b = self._buckets.get(key)
+            if b and b["factor"] < 1.0:
+                b["factor"] = min(1.0, b["factor"] * RECOVERY_FACTOR)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {k: {f: b[f] for f in STAT_FIELDS} for k, b in sorted(self._buckets.items())}
+
+
+class RateLimiter:
+    """Fachada: reserva no backend e dorme fora de qualquer lock."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def acquire(self, key: str, rpm: float, burst: float = None) -> float:
+        wait = self.backend.reserve(key, rpm, burst)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, key: str, retry_after_s: float = None):
+        self.backend.penalize(key, retry_after_s)
+
+    def success(self, key: str):
+        self.backend.success(key)
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            try:
+                backend = SQLiteRateLimiter()
+            except (sqlite3.Error, OSError) as e:
+                print(f"[rate_limiter] SQLite backend unavailable ({e}), using per-process buckets",
+                      file=sys.stderr)
+                backend = MemoryRateLimiter()
+            _limiter = RateLimiter(backend)
+        return _limiter
+
+
+if __name__ == "__main__":
+    stats = get_limiter().stats()
+    print(f"{'key':<30} {'requests':>9} {'waits':>7} {'wait_ms':>10} {'max_ms':>8} {'429':>5} {'factor':>7}")
+    for key, s in stats.items():
+        print(f"{key:<30} {s['requests']:>9} {s['waits']:>7} {s['wait_ms_total']:>10} "
+              f"{s['max_wait_ms']:>8} {s['throttled']:>5} {s['factor']:>7.2f}")
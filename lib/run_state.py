@@ -0,0 +1,162 @@
+"""Sofia Pulse — Escrita em lote do ciclo de vida dos runs (sofia.collector_runs)
+
+collect.run gravava start (INSERT) e finish (UPDATE) cada um com conexão e
+commit próprios. Aqui os dois ficam num buffer e vão ao banco em lote:
+- start + finish do mesmo run ainda no buffer → um único INSERT já fechado
+- INSERTs via execute_values, finishes via UPDATE ... FROM (VALUES ...)
+- flush quando o buffer chega a SOFIA_RUN_STATE_BATCH (50), a cada
+  SOFIA_RUN_STATE_FLUSH_S (2s) por thread de fundo, no atexit, ou explícito
+  (runs.audit chama flush() antes de ler)
+
+started_at/finished_at são carimbados no momento da chamada, não do flush.
+Injetado pelo lib/skill_runner em context["run_state"].
+"""
+
+import atexit
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+
+from lib.db_pool import get_pool
+
+START_COLUMNS = ("run_id", "trace_id", "collector_name", "collector_path", "actor", "params", "env", "started_at")
+FINISH_COLUMNS = ("finished_at", "duration_ms", "fetched", "saved", "skipped", "exit_code", "ok",
+                  "error_code", "error_message")
+
+_INSERT_SQL = (f"INSERT INTO sofia.collector_runs ({','.join(START_COLUMNS + FINISH_COLUMNS)}) VALUES %s "
+               "ON CONFLICT (run_id) DO NOTHING")
+_INSERT_TEMPLATE = ("(%s::uuid,%s::uuid,%s,%s,%s,%s::jsonb,%s,%s::timestamptz,"
+                    "%s::timestamptz,%s::int,COALESCE(%s::int,0),COALESCE(%s::int,0),COALESCE(%s::int,0),"
+                    "%s::int,COALESCE(%s::boolean,FALSE),%s,%s)")
+_UPDATE_SQL = ("UPDATE sofia.collector_runs r SET " + ",".join(f"{c}=v.{c}" for c in FINISH_COLUMNS) +
+               " FROM (VALUES %s) AS v(run_id," + ",".join(FINISH_COLUMNS) + ") WHERE r.run_id=v.run_id")
+_UPDATE_TEMPLATE = "(%s::uuid,%s::timestamptz,%s::int,%s::int,%s::int,%s::int,%s::int,%s::boolean,%s,%s)"
+
+MAX_PENDING = 5000  # banco fora: não cresce sem limite
+
+
+class RunStateWriter:
+    def __init__(self, pool=None, batch_size: int = 50, flush_interval_s: float = 2.0):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._starts = {}    # run_id → dict (start + finish opcional)
+        self._finishes = {}  # run_id → dict (start já gravado)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"starts": 0, "finishes": 0, "merged": 0, "flushes": 0, "rows_written": 0,
+                      "errors": 0, "dropped": 0}
+
+    def _pending(self) -> int:
+        return len(self._starts) + len(self._finishes)
+
+    def start(self, run_id, trace_id, collector_name, collector_path, actor, params_json, env):
+        row = {"run_id": run_id, "trace_id": trace_id, "collector_name": collector_name,
+               "collector_path": collector_path, "actor": actor, "params": params_json, "env": env,
+               "started_at": datetime.now(timezone.utc)}
+        with self._lock:
+            self._starts[run_id] = row
+            self.stats["starts"] += 1
+        self._after_write()
+
+    def finish(self, run_id, duration_ms, fetched, saved, skipped, exit_code, ok, error_code, error_message):
+        fields = {"finished_at": datetime.now(timezone.utc), "duration_ms": duration_ms, "fetched": fetched,
+                  "saved": saved, "skipped": skipped, "exit_code": exit_code, "ok": ok,
+                  "error_code": error_code, "error_message": error_message}
+        with self._lock:
+            self.stats["finishes"] += 1
+            if run_id in self._starts:
+                self._starts[run_id].update(fields)
+                self.stats["merged"] += 1
+            else:
+                self._finishes[run_id] = fields
+        self._after_write()
+
+    def _after_write(self):
+        if self._thread is None:
+            self._start_thread()
+        if self._pending() >= self.batch_size:
+            self._wake.set()
+
+    def _start_thread(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="run-state-flush", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Grava o buffer. Retorna linhas escritas (0 se vazio ou erro)."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._starts and not self._finishes:
+                    return 0
+                starts, self._starts = self._starts, {}
+                finishes, self._finishes = self._finishes, {}
+            try:
+                from psycopg2.extras import execute_values
+
+                with (self.pool or get_pool()).connection() as conn:
+                    cur = conn.cursor()
+                    if starts:
+                        execute_values(cur, _INSERT_SQL,
+                                       [tuple(r.get(c) for c in START_COLUMNS + FINISH_COLUMNS) for r in starts.values()],
+                                       template=_INSERT_TEMPLATE, page_size=500)
+                    if finishes:
+                        execute_values(cur, _UPDATE_SQL,
+                                       [(rid, *(f[c] for c in FINISH_COLUMNS)) for rid, f in finishes.items()],
+                                       template=_UPDATE_TEMPLATE, page_size=500)
+                    conn.commit()
+                    cur.close()
+            except Exception as e:
+                self._requeue(starts, finishes)
+                self.stats["errors"] += 1
+                print(f"[run_state] flush failed ({len(starts)}+{len(finishes)} rows): {e}", file=sys.stderr)
+                return 0
+            written = len(starts) + len(finishes)
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += written
+            return written
+
+    def _requeue(self, starts, finishes):
+        with self._lock:
+            # Mantém a ordem start → finish: o que chegou depois do swap vale mais
+            for rid, row in starts.items():
+                if rid in self._finishes:
+                    row.update(self._finishes.pop(rid))
+                self._starts.setdefault(rid, row)
+            for rid, fields in finishes.items():
+                self._finishes.setdefault(rid, fields)
+            overflow = self._pending() - MAX_PENDING
+            if overflow > 0:
+                victims = list(self._finishes)[:overflow]
+                for rid in victims:
+                    del self._finishes[rid]
+                self.stats["dropped"] += len(victims)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_run_state() -> RunStateWriter:
+    """Writer global do processo; flush final registrado no atexit."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = RunStateWriter(
+                    batch_size=int(os.getenv("SOFIA_RUN_STATE_BATCH", "50")),
+                    flush_interval_s=float(os.getenv("SOFIA_RUN_STATE_FLUSH_S", "2")),
+                )
+                atexit.register(_writer.flush)
+    return _writer
@@ -0,0 +1,194 @@
+"""Sofia Pulse — Registro de skills (preload, dispatch cacheado, métricas)
+
+Descobre skills/<dir>/skill.yaml, importa skills.<dir>.src uma vez e guarda o
+execute resolvido. preload() faz isso para todas no startup (fora das threads
+do pipeline) e chama o hook opcional de cada skill:
+
+    def warmup(context):   # em skills/<dir>/src/__init__.py
+        ...                # pré-cria clients, conexões do pool, diretórios
+
+Métricas por skill: chamadas, falhas (ok=False), latência total/máx e
+histograma em buckets fixos (ms). Relatório: registry.report() ou
+`python3 -m lib.skill_registry` (preload + tempos de import/warmup).
+"""
+
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from importlib import import_module
+from typing import Callable, Dict, List, Optional
+
+SKILLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "skills")
+LATENCY_BUCKETS_MS = [10, 50, 100, 250, 500, 1000, 5000, 30000, 120000]
+
+
+def _read_manifest(path: str) -> dict:
+    """name/version do skill.yaml (chaves de topo; sem depender de PyYAML)."""
+    manifest = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line[:1] in (" ", "\t", "#") or ":" not in line:
+                continue
+            key, value = line.split(":", 1)
+            if key in ("name", "version"):
+                manifest[key] = value.strip().strip("\"'")
+    return manifest
+
+
+@dataclass
+class SkillStats:
+    calls: int = 0
+    failures: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+
+    def observe(self, ms: float, ok: bool):
+        self.calls += 1
+        self.failures += 0 if ok else 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Limite superior do bucket que contém o quantil q (None se sem chamadas)."""
+        if not self.calls:
+            return None
+        target, seen = q * self.calls, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> dict:
+        labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {"calls": self.calls, "failures": self.failures,
+                "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+                "p50_ms": self.percentile(0.5), "p95_ms": self.percentile(0.95),
+                "max_ms": round(self.max_ms, 1), "histogram_ms": dict(zip(labels, self.buckets))}
+
+
+@dataclass
+class SkillEntry:
+    name: str
+    module_path: str
+    version: str = "0.0.0"
+    execute: Optional[Callable] = None
+    warmup: Optional[Callable] = None
+    import_ms: float = 0.0
+    warmup_ms: float = 0.0
+    warmup_error: Optional[str] = None
+    stats: SkillStats = field(default_factory=SkillStats)
+
+
+class SkillRegistry:
+    def __init__(self, skills_dir: str = SKILLS_DIR):
+        self.skills_dir = skills_dir
+        self._entries: Dict[str, SkillEntry] = {}
+        self._lock = threading.Lock()
+        self._discovered = False
+
+    def discover(self) -> Dict[str, SkillEntry]:
+        """Lê os manifests (skill.yaml) de skills/*; _template e afins ficam de fora."""
+        with self._lock:
+            if self._discovered:
+                return self._entries
+            for d in sorted(os.listdir(self.skills_dir)):
+                manifest_path = os.path.join(self.skills_dir, d, "skill.yaml")
+                if d.startswith("_") or not os.path.isfile(manifest_path):
+                    continue
+                manifest = _read_manifest(manifest_path)
+                name = manifest.get("name") or d.replace("_", ".", 1)
+                self._entries.setdefault(name, SkillEntry(name, f"skills.{d}.src", manifest.get("version", "0.0.0")))
+            self._discovered = True
+            return self._entries
+
+    def get(self, name: str) -> SkillEntry:
+        """Entry com execute resolvido. ImportError se a skill não existe ou não tem execute."""
+        entry = self._entries.get(name)
+        if entry is not None and entry.execute is not None:
+            return entry
+        self.discover()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                # skill sem manifest: mesma convenção de path do runner
+                entry = SkillEntry(name, f"skills.{name.replace('.', '_')}.src")
+            if entry.execute is None:
+                t0 = time.perf_counter()
+                module = import_module(entry.module_path)
+                execute = getattr(module, "execute", None)
+                if not callable(execute):
+                    raise ImportError(f"{entry.module_path} has no execute()")
+                entry.execute = execute
+                entry.warmup = getattr(module, "warmup", None)
+                entry.import_ms = (time.perf_counter() - t0) * 1000
+                self._entries[name] = entry
+            return entry
+
+    def preload(self, context: Optional[dict] = None, warmup: bool = True) -> Dict[str, str]:
+        """Importa (e aquece) todas as skills descobertas. Retorna {skill: erro}; não levanta."""
+        errors = {}
+        for name in list(self.discover()):
+            try:
+                entry = self.get(name)
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+                continue
+            if warmup and entry.warmup is not None and entry.warmup_ms == 0.0:
+                t0 = time.perf_counter()
+                try:
+                    entry.warmup(context or {})
+                except Exception as e:
+                    entry.warmup_error = f"{type(e).__name__}: {e}"
+                    errors[name] = f"warmup: {entry.warmup_error}"
+                entry.warmup_ms = (time.perf_counter() - t0) * 1000
+        return errors
+
+    def observe(self, name: str, ms: float, ok: bool):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.stats.observe(ms, ok)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: {"version": e.version, "loaded": e.execute is not None,
+                           "import_ms": round(e.import_ms, 1), "warmup_ms": round(e.warmup_ms, 1),
+                           "warmup_error": e.warmup_error, **e.stats.as_dict()}
+                    for name, e in sorted(self._entries.items())}
+
+    def report(self, file=None, only_called: bool = True):
+        file = file or sys.stdout
+        print(f"{'skill':<22} {'calls':>6} {'fail':>5} {'avg_ms':>8} {'p50':>7} {'p95':>7} {'max_ms':>8} "
+              f"{'import':>7} {'warmup':>7}", file=file)
+        for name, s in self.stats().items():
+            if only_called and not s["calls"]:
+                continue
+            p50 = f"{s['p50_ms']:.0f}" if s["p50_ms"] is not None else "-"
+            p95 = f"{s['p95_ms']:.0f}" if s["p95_ms"] is not None else "-"
+            print(f"{name:<22} {s['calls']:>6} {s['failures']:>5} {s['avg_ms']:>8.1f} {p50:>7} {p95:>7} "
+                  f"{s['max_ms']:>8.1f} {s['import_ms']:>7.1f} {s['warmup_ms']:>7.1f}", file=file)
+
+
+_registry = SkillRegistry()
+
+
+def get_registry() -> SkillRegistry:
+    return _registry
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(SKILLS_DIR))
+    from lib.skill_registry import get_registry as _get  # instância do pacote, não a de __main__
+    from lib.skill_runner import preload
+
+    errs = preload()
+    _get().report(only_called=False)
+    for name, err in errs.items():
+        print(f"  ✗ {name}: {err}")
+    sys.exit(1 if errs else 0)
@@ -1,35 +1,70 @@
 """
-Sofia Skill Runner v1.2
+Sofia Skill Runner v1.4
 
 Assinatura canônica (não mude a ordem):
     run(skill_name, params, trace_id=None, actor="system", dry_run=False, env="prod")
 
 trace_id NUNCA vai dentro de params. O runner monta o envelope.
 
+context leva recursos compartilhados do processo (não abra conexão por chamada):
+    context["db"]         → lib.db_pool.DatabasePool (with db_connection(context) as conn)
+    context["run_state"]  → lib.run_state.RunStateWriter (start/finish de runs em lote)
+
+Dispatch via lib/skill_registry: módulo importado e execute resolvido uma vez,
+latência/falhas por skill em get_registry().stats(). Processos com paralelismo
+chamam preload() no startup (imports + warmup de cada skill fora das threads).
+
 Uso:
-    from lib.skill_runner import run
+    from lib.skill_runner import run, preload
     result = run("logger.event", {"level":"info","event":"test","skill":"test"})
     result = run("collect.run", {"collector_id":"acled"}, trace_id=trace)
 """
+import time
 import uuid
-from importlib import import_module
+
+from lib.db_pool import get_pool
+from lib.run_state import get_run_state
+from lib.skill_registry import get_registry
+
+_BASE_CONTEXT = None
+
+
+def _context(env: str) -> dict:
+    """Context por chamada (cópia rasa: skills podem anotar sem vazar entre chamadas)."""
+    global _BASE_CONTEXT
+    if _BASE_CONTEXT is None:
+        _BASE_CONTEXT = {"timezone": "America/Sao_Paulo", "locale": "pt-BR",
+                         "db": get_pool(), "run_state": get_run_state()}
+    return {**_BASE_CONTEXT, "env": env}
+
+
+def preload(env: str = "prod", warmup: bool = True) -> dict:
+    """Importa e aquece todas as skills. Retorna {skill: erro} (vazio se tudo ok)."""
+    return get_registry().preload(_context(env), warmup=warmup)
 
 
 def run(skill_name: str, params: dict, *, trace_id: str = None,
         actor: str = "system", dry_run: bool = False, env: str = "prod") -> dict:
     """Executa skill. Kwargs após params são keyword-only (asterisco impede posicional)."""
     trace_id = trace_id or str(uuid.uuid4())
-    context = {"env": env, "timezone": "America/Sao_Paulo", "locale": "pt-BR"}
+    context = _context(env)
 
     # Guarda: trace_id nunca dentro de params
     if "trace_id" in params:
         params = {k: v for k, v in params.items() if k != "trace_id"}
 
-    module_path = f"skills.{skill_name.replace('.', '_')}.src"
+    registry = get_registry()
     try:
-        module = import_module(module_path)
+        entry = registry.get(skill_name)
     except ImportError as e:
         return {"ok": False, "data": None, "warnings": [],
                 "errors": [{"code": "INVALID_INPUT", "message": f"Skill not found: {skill_name} ({e})", "retryable": False}],
                 "meta": {"duration_ms": 0, "version": "0.0.0"}}
-    return module.execute(trace_id, actor, dry_run, params, context)
+    t0 = time.perf_counter()
+    result = None
+    try:
+        result = entry.execute(trace_id, actor, dry_run, params, context)
+        return result
+    finally:
+        ok = isinstance(result, dict) and bool(result.get("ok"))
+        registry.observe(skill_name, (time.perf_counter() - t0) * 1000, ok)
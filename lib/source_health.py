@@ -0,0 +1,377 @@
+"""Sofia Pulse — Snapshot de saúde das fontes (source health)
+
+Uma passada por tabela: COUNT(*), MIN/MAX do timestamp da fonte e COUNT(col)
+das colunas monitoradas (fração de nulos = 1 - COUNT(col)/COUNT(*)), tudo no
+mesmo SELECT. As tabelas são varridas em paralelo, uma conexão do pool por
+tabela. O resultado fica em sofia.source_health (migration 112) e é reaproveitado
+por quem pedir a mesma janela (mesmo tamanho) dentro de SOFIA_SOURCE_HEALTH_TTL
+(3600s): build-cross-signals, generate_operational_report, email.
+
+    from lib.source_health import get_snapshot
+    snap = get_snapshot(window_start, window_end)
+    snap.availability()   # sources[] do cross_signals.json
+    snap.null_rates()     # deep_read / engagement / chat_activation
+
+CLI: python3 -m lib.source_health [--window-days 7] [--refresh] [--workers 4]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_TTL_S = int(os.getenv("SOFIA_SOURCE_HEALTH_TTL", "3600"))
+DEFAULT_WORKERS = int(os.getenv("SOFIA_SOURCE_HEALTH_WORKERS", "4"))
+
+
+@dataclass(frozen=True)
+class HealthSource:
+    """Fonte registrada. ts_kind: 'ts' (timestamptz), 'date' ou 'micros' (bigint µs)."""
+    source_id: str
+    table: str
+    ts_column: Optional[str] = None
+    ts_kind: str = "ts"
+    where: str = ""
+    null_columns: Tuple[str, ...] = ()
+    windowed: bool = True
+    exists_only: bool = False      # tabela grande/cumulativa: só checa existência
+    listed: bool = True            # aparece em sources[] do cross_signals.json
+    report_range: bool = True      # expõe last_updated_at/coverage_days
+    ok_min: int = 1                # records > ok_min - 1 → ok
+    partial: bool = True           # 0 < records < ok_min → partial (senão offline)
+    ok_notes: str = ""
+    empty_notes: str = ""
+    missing_notes: str = ""
+
+
+SOURCES: List[HealthSource] = [
+    HealthSource("ga4", "sofia.analytics_events", "event_timestamp", "micros",
+                 null_columns=("engagement_time_msec",), partial=False,
+                 empty_notes="No analytics events in window"),
+    HealthSource("vscode_marketplace", "sofia.vscode_extensions_daily", "snapshot_date", "date",
+                 ok_min=101, ok_notes="Full extension data available"),
+    HealthSource("github_trending", "sofia.github_trending", "collected_at", ok_min=51),
+    HealthSource("patents", "sofia.patents", exists_only=True, windowed=False,
+                 ok_notes="Patents data available (aggregated queries only)",
+                 missing_notes="Patents table not found"),
+    HealthSource("arxiv", "sofia.arxiv_ai_papers", "published_date", "date", ok_min=11),
+    HealthSource("hackernews", "sofia.news_items", "published_at", where="source = 'hackernews'", ok_min=21),
+    HealthSource("chat_sessions", "sofia.ga4_chat_sessions", "session_start",
+                 null_columns=("chat_activated",), report_range=False, partial=False),
+    HealthSource("funding_rounds", "sofia.funding_rounds", "announced_date", "date", ok_min=6),
+    # Sem janela (content_meta é catálogo, não série temporal); só para null rate
+    HealthSource("content_meta", "sofia.content_meta", windowed=False, listed=False,
+                 null_columns=("reading_time_sec",)),
+]
+SOURCES_BY_ID = {s.source_id: s for s in SOURCES}
+
+# null_rates do cross_signals.json → (fonte, coluna)
+NULL_RATE_KEYS = {
+    "deep_read_null_rate": ("content_meta", "reading_time_sec"),
+    "engagement_null_rate": ("ga4", "engagement_time_msec"),
+    "chat_activation_null_rate": ("chat_sessions", "chat_activated"),
+}
+
+
+@dataclass
+class SourceHealth:
+    source_id: str
+    status: str                    # ok | partial | offline | missing
+    records: Optional[int] = None
+    min_at: Optional[datetime] = None
+    max_at: Optional[datetime] = None
+    null_rates: Dict[str, float] = field(default_factory=dict)
+    scan_ms: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def coverage_days(self) -> int:
+        return (self.max_at - self.min_at).days if self.max_at and self.min_at else 0
+
+
+@dataclass
+class HealthSnapshot:
+    window_start: datetime
+    window_end: datetime
+    sources: Dict[str, SourceHealth]
+    snapshot_id: Optional[int] = None
+    collected_at: Optional[datetime] = None
+    cached: bool = False
+    scan_ms: float = 0.0
+
+    def get(self, source_id: str) -> Optional[SourceHealth]:
+        return self.sources.get(source_id)
+
+    def availability(self) -> List[Dict]:
+        """sources[] no formato do cross_signals.json (ordem do registro)."""
+        return [_availability_entry(src, self.sources[src.source_id])
+                for src in SOURCES if src.listed and src.source_id in self.sources]
+
+    def null_rate(self, source_id: str, column: str, default: float = 1.0) -> float:
+        h = self.sources.get(source_id)
+        if h is None or h.status != "ok":
+            return default
+        return h.null_rates.get(column, default)
+
+    def null_rates(self) -> Dict[str, float]:
+        return {key: self.null_rate(sid, col) for key, (sid, col) in NULL_RATE_KEYS.items()}
+
+    def summary(self) -> Dict:
+        return {"snapshot_id": self.snapshot_id, "cached": self.cached,
+                "collected_at": self.collected_at.isoformat() if self.collected_at else None,
+                "scan_ms": round(self.scan_ms, 1)}
+
+
+def _status(src: HealthSource, records: int) -> str:
+    if records >= src.ok_min:
+        return "ok"
+    if records > 0:
+        return "partial" if src.partial else "offline"
+    return "offline"
+
+
+def _as_source_value(src: HealthSource, value):
+    """Valor de MIN/MAX (ou do cache, sempre timestamptz) no tipo nativo da fonte."""
+    if value is None:
+        return None
+    if src.ts_kind == "micros" and isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1_000_000, tz=timezone.utc)
+    if src.ts_kind == "date" and isinstance(value, datetime):
+        return value.astimezone(timezone.utc).date() if value.tzinfo else value.date()
+    return value
+
+
+def _availability_entry(src: HealthSource, h: SourceHealth) -> Dict:
+    if h.status == "missing":
+        return {"source_id": src.source_id, "status": "missing", "last_updated_at": None,
+                "coverage_days": 0, "records_count": 0,
+                "notes": src.missing_notes or f"Table {src.table.split('.')[-1]} not found"}
+    if src.exists_only:
+        return {"source_id": src.source_id, "status": "ok", "last_updated_at": None, "coverage_days": None,
+                "records_count": None, "notes": src.ok_notes}
+    notes = src.ok_notes if h.status == "ok" else (src.empty_notes if h.status == "offline" else "")
+    return {
+        "source_id": src.source_id,
+        "status": h.status,
+        "last_updated_at": h.max_at.isoformat() if src.report_range and h.max_at else None,
+        "coverage_days": h.coverage_days if src.report_range else None,
+        "records_count": h.records,
+        "notes": notes,
+    }
+
+
+def _scan_query(src: HealthSource, window_start: datetime, window_end: datetime) -> Tuple[str, tuple]:
+    if src.exists_only:
+        return f"SELECT 1 FROM {src.table} LIMIT 1", ()
+
+    cols = ["COUNT(*)"]
+    if src.ts_column:
+        cols += [f"MIN({src.ts_column})", f"MAX({src.ts_column})"]
+    cols += [f"COUNT({c})" for c in src.null_columns]
+
+    conds, params = [], []
+    if src.where:
+        conds.append(src.where)
+    if src.windowed and src.ts_column:
+        cast = "::DATE" if src.ts_kind == "date" else ""
+        conds.append(f"{src.ts_column} >= %s{cast} AND {src.ts_column} < %s{cast}")
+        if src.ts_kind == "micros":
+            params += [int(window_start.timestamp() * 1_000_000), int(window_end.timestamp() * 1_000_000)]
+        else:
+            params += [window_start, window_end]
+    where = f" WHERE {' AND '.join(conds)}" if conds else ""
+    return f"SELECT {', '.join(cols)} FROM {src.table}{where}", tuple(params)
+
+
+def scan_source(conn, src: HealthSource, window_start: datetime, window_end: datetime) -> SourceHealth:
+    """Uma query para a fonte. Tabela inexistente → status 'missing'."""
+    import psycopg2
+
+    sql, params = _scan_query(src, window_start, window_end)
+    t0 = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+        conn.rollback()  # só leitura; não deixa transação aberta na conexão
+    except psycopg2.ProgrammingError as e:
+        conn.rollback()
+        return SourceHealth(src.source_id, "missing", 0, scan_ms=(time.perf_counter() - t0) * 1000,
+                            error=str(e).strip().splitlines()[0])
+    scan_ms = (time.perf_counter() - t0) * 1000
+
+    if src.exists_only:
+        return SourceHealth(src.source_id, "ok", None, scan_ms=scan_ms)
+
+    values = list(row.values()) if isinstance(row, dict) else list(row)
+    records = values.pop(0) or 0
+    min_at = max_at = None
+    if src.ts_column:
+        min_at, max_at = (_as_source_value(src, v) for v in values[:2])
+        values = values[2:]
+    null_rates = {col: (round(1 - (nn or 0) / records, 4) if records else 1.0)
+                  for col, nn in zip(src.null_columns, values)}
+    return SourceHealth(src.source_id, _status(src, records), records, min_at, max_at, null_rates, scan_ms)
+
+
+def collect(window_start: datetime, window_end: datetime, pool=None, workers: int = None,
+            sources: List[HealthSource] = None) -> HealthSnapshot:
+    """Varre todas as fontes em paralelo (uma conexão do pool por tabela)."""
+    if pool is None:
+        from lib.db_pool import get_pool
+        pool = get_pool()
+    sources = sources or SOURCES
+    workers = max(1, min(workers or DEFAULT_WORKERS, getattr(pool, "maxconn", 1), len(sources)))
+
+    def _one(src):
+        with pool.connection() as conn:
+            return scan_source(conn, src, window_start, window_end)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="source-health") as ex:
+        results = list(ex.map(_one, sources))
+    return HealthSnapshot(window_start, window_end, {h.source_id: h for h in results},
+                          collected_at=datetime.now(timezone.utc), scan_ms=(time.perf_counter() - t0) * 1000)
+
+
+# === Cache (sofia.source_health) ===
+
+_SAVE_SQL = """
+    INSERT INTO sofia.source_health
+        (snapshot_id, source_id, window_start, window_end, status, records, min_at, max_at,
+         null_rates, scan_ms, error, collected_at)
+    VALUES %s
+"""
+_SAVE_TEMPLATE = "(%s,%s,%s,%s,%s,%s,%s::timestamptz,%s::timestamptz,%s::jsonb,%s,%s,%s)"
+
+_LOAD_COLUMNS = ("snapshot_id", "source_id", "window_start", "window_end", "status", "records",
+                 "min_at", "max_at", "null_rates", "scan_ms", "error", "collected_at")
+
+
+def _as_timestamptz(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    return value
+
+
+def save(pool, snap: HealthSnapshot) -> int:
+    """Grava o snapshot; retorna snapshot_id."""
+    import json
+    from psycopg2.extras import execute_values
+
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT nextval('sofia.source_health_snapshot_seq')")
+            row = cur.fetchone()
+            snapshot_id = list(row.values())[0] if isinstance(row, dict) else row[0]
+            execute_values(cur, _SAVE_SQL, [
+                (snapshot_id, h.source_id, snap.window_start, snap.window_end, h.status, h.records,
+                 _as_timestamptz(h.min_at), _as_timestamptz(h.max_at), json.dumps(h.null_rates),
+                 int(h.scan_ms), h.error, snap.collected_at)
+                for h in snap.sources.values()
+            ], template=_SAVE_TEMPLATE)
+        conn.commit()
+    snap.snapshot_id = snapshot_id
+    return snapshot_id
+
+
+def _rows_to_snapshot(rows) -> Optional[HealthSnapshot]:
+    if not rows:
+        return None
+    rows = [dict(zip(_LOAD_COLUMNS, r.values() if isinstance(r, dict) else r)) for r in rows]
+    sources = {}
+    for r in rows:
+        src = SOURCES_BY_ID.get(r["source_id"])
+        if src is None:
+            continue
+        sources[r["source_id"]] = SourceHealth(
+            r["source_id"], r["status"], r["records"],
+            _as_source_value(src, r["min_at"]), _as_source_value(src, r["max_at"]),
+            r["null_rates"] or {}, r["scan_ms"] or 0, r["error"])
+    first = rows[0]
+    return HealthSnapshot(first["window_start"], first["window_end"], sources, first["snapshot_id"],
+                          first["collected_at"], cached=True)
+
+
+def load_cached(pool, window_start: datetime = None, window_end: datetime = None,
+                max_age_s: int = None) -> Optional[HealthSnapshot]:
+    """Snapshot mais recente com o mesmo tamanho de janela e idade <= max_age_s.
+
+    Sem janela: o mais recente de todos (relatórios que só leem). None se não houver
+    (ou se a tabela ainda não existe).
+    """
+    import psycopg2
+
+    max_age_s = DEFAULT_TTL_S if max_age_s is None else max_age_s
+    conds, params = ["collected_at >= NOW() - %s * INTERVAL '1 second'"], [max_age_s]
+    if window_start is not None and window_end is not None:
+        conds.append("window_end - window_start = %s")
+        params.append(window_end - window_start)
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT {', '.join(_LOAD_COLUMNS)} FROM sofia.source_health
+                    WHERE snapshot_id = (
+                        SELECT snapshot_id FROM sofia.source_health
+                        WHERE {' AND '.join(conds)}
+                        ORDER BY collected_at DESC LIMIT 1)
+                """, params)
+                return _rows_to_snapshot(cur.fetchall())
+    except psycopg2.ProgrammingError as e:
+        print(f"[source_health] cache unavailable: {str(e).strip().splitlines()[0]}", file=sys.stderr)
+        return None
+
+
+def get_snapshot(window_start: datetime, window_end: datetime, pool=None, max_age_s: int = None,
+                 refresh: bool = False, workers: int = None) -> HealthSnapshot:
+    """Snapshot em cache para a janela, ou varre e grava um novo."""
+    if pool is None:
+        from lib.db_pool import get_pool
+        pool = get_pool()
+    if not refresh:
+        snap = load_cached(pool, window_start, window_end, max_age_s)
+        if snap is not None:
+            return snap
+    snap = collect(window_start, window_end, pool=pool, workers=workers)
+    try:
+        save(pool, snap)
+    except Exception as e:
+        # Sem cache o snapshot ainda vale para este processo
+        print(f"[source_health] could not cache snapshot: {e}", file=sys.stderr)
+    return snap
+
+
+def format_table(snap: HealthSnapshot) -> str:
+    """Tabela texto (relatório operacional / CLI)."""
+    origin = "cache" if snap.cached else f"scan {snap.scan_ms:.0f}ms"
+    lines = [f"Snapshot #{snap.snapshot_id or '-'} ({origin}) "
+             f"{snap.window_start:%Y-%m-%d} → {snap.window_end:%Y-%m-%d}",
+             f"  {'source':<20} {'status':<8} {'records':>10} {'last':<12} {'nulls'}"]
+    for src in SOURCES:
+        h = snap.sources.get(src.source_id)
+        if h is None:
+            continue
+        records = "-" if h.records is None else str(h.records)
+        last = h.max_at.strftime("%Y-%m-%d") if h.max_at else "-"
+        nulls = ", ".join(f"{c}={r:.0%}" for c, r in h.null_rates.items())
+        lines.append(f"  {src.source_id:<20} {h.status:<8} {records:>10} {last:<12} {nulls}".rstrip())
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Source health snapshot")
+    parser.add_argument("--window-days", type=int, default=7)
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached snapshot")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    end = datetime.now(timezone.utc)
+    print(format_table(get_snapshot(end - timedelta(days=args.window_days), end, refresh=args.refresh,
+                                    workers=args.workers)))
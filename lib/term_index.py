@@ -0,0 +1,321 @@
+"""Sofia Pulse — Índice invertido de termos de tecnologia (sofia.term_postings)
+
+Em vez de ILIKE '%termo%' (sem índice) sobre abstract/description/sector,
+cada documento das fontes abaixo é tokenizado uma vez e os termos reconhecidos
+por analytics/shared/tech_normalizer.TECH_ALIASES viram postings
+(termo canônico, fonte, doc_id, doc_date). Consulta = probe no índice.
+
+Fontes (TERM_INDEX_SOURCES): arxiv, github, funding. Atualização incremental
+por collected_at (watermark em sofia.normalizer_watermarks, source
+'term_index:<fonte>'), com sobreposição de REINDEX_OVERLAP para não perder
+linhas commitadas fora de ordem. Reindexar um doc apaga e regrava as postings.
+
+Mantido após cada run de collector (collect.run / tracked_runner chamam
+refresh_for_collector). Manual:
+    python3 -m lib.term_index update [--rebuild] [--source arxiv]
+    python3 -m lib.term_index query rust llm --source arxiv --days 30
+    python3 -m lib.term_index stats
+
+API:
+    from lib.term_index import TermIndex
+    idx = TermIndex(conn)
+    idx.docs_any(["rust", "k8s"], "arxiv", start, end)   # {doc_id, ...}
+    idx.docs(["rust"], "github", start, end)             # {"Rust": {doc_id, ...}}
+"""
+
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from analytics.shared.tech_normalizer import TECH_ALIASES
+
+# Aliases que são palavras comuns (ou curtos demais) em texto livre: só contam
+# em campos exatos (github.language / github.topics)
+AMBIGUOUS_ALIASES = {
+    "apache", "argo", "astro", "babel", "backbone", "compose", "echo", "eloquent", "ember", "emotion",
+    "expo", "express", "fiber", "gin", "git", "go", "helm", "jest", "less", "mocha", "neon", "nest",
+    "next", "parcel", "phoenix", "railway", "render", "remix", "rest", "rocket", "rollup", "solid",
+    "spring", "swift", "travis", "windows", "alpine", "nats", "rails", "torch", "pulsar", "llama",
+}
+MIN_FREE_TEXT_ALIAS_LEN = 3
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[.\-][a-z0-9+#]+)*")
+
+# fonte → (tabela, coluna de data do doc, colunas de texto livre, colunas exatas, colunas array exatas)
+TERM_INDEX_SOURCES = {
+    "arxiv": {
+        "table": "sofia.arxiv_ai_papers",
+        "date": "published_date",
+        "text": ["title", "abstract"],
+        "exact": [],
+        "arrays": ["keywords"],
+        "collectors": ("arxiv", "research-papers"),
+    },
+    "github": {
+        "table": "sofia.github_trending",
+        "date": "collected_at::DATE",
+        "text": ["full_name", "description"],
+        "exact": ["language"],
+        "arrays": ["topics"],
+        "collectors": ("github-trend",),
+    },
+    "funding": {
+        "table": "sofia.funding_rounds",
+        "date": "announced_date",
+        "text": ["company_name", "sector"],
+        "exact": [],
+        "arrays": [],
+        "collectors": ("funding",),
+    },
+}
+
+REINDEX_OVERLAP = timedelta(minutes=10)
+FETCH_BATCH = 2000
+WATERMARK_PREFIX = "term_index:"
+
+
+def _build_phrases():
+    free, exact = {}, {}
+    for alias, canonical in TECH_ALIASES.items():
+        key = " ".join(TOKEN_RE.findall(alias.lower())) or alias.lower()
+        exact[alias.lower()] = canonical
+        exact[key] = canonical
+        if alias in AMBIGUOUS_ALIASES or (len(alias) < MIN_FREE_TEXT_ALIAS_LEN and alias.isalnum()):
+            continue
+        if key.replace(" ", "") != alias.lower().replace(" ", ""):
+            continue  # ".net" viraria "net": tokenizer não reproduz o alias
+        free[key] = canonical
+    max_words = max(len(k.split()) for k in free)
+    return free, exact, max_words
+
+
+FREE_TEXT_PHRASES, EXACT_ALIASES, MAX_PHRASE_WORDS = _build_phrases()
+CANONICAL_TERMS = set(TECH_ALIASES.values())
+_CANONICAL_BY_LOWER = {c.lower(): c for c in CANONICAL_TERMS}
+
+
+def normalize_term(term: str) -> Optional[str]:
+    """Termo de consulta → nome canônico indexado (None se fora do vocabulário)."""
+    if not term:
+        return None
+    if term in CANONICAL_TERMS:
+        return term
+    lowered = term.lower().strip()
+    canonical = EXACT_ALIASES.get(lowered) or EXACT_ALIASES.get(" ".join(TOKEN_RE.findall(lowered)))
+    if canonical:
+        return canonical
+    return _CANONICAL_BY_LOWER.get(lowered)
+
+
+def extract_terms(text: Optional[str]) -> Set[str]:
+    """Termos canônicos em texto livre (frases de até MAX_PHRASE_WORDS tokens)."""
+    if not text:
+        return set()
+    tokens = TOKEN_RE.findall(text.lower())
+    found = set()
+    for i in range(len(tokens)):
+        phrase = tokens[i]
+        canonical = FREE_TEXT_PHRASES.get(phrase)
+        if canonical:
+            found.add(canonical)
+        for n in range(2, MAX_PHRASE_WORDS + 1):
+            if i + n > len(tokens):
+                break
+            phrase = f"{phrase} {tokens[i + n - 1]}"
+            canonical = FREE_TEXT_PHRASES.get(phrase)
+            if canonical:
+                found.add(canonical)
+    return found
+
+
+def _exact_terms(values: Iterable) -> Set[str]:
+    found = set()
+    for v in values:
+        if isinstance(v, str) and v:
+            canonical = EXACT_ALIASES.get(v.lower().strip())
+            if canonical:
+                found.add(canonical)
+    return found
+
+
+def document_terms(cfg: dict, row: dict) -> Set[str]:
+    terms = set()
+    for col in cfg["text"]:
+        terms |= extract_terms(row.get(col))
+    terms |= _exact_terms(row.get(col) for col in cfg["exact"])
+    for col in cfg["arrays"]:
+        terms |= _exact_terms(row.get(col) or [])
+    return terms
+
+
+class TermIndex:
+    def __init__(self, conn):
+        self.conn = conn
+
+    # ------------------------------------------------------------------ query
+
+    def docs(self, terms: Iterable[str], source: str, start=None, end=None) -> Dict[str, Set[int]]:
+        """{termo canônico: {doc_id}} para os termos conhecidos; desconhecidos ficam de fora."""
+        canonical = sorted({c for c in (normalize_term(t) for t in terms) if c})
+        result = {c: set() for c in canonical}
+        if not canonical:
+            return result
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT term, doc_id FROM sofia.term_postings
+                WHERE source = %s AND term = ANY(%s)
+                  AND (%s::DATE IS NULL OR doc_date >= %s::DATE)
+                  AND (%s::DATE IS NULL OR doc_date < %s::DATE)
+            """, (source, canonical, start, start, end, end))
+            for row in cur.fetchall():
+                term, doc_id = (row["term"], row["doc_id"]) if isinstance(row, dict) else row
+                result[term].add(doc_id)
+        return result
+
+    def docs_any(self, terms: Iterable[str], source: str, start=None, end=None) -> Set[int]:
+        """Docs que mencionam QUALQUER um dos termos na janela [start, end)."""
+        out = set()
+        for ids in self.docs(terms, source, start, end).values():
+            out |= ids
+        return out
+
+    def stats(self) -> List[Tuple]:
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT p.source, COUNT(*) AS postings, COUNT(DISTINCT p.term) AS terms,
+                       COUNT(DISTINCT p.doc_id) AS docs, w.last_ingested_at
+                FROM sofia.term_postings p
+                LEFT JOIN sofia.normalizer_watermarks w ON w.source = %s || p.source
+                GROUP BY p.source, w.last_ingested_at
+                ORDER BY p.source
+            """, (WATERMARK_PREFIX,))
+            rows = cur.fetchall()
+        return [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in rows]
+
+    # ----------------------------------------------------------------- update
+
+    def _watermark(self, cur, source) -> Optional[datetime]:
+        cur.execute("SELECT last_ingested_at FROM sofia.normalizer_watermarks WHERE source = %s",
+                    (WATERMARK_PREFIX + source,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return row["last_ingested_at"] if isinstance(row, dict) else row[0]
+
+    def update_source(self, source: str, rebuild: bool = False) -> dict:
+        """Indexa docs com collected_at > watermark - overlap. Retorna contadores."""
+        from psycopg2.extras import RealDictCursor, execute_values
+
+        cfg = TERM_INDEX_SOURCES[source]
+        t0 = time.time()
+        stats = {"source": source, "docs": 0, "postings": 0}
+        with self.conn.cursor() as cur:
+            if rebuild:
+                cur.execute("DELETE FROM sofia.term_postings WHERE source = %s", (source,))
+                since = None
+            else:
+                wm = self._watermark(cur, source)
+                since = wm - REINDEX_OVERLAP if wm else None
+
+        cols = ["id", f"{cfg['date']} AS doc_date", "collected_at"] + cfg["text"] + cfg["exact"] + cfg["arrays"]
+        where = "WHERE collected_at > %s" if since else ""
+        high_water = None
+        # cursor nomeado: janelas grandes sem carregar tudo em RAM
+        with self.conn.cursor(name=f"term_index_{source}", cursor_factory=RealDictCursor) as scan:
+            scan.itersize = FETCH_BATCH
+            scan.execute(f"SELECT {', '.join(cols)} FROM {cfg['table']} {where}", (since,) if since else None)
+            with self.conn.cursor() as cur:
+                while True:
+                    rows = scan.fetchmany(FETCH_BATCH)
+                    if not rows:
+                        break
+                    doc_ids = [r["id"] for r in rows]
+                    postings = [(term, source, r["id"], r["doc_date"]) for r in rows for term in document_terms(cfg, r)]
+                    if not rebuild:
+                        cur.execute("DELETE FROM sofia.term_postings WHERE source = %s AND doc_id = ANY(%s)",
+                                    (source, doc_ids))
+                    if postings:
+                        execute_values(cur, "INSERT INTO sofia.term_postings (term, source, doc_id, doc_date) VALUES %s "
+                                            "ON CONFLICT DO NOTHING", postings, page_size=1000)
+                    stats["docs"] += len(rows)
+                    stats["postings"] += len(postings)
+                    batch_max = max((r["collected_at"] for r in rows if r["collected_at"]), default=None)
+                    if batch_max and (high_water is None or batch_max > high_water):
+                        high_water = batch_max
+
+        with self.conn.cursor() as cur:
+            if high_water is not None:
+                cur.execute("""
+                    INSERT INTO sofia.normalizer_watermarks (source, last_ingested_at, updated_at)
+                    VALUES (%s, %s, NOW())
+                    ON CONFLICT (source) DO UPDATE
+                    SET last_ingested_at = GREATEST(sofia.normalizer_watermarks.last_ingested_at, EXCLUDED.last_ingested_at),
+                        updated_at = NOW()
+                """, (WATERMARK_PREFIX + source, high_water))
+        self.conn.commit()
+        stats["seconds"] = round(time.time() - t0, 2)
+        return stats
+
+    def update(self, sources: Optional[Iterable[str]] = None, rebuild: bool = False) -> List[dict]:
+        return [self.update_source(s, rebuild=rebuild) for s in (sources or TERM_INDEX_SOURCES)]
+
+
+def sources_for_collector(collector_id: str) -> List[str]:
+    cid = (collector_id or "").lower()
+    return [s for s, cfg in TERM_INDEX_SOURCES.items() if any(p in cid for p in cfg["collectors"])]
+
+
+def refresh_for_collector(collector_id: str, conn=None) -> List[dict]:
+    """Atualização incremental das fontes alimentadas por esse collector (no-op se nenhuma)."""
+    sources = sources_for_collector(collector_id)
+    if not sources:
+        return []
+    if conn is not None:
+        return TermIndex(conn).update(sources)
+    from lib.db_pool import get_pool
+    with get_pool().connection() as pooled:
+        return TermIndex(pooled).update(sources)
+
+
+def _main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sofia term index (sofia.term_postings)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    up = sub.add_parser("update")
+    up.add_argument("--rebuild", action="store_true")
+    up.add_argument("--source", action="append", choices=sorted(TERM_INDEX_SOURCES))
+    q = sub.add_parser("query")
+    q.add_argument("terms", nargs="+")
+    q.add_argument("--source", default="arxiv", choices=sorted(TERM_INDEX_SOURCES))
+    q.add_argument("--days", type=int, default=7)
+    sub.add_parser("stats")
+    args = parser.parse_args(argv)
+
+    from lib.db_pool import get_pool
+    with get_pool().connection() as conn:
+        idx = TermIndex(conn)
+        if args.cmd == "update":
+            for s in idx.update(args.source, rebuild=args.rebuild):
+                print(f"{s['source']:<10} {s['docs']:>8} docs {s['postings']:>9} postings {s['seconds']:>7}s")
+        elif args.cmd == "query":
+            end = datetime.utcnow().date() + timedelta(days=1)
+            start = end - timedelta(days=args.days + 1)
+            t0 = time.perf_counter()
+            hits = idx.docs(args.terms, args.source, start, end)
+            ms = (time.perf_counter() - t0) * 1000
+            unknown = [t for t in args.terms if not normalize_term(t)]
+            for term, ids in hits.items():
+                print(f"{term:<24} {len(ids):>7} docs")
+            if unknown:
+                print(f"(fora do vocabulário TECH_ALIASES: {', '.join(unknown)})")
+            print(f"{ms:.1f} ms")
+        else:
+            print(f"{'source':<10} {'postings':>9} {'terms':>6} {'docs':>8}  watermark")
+            for source, postings, terms, docs, wm in idx.stats():
+                print(f"{source:<10} {postings:>9} {terms:>6} {docs:>8}  {wm}")
+
+
+if __name__ == "__main__":
+    _main()
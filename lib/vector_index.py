@@ -0,0 +1,496 @@
+"""Sofia Pulse — Índice ANN local sobre sofia.embeddings (search.semantic)
+
+Vetores normalizados em memória (numpy) + HNSW (hnswlib) quando instalado.
+Sem hnswlib a busca é exata em numpy; sem numpy o índice fica desligado e
+search.semantic usa só o pgvector.
+
+- Build/refresh incremental por created_at (watermark - 10 min de overlap,
+  ids já indexados são ignorados). ingest() adiciona direto no índice.
+- Pré-filtro por entity_type / source / created_at (since/until): máscara em
+  memória; se sobram <= SOFIA_VECTOR_INDEX_BRUTE_MAX docs a busca é exata
+  sobre o subconjunto, senão HNSW com filtro por label.
+- Persistido em SOFIA_VECTOR_INDEX_DIR: cada save grava uma geração nova
+  (gen-*/ com vectors.npz + meta.json + hnsw.bin) e troca o symlink current
+  atomicamente, então processos novos começam quentes e só buscam o delta.
+
+CLI:
+    python3 -m lib.vector_index build | refresh | stats
+    python3 -m lib.vector_index bench [--queries 200] [--k 10] [--pg] [--filter entity_type=paper]
+    python3 -m lib.vector_index bench --synthetic 50000 --dim 768     # sem banco
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from lib.helpers import SOFIA_LOG_DIR
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+INDEX_DIR = os.getenv("SOFIA_VECTOR_INDEX_DIR", os.path.join(SOFIA_LOG_DIR, "vector_index"))
+REFRESH_S = float(os.getenv("SOFIA_VECTOR_INDEX_REFRESH_S", "300"))
+BRUTE_FORCE_MAX = int(os.getenv("SOFIA_VECTOR_INDEX_BRUTE_MAX", "20000"))
+EF_SEARCH = int(os.getenv("SOFIA_VECTOR_INDEX_EF", "64"))
+HNSW_M = 16
+EF_CONSTRUCTION = 200
+REFRESH_OVERLAP = timedelta(minutes=10)
+FETCH_PAGE = 5000
+KEEP_GENERATIONS = 2  # a anterior fica para leitores que já resolveram current
+FILTER_KEYS = ("entity_type", "source", "since", "until")
+
+_REFRESH_SQL = """
+    SELECT id::text, entity_type, source, created_at, embedding::real[]
+    FROM sofia.embeddings
+    WHERE embedding IS NOT NULL {where}
+    ORDER BY created_at
+"""
+
+
+def available() -> bool:
+    return np is not None
+
+
+def supports_filters(filters: Optional[dict]) -> bool:
+    """Filtros que o índice sabe aplicar (metadata->>'country' etc. ficam no pgvector)."""
+    return all(k in FILTER_KEYS or not v for k, v in (filters or {}).items())
+
+
+def _epoch(value) -> float:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class VectorIndex:
+    def __init__(self, dim: int = None):
+        if np is None:
+            raise ImportError("numpy is required for lib.vector_index")
+        self.dim = dim
+        self.ids: List[str] = []
+        self._label_of: Dict[str, int] = {}
+        self._codes = {"entity_type": {}, "source": {}}
+        self.vectors = None
+        self.entity_type = None
+        self.source = None
+        self.created = None
+        self._hnsw = None
+        self.watermark: Optional[datetime] = None
+        self.refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._refreshing = threading.Lock()
+        self.stats = {"queries": 0, "ann": 0, "exact": 0, "refreshes": 0, "added": 0}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # === Escrita ===
+
+    def _code(self, kind: str, value) -> int:
+        codes = self._codes[kind]
+        if value not in codes:
+            codes[value] = len(codes)
+        return codes[value]
+
+    def _grow(self, needed: int):
+        capacity = 0 if self.vectors is None else len(self.vectors)
+        if needed <= capacity:
+            return
+        new_cap = max(needed, capacity * 2, 1024)
+        vectors = np.zeros((new_cap, self.dim), dtype=np.float32)
+        entity_type = np.full(new_cap, -1, dtype=np.int32)
+        source = np.full(new_cap, -1, dtype=np.int32)
+        created = np.zeros(new_cap, dtype=np.float64)
+        n = len(self.ids)
+        if self.vectors is not None:
+            vectors[:n], entity_type[:n], source[:n], created[:n] = (
+                self.vectors[:n], self.entity_type[:n], self.source[:n], self.created[:n])
+        self.vectors, self.entity_type, self.source, self.created = vectors, entity_type, source, created
+        if hnswlib is not None:
+            if self._hnsw is None:
+                self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+                self._hnsw.init_index(max_elements=new_cap, ef_construction=EF_CONSTRUCTION, M=HNSW_M)
+            else:
+                self._hnsw.resize_index(new_cap)
+            self._hnsw.set_ef(EF_SEARCH)
+
+    def add(self, rows: Sequence[tuple]) -> int:
+        """rows: (id, entity_type, source, created_at, vector). Ids já indexados são ignorados."""
+        with self._lock:
+            rows = [r for r in rows if str(r[0]) not in self._label_of and r[4] is not None]
+            if not rows:
+                return 0
+            if self.dim is None:
+                self.dim = len(rows[0][4])
+            rows = [r for r in rows if len(r[4]) == self.dim]
+            batch = np.asarray([r[4] for r in rows], dtype=np.float32)
+            norms = np.linalg.norm(batch, axis=1, keepdims=True)
+            batch /= np.where(norms == 0, 1.0, norms)
+
+            start = len(self.ids)
+            self._grow(start + len(rows))
+            labels = np.arange(start, start + len(rows))
+            self.vectors[labels] = batch
+            for label, (doc_id, entity_type, source, created_at, _) in zip(labels, rows):
+                self.ids.append(str(doc_id))
+                self._label_of[str(doc_id)] = int(label)
+                self.entity_type[label] = self._code("entity_type", entity_type)
+                self.source[label] = self._code("source", source)
+                self.created[label] = _epoch(created_at) if created_at else 0.0
+                if created_at and (self.watermark is None or created_at > self.watermark):
+                    self.watermark = created_at
+            if self._hnsw is not None:
+                self._hnsw.add_items(batch, labels)
+            self.stats["added"] += len(rows)
+            return len(rows)
+
+    def refresh(self, conn) -> int:
+        """Busca o delta desde o watermark (ou tudo, no primeiro build)."""
+        where, params = "", []
+        if self.watermark is not None:
+            where, params = "AND created_at > %s", [self.watermark - REFRESH_OVERLAP]
+        added = 0
+        with conn.cursor(name="vector_index_refresh") as cur:
+            cur.itersize = FETCH_PAGE
+            cur.execute(_REFRESH_SQL.format(where=where), params)
+            while True:
+                rows = cur.fetchmany(FETCH_PAGE)
+                if not rows:
+                    break
+                added += self.add([tuple(r.values()) if isinstance(r, dict) else r for r in rows])
+        conn.rollback()
+        self.refreshed_at = time.time()
+        self.stats["refreshes"] += 1
+        return added
+
+    def maybe_refresh(self, save: bool = True):
+        """Refresh em thread de fundo se passou REFRESH_S; a busca segue no estado atual."""
+        if time.time() - self.refreshed_at < REFRESH_S or not self._refreshing.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                from lib.db_pool import db_connection
+                with db_connection() as conn:
+                    added = self.refresh(conn)
+                if added and save:
+                    self.save()
+            except Exception as e:
+                self.refreshed_at = time.time()  # não martela o banco se ele estiver fora
+                print(f"[vector_index] refresh failed: {e}", file=sys.stderr)
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="vector-index-refresh", daemon=True).start()
+
+    # === Busca ===
+
+    def _query(self, query) -> "np.ndarray":
+        q = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def _mask(self, filters: Optional[dict]):
+        n = len(self.ids)
+        mask = None
+        for kind in ("entity_type", "source"):
+            value = (filters or {}).get(kind)
+            if value:
+                code = self._codes[kind].get(value, -2)
+                m = getattr(self, kind)[:n] == code
+                mask = m if mask is None else mask & m
+        if (filters or {}).get("since"):
+            m = self.created[:n] >= _epoch(filters["since"])
+            mask = m if mask is None else mask & m
+        if (filters or {}).get("until"):
+            m = self.created[:n] <= _epoch(filters["until"])
+            mask = m if mask is None else mask & m
+        return mask
+
+    def _exact(self, q, k: int, mask=None) -> List[Tuple[str, float]]:
+        n = len(self.ids)
+        labels = np.arange(n) if mask is None else np.flatnonzero(mask)
+        if not len(labels):
+            return []
+        sims = self.vectors[labels] @ q
+        k = min(k, len(labels))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self.ids[labels[i]], float(sims[i])) for i in top]
+
+    def exact(self, query, k: int, filters: dict = None) -> List[Tuple[str, float]]:
+        """Busca exata (referência do benchmark; mesma métrica do pgvector <=>)."""
+        with self._lock:
+            return self._exact(self._query(query), k, self._mask(filters))
+
+    def search(self, query, k: int, filters: dict = None) -> List[Tuple[str, float]]:
+        """[(id, similaridade cosseno)] em ordem decrescente."""
+        with self._lock:
+            self.stats["queries"] += 1
+            if not self.ids:
+                return []
+            q = self._query(query)
+            mask = self._mask(filters)
+            allowed = len(self.ids) if mask is None else int(mask.sum())
+            if self._hnsw is None or allowed <= BRUTE_FORCE_MAX or allowed < k:
+                self.stats["exact"] += 1
+                return self._exact(q, k, mask)
+            self.stats["ann"] += 1
+            self._hnsw.set_ef(max(EF_SEARCH, k))
+            flt = None if mask is None else (lambda label: bool(mask[label]))
+            try:
+                labels, dists = self._hnsw.knn_query(q, k=min(k, allowed), filter=flt)
+            except RuntimeError:
+                # filtro seletivo demais para o ef atual: menos de k vizinhos alcançáveis
+                return self._exact(q, k, mask)
+            return [(self.ids[l], float(1.0 - d)) for l, d in zip(labels[0], dists[0])]
+
+    # === Persistência ===
+
+    def save(self, path: str = INDEX_DIR):
+        """Grava uma geração nova e aponta current para ela (rename atômico do symlink).
+        Arrays são copiados sob o lock e escritos fora dele; o hnsw.bin é salvo sob o
+        lock para bater com o count do meta."""
+        os.makedirs(path, exist_ok=True)
+        gen = os.path.join(path, f"gen-{time.time_ns()}-{os.getpid()}-{threading.get_ident()}")
+        os.makedirs(gen)
+        try:
+            with self._lock:
+                n = len(self.ids)
+                if self.vectors is None:
+                    arrays = {"vectors": np.zeros((0, self.dim or 0), dtype=np.float32),
+                              "entity_type": np.zeros(0, dtype=np.int32), "source": np.zeros(0, dtype=np.int32),
+                              "created": np.zeros(0, dtype=np.float64)}
+                else:
+                    arrays = {"vectors": self.vectors[:n].copy(), "entity_type": self.entity_type[:n].copy(),
+                              "source": self.source[:n].copy(), "created": self.created[:n].copy()}
+                meta = {"dim": self.dim, "count": n, "ids": list(self.ids),
+                        "codes": {kind: dict(codes) for kind, codes in self._codes.items()},
+                        "watermark": self.watermark.isoformat() if self.watermark else None}
+                if self._hnsw is not None and n:
+                    self._hnsw.save_index(os.path.join(gen, "hnsw.bin"))
+            np.savez(os.path.join(gen, "vectors.npz"), **arrays)
+            with open(os.path.join(gen, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            link = os.path.join(path, f"current.{os.getpid()}.{threading.get_ident()}.tmp")
+            os.symlink(os.path.basename(gen), link)
+            os.replace(link, os.path.join(path, "current"))
+        except BaseException:
+            shutil.rmtree(gen, ignore_errors=True)
+            raise
+        _prune_generations(path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_DIR) -> Optional["VectorIndex"]:
+        current = os.path.join(path, "current")
+        if np is None or not os.path.isfile(os.path.join(current, "meta.json")):
+            return None
+        gen = os.path.realpath(current)  # resolve uma vez: os três arquivos vêm da mesma geração
+        with open(os.path.join(gen, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = np.load(os.path.join(gen, "vectors.npz"))
+        n = meta["count"]
+        if len(meta["ids"]) != n or len(arrays["vectors"]) != n:
+            raise ValueError(f"inconsistent index generation {gen}: meta count {n}")
+        index = cls(meta["dim"])
+        if not n:
+            return index
+        index._grow(n)
+        index.vectors[:n] = arrays["vectors"]
+        index.entity_type[:n] = arrays["entity_type"]
+        index.source[:n] = arrays["source"]
+        index.created[:n] = arrays["created"]
+        index.ids = meta["ids"]
+        index._label_of = {doc_id: i for i, doc_id in enumerate(index.ids)}
+        index._codes = meta["codes"]
+        index.watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        if index._hnsw is not None:
+            hnsw, hnsw_path = None, os.path.join(gen, "hnsw.bin")
+            if os.path.isfile(hnsw_path):
+                hnsw = hnswlib.Index(space="ip", dim=index.dim)
+                hnsw.load_index(hnsw_path, max_elements=len(index.vectors))
+                if hnsw.get_current_count() != n:
+                    hnsw = None  # não bate com os vetores: reconstrói
+            if hnsw is None:
+                index._hnsw.add_items(index.vectors[:n], np.arange(n))
+            else:
+                index._hnsw = hnsw
+                index._hnsw.set_ef(EF_SEARCH)
+        return index
+
+
+def _prune_generations(path: str):
+    """Remove gerações antigas, mantendo current e as KEEP_GENERATIONS mais novas."""
+    current = os.path.realpath(os.path.join(path, "current"))
+    gens = sorted((d for d in os.listdir(path) if d.startswith("gen-")),
+                  key=lambda d: int(d.split("-")[1]), reverse=True)
+    for d in gens[KEEP_GENERATIONS:]:
+        full = os.path.join(path, d)
+        if os.path.realpath(full) != current:
+            shutil.rmtree(full, ignore_errors=True)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(build: bool = True) -> Optional[VectorIndex]:
+    """Índice do processo: carrega do disco e agenda o refresh. None se numpy ausente
+    ou desligado (SOFIA_SEARCH_ANN=0). Sem arquivo em disco, o build roda em fundo
+    e a primeira busca cai no pgvector."""
+    global _index
+    if np is None or os.getenv("SOFIA_SEARCH_ANN", "1") == "0":
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    _index = VectorIndex.load()
+                except Exception as e:
+                    print(f"[vector_index] could not load {INDEX_DIR}: {e}", file=sys.stderr)
+                if _index is None:
+                    _index = VectorIndex()
+    if build:
+        _index.maybe_refresh()
+    return _index
+
+
+# === Benchmark ===
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def _pg_exact(conn, query, k: int, filters: dict) -> List[str]:
+    wheres, params = [], []
+    for key in ("entity_type", "source"):
+        if filters.get(key):
+            wheres.append(f"{key} = %s")
+            params.append(filters[key])
+    where = ("WHERE " + " AND ".join(wheres)) if wheres else ""
+    vec = "[" + ",".join(f"{x:.7g}" for x in query) + "]"
+    with conn.cursor() as cur:
+        cur.execute(f"""WITH q AS (SELECT %s::vector AS v)
+                        SELECT e.id::text FROM sofia.embeddings e, q {where}
+                        ORDER BY e.embedding <=> q.v LIMIT %s""", [vec] + params + [k])
+        rows = cur.fetchall()
+    return [list(r.values())[0] if isinstance(r, dict) else r[0] for r in rows]
+
+
+def bench(index: VectorIndex, queries: int = 200, k: int = 10, filters: dict = None, conn=None,
+          seed: int = 7) -> dict:
+    """recall@k e latência do índice contra a busca exata (numpy e, com conn, pgvector)."""
+    rng = np.random.default_rng(seed)
+    n = len(index)
+    picks = rng.choice(n, size=min(queries, n), replace=False)
+    # consulta = doc existente + ruído (não é o próprio doc com sim 1.0)
+    qs = index.vectors[picks] + rng.normal(0, 0.05, size=(len(picks), index.dim)).astype(np.float32)
+
+    ann_ms, exact_ms, pg_ms, recalls = [], [], [], []
+    hnsw_before = index.stats["ann"]
+    for q in qs:
+        t0 = time.perf_counter()
+        got = index.search(q, k, filters)
+        ann_ms.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        truth = index.exact(q, k, filters)
+        exact_ms.append((time.perf_counter() - t0) * 1000)
+        if truth:
+            recalls.append(len({i for i, _ in got} & {i for i, _ in truth}) / len(truth))
+        if conn is not None:
+            t0 = time.perf_counter()
+            _pg_exact(conn, q.tolist(), k, filters or {})
+            pg_ms.append((time.perf_counter() - t0) * 1000)
+
+    result = {"docs": n, "dim": index.dim, "queries": len(qs), "k": k, "filters": filters or {},
+              "backend": "hnswlib" if index._hnsw is not None else "numpy-exact",
+              "hnsw_queries": index.stats["ann"] - hnsw_before,  # o resto foi exato (filtro/índice pequeno)
+              "recall_at_k": round(sum(recalls) / len(recalls), 4) if recalls else None,
+              "ann_p50_ms": round(_percentile(ann_ms, 0.5), 2), "ann_p95_ms": round(_percentile(ann_ms, 0.95), 2),
+              "exact_p50_ms": round(_percentile(exact_ms, 0.5), 2),
+              "exact_p95_ms": round(_percentile(exact_ms, 0.95), 2)}
+    if pg_ms:
+        result.update(pg_p50_ms=round(_percentile(pg_ms, 0.5), 2), pg_p95_ms=round(_percentile(pg_ms, 0.95), 2))
+    return result
+
+
+def _synthetic(n: int, dim: int, seed: int = 7) -> VectorIndex:
+    """Dados em clusters (mais próximo de embeddings reais que ruído uniforme)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, n // 500), dim)).astype(np.float32)
+    assign = rng.integers(0, len(centers), size=n)
+    vecs = centers[assign] + rng.normal(0, 0.6, size=(n, dim)).astype(np.float32)
+    now = datetime.now(timezone.utc)
+    index = VectorIndex(dim)
+    page = 10000
+    for s in range(0, n, page):
+        index.add([(f"syn-{i}", ("paper", "repo", "news")[i % 3], f"src{i % 7}", now - timedelta(hours=i % 720),
+                    vecs[i]) for i in range(s, min(n, s + page))])
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Local ANN index over sofia.embeddings")
+    parser.add_argument("cmd", choices=["build", "refresh", "stats", "bench"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--filter", action="append", default=[], help="key=value (entity_type, source, since, until)")
+    parser.add_argument("--pg", action="store_true", help="Also time pgvector ORDER BY <=> (bench)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Bench on N synthetic vectors (no database)")
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    if np is None:
+        print("numpy not installed: local index disabled (search.semantic uses pgvector only)")
+        sys.exit(1)
+
+    from lib.db_pool import get_pool
+
+    if args.synthetic:
+        t0 = time.perf_counter()
+        idx = _synthetic(args.synthetic, args.dim)
+        print(f"Built {len(idx)} synthetic vectors in {time.perf_counter() - t0:.1f}s")
+        print(json.dumps(bench(idx, args.queries, args.k, dict(f.split("=", 1) for f in args.filter)), indent=2))
+        sys.exit(0)
+
+    idx = None if args.cmd == "build" else VectorIndex.load()
+    if idx is None:
+        idx = VectorIndex()
+    if args.cmd in ("build", "refresh"):
+        t0 = time.perf_counter()
+        with get_pool().connection() as c:
+            added = idx.refresh(c)
+        idx.save()
+        print(f"{args.cmd}: +{added} docs ({len(idx)} total) in {time.perf_counter() - t0:.1f}s → {INDEX_DIR}")
+    elif args.cmd == "stats":
+        print(json.dumps({"docs": len(idx), "dim": idx.dim, "hnsw": idx._hnsw is not None,
+                          "watermark": idx.watermark.isoformat() if idx.watermark else None,
+                          "entity_types": len(idx._codes["entity_type"]), "sources": len(idx._codes["source"])}))
+    else:
+        if not len(idx):
+            print("Index is empty: run `python3 -m lib.vector_index build` first")
+            sys.exit(1)
+        flt = dict(f.split("=", 1) for f in args.filter)
+        if args.pg:
+            with get_pool().connection() as c:
+                print(json.dumps(bench(idx, args.queries, args.k, flt, conn=c), indent=2))
+        else:
+            print(json.dumps(bench(idx, args.queries, args.k, flt), indent=2))
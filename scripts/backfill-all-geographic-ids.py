@@ -11,7 +11,7 @@ from datetime import datetime
 import psycopg2
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from scripts.shared.geo_helpers import normalize_location
+from scripts.shared.geo_helpers import normalize_location, normalize_locations_bulk
 
 DB_CONFIG = {
     "host": os.getenv("DB_HOST", "91.98.158.19"),
@@ -42,12 +42,12 @@ def backfill_jobs(conn):
     rows = cur.fetchall()
     print(f"Encontrados {len(rows)} jobs sem country_id")
 
+    # Normalize all locations at once (in-memory lookups + bulk city creation)
+    locs = normalize_locations_bulk(conn, ({"country": country, "city": city or location} for _, country, city, location in rows))
+
     updated = 0
-    for job_id, country, city, location in rows:
+    for (job_id, country, city, location), loc in zip(rows, locs):
         try:
-            # Normalize location
-            loc = normalize_location(conn, {"country": country, "city": city or location})
-
             if loc["country_id"]:
                 cur.execute(
                     """
@@ -90,11 +90,11 @@ def backfill_persons(conn):
     rows = cur.fetchall()
     print(f"Encontrados {len(rows)} persons sem country_id (limitado a 10k)")
 
+    locs = normalize_locations_bulk(conn, ({"country": country, "city": city} for _, country, city in rows))
+
     updated = 0
-    for person_id, country, city in rows:
+    for (person_id, country, city), loc in zip(rows, locs):
         try:
-            loc = normalize_location(conn, {"country": country, "city": city})
-
             if loc["country_id"]:
                 cur.execute(
                     """
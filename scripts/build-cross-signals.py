@@ -6,12 +6,13 @@ Generates outputs/cross_signals.json from PostgreSQL sources.
 Safe plug-in design: does not modify existing email/site infrastructure.
 
 Usage:
-    python build-cross-signals.py [--window-days 7] [--dry-run]
+    python build-cross-signals.py [--window-days 7] [--dry-run] [--profile] [--term-index] [--refresh-health]
 """
 
 import os
 import sys
 import json
+import time
 import argparse
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
@@ -49,193 +50,21 @@ def get_connection():
 
 # === Source Availability Detection ===
 
-def detect_source_availability(conn, window_start: datetime, window_end: datetime) -> List[Dict]:
+def load_source_health(window_start: datetime, window_end: datetime, refresh: bool = False):
     """
-    Detect which sources are available and their coverage.
-    Returns sources[] array for cross_signals.json
+    Source availability + null rates from one shared snapshot (lib/source_health.py).
+    One aggregate query per table, tables scanned in parallel; reused from
+    sofia.source_health when a snapshot for the same window length is fresh.
     """
-    sources = []
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from lib.db_pool import DatabasePool
+    from lib.source_health import DEFAULT_WORKERS, get_snapshot
 
-    with conn.cursor() as cur:
-        # GA4 (analytics_events) - event_timestamp is bigint (microseconds)
-        window_start_micros = int(window_start.timestamp() * 1_000_000)
-        window_end_micros = int(window_end.timestamp() * 1_000_000)
-
-        cur.execute("""
-            SELECT
-                COUNT(*) as records,
-                MIN(event_timestamp) as min_date,
-                MAX(event_timestamp) as max_date
-            FROM sofia.analytics_events
-            WHERE event_timestamp >= %s AND event_timestamp < %s
-        """, (window_start_micros, window_end_micros))
-        ga4 = cur.fetchone()
-
-        # Convert bigint microseconds back to datetime for ISO format
-        ga4_max_date = None
-        ga4_min_date = None
-        coverage_days = 0
-        if ga4['max_date']:
-            ga4_max_date = datetime.fromtimestamp(ga4['max_date'] / 1_000_000, tz=timezone.utc)
-            ga4_min_date = datetime.fromtimestamp(ga4['min_date'] / 1_000_000, tz=timezone.utc)
-            coverage_days = (ga4_max_date - ga4_min_date).days
-
-        sources.append({
-            'source_id': 'ga4',
-            'status': 'ok' if ga4['records'] > 0 else 'offline',
-            'last_updated_at': ga4_max_date.isoformat() if ga4_max_date else None,
-            'coverage_days': coverage_days,
-            'records_count': ga4['records'],
-            'notes': '' if ga4['records'] > 0 else 'No analytics events in window'
-        })
-
-        # VSCode Marketplace
-        cur.execute("""
-            SELECT
-                COUNT(*) as records,
-                MIN(snapshot_date) as min_date,
-                MAX(snapshot_date) as max_date
-            FROM sofia.vscode_extensions_daily
-            WHERE snapshot_date >= %s::DATE AND snapshot_date < %s::DATE
-        """, (window_start, window_end))
-        vscode = cur.fetchone()
-        sources.append({
-            'source_id': 'vscode_marketplace',
-            'status': 'ok' if vscode['records'] > 100 else ('partial' if vscode['records'] > 0 else 'offline'),
-            'last_updated_at': vscode['max_date'].isoformat() if vscode['max_date'] else None,
-            'coverage_days': (vscode['max_date'] - vscode['min_date']).days if vscode['max_date'] else 0,
-            'records_count': vscode['records'],
-            'notes': 'Full extension data available' if vscode['records'] > 100 else ''
-        })
-
-        # GitHub Trending
-        cur.execute("""
-            SELECT
-                COUNT(*) as records,
-                MIN(collected_at) as min_date,
-                MAX(collected_at) as max_date
-            FROM sofia.github_trending
-            WHERE collected_at >= %s AND collected_at < %s
-        """, (window_start, window_end))
-        github = cur.fetchone()
-        sources.append({
-            'source_id': 'github_trending',
-            'status': 'ok' if github['records'] > 50 else ('partial' if github['records'] > 0 else 'offline'),
-            'last_updated_at': github['max_date'].isoformat() if github['max_date'] else None,
-            'coverage_days': (github['max_date'] - github['min_date']).days if github['max_date'] else 0,
-            'records_count': github['records'],
-            'notes': ''
-        })
-
-        # Patents (check existence, not date range since it's cumulative)
-        try:
-            cur.execute("SELECT COUNT(*) as records FROM sofia.patents LIMIT 1")
-            patents = cur.fetchone()
-            sources.append({
-                'source_id': 'patents',
-                'status': 'ok',
-                'last_updated_at': None,
-                'coverage_days': None,
-                'records_count': None,  # Too large to count
-                'notes': 'Patents data available (aggregated queries only)'
-            })
-        except psycopg2.ProgrammingError:
-            sources.append({
-                'source_id': 'patents',
-                'status': 'missing',
-                'last_updated_at': None,
-                'coverage_days': 0,
-                'records_count': 0,
-                'notes': 'Patents table not found'
-            })
-            conn.rollback()
-
-        # ArXiv Papers
-        cur.execute("""
-            SELECT
-                COUNT(*) as records,
-                MIN(published_date) as min_date,
-                MAX(published_date) as max_date
-            FROM sofia.arxiv_ai_papers
-            WHERE published_date >= %s::DATE AND published_date < %s::DATE
-        """, (window_start, window_end))
-        arxiv = cur.fetchone()
-        sources.append({
-            'source_id': 'arxiv',
-            'status': 'ok' if arxiv['records'] > 10 else ('partial' if arxiv['records'] > 0 else 'offline'),
-            'last_updated_at': arxiv['max_date'].isoformat() if arxiv['max_date'] else None,
-            'coverage_days': (arxiv['max_date'] - arxiv['min_date']).days if arxiv['max_date'] else 0,
-            'records_count': arxiv['records'],
-            'notes': ''
-        })
-
-        # HackerNews (news_items)
-        cur.execute("""
-            SELECT
-                COUNT(*) as records,
-                MIN(published_at) as min_date,
-                MAX(published_at) as max_date
-            FROM sofia.news_items
-            WHERE source = 'hackernews'
-              AND published_at >= %s AND published_at < %s
-        """, (window_start, window_end))
-        hn = cur.fetchone()
-        sources.append({
-            'source_id': 'hackernews',
-            'status': 'ok' if hn['records'] > 20 else ('partial' if hn['records'] > 0 else 'offline'),
-            'last_updated_at': hn['max_date'].isoformat() if hn['max_date'] else None,
-            'coverage_days': (hn['max_date'] - hn['min_date']).days if hn['max_date'] else 0,
-            'records_count': hn['records'],
-            'notes': ''
-        })
-
-        # Chat Sessions (optional)
-        try:
-            cur.execute("""
-                SELECT COUNT(*) as records
-                FROM sofia.ga4_chat_sessions
-                WHERE session_start >= %s AND session_start < %s
-            """, (window_start, window_end))
-            chat = cur.fetchone()
-            sources.append({
-                'source_id': 'chat_sessions',
-                'status': 'ok' if chat['records'] > 0 else 'offline',
-                'last_updated_at': None,
-                'coverage_days': None,
-                'records_count': chat['records'],
-                'notes': ''
-            })
-        except psycopg2.ProgrammingError:
-            sources.append({
-                'source_id': 'chat_sessions',
-                'status': 'missing',
-                'last_updated_at': None,
-                'coverage_days': 0,
-                'records_count': 0,
-                'notes': 'Table ga4_chat_sessions not found'
-            })
-            conn.rollback()
-
-        # Funding Rounds
-        cur.execute("""
-            SELECT
-                COUNT(*) as records,
-                MIN(announced_date) as min_date,
-                MAX(announced_date) as max_date
-            FROM sofia.funding_rounds
-            WHERE announced_date >= %s::DATE AND announced_date < %s::DATE
-        """, (window_start, window_end))
-        funding = cur.fetchone()
-        sources.append({
-            'source_id': 'funding_rounds',
-            'status': 'ok' if funding['records'] > 5 else ('partial' if funding['records'] > 0 else 'offline'),
-            'last_updated_at': funding['max_date'].isoformat() if funding['max_date'] else None,
-            'coverage_days': (funding['max_date'] - funding['min_date']).days if funding['max_date'] else 0,
-            'records_count': funding['records'],
-            'notes': ''
-        })
-
-    return sources
+    pool = DatabasePool(dsn=psycopg2.extensions.make_dsn(**DB_CONFIG), maxconn=DEFAULT_WORKERS)
+    try:
+        return get_snapshot(window_start, window_end, pool=pool, refresh=refresh)
+    finally:
+        pool.close()
 
 # === Candidate Event Detection ===
 
@@ -288,182 +117,295 @@ def detect_candidate_events(conn, window_start: datetime, window_end: datetime)
     return events
 
 # === Reaction Detection ===
+#
+# Set-based: os termos de TODOS os eventos vão num único query por fonte
+# (unnest de pares evento/termo), cada termo distinto é casado uma vez contra
+# a fonte e o resultado volta por evento (top 3 por evento via row_number).
+# 4 queries por build em vez de 4 por evento. Índices pg_trgm (migration 110)
+# atendem os ILIKE '%termo%'.
+
+REACTION_TOP_N = 3
+
+VSCODE_REACTIONS_SQL = """
+    WITH ev(idx, term) AS (SELECT * FROM unnest(%s::INT[], %s::TEXT[])),
+    cand AS (
+        SELECT extension_id, installs_current, installs_delta_7d, installs_delta_pct_7d, tags
+        FROM sofia.vscode_extensions_7d_deltas
+        WHERE installs_delta_7d > 1000  -- Significant increase
+    ),
+    hits AS (
+        SELECT DISTINCT ev.idx, c.extension_id, c.installs_current, c.installs_delta_7d, c.installs_delta_pct_7d
+        FROM ev JOIN cand c ON ev.term = ANY(c.tags)  -- tags && topics
+    )
+    SELECT * FROM (
+        SELECT hits.*, row_number() OVER (PARTITION BY idx ORDER BY installs_delta_7d DESC) AS rn
+        FROM hits
+    ) x
+    WHERE rn <= %s
+    ORDER BY idx, rn
+"""
 
-def detect_reactions_for_event(conn, event: Dict, window_start: datetime, window_end: datetime) -> List[Dict]:
-    """
-    For a given event, detect correlated reactions from multiple sources.
-    Returns list of reactions (each with source_id, signal_type, metric_name, value, etc)
-    """
-    reactions = []
-    topics = event.get('topics', [])
+GITHUB_REACTIONS_SQL = """
+    WITH ev(idx, term) AS (SELECT * FROM unnest(%s::INT[], %s::TEXT[])),
+    terms AS (SELECT DISTINCT term FROM ev),
+    cand AS (
+        SELECT id, full_name, stars, language, description
+        FROM sofia.github_trending
+        WHERE collected_at >= %s AND collected_at < %s
+    ),
+    term_hits AS (
+        SELECT DISTINCT t.term, c.id
+        FROM terms t JOIN cand c
+          ON c.full_name ILIKE '%%' || t.term || '%%'
+          OR c.description ILIKE '%%' || t.term || '%%'
+          OR c.language ILIKE t.term  -- Language exact match
+    ),
+    event_hits AS (SELECT DISTINCT ev.idx, th.id FROM ev JOIN term_hits th USING (term))
+    SELECT * FROM (
+        SELECT eh.idx, c.full_name, c.stars,
+               row_number() OVER (PARTITION BY eh.idx ORDER BY c.stars DESC) AS rn
+        FROM event_hits eh JOIN cand c USING (id)
+    ) x
+    WHERE rn <= %s
+    ORDER BY idx, rn
+"""
+
+ARXIV_REACTIONS_SQL = """
+    WITH ev(idx, term) AS (SELECT * FROM unnest(%s::INT[], %s::TEXT[])),
+    terms AS (SELECT DISTINCT term FROM ev),
+    term_hits AS (
+        SELECT DISTINCT t.term, p.id
+        FROM terms t JOIN sofia.arxiv_ai_papers p
+          ON p.published_date >= %s::DATE AND p.published_date < %s::DATE
+         AND (p.title ILIKE '%%' || t.term || '%%' OR p.abstract ILIKE '%%' || t.term || '%%')
+    )
+    SELECT ev.idx, COUNT(DISTINCT th.id) AS paper_count
+    FROM ev JOIN term_hits th USING (term)
+    GROUP BY ev.idx
+"""
+
+FUNDING_REACTIONS_SQL = """
+    WITH ev(idx, term) AS (SELECT * FROM unnest(%s::INT[], %s::TEXT[])),
+    terms AS (SELECT DISTINCT term FROM ev),
+    cand AS (
+        SELECT fr.id, o.name AS organization_name, fr.company_name, fr.sector,
+               fr.amount_usd, fr.announced_date
+        FROM sofia.funding_rounds fr
+        LEFT JOIN sofia.organizations o ON fr.organization_id = o.id
+        WHERE fr.announced_date >= %s::DATE AND fr.announced_date < %s::DATE
+    ),
+    term_hits AS (
+        SELECT DISTINCT t.term, c.id
+        FROM terms t JOIN cand c
+          ON c.organization_name ILIKE '%%' || t.term || '%%'
+          OR c.company_name ILIKE '%%' || t.term || '%%'
+          OR c.sector ILIKE '%%' || t.term || '%%'
+    ),
+    event_hits AS (SELECT DISTINCT ev.idx, th.id FROM ev JOIN term_hits th USING (term))
+    SELECT * FROM (
+        SELECT eh.idx, c.organization_name, c.amount_usd, c.announced_date,
+               row_number() OVER (PARTITION BY eh.idx ORDER BY c.amount_usd DESC NULLS LAST) AS rn
+        FROM event_hits eh JOIN cand c USING (id)
+    ) x
+    WHERE rn <= %s
+    ORDER BY idx, rn
+"""
+
+
+def _event_term_pairs(events: List[Dict], terms_for, skip=frozenset()) -> Tuple[List[int], List[str]]:
+    """Achata (índice do evento, termo) para o unnest. Eventos sem topics ficam de fora."""
+    idxs, terms = [], []
+    for idx, event in enumerate(events):
+        if not event.get('topics') or idx in skip:
+            continue
+        for term in dict.fromkeys(t for t in terms_for(event) if isinstance(t, str) and t):
+            idxs.append(idx)
+            terms.append(term)
+    return idxs, terms
+
+
+def _funding_terms(event: Dict) -> List[str]:
+    # Build search terms from entities (companies) and topics
     entities = event.get('entities', {})
+    search_terms = []
+    if isinstance(entities, dict):
+        search_terms.extend(entities.get('companies', []))
+        search_terms.extend(entities.get('technologies', []))
+    search_terms.extend(event.get('topics', [])[:5])
+    return search_terms
+
+
+def _vscode_reaction(row: Dict) -> Dict:
+    return {
+        'source_id': 'vscode_marketplace',
+        'signal_type': 'adoption',
+        'metric_name': f"{row['extension_id']}_installs",
+        'value': row['installs_current'],
+        'delta': row['installs_delta_7d'],
+        'delta_pct': float(row['installs_delta_pct_7d']) if row['installs_delta_pct_7d'] else None,
+        'window_days': 7,
+        'direction': 'up',
+        'evidence': [
+            {
+                'ref_type': 'internal_id',
+                'ref_id': row['extension_id']
+            }
+        ],
+        'confidence': 0.85
+    }
 
-    if not topics:
-        return reactions  # No topics to match
 
-    with conn.cursor() as cur:
-        # VSCode Marketplace reaction (installs spike for related extensions)
-        if topics:
-            cur.execute("""
-                SELECT
-                    extension_id,
-                    display_name,
-                    installs_current,
-                    installs_7d_ago,
-                    installs_delta_7d,
-                    installs_delta_pct_7d,
-                    tags
-                FROM sofia.vscode_extensions_7d_deltas
-                WHERE tags && %s::TEXT[]  -- Overlap with event topics
-                  AND installs_delta_7d > 1000  -- Significant increase
-                ORDER BY installs_delta_7d DESC
-                LIMIT 3
-            """, (topics,))
-
-            for row in cur.fetchall():
-                reactions.append({
-                    'source_id': 'vscode_marketplace',
-                    'signal_type': 'adoption',
-                    'metric_name': f"{row['extension_id']}_installs",
-                    'value': row['installs_current'],
-                    'delta': row['installs_delta_7d'],
-                    'delta_pct': float(row['installs_delta_pct_7d']) if row['installs_delta_pct_7d'] else None,
-                    'window_days': 7,
-                    'direction': 'up',
-                    'evidence': [
-                        {
-                            'ref_type': 'internal_id',
-                            'ref_id': row['extension_id']
-                        }
-                    ],
-                    'confidence': 0.85
-                })
+def _github_reaction(row: Dict) -> Dict:
+    return {
+        'source_id': 'github_trending',
+        'signal_type': 'activity',
+        'metric_name': f"{row['full_name']}_stars",
+        'value': row['stars'],
+        'window_days': 7,
+        'direction': 'up',
+        'evidence': [
+            {
+                'ref_type': 'github_repo',
+                'ref_id': row['full_name']
+            }
+        ],
+        'confidence': 0.80
+    }
 
-        # GitHub activity reaction (stars, commits for related repos)
-        if topics:
-            cur.execute("""
-                SELECT
-                    full_name,
-                    stars,
-                    language,
-                    description,
-                    collected_at
-                FROM sofia.github_trending
-                WHERE collected_at >= %s AND collected_at < %s
-                  AND (
-                    full_name ILIKE ANY(%s::TEXT[])
-                    OR description ILIKE ANY(%s::TEXT[])
-                    OR language ILIKE ANY(%s::TEXT[])
-                  )
-                ORDER BY stars DESC
-                LIMIT 3
-            """, (
-                window_start,
-                window_end,
-                ['%' + topic + '%' for topic in topics[:5]],
-                ['%' + topic + '%' for topic in topics[:5]],
-                topics[:5]  # Language exact match
-            ))
-
-            for row in cur.fetchall():
-                reactions.append({
-                    'source_id': 'github_trending',
-                    'signal_type': 'activity',
-                    'metric_name': f"{row['full_name']}_stars",
-                    'value': row['stars'],
-                    'window_days': 7,
-                    'direction': 'up',
-                    'evidence': [
-                        {
-                            'ref_type': 'github_repo',
-                            'ref_id': row['full_name']
-                        }
-                    ],
-                    'confidence': 0.80
-                })
 
-        # ArXiv papers reaction (papers mentioning same topics)
-        if topics:
-            cur.execute("""
-                SELECT COUNT(*) as paper_count
-                FROM sofia.arxiv_ai_papers
-                WHERE published_date >= %s::DATE AND published_date < %s::DATE
-                  AND (
-                    title ILIKE ANY(%s::TEXT[])
-                    OR abstract ILIKE ANY(%s::TEXT[])
-                  )
-            """, (
-                window_start,
-                window_end,
-                ['%' + topic + '%' for topic in topics[:5]],  # Limit to top 5 topics
-                ['%' + topic + '%' for topic in topics[:5]]
-            ))
-            paper_row = cur.fetchone()
-            if paper_row and paper_row['paper_count'] > 2:
-                reactions.append({
-                    'source_id': 'arxiv',
-                    'signal_type': 'research',
-                    'metric_name': 'papers_mentioning_topics',
-                    'value': paper_row['paper_count'],
-                    'window_days': 7,
-                    'direction': 'up',
-                    'confidence': 0.70
-                })
+def _arxiv_reaction(row: Dict) -> Optional[Dict]:
+    if row['paper_count'] <= 2:
+        return None
+    return {
+        'source_id': 'arxiv',
+        'signal_type': 'research',
+        'metric_name': 'papers_mentioning_topics',
+        'value': row['paper_count'],
+        'window_days': 7,
+        'direction': 'up',
+        'confidence': 0.70
+    }
 
-        # Funding rounds reaction (funding for related companies/sectors)
-        if topics or entities:
-            # Build search terms from entities (companies) and topics
-            search_terms = []
-            if isinstance(entities, dict):
-                search_terms.extend(entities.get('companies', []))
-                search_terms.extend(entities.get('technologies', []))
-            search_terms.extend(topics[:5])
-
-            if search_terms:
-                cur.execute("""
-                    SELECT
-                        o.name as organization_name,
-                        fr.amount_usd,
-                        fr.round_type,
-                        fr.announced_date,
-                        fr.investors
-                    FROM sofia.funding_rounds fr
-                    LEFT JOIN sofia.organizations o ON fr.organization_id = o.id
-                    WHERE fr.announced_date >= %s::DATE AND fr.announced_date < %s::DATE
-                      AND (
-                        o.name ILIKE ANY(%s::TEXT[])
-                        OR fr.company_name ILIKE ANY(%s::TEXT[])
-                        OR fr.sector ILIKE ANY(%s::TEXT[])
-                      )
-                    ORDER BY fr.amount_usd DESC NULLS LAST
-                    LIMIT 3
-                """, (
-                    window_start,
-                    window_end,
-                    ['%' + term + '%' for term in search_terms if term],
-                    ['%' + term + '%' for term in search_terms if term],
-                    ['%' + term + '%' for term in search_terms if term]
-                ))
-
-                for row in cur.fetchall():
-                    reactions.append({
-                        'source_id': 'funding_rounds',
-                        'signal_type': 'market',
-                        'metric_name': f"{row['organization_name']}_funding",
-                        'value': row['amount_usd'] or 0,
-                        'window_days': 7,
-                        'direction': 'up',
-                        'evidence': [
-                            {
-                                'ref_type': 'internal_id',
-                                'ref_id': f"funding_{row['announced_date']}"
-                            }
-                        ],
-                        'confidence': 0.75
-                    })
+
+def _funding_reaction(row: Dict) -> Dict:
+    return {
+        'source_id': 'funding_rounds',
+        'signal_type': 'market',
+        'metric_name': f"{row['organization_name']}_funding",
+        'value': row['amount_usd'] or 0,
+        'window_days': 7,
+        'direction': 'up',
+        'evidence': [
+            {
+                'ref_type': 'internal_id',
+                'ref_id': f"funding_{row['announced_date']}"
+            }
+        ],
+        'confidence': 0.75
+    }
+
+
+# (fonte, SQL, termos por evento, usa janela, top N, row → reaction)
+REACTION_SOURCES = [
+    ('vscode_marketplace', VSCODE_REACTIONS_SQL, lambda e: e.get('topics', []), False, True, _vscode_reaction),
+    ('github_trending', GITHUB_REACTIONS_SQL, lambda e: e.get('topics', [])[:5], True, True, _github_reaction),
+    ('arxiv', ARXIV_REACTIONS_SQL, lambda e: e.get('topics', [])[:5], True, False, _arxiv_reaction),
+    ('funding_rounds', FUNDING_REACTIONS_SQL, _funding_terms, True, True, _funding_reaction),
+]
+
+
+def _arxiv_counts_from_index(term_index, events: List[Dict], window_start: datetime,
+                             window_end: datetime) -> Dict[int, int]:
+    """
+    Contagem de papers por evento via sofia.term_postings (lib/term_index.py).
+    Só eventos cujos topics[:5] são todos termos do vocabulário; o resto fica
+    com o ILIKE set-based.
+    """
+    from lib.term_index import normalize_term
+
+    covered = {}
+    for idx, event in enumerate(events):
+        topics = [t for t in event.get('topics', [])[:5] if isinstance(t, str) and t]
+        canonical = [normalize_term(t) for t in topics]
+        if topics and all(canonical):
+            covered[idx] = set(canonical)
+    if not covered:
+        return {}
+    hits = term_index.docs(set().union(*covered.values()), 'arxiv', window_start.date(), window_end.date())
+    return {idx: len(set().union(*(hits.get(t, set()) for t in terms))) for idx, terms in covered.items()}
+
+
+def detect_reactions_batch(conn, events: List[Dict], window_start: datetime, window_end: datetime,
+                           profile: Optional[Dict] = None, term_index=None) -> List[List[Dict]]:
+    """
+    Detect correlated reactions for all events at once (one query per source).
+    Returns one list of reactions per event, in the same order as `events`,
+    with sources in the order vscode, github, arxiv, funding.
+    profile (opcional) recebe {fonte: {ms, pairs, terms, rows, events_matched}}.
+    term_index (opcional, lib.term_index.TermIndex): contagem do arxiv por probe no índice.
+    """
+    reactions = [[] for _ in events]
+
+    with conn.cursor() as cur:
+        for source_id, sql, terms_for, windowed, top_n, to_reaction in REACTION_SOURCES:
+            skip = {}
+            if source_id == 'arxiv' and term_index is not None:
+                t0 = time.perf_counter()
+                skip = _arxiv_counts_from_index(term_index, events, window_start, window_end)
+                matched = set()
+                for idx, paper_count in skip.items():
+                    reaction = to_reaction({'idx': idx, 'paper_count': paper_count})
+                    if reaction is not None:
+                        reactions[idx].append(reaction)
+                        matched.add(idx)
+                if profile is not None:
+                    profile['arxiv (term index)'] = {'ms': round((time.perf_counter() - t0) * 1000, 1),
+                                                     'pairs': len(skip), 'terms': 0, 'rows': len(skip),
+                                                     'events_matched': len(matched)}
+
+            idxs, terms = _event_term_pairs(events, terms_for, skip)
+            if not idxs:
+                continue
+            args = [idxs, terms]
+            if windowed:
+                args += [window_start, window_end]
+            if top_n:
+                args.append(REACTION_TOP_N)
+
+            t0 = time.perf_counter()
+            cur.execute(sql, args)
+            rows = cur.fetchall()
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+
+            matched = set()
+            for row in rows:
+                reaction = to_reaction(row)
+                if reaction is not None:
+                    reactions[row['idx']].append(reaction)
+                    matched.add(row['idx'])
+
+            if profile is not None:
+                profile[source_id] = {'ms': round(elapsed_ms, 1), 'pairs': len(idxs), 'terms': len(set(terms)),
+                                      'rows': len(rows), 'events_matched': len(matched)}
 
     return reactions
 
+
+def detect_reactions_for_event(conn, event: Dict, window_start: datetime, window_end: datetime) -> List[Dict]:
+    """
+    For a given event, detect correlated reactions from multiple sources.
+    Returns list of reactions (each with source_id, signal_type, metric_name, value, etc)
+    """
+    return detect_reactions_batch(conn, [event], window_start, window_end)[0]
+
+
+def print_reaction_profile(profile: Dict):
+    """--profile: tempo de match por fonte."""
+    print(f"\n{'source':<20} {'ms':>9} {'pairs':>7} {'terms':>7} {'rows':>6} {'events':>7}")
+    for source_id, p in profile.items():
+        print(f"{source_id:<20} {p['ms']:>9.1f} {p['pairs']:>7} {p['terms']:>7} {p['rows']:>6} {p['events_matched']:>7}")
+    print(f"{'total':<20} {sum(p['ms'] for p in profile.values()):>9.1f}\n")
+
 # === Classification Helpers ===
 
 def classify_domain(topics: List[str], entities: Dict) -> str:
@@ -648,81 +590,10 @@ def calculate_confidence(reactions: List[Dict], data_quality_flags: Dict) -> str
 
 # === Null Rates Calculation ===
 
-def calculate_null_rates(conn, window_start: datetime, window_end: datetime, data_quality_flags: Dict) -> Dict:
-    """
-    Calculate null rates for data quality assessment.
-    Returns dict with deep_read_null_rate, engagement_null_rate, chat_activation_null_rate.
-    """
-    null_rates = {}
-
-    with conn.cursor() as cur:
-        # Deep read null rate (from content_meta)
-        if data_quality_flags.get('content_meta_available'):
-            try:
-                cur.execute("""
-                    SELECT
-                        COUNT(*) as total,
-                        SUM(CASE WHEN reading_time_sec IS NULL THEN 1 ELSE 0 END) as null_count
-                    FROM sofia.content_meta
-                """)
-                result = cur.fetchone()
-                if result and result['total'] > 0:
-                    null_rates['deep_read_null_rate'] = round(result['null_count'] / result['total'], 4)
-                else:
-                    null_rates['deep_read_null_rate'] = 1.0
-            except psycopg2.ProgrammingError:
-                null_rates['deep_read_null_rate'] = 1.0
-                conn.rollback()
-        else:
-            null_rates['deep_read_null_rate'] = 1.0
-
-        # Engagement null rate (from analytics_events)
-        if data_quality_flags.get('ga4_available'):
-            try:
-                cur.execute("""
-                    SELECT
-                        COUNT(*) as total,
-                        SUM(CASE WHEN engagement_time_msec IS NULL THEN 1 ELSE 0 END) as null_count
-                    FROM sofia.analytics_events
-                    WHERE event_timestamp >= %s AND event_timestamp < %s
-                """, (window_start, window_end))
-                result = cur.fetchone()
-                if result and result['total'] > 0:
-                    null_rates['engagement_null_rate'] = round(result['null_count'] / result['total'], 4)
-                else:
-                    null_rates['engagement_null_rate'] = 1.0
-            except psycopg2.ProgrammingError:
-                null_rates['engagement_null_rate'] = 1.0
-                conn.rollback()
-        else:
-            null_rates['engagement_null_rate'] = 1.0
-
-        # Chat activation null rate (from ga4_chat_sessions)
-        if data_quality_flags.get('chat_table_available'):
-            try:
-                cur.execute("""
-                    SELECT
-                        COUNT(*) as total,
-                        SUM(CASE WHEN chat_activated IS NULL THEN 1 ELSE 0 END) as null_count
-                    FROM sofia.ga4_chat_sessions
-                    WHERE session_start >= %s AND session_start < %s
-                """, (window_start, window_end))
-                result = cur.fetchone()
-                if result and result['total'] > 0:
-                    null_rates['chat_activation_null_rate'] = round(result['null_count'] / result['total'], 4)
-                else:
-                    null_rates['chat_activation_null_rate'] = 1.0
-            except psycopg2.ProgrammingError:
-                null_rates['chat_activation_null_rate'] = 1.0
-                conn.rollback()
-        else:
-            null_rates['chat_activation_null_rate'] = 1.0
-
-    return null_rates
-
 # === Insight Generation ===
 
-def generate_insights(conn, events: List[Dict], window_start: datetime, window_end: datetime, data_quality_flags: Dict) -> Tuple[List[Dict], List[Dict]]:
+def generate_insights(conn, events: List[Dict], window_start: datetime, window_end: datetime, data_quality_flags: Dict,
+                      profile: Optional[Dict] = None, term_index=None) -> Tuple[List[Dict], List[Dict]]:
     """
     Generate insights (2+ reactions) and observations (0-1 reactions) from events.
     Returns (insights, observations)
@@ -730,8 +601,10 @@ def generate_insights(conn, events: List[Dict], window_start: datetime, window_e
     insights = []
     observations = []
 
-    for event in events:
-        reactions = detect_reactions_for_event(conn, event, window_start, window_end)
+    all_reactions = detect_reactions_batch(conn, events, window_start, window_end, profile=profile,
+                                           term_index=term_index)
+
+    for event, reactions in zip(events, all_reactions):
 
         if len(reactions) >= MIN_SOURCES_FOR_INSIGHT:
             # It's an insight
@@ -813,7 +686,8 @@ def generate_insights(conn, events: List[Dict], window_start: datetime, window_e
 
 # === Main Builder ===
 
-def build_cross_signals(window_days: int = 7, dry_run: bool = False) -> Dict:
+def build_cross_signals(window_days: int = 7, dry_run: bool = False, profile: bool = False,
+                        use_term_index: bool = False, refresh_health: bool = False) -> Dict:
     """
     Main builder function.
     Returns complete cross_signals.json structure.
@@ -823,10 +697,14 @@ def build_cross_signals(window_days: int = 7, dry_run: bool = False) -> Dict:
 
     print(f"Building cross-signals for window: {window_start.date()} to {window_end.date()}")
 
+    # 1. Detect source availability (shared source health snapshot)
+    print("Detecting source availability...")
+    health = load_source_health(window_start, window_end, refresh=refresh_health)
+    sources = health.availability()
+    origin = 'cached' if health.cached else f"scanned in {health.scan_ms:.0f}ms"
+    print(f"Source health snapshot #{health.snapshot_id or '-'} ({origin})")
+
     with get_connection() as conn:
-        # 1. Detect source availability
-        print("Detecting source availability...")
-        sources = detect_source_availability(conn, window_start, window_end)
 
         # Build data quality flags
         data_quality_flags = {
@@ -846,7 +724,16 @@ def build_cross_signals(window_days: int = 7, dry_run: bool = False) -> Dict:
 
         # 3. Generate insights and observations
         print("Generating insights and observations...")
-        insights, observations = generate_insights(conn, events, window_start, window_end, data_quality_flags)
+        reaction_profile = {} if profile else None
+        term_index = None
+        if use_term_index:
+            sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+            from lib.term_index import TermIndex
+            term_index = TermIndex(conn)
+        insights, observations = generate_insights(conn, events, window_start, window_end, data_quality_flags,
+                                                   profile=reaction_profile, term_index=term_index)
+        if profile:
+            print_reaction_profile(reaction_profile)
         print(f"Generated {len(insights)} insights, {len(observations)} observations")
 
         # 4. Build coverage summary
@@ -881,9 +768,8 @@ def build_cross_signals(window_days: int = 7, dry_run: bool = False) -> Dict:
                     'timestamp': datetime.now(timezone.utc).isoformat()
                 })
 
-        # 6. Calculate null rates
-        print("Calculating data quality null rates...")
-        null_rates = calculate_null_rates(conn, window_start, window_end, data_quality_flags)
+        # 6. Null rates (same snapshot as step 1)
+        null_rates = health.null_rates()
 
         # 7. Assemble final JSON
         cross_signals = {
@@ -908,6 +794,7 @@ def build_cross_signals(window_days: int = 7, dry_run: bool = False) -> Dict:
             'data_quality': {
                 'flags': data_quality_flags,
                 'null_rates': null_rates,
+                'source_health': health.summary(),
                 'warnings': warnings,
                 'coverage_summary': {
                     'min_coverage_days': min((s['coverage_days'] for s in sources if s['coverage_days']), default=0),
@@ -933,10 +820,16 @@ def main():
     parser = argparse.ArgumentParser(description='Sofia Pulse Cross Signals Builder')
     parser.add_argument('--window-days', type=int, default=7, help='Analysis window in days (default: 7)')
     parser.add_argument('--dry-run', action='store_true', help='Print JSON to stdout instead of writing file')
+    parser.add_argument('--profile', action='store_true', help='Print per-source reaction match time')
+    parser.add_argument('--term-index', action='store_true',
+                        help='Count arXiv reactions from sofia.term_postings (lib/term_index.py) instead of ILIKE')
+    parser.add_argument('--refresh-health', action='store_true',
+                        help='Rescan sources instead of reusing a cached sofia.source_health snapshot')
     args = parser.parse_args()
 
     try:
-        cross_signals = build_cross_signals(window_days=args.window_days, dry_run=args.dry_run)
+        cross_signals = build_cross_signals(window_days=args.window_days, dry_run=args.dry_run, profile=args.profile,
+                                            use_term_index=args.term_index, refresh_health=args.refresh_health)
 
         if args.dry_run:
             print(json.dumps(cross_signals, indent=2))
@@ -8,11 +8,15 @@ API: https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados?formato=json
 import os
 import sys
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
 import psycopg2
 import requests
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from lib.metrics_channel import emitter  # noqa: E402
+
 # Database connection
 DB_CONFIG = {
     "host": os.getenv("POSTGRES_HOST", os.getenv("DB_HOST", "localhost")),
@@ -145,6 +149,47 @@ def save_to_database(conn, series_code: str, series_info: Dict, data: List[Dict]
     return inserted
 
 
+def collect(conn) -> Tuple[int, int]:
+    """Fetch + save all series. Returns (fetched, saved)."""
+    fetched = 0
+    total_records = 0
+    metrics = emitter()
+
+    print("📊 Fetching BACEN series...")
+    print("")
+
+    for done, (series_code, series_info) in enumerate(BACEN_SERIES.items(), 1):
+        print(f"📈 {series_info['name']} (code: {series_code})")
+
+        # Fetch data (last 365 days)
+        with metrics.phase("fetch"):
+            data = fetch_bacen_series(series_code, days_back=365)
+        fetched += len(data)
+        metrics.count("fetched", len(data))
+
+        if data:
+            # Save to database
+            with metrics.phase("write"):
+                inserted = save_to_database(conn, series_code, series_info, data)
+            total_records += inserted
+            metrics.count("saved", inserted)
+            print(f"   💾 Saved: {inserted} records")
+
+        metrics.progress(done, len(BACEN_SERIES), "series")
+        print("")
+
+    return fetched, total_records
+
+
+def run(params: Dict[str, Any]) -> Dict[str, int]:
+    """Entry point for collect.run warm mode (lib/collector_runtime.py)"""
+    from lib.collector_runtime import db_connection
+
+    with db_connection() as conn:
+        fetched, saved = collect(conn)
+    return {"fetched": fetched, "saved": saved, "skipped": fetched - saved}
+
+
 def main():
     print("=" * 80)
     print("📊 BACEN SGS API - Banco Central do Brasil")
@@ -163,27 +208,13 @@ def main():
         print(f"❌ Database connection failed: {e}")
         sys.exit(1)
 
-    total_records = 0
-
-    print("📊 Fetching BACEN series...")
-    print("")
-
-    for series_code, series_info in BACEN_SERIES.items():
-        print(f"📈 {series_info['name']} (code: {series_code})")
-
-        # Fetch data (last 365 days)
-        data = fetch_bacen_series(series_code, days_back=365)
-
-        if data:
-            # Save to database
-            inserted = save_to_database(conn, series_code, series_info, data)
-            total_records += inserted
-            print(f"   💾 Saved: {inserted} records")
-
-        print("")
-
+    fetched, total_records = collect(conn)
     conn.close()
 
+    emitter().result(status="ok", source="bacen-sgs", items_read=fetched,
+                     items_inserted=total_records, items_updated=0,
+                     tables_affected=["sofia.bacen_sgs_series"])
+
     print("=" * 80)
     print("✅ BACEN SGS COLLECTION COMPLETE")
     print("=" * 80)
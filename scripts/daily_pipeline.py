@@ -1,20 +1,31 @@
 #!/usr/bin/env python3
 """
-Sofia Skills Kit - Daily Pipeline (v2 - Batch Execution)
-Executa collectors em lotes com prioridades + budget control.
+Sofia Skills Kit - Daily Pipeline (v3 - Global Queue)
+Executa todos os collectors numa fila global (longest-job-first, caps por
+host, orçamento de CPU/memória) + budget control.
 """
 
+import os
 import sys
 import uuid
 import json
 import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import psycopg2
 
 # Adicionar path do projeto (relativo ao arquivo)
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from lib.skill_runner import run
+from lib.helpers import DB_URL
+from lib.db_pool import get_pool
+from lib.run_state import get_run_state
+from lib.skill_registry import get_registry
+from lib.skill_runner import preload, run
+
+# Grupos executados (os demais grupos do config são ignorados, como antes)
+COLLECTOR_GROUPS = ["required", "ga4", "tech", "research", "jobs", "patents", "other"]
 
 
 def execute_collector(cid, config, trace, max_retries=2):
@@ -62,48 +73,174 @@ def execute_collector(cid, config, trace, max_retries=2):
     }
 
 
-def execute_batch(collectors_config, group_name, trace, max_parallel=3):
-    """Executa um lote de collectors com concorrência limitada."""
-    results = []
+def load_resource_hints():
+    """Lê config/collector_resources.json (hosts, caps, cpu/mem). Arquivo opcional."""
+    path = Path(__file__).resolve().parents[1] / "config" / "collector_resources.json"
+    hints = {"budget": {}, "defaults": {}, "host_caps": {}, "collectors": {}}
+    if path.exists():
+        try:
+            with open(path, "r") as f:
+                hints.update(json.load(f))
+        except Exception as e:
+            print(f"[daily_pipeline] ⚠️ Failed to read {path.name}: {e}")
+    return hints
 
-    if not collectors_config:
-        return results
 
-    print(f"\n[daily_pipeline] === Group: {group_name} ({len(collectors_config)} collectors) ===")
+def load_cost_hints(collector_ids, lookback_days=30, last_n=10):
+    """Mediana de duration_ms das últimas N execuções por collector (sofia.collector_runs)."""
+    if not DB_URL or not collector_ids:
+        return {}
+    try:
+        conn = psycopg2.connect(DB_URL)
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT collector_name,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms)
+            FROM (
+                SELECT collector_name, duration_ms,
+                       ROW_NUMBER() OVER (PARTITION BY collector_name ORDER BY started_at DESC) AS rn
+                FROM sofia.collector_runs
+                WHERE collector_name = ANY(%s)
+                  AND duration_ms IS NOT NULL
+                  AND started_at > NOW() - make_interval(days => %s)
+            ) r
+            WHERE rn <= %s
+            GROUP BY collector_name
+        """, (list(collector_ids), lookback_days, last_n))
+        costs = {name: float(ms) for name, ms in cur.fetchall()}
+        cur.close()
+        conn.close()
+        return costs
+    except Exception as e:
+        print(f"[daily_pipeline] ⚠️ Cost hints unavailable ({e}), using timeouts")
+        return {}
+
 
-    # Executar com ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
-        future_to_cid = {
-            executor.submit(execute_collector, c["collector_id"], c, trace): c["collector_id"]
-            for c in collectors_config
+def _mem_available_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 4096
+
+
+class ResourceQueue:
+    """
+    Fila global de collectors: longest-job-first, com cap de concorrência por
+    host e orçamento global de CPU/memória. Jobs bloqueados (host ocupado ou
+    sem recurso) não seguram a fila - o próximo que couber é iniciado.
+    """
+
+    def __init__(self, hints, costs):
+        budget = hints.get("budget") or {}
+        self.defaults = {"cpu": 0.25, "mem_mb": 256, "host_cap": 1, **(hints.get("defaults") or {})}
+        self.host_caps = hints.get("host_caps") or {}
+        self.collector_hints = hints.get("collectors") or {}
+        self.costs = costs
+        self.cpu_budget = float(os.getenv("PIPELINE_CPU_BUDGET") or budget.get("cpu") or os.cpu_count() or 2)
+        self.mem_budget = int(os.getenv("PIPELINE_MEM_BUDGET_MB") or budget.get("mem_mb") or _mem_available_mb() * 0.7)
+        self.max_workers = int(os.getenv("PIPELINE_MAX_WORKERS") or budget.get("max_workers") or 8)
+        self.cpu_used = 0.0
+        self.mem_used = 0
+        self.host_running = {}
+
+    def job(self, c, group_name):
+        cid = c["collector_id"]
+        h = self.collector_hints.get(cid, {})
+        # Sem histórico: metade do timeout (conservador, agenda cedo)
+        cost_ms = self.costs.get(cid, c.get("timeout_s", 300) * 1000 / 2)
+        return {
+            "collector_id": cid, "config": c, "group": group_name,
+            "host": h.get("host", cid),
+            "cpu": float(h.get("cpu", self.defaults["cpu"])),
+            "mem_mb": int(h.get("mem_mb", self.defaults["mem_mb"])),
+            "cost_ms": cost_ms, "cost_source": "history" if cid in self.costs else "timeout",
         }
 
-        for future in as_completed(future_to_cid):
-            cid = future_to_cid[future]
-            try:
-                result = future.result()
-                results.append(result)
-
-                if result["ok"]:
-                    print(f"  ✅ {cid}: saved={result['saved']}, fetched={result['fetched']} ({result['duration_ms']}ms)")
-                else:
-                    print(f"  ❌ {cid}: {result.get('error_code', 'UNKNOWN')}")
-            except Exception as e:
-                print(f"  ❌ {cid}: Exception: {e}")
-                results.append({
-                    "collector_id": cid,
-                    "ok": False,
-                    "error_code": "UNKNOWN_ERROR",
-                    "exception": str(e)
-                })
+    def fits(self, job, running_count):
+        if running_count >= self.max_workers:
+            return False
+        if self.host_running.get(job["host"], 0) >= self.host_caps.get(job["host"], self.defaults["host_cap"]):
+            return False
+        if running_count == 0:
+            return True  # um job maior que o orçamento ainda roda, sozinho
+        return (self.cpu_used + job["cpu"] <= self.cpu_budget
+                and self.mem_used + job["mem_mb"] <= self.mem_budget)
+
+    def acquire(self, job):
+        self.cpu_used += job["cpu"]
+        self.mem_used += job["mem_mb"]
+        self.host_running[job["host"]] = self.host_running.get(job["host"], 0) + 1
+
+    def release(self, job):
+        self.cpu_used -= job["cpu"]
+        self.mem_used -= job["mem_mb"]
+        self.host_running[job["host"]] -= 1
+
+    def run(self, jobs, trace):
+        """Executa todos os jobs; retorna resultados na ordem de término."""
+        pending = sorted(jobs, key=lambda j: -j["cost_ms"])
+        results = []
+        if not pending:
+            return results
+
+        est_serial = sum(j["cost_ms"] for j in pending) / 1000
+        est_longest = pending[0]["cost_ms"] / 1000
+        print(f"[daily_pipeline] Queue: {len(pending)} collectors, budget cpu={self.cpu_budget:g} "
+              f"mem={self.mem_budget}MB workers={self.max_workers}")
+        print(f"  Estimated: serial={est_serial:.0f}s, longest={pending[0]['collector_id']} ({est_longest:.0f}s)")
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for job in list(pending):
+                    if self.fits(job, len(running)):
+                        pending.remove(job)
+                        self.acquire(job)
+                        print(f"  ▶ {job['collector_id']} [{job['group']}] host={job['host']} "
+                              f"est={job['cost_ms'] / 1000:.0f}s ({job['cost_source']})")
+                        future = executor.submit(execute_collector, job["collector_id"], job["config"], trace)
+                        running[future] = job
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    self.release(job)
+                    cid = job["collector_id"]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {
+                            "collector_id": cid,
+                            "ok": False,
+                            "error_code": "UNKNOWN_ERROR",
+                            "exception": str(e)
+                        }
+                    result["group"] = job["group"]
+                    results.append(result)
+
+                    if result["ok"]:
+                        print(f"  ✅ {cid}: saved={result['saved']}, fetched={result['fetched']} ({result['duration_ms']}ms)")
+                    elif "exception" in result:
+                        print(f"  ❌ {cid}: Exception: {result['exception']}")
+                    else:
+                        print(f"  ❌ {cid}: {result.get('error_code', 'UNKNOWN')}")
 
-    return results
+        return results
 
 
 def main():
     trace = str(uuid.uuid4())
     print(f"[daily_pipeline] Starting pipeline v2 (trace={trace})")
 
+    # Imports + warmup de todas as skills antes das threads (sem pico no 1º collect.run)
+    preload_errors = preload()
+    for skill, err in preload_errors.items():
+        print(f"[daily_pipeline] ⚠️ preload {skill}: {err}")
+
     # 1. Ler config com grupos
     config_path = Path(__file__).resolve().parents[1] / "config" / "daily_expected_collectors.json"
 
@@ -134,23 +271,14 @@ def main():
             "required": [{"collector_id": c, "required": True, "timeout_s": 300} for c in collectors_list]
         }
 
-    # 2. Executar grupo REQUIRED primeiro (sequencial, com retry)
+    # 2. Budget guard do GA4 (antes de enfileirar)
     print(f"\n[daily_pipeline] ========================================")
-    print(f"[daily_pipeline] PHASE 1: Required collectors")
+    print(f"[daily_pipeline] PHASE 1: Collectors (global queue: required, ga4, best-effort)")
     print(f"[daily_pipeline] ========================================")
 
-    required_results = []
-    if "required" in groups:
-        required_results = execute_batch(groups["required"], "required", trace, max_parallel=1)
-
-    # 3. Executar grupo GA4 (com budget.guard)
-    print(f"\n[daily_pipeline] ========================================")
-    print(f"[daily_pipeline] PHASE 2: GA4 collectors (with budget control)")
-    print(f"[daily_pipeline] ========================================")
-
-    ga4_results = []
-    if "ga4" in groups and groups["ga4"]:
-        # Budget guard antes de GA4
+    skipped_results = []
+    queued_groups = [g for g in COLLECTOR_GROUPS if groups.get(g)]
+    if "ga4" in queued_groups:
         print(f"[daily_pipeline] Running budget.guard...")
         budget_result = run("budget.guard", {
             "action": "check",
@@ -159,31 +287,28 @@ def main():
         }, trace_id=trace)
 
         if budget_result["ok"] and budget_result["data"].get("allowed", False):
-            print(f"  ✅ Budget OK, proceeding with GA4")
-            ga4_results = execute_batch(groups["ga4"], "ga4", trace, max_parallel=2)
+            print(f"  ✅ Budget OK, queueing GA4")
         else:
             print(f"  ❌ Budget exceeded, skipping GA4")
+            queued_groups.remove("ga4")
             for ga4_collector in groups["ga4"]:
-                ga4_results.append({
+                skipped_results.append({
                     "collector_id": ga4_collector["collector_id"],
                     "ok": False,
                     "error_code": "BUDGET_EXCEEDED",
                     "skipped": True
                 })
 
-    # 4. Executar demais grupos (paralelo, best-effort)
-    print(f"\n[daily_pipeline] ========================================")
-    print(f"[daily_pipeline] PHASE 3: Other collectors (best-effort)")
-    print(f"[daily_pipeline] ========================================")
+    # 3. Fila única: longest-job-first + caps por host + orçamento CPU/mem
+    queued = [(c, g) for g in queued_groups for c in groups[g]]
+    queue = ResourceQueue(load_resource_hints(), load_cost_hints({c["collector_id"] for c, _ in queued}))
+    jobs = [queue.job(c, g) for c, g in queued]
 
-    other_results = []
-    for group_name in ["tech", "research", "jobs", "patents", "other"]:
-        if group_name in groups and groups[group_name]:
-            batch_results = execute_batch(groups[group_name], group_name, trace, max_parallel=3)
-            other_results.extend(batch_results)
+    phase_start = time.time()
+    all_results = queue.run(jobs, trace) + skipped_results
+    print(f"[daily_pipeline] Collectors finished in {time.time() - phase_start:.0f}s")
 
-    # 5. Consolidar resultados
-    all_results = required_results + ga4_results + other_results
+    # 4. Consolidar resultados
     succeeded = [r for r in all_results if r["ok"]]
     failed = [r for r in all_results if not r["ok"]]
 
@@ -286,6 +411,11 @@ def main():
 
     print(f"[daily_pipeline] Audit summary: {json.dumps(summary)}")
     print(f"[daily_pipeline] Healthy (required only): {healthy}")
+    pool = get_pool().snapshot()
+    print(f"[daily_pipeline] DB pool: {pool['connects']} connects / {pool['acquired']} acquires, "
+          f"wait avg {pool['wait_ms_avg']}ms max {pool['wait_ms_max']:.1f}ms; "
+          f"run_state: {get_run_state().stats['rows_written']} rows in {get_run_state().stats['flushes']} flushes")
+    get_registry().report()
 
     # 9. Log resultado
     if not healthy:
@@ -471,6 +471,20 @@ Não rodaram: {len(missing)}
     return report
 
 
+def format_source_health(max_age_s=86400):
+    """Seção de saúde das fontes a partir do último snapshot em sofia.source_health (sem rescan)."""
+    from lib.db_pool import get_pool
+    from lib.source_health import format_table, load_cached
+
+    try:
+        snap = load_cached(get_pool(), max_age_s=max_age_s)
+    except Exception as e:
+        return f"\n8️⃣ SAÚDE DAS FONTES\n\nIndisponível: {e}\n"
+    if snap is None:
+        return "\n8️⃣ SAÚDE DAS FONTES\n\nNenhum snapshot nas últimas 24h (rode build-cross-signals ou python3 -m lib.source_health).\n"
+    return f"\n8️⃣ SAÚDE DAS FONTES\n\n{format_table(snap)}\n"
+
+
 def format_report_whatsapp(execution, summary, gate_status, observations, expected_set):
     """Gera versão WhatsApp-friendly (curta)."""
     if not execution:
@@ -584,6 +598,7 @@ def main():
 
         exec_report = format_report_executive(execution, summary, gate_status, observations, expected_set)
         tech_report = format_report_technical(execution, expected_set, succeeded, empty, failed, missing, gate_status, observations)
+        tech_report += format_source_health()
         wpp_report = format_report_whatsapp(execution, summary, gate_status, observations, expected_set)
 
     # Criar diretório de output
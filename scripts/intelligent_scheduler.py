@@ -10,37 +10,86 @@ Beyond simple cron jobs, this scheduler provides:
   - Fallbacks (B3 error → use yesterday's data)
   - Dependency management (collector down 48h → pause dependents)
   - Priority queuing (critical > normal > low)
-  - Circuit breakers (repeated failures → disable temporarily)
+  - Circuit breakers (repeated failures → disable temporarily, state in DB)
   - Health checks (auto-resume when service recovers)
+  - Event loop: priority queue keyed by next_run + N concurrent slots;
+    retries are re-enqueued with a future due time (never sleep inline),
+    so one flaky API can't push critical collectors past their window
 
 Usage:
   from intelligent_scheduler import IntelligentScheduler
 
   scheduler = IntelligentScheduler()
-  scheduler.schedule_collector('github_trending', priority='high', retry_max=3)
-  scheduler.run()
+  scheduler.register_collector('github', 'npx tsx scripts/collect.ts github',
+                               priority='high', retry_max=3, schedule_cron='0 10,14,18 * * 1-5')
+  scheduler.run_once(slots=4)     # due tasks only; queue depth / slot utilization / lateness at the end
+  scheduler.run()                 # long-lived: cron slots + catch-up + jitter (replaces crontab)
+
+CLI:
+  python3 scripts/intelligent_scheduler.py --register-all --schedule   # next due per task
+  python3 scripts/intelligent_scheduler.py --register-all --run        # single long-running process
 
 ================================================================================
 """
 
+import heapq
+import itertools
+import json
 import os
 import signal
 import subprocess
 import sys
-import time
+import threading
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import Dict, List, Optional
 
 import psycopg2
+import psycopg2.errors
 import requests
 from dotenv import load_dotenv
 from psycopg2.extras import RealDictCursor
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lib.cron import CronExpression
+from lib.helpers import SOFIA_LOG_DIR
+from lib.metrics_channel import MetricsChannel, format_event
+from lib.process_supervisor import LineProgress, supervise
+
 # Load environment variables
 load_dotenv()
 
+CATCHUP_POLICIES = ("coalesce", "skip")
+
+# Cron slots for register_all_collectors (server local time, same slots as the
+# old crontab in scripts/automation/install-crontab-by-frequency.sh)
+COLLECTOR_SCHEDULES = {
+    "hackernews": "0 8,11,14,17,20 * * 1-5",
+    "reddit": "10 8,11,14,17,20 * * 1-5",
+    "npm": "20 8,11,14,17,20 * * 1-5",
+    "pypi": "30 8,11,14,17,20 * * 1-5",
+    "github": "0 10,14,18 * * 1-5",
+    "stackoverflow": "40 8 * * 1-5",
+    "producthunt": "0 9,15 * * 1-5",
+    "mdic-regional": "15 10 * * 1-5",
+    "fiesp-data": "0 11 * * 1-5",
+    "ai-companies": "20 11 * * 1-5",
+    "yc-companies": "0 12 * * 1-5",
+    "world_bank": "0 13 * * 1",
+    "eurostat": "5 13 * * 1",
+    "fred": "10 13 * * 1",
+    "ilo": "15 13 * * 1",
+    "brazil_ibge": "20 13 * * 1",
+    "brazil_security": "25 13 * * 1",
+    "universities": "45 13 * * 1",
+    "ngos": "20 14 1-7 * 1",
+}
+IDLE_TICK_SEC = 60  # max idle sleep (stats report / stop checks)
+SCHEDULER_LOG_DIR = os.path.join(SOFIA_LOG_DIR, "scheduler")  # <collector>/<run_id>.out|.err
+
 
 class Priority(Enum):
     """Task priority levels."""
@@ -110,6 +159,48 @@ class CollectorTask:
     status: CollectorStatus = CollectorStatus.HEALTHY
     consecutive_failures: int = 0
     circuit_opened_at: Optional[datetime] = None
+    attempt: int = 0  # failed attempts in the current cycle (retries re-enqueued)
+    catchup: Optional[str] = None  # per-task override of the scheduler catch-up policy
+    cron: Optional[CronExpression] = field(default=None, repr=False)
+    fire_at: Optional[datetime] = None  # cron slot served by the queued run
+    last_fire_at: Optional[datetime] = None  # last cron slot served (ok or failed)
+
+
+@dataclass
+class SchedulerStats:
+    """Queue depth, slot utilization and lateness for one scheduling cycle."""
+
+    slots: int
+    started_at: datetime = field(default_factory=datetime.now)
+    busy_sec: float = 0.0
+    max_queue_depth: int = 0
+    queue_depth_sum: int = 0
+    queue_depth_samples: int = 0
+    lateness_sec: Dict[str, float] = field(default_factory=dict)  # worst start delay per task
+    outcomes: Dict[str, str] = field(default_factory=dict)
+
+    def sample_queue(self, depth: int):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self.queue_depth_sum += depth
+        self.queue_depth_samples += 1
+
+    def record_start(self, name: str, due: datetime, started: datetime):
+        late = max(0.0, (started - due).total_seconds())
+        self.lateness_sec[name] = max(late, self.lateness_sec.get(name, 0.0))
+
+    def utilization(self) -> float:
+        wall = (datetime.now() - self.started_at).total_seconds()
+        return self.busy_sec / (self.slots * wall) if wall > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "slots": self.slots,
+            "slot_utilization": round(self.utilization(), 3),
+            "queue_depth_max": self.max_queue_depth,
+            "queue_depth_avg": round(self.queue_depth_sum / max(1, self.queue_depth_samples), 2),
+            "lateness_sec": {k: round(v, 1) for k, v in self.lateness_sec.items()},
+            "outcomes": dict(self.outcomes),
+        }
 
 
 class IntelligentScheduler:
@@ -118,7 +209,7 @@ class IntelligentScheduler:
     Handles retries, rate limiting, fallbacks, and dependencies.
     """
 
-    def __init__(self):
+    def __init__(self, slots: Optional[int] = None):
         """Initialize scheduler."""
         self.conn = psycopg2.connect(
             host=os.getenv("POSTGRES_HOST", "localhost"),
@@ -127,12 +218,27 @@ class IntelligentScheduler:
             database=os.getenv("POSTGRES_DB", "sofia_db"),
         )
         self.cur = self.conn.cursor(cursor_factory=RealDictCursor)
+        # Slots share the connection; the cursor is not thread-safe
+        self._db_lock = threading.RLock()
 
         # Task registry
         self.tasks: Dict[str, CollectorTask] = {}
 
-        # Priority queue (will be sorted by priority + next_run)
-        self.queue: List[CollectorTask] = []
+        # Priority queue: heap of (next_run, priority, seq, collector_name)
+        self.queue: List[tuple] = []
+        self._queued: set = set()
+        self._seq = itertools.count()
+
+        # Concurrent execution slots
+        self.slots = slots or int(os.getenv("SCHEDULER_SLOTS", "4"))
+        self.last_stats: Optional[SchedulerStats] = None
+
+        # Schedule engine: catch-up of missed cron slots + start jitter
+        self.catchup_policy = os.getenv("SCHEDULER_CATCHUP", "coalesce")
+        self.catchup_window = timedelta(hours=float(os.getenv("SCHEDULER_CATCHUP_WINDOW_H", "24")))
+        self.misfire_grace = timedelta(seconds=int(os.getenv("SCHEDULER_MISFIRE_GRACE_SEC", "300")))
+        self.jitter_sec = int(os.getenv("SCHEDULER_JITTER_SEC", "90"))
+        self._stop = threading.Event()
 
         # Running flag
         self.running = False
@@ -144,6 +250,7 @@ class IntelligentScheduler:
 
         print("✅ IntelligentScheduler initialized")
         print(f"   Database: {os.getenv('POSTGRES_DB', 'sofia_db')}")
+        print(f"   Slots: {self.slots} | Catch-up: {self.catchup_policy} | Jitter: {self.jitter_sec}s")
         print(f"   WhatsApp alerts: {self.whatsapp_enabled}")
 
     # ========================================================================
@@ -160,6 +267,7 @@ class IntelligentScheduler:
         fallback_enabled: bool = True,
         dependencies: Optional[List[str]] = None,
         schedule_cron: Optional[str] = None,
+        catchup: Optional[str] = None,
     ):
         """
         Register a collector with the scheduler.
@@ -172,8 +280,11 @@ class IntelligentScheduler:
           retry_delay_sec: Initial retry delay
           fallback_enabled: Enable fallback to cached data
           dependencies: List of collector names this depends on
-          schedule_cron: Cron expression (optional)
+          schedule_cron: Cron expression (optional - without it the task runs every cycle)
+          catchup: 'coalesce' or 'skip' for missed slots (default: SCHEDULER_CATCHUP)
         """
+        if catchup is not None and catchup not in CATCHUP_POLICIES:
+            raise ValueError(f"catchup must be one of {CATCHUP_POLICIES}: {catchup!r}")
         priority_enum = {
             "critical": Priority.CRITICAL,
             "high": Priority.HIGH,
@@ -189,10 +300,13 @@ class IntelligentScheduler:
             fallback_policy=FallbackPolicy(enabled=fallback_enabled),
             dependencies=dependencies or [],
             schedule_cron=schedule_cron,
+            catchup=catchup,
+            cron=CronExpression(schedule_cron) if schedule_cron else None,
         )
 
         self.tasks[collector_name] = task
-        print(f"📝 Registered collector: {collector_name} (priority: {priority})")
+        print(f"📝 Registered collector: {collector_name} (priority: {priority}"
+              f"{', cron: ' + schedule_cron if schedule_cron else ''})")
 
     def register_all_collectors(self):
         """Register all Sofia Pulse collectors with recommended configs."""
@@ -314,7 +428,12 @@ class IntelligentScheduler:
             "producthunt", "npx tsx scripts/collect.ts producthunt", priority="high", retry_max=3, retry_delay_sec=900
         )
 
-        print(f"\n✅ Registered {len(self.tasks)} collectors")
+        for name, cron in COLLECTOR_SCHEDULES.items():
+            if name in self.tasks:
+                self.tasks[name].schedule_cron = cron
+                self.tasks[name].cron = CronExpression(cron)
+
+        print(f"\n✅ Registered {len(self.tasks)} collectors ({len(COLLECTOR_SCHEDULES)} with cron slots)")
 
     # ========================================================================
     # TASK EXECUTION
@@ -345,25 +464,39 @@ class IntelligentScheduler:
             else:
                 cmd = task.script_path.split()
 
-            # Execute script
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)  # 1 hour timeout
+            # Execute script — stdout/stderr em streaming para logs rotacionados
+            # (nunca em RAM), métricas pelo canal tipado
+            log_prefix = os.path.join(SCHEDULER_LOG_DIR, task.collector_name, str(run_id))
+            with MetricsChannel(on_event=self._live_progress(task)) as channel:
+                result = supervise(
+                    cmd, timeout=3600,  # 1 hour timeout
+                    env={**os.environ, **channel.env}, pass_fds=channel.pass_fds,
+                    log_prefix=log_prefix, tail_bytes=4000,
+                    on_line=LineProgress(self._live_progress(task), min_interval_s=30),
+                )
+            if result.timed_out:
+                raise subprocess.TimeoutExpired(cmd, 3600)
+            stderr_tail = result.stderr_tail[-2000:]
 
             success = result.returncode == 0
+            streamed = channel.snapshot()
 
-            # Complete run
+            # Complete run (sucesso: resumo das métricas; falha: fim do stderr)
+            summary = {"counters": streamed["counters"], "phases_ms": streamed["phases_ms"]}
             self.complete_collector_run(
-                run_id, "success" if success else "failed", result.stdout if success else result.stderr
+                run_id, "success" if success else "failed",
+                json.dumps(summary) if success else stderr_tail
             )
 
             if success:
-                print(f"✅ SUCCESS: {task.collector_name}")
+                print(f"✅ SUCCESS: {task.collector_name} {summary['counters'] or ''}")
                 task.consecutive_failures = 0
                 task.status = CollectorStatus.HEALTHY
                 task.last_run = datetime.now()
                 return True
             else:
                 print(f"❌ FAILED: {task.collector_name}")
-                print(f"   Error: {result.stderr[:200]}")
+                print(f"   Error: {stderr_tail[-200:]}")
                 task.consecutive_failures += 1
                 return False
 
@@ -380,31 +513,21 @@ class IntelligentScheduler:
             task.consecutive_failures += 1
             return False
 
-    def retry_with_backoff(self, task: CollectorTask) -> bool:
-        """
-        Retry task with exponential backoff.
+    @staticmethod
+    def _live_progress(task: CollectorTask):
+        def on_event(event):
+            if event.get("type") in ("progress", "phase"):
+                print(f"   📈 {task.collector_name}: {format_event(event)}", flush=True)
+        return on_event
 
-        Returns:
-          True if eventually successful, False if all retries exhausted
+    def retry_delay(self, task: CollectorTask) -> float:
         """
-        attempts = 0
-        delay = task.retry_policy.initial_delay_sec
-
-        while attempts < task.retry_policy.max_attempts:
-            attempts += 1
-            print(f"\n🔄 RETRY {attempts}/{task.retry_policy.max_attempts}: {task.collector_name}")
-            print(f"   Waiting {delay}s before retry...")
-            time.sleep(delay)
-
-            success = self.execute_collector(task)
-            if success:
-                return True
-
-            # Exponential backoff
-            delay = min(delay * task.retry_policy.backoff_multiplier, task.retry_policy.max_delay_sec)
-
-        print(f"❌ All retries exhausted for {task.collector_name}")
-        return False
+        Exponential backoff for the task's next retry (seconds).
+        The retry is re-enqueued with this due time - the slot is freed meanwhile.
+        """
+        policy = task.retry_policy
+        delay = policy.initial_delay_sec * policy.backoff_multiplier ** max(0, task.attempt - 1)
+        return min(delay, policy.max_delay_sec)
 
     def handle_fallback(self, task: CollectorTask):
         """
@@ -422,20 +545,21 @@ class IntelligentScheduler:
         print(f"\n🔄 FALLBACK: {task.collector_name}")
 
         # Check for recent successful run
-        self.cur.execute(
-            """
-            SELECT completed_at, records_processed
-            FROM sofia.collector_runs
-            WHERE collector_name = %s
-              AND status = 'success'
-              AND completed_at >= NOW() - INTERVAL '%s hours'
-            ORDER BY completed_at DESC
-            LIMIT 1
-        """,
-            (task.collector_name, task.fallback_policy.cache_max_age_hours),
-        )
-
-        result = self.cur.fetchone()
+        with self._db_lock:
+            self.cur.execute(
+                """
+                SELECT completed_at, records_processed
+                FROM sofia.collector_runs
+                WHERE collector_name = %s
+                  AND status = 'success'
+                  AND completed_at >= NOW() - INTERVAL '%s hours'
+                ORDER BY completed_at DESC
+                LIMIT 1
+            """,
+                (task.collector_name, task.fallback_policy.cache_max_age_hours),
+            )
+            result = self.cur.fetchone()
+            self.conn.commit()
 
         if result:
             print(f"✅ Using cached data from {result['completed_at']}")
@@ -513,88 +637,331 @@ class IntelligentScheduler:
 
         return True
 
+    def enqueue(self, task: CollectorTask, due: datetime):
+        """Push task onto the priority queue (ordered by due time, then priority)."""
+        task.next_run = due
+        heapq.heappush(self.queue, (due, task.priority.value, next(self._seq), task.collector_name))
+        self._queued.add(task.collector_name)
+
+    # ========================================================================
+    # SCHEDULE ENGINE (cron + catch-up + jitter)
+    # ========================================================================
+
+    def _jitter(self, task: CollectorTask) -> timedelta:
+        """Stable per-collector offset in [0, jitter_sec] - spreads same-minute crons across the DB."""
+        if not self.jitter_sec:
+            return timedelta(0)
+        return timedelta(seconds=zlib.crc32(task.collector_name.encode()) % (self.jitter_sec + 1))
+
+    def plan_next(self, task: CollectorTask, now: datetime) -> datetime:
+        """
+        Due time of the task's next run; sets task.fire_at (the cron slot it serves).
+
+        No cron → due now. Missed slots since last_fire_at (downtime) are
+        coalesced into ONE run according to the catch-up policy:
+          coalesce - catch up if the latest missed slot is within catchup_window_h
+          skip     - catch up only if it's within misfire_grace_sec (slow restart)
+        Older misses (and first-ever runs outside the grace) wait for the next slot.
+        """
+        if task.cron is None:
+            task.fire_at = None
+            return now
+
+        prev = task.cron.prev_before(now)
+        last = task.last_fire_at or task.last_run
+        if last is None or prev > last:
+            policy = task.catchup or self.catchup_policy
+            window = self.catchup_window if policy == "coalesce" and last is not None else self.misfire_grace
+            if now - prev <= window:
+                task.fire_at = prev
+                # Jitter also on catch-up: after downtime every missed task is due at once
+                return now + self._jitter(task)
+
+        task.fire_at = task.cron.next_after(now)
+        return task.fire_at + self._jitter(task)
+
+    def schedule_report(self, now: Optional[datetime] = None) -> List[dict]:
+        """Next due time per task (after loading persisted state)."""
+        now = now or datetime.now()
+        rows = []
+        for task in self.tasks.values():
+            due = self.plan_next(task, now)
+            rows.append({"collector": task.collector_name, "cron": task.schedule_cron,
+                         "last_fire_at": task.last_fire_at, "fire_at": task.fire_at, "due": due,
+                         "catch_up": task.fire_at is not None and task.fire_at <= now})
+        return sorted(rows, key=lambda r: r["due"])
+
     # ========================================================================
     # SCHEDULER LOOP
     # ========================================================================
 
-    def run_once(self, max_runtime_minutes: int = 60):
+    def _deps_in_flight(self, task: CollectorTask, due: datetime, held_names: set) -> bool:
         """
-        Run all pending tasks once.
+        Hold the dependent while a dependency is running/held, retrying, or queued
+        at or before the dependent's due time. In run() every task is always
+        queued for its next slot - a dependency due later doesn't count.
+        """
+        for dep in task.dependencies:
+            dep_task = self.tasks.get(dep)
+            if dep in held_names:
+                return True
+            if dep_task is not None and dep in self._queued and (
+                    dep_task.attempt > 0 or (dep_task.next_run is not None and dep_task.next_run <= due)):
+                return True
+        return False
 
-        Args:
-            max_runtime_minutes: Maximum runtime in minutes (default: 60)
+    def _finish(self, task: CollectorTask, success: bool, now: datetime, retry_cutoff: Optional[datetime],
+                stats: SchedulerStats) -> bool:
         """
-        start_time = datetime.now()
-        max_runtime = timedelta(minutes=max_runtime_minutes)
+        Book-keeping after an attempt: re-enqueue a retry (future due time) or fall back.
+        Returns True when the task's cycle is over (success or retries exhausted).
+        """
+        if success:
+            task.attempt = 0
+            task.circuit_opened_at = None
+            stats.outcomes[task.collector_name] = "ok"
+            return True
 
-        print("\n" + "=" * 80)
-        print("🚀 RUNNING SCHEDULED TASKS")
-        print(f"   Max Runtime: {max_runtime_minutes} minutes")
-        print("=" * 80)
+        task.attempt += 1
+        if task.status == CollectorStatus.CIRCUIT_OPEN:
+            # Half-open probe failed: restart the recovery window
+            task.circuit_opened_at = now
+        due = now + timedelta(seconds=self.retry_delay(task))
+        can_retry = (
+            task.attempt <= task.retry_policy.max_attempts
+            and task.status != CollectorStatus.CIRCUIT_OPEN
+            and (retry_cutoff is None or due < retry_cutoff)  # only retry while 20% of the window is left
+        )
+        if can_retry:
+            print(f"🔄 RETRY {task.attempt}/{task.retry_policy.max_attempts}: {task.collector_name} "
+                  f"re-enqueued for {due:%H:%M:%S}")
+            self.enqueue(task, due)
+            stats.outcomes[task.collector_name] = "retrying"
+            return False
 
-        # Sort tasks by priority
-        tasks = sorted(self.tasks.values(), key=lambda t: (t.priority.value, t.next_run or datetime.min))
+        if task.attempt > task.retry_policy.max_attempts:
+            print(f"❌ All retries exhausted for {task.collector_name}")
+        task.attempt = 0
+        stats.outcomes[task.collector_name] = "failed"
+        self.handle_fallback(task)
+        return True
 
-        for task in tasks:
-            # Check if we've exceeded max runtime
-            elapsed = datetime.now() - start_time
-            if elapsed > max_runtime:
-                print(f"\n⏰ Max runtime ({max_runtime_minutes}min) exceeded. Stopping.")
-                break
+    def _end_cycle(self, task: CollectorTask, now: datetime, reschedule):
+        """The cron slot is served (ok, failed or blocked): persist and, in loop mode, plan the next one."""
+        if task.fire_at is not None:
+            task.last_fire_at = task.fire_at
+        if reschedule is not None:
+            self.enqueue(task, reschedule(task, now))
+        self.save_circuit_state(task)
 
-            # Check circuit breaker
-            if not self.check_circuit_breaker(task):
+    def _event_loop(self, pool, slots: int, stats: SchedulerStats, deadline: Optional[datetime] = None,
+                    retry_cutoff: Optional[datetime] = None, reschedule=None, on_tick=None):
+        """
+        Pop due tasks from the queue into free slots until the queue drains
+        (run_once), the deadline passes, or stop() is called (run).
+        """
+        running = {}  # future -> (task, started_at)
+        waiting: List[CollectorTask] = []  # held back by a dependency in flight
+
+        while True:
+            if on_tick is not None:
+                on_tick()
+            now = datetime.now()
+            accepting = not self._stop.is_set() and (deadline is None or now < deadline)
+
+            # Fill free slots with due tasks
+            while accepting and self.queue and len(running) < slots and self.queue[0][0] <= now:
+                due, _, _, name = heapq.heappop(self.queue)
+                self._queued.discard(name)
+                task = self.tasks[name]
+                held = {t.collector_name for t, _ in running.values()} | {t.collector_name for t in waiting}
+                if self._deps_in_flight(task, due, held):
+                    waiting.append(task)
+                    continue
+                if not self.check_circuit_breaker(task) or not self.check_dependencies(task):
+                    stats.outcomes[name] = task.status.value
+                    self._end_cycle(task, now, reschedule)
+                    continue
+                stats.record_start(name, due, now)
+                running[pool.submit(self.execute_collector, task)] = (task, now)
+
+            stats.sample_queue(len(self.queue) + len(waiting))
+
+            if not running:
+                if waiting and not self.queue:
+                    # Dependencies left the queue without running (skipped) - release
+                    for task in waiting:
+                        self.enqueue(task, now)
+                    waiting = []
+                    continue
+                if not self.queue or not accepting:
+                    break
+                # Idle until the next task is due (stop() wakes us up)
+                idle = min((self.queue[0][0] - now).total_seconds(), IDLE_TICK_SEC)
+                if deadline is not None:
+                    idle = min(idle, (deadline - now).total_seconds())
+                self._stop.wait(max(0.0, idle))
                 continue
 
-            # Check dependencies
-            if not self.check_dependencies(task):
-                continue
+            timeout = None
+            if accepting and self.queue and len(running) < slots:
+                timeout = max(0.0, (self.queue[0][0] - now).total_seconds())
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            now = datetime.now()
+            for future in done:
+                task, started = running.pop(future)
+                stats.busy_sec += (now - started).total_seconds()
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print(f"💥 EXCEPTION: {task.collector_name}: {e}")
+                    success = False
+                if self._finish(task, success, now, retry_cutoff, stats):
+                    self._end_cycle(task, now, reschedule)
+                else:
+                    self.save_circuit_state(task)
+            if done and waiting:
+                for task in waiting:
+                    self.enqueue(task, now)
+                waiting = []
+
+        return sorted(self._queued | {t.collector_name for t in waiting})
+
+    def _print_stats(self, stats: SchedulerStats, title: str):
+        summary = stats.to_dict()
+        print("\n" + "=" * 80)
+        print(title)
+        print(f"   Runtime: {(datetime.now() - stats.started_at).total_seconds():.1f}s")
+        print(f"   Slot utilization: {summary['slot_utilization']:.0%} ({stats.slots} slots)")
+        print(f"   Queue depth: max {summary['queue_depth_max']}, avg {summary['queue_depth_avg']}")
+        late = sorted(summary["lateness_sec"].items(), key=lambda kv: -kv[1])
+        for name, seconds in late[:10]:
+            print(f"   {name:<20} {stats.outcomes.get(name, '-'):<12} late {seconds:>7.1f}s")
+        print("=" * 80)
+        return summary
 
-            # Execute with retry (but skip retry if we're running out of time)
-            success = self.execute_collector(task)
+    def run_once(self, max_runtime_minutes: int = 60, slots: Optional[int] = None) -> dict:
+        """
+        Run every DUE task once as an event loop.
 
-            if not success and (datetime.now() - start_time) < (max_runtime * 0.8):
-                # Only retry if we have 20% of time left
-                success = self.retry_with_backoff(task)
+        Tasks with a cron run only if a slot is due (or a missed one is caught
+        up per the catch-up policy); tasks without a cron always run. They come
+        off a priority queue keyed by next_run into `slots` concurrent workers.
+        A failed task is re-enqueued with its backoff as due time - the slot
+        goes to the next task instead of sleeping.
 
-            if not success:
-                # Handle fallback
-                self.handle_fallback(task)
+        Args:
+            max_runtime_minutes: No new task starts after this (running ones finish)
+            slots: Concurrent collectors (default: SCHEDULER_SLOTS / 4)
+
+        Returns:
+            Stats dict (slot utilization, queue depth, lateness per task, outcomes)
+        """
+        slots = slots or self.slots
+        start_time = datetime.now()
+        deadline = start_time + timedelta(minutes=max_runtime_minutes)
+        retry_cutoff = start_time + timedelta(minutes=max_runtime_minutes) * 0.8
+        stats = SchedulerStats(slots=slots, started_at=start_time)
 
         print("\n" + "=" * 80)
-        print("✅ SCHEDULED RUN COMPLETE")
-        print(f"   Runtime: {(datetime.now() - start_time).total_seconds():.1f}s")
+        print("🚀 RUNNING SCHEDULED TASKS")
+        print(f"   Max Runtime: {max_runtime_minutes} minutes | Slots: {slots}")
         print("=" * 80)
 
-    def run(self, interval_sec: int = 300):
+        self.load_circuit_state()
+        self.queue, self._queued = [], set()
+        not_due = []
+        for task in self.tasks.values():
+            task.attempt = 0
+            due = self.plan_next(task, start_time)
+            if task.fire_at is None or task.fire_at <= start_time:
+                self.enqueue(task, due)
+            else:
+                not_due.append(task.collector_name)
+        if not_due:
+            print(f"   Not due: {len(not_due)} ({', '.join(sorted(not_due)[:10])}{'...' if len(not_due) > 10 else ''})")
+
+        with ThreadPoolExecutor(max_workers=slots, thread_name_prefix="collector") as pool:
+            skipped = self._event_loop(pool, slots, stats, deadline=deadline, retry_cutoff=retry_cutoff)
+
+        for name in skipped:
+            stats.outcomes[name] = "skipped"
+        if skipped:
+            print(f"\n⏰ Max runtime ({max_runtime_minutes}min) exceeded. Skipped: {', '.join(skipped)}")
+        self.queue, self._queued = [], set()
+        self.last_stats = stats
+        return self._print_stats(stats, "✅ SCHEDULED RUN COMPLETE")
+
+    def stop(self):
+        """Stop accepting tasks; running collectors finish, then run() returns."""
+        self.running = False
+        self._stop.set()
+
+    def run(self, interval_sec: int = 300, report_every_sec: int = 3600):
         """
-        Run scheduler loop.
+        Long-running scheduler (replaces the crontab scripts in scripts/automation/).
+
+        Every task is queued at its next cron slot (missed slots caught up per
+        the catch-up policy, start times jittered); after each cycle it is
+        re-planned. Tasks without a cron re-run every interval_sec.
 
         Args:
-          interval_sec: Seconds between runs (default: 5 minutes)
+          interval_sec: Period for tasks without schedule_cron (default: 5 minutes)
+          report_every_sec: Print slot/queue/lateness stats this often
         """
         self.running = True
+        self._stop.clear()
 
-        # Handle Ctrl+C gracefully
+        # Ctrl+C / SIGTERM: graceful stop (running collectors finish); second signal exits
         def signal_handler(sig, frame):
-            print("\n🛑 Shutting down scheduler...")
-            self.running = False
-            sys.exit(0)
+            if self._stop.is_set():
+                sys.exit(1)
+            print("\n🛑 Shutting down scheduler (waiting for running collectors)...")
+            self.stop()
 
         signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+
+        now = datetime.now()
+        self.load_circuit_state()
+        self.queue, self._queued = [], set()
+        for task in self.tasks.values():
+            task.attempt = 0
+            self.enqueue(task, self.plan_next(task, now))
 
         print("\n" + "=" * 80)
         print("🚀 INTELLIGENT SCHEDULER STARTED")
         print("=" * 80)
-        print(f"   Interval: {interval_sec}s")
-        print(f"   Tasks: {len(self.tasks)}")
+        print(f"   Tasks: {len(self.tasks)} | Slots: {self.slots} | Catch-up: {self.catchup_policy} "
+              f"| Jitter: {self.jitter_sec}s | Interval (no cron): {interval_sec}s")
+        for due, _, _, name in sorted(self.queue)[:10]:
+            print(f"   next {name:<20} {due:%Y-%m-%d %H:%M:%S}")
         print("   Press Ctrl+C to stop")
         print("=" * 80)
 
-        while self.running:
-            self.run_once()
-            print(f"\n⏰ Next run in {interval_sec}s...")
-            time.sleep(interval_sec)
+        def reschedule(task, now):
+            if task.cron is None:
+                return now + timedelta(seconds=interval_sec)
+            return self.plan_next(task, now)
+
+        stats = SchedulerStats(slots=self.slots)
+
+        def report():
+            nonlocal stats
+            if (datetime.now() - stats.started_at).total_seconds() >= report_every_sec:
+                self._print_stats(stats, "📊 SCHEDULER STATS")
+                stats = SchedulerStats(slots=self.slots)
+
+        if not self.tasks:
+            print("⚠️ No tasks registered (use --register-all)")
+            return
+
+        with ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix="collector") as pool:
+            self._event_loop(pool, self.slots, stats, reschedule=reschedule, on_tick=report)
+
+        self.last_stats = stats
+        self._print_stats(stats, "🛑 SCHEDULER STOPPED")
 
     # ========================================================================
     # DATABASE HELPERS
@@ -602,30 +969,87 @@ class IntelligentScheduler:
 
     def start_collector_run(self, collector_name: str) -> int:
         """Start tracking a collector run."""
-        self.cur.execute(
-            """
-            INSERT INTO sofia.collector_runs (collector_name, started_at, status)
-            VALUES (%s, NOW(), 'running')
-            RETURNING id
-        """,
-            (collector_name,),
-        )
-        self.conn.commit()
-        return self.cur.fetchone()["id"]
+        with self._db_lock:
+            self.cur.execute(
+                """
+                INSERT INTO sofia.collector_runs (collector_name, started_at, status)
+                VALUES (%s, NOW(), 'running')
+                RETURNING id
+            """,
+                (collector_name,),
+            )
+            run_id = self.cur.fetchone()["id"]
+            self.conn.commit()
+            return run_id
 
     def complete_collector_run(self, run_id: int, status: str, error_message: Optional[str] = None):
         """Complete a collector run."""
-        self.cur.execute(
-            """
-            UPDATE sofia.collector_runs
-            SET status = %s,
-                completed_at = NOW(),
-                error_message = %s
-            WHERE id = %s
-        """,
-            (status, error_message, run_id),
-        )
-        self.conn.commit()
+        with self._db_lock:
+            self.cur.execute(
+                """
+                UPDATE sofia.collector_runs
+                SET status = %s,
+                    completed_at = NOW(),
+                    error_message = %s
+                WHERE id = %s
+            """,
+                (status, error_message, run_id),
+            )
+            self.conn.commit()
+
+    def load_circuit_state(self):
+        """Restore breaker + schedule state (status, failure streak, opened_at, last run / cron slot) from the DB."""
+        with self._db_lock:
+            try:
+                self.cur.execute(
+                    """
+                    SELECT collector_name, status, consecutive_failures, circuit_opened_at, last_run, last_fire_at
+                    FROM sofia.scheduler_circuit_state
+                    WHERE collector_name = ANY(%s)
+                """,
+                    (list(self.tasks),),
+                )
+                rows = self.cur.fetchall()
+                self.conn.commit()
+            except psycopg2.errors.UndefinedTable:
+                self.conn.rollback()
+                print("⚠️ sofia.scheduler_circuit_state missing (migrations 108/109) - state is in-memory only")
+                return
+
+        for row in rows:
+            task = self.tasks[row["collector_name"]]
+            task.status = CollectorStatus(row["status"])
+            task.consecutive_failures = row["consecutive_failures"]
+            task.circuit_opened_at = row["circuit_opened_at"]
+            task.last_run = row["last_run"] or task.last_run
+            task.last_fire_at = row["last_fire_at"] or task.last_fire_at
+
+    def save_circuit_state(self, task: CollectorTask):
+        """Persist breaker + schedule state after every attempt (survives restarts)."""
+        with self._db_lock:
+            try:
+                self.cur.execute(
+                    """
+                    INSERT INTO sofia.scheduler_circuit_state
+                        (collector_name, status, consecutive_failures, circuit_opened_at, last_run,
+                         last_fire_at, next_run, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                    ON CONFLICT (collector_name) DO UPDATE SET
+                        status = EXCLUDED.status,
+                        consecutive_failures = EXCLUDED.consecutive_failures,
+                        circuit_opened_at = EXCLUDED.circuit_opened_at,
+                        last_run = COALESCE(EXCLUDED.last_run, sofia.scheduler_circuit_state.last_run),
+                        last_fire_at = COALESCE(EXCLUDED.last_fire_at, sofia.scheduler_circuit_state.last_fire_at),
+                        next_run = EXCLUDED.next_run,
+                        updated_at = NOW()
+                """,
+                    (task.collector_name, task.status.value, task.consecutive_failures,
+                     task.circuit_opened_at, task.last_run, task.last_fire_at, task.next_run),
+                )
+                self.conn.commit()
+            except psycopg2.Error as e:
+                self.conn.rollback()
+                print(f"⚠️ Could not persist breaker state for {task.collector_name}: {e}")
 
     def send_alert(self, message: str):
         """Send WhatsApp alert."""
@@ -661,25 +1085,41 @@ def main():
 
     parser = argparse.ArgumentParser(description="Sofia Intelligent Scheduler")
     parser.add_argument("--register-all", action="store_true", help="Register all collectors")
-    parser.add_argument("--run-once", action="store_true", help="Run all tasks once and exit")
-    parser.add_argument("--run", action="store_true", help="Run scheduler loop")
-    parser.add_argument("--interval", type=int, default=300, help="Interval between runs (seconds)")
+    parser.add_argument("--run-once", action="store_true", help="Run all DUE tasks once and exit")
+    parser.add_argument("--run", action="store_true", help="Run long-lived scheduler (cron slots, replaces crontab)")
+    parser.add_argument("--schedule", action="store_true", help="Print next due time per task and exit")
+    parser.add_argument("--interval", type=int, default=300, help="Period for tasks without cron (seconds)")
+    parser.add_argument("--slots", type=int, default=None, help="Concurrent collectors (default: SCHEDULER_SLOTS or 4)")
+    parser.add_argument("--catchup", choices=CATCHUP_POLICIES, default=None,
+                        help="Missed-slot policy (default: SCHEDULER_CATCHUP or coalesce)")
+    parser.add_argument("--jitter", type=int, default=None, help="Max start jitter in seconds (default: 90)")
 
     args = parser.parse_args()
 
-    scheduler = IntelligentScheduler()
+    scheduler = IntelligentScheduler(slots=args.slots)
+    if args.catchup:
+        scheduler.catchup_policy = args.catchup
+    if args.jitter is not None:
+        scheduler.jitter_sec = args.jitter
 
     try:
         if args.register_all:
             scheduler.register_all_collectors()
 
+        if args.schedule:
+            scheduler.load_circuit_state()
+            for row in scheduler.schedule_report():
+                flag = "catch-up" if row["catch_up"] else ""
+                print(f"{row['collector']:<20} {row['cron'] or '(every cycle)':<26} "
+                      f"due {row['due']:%Y-%m-%d %H:%M:%S} {flag}")
+
         if args.run_once:
             scheduler.run_once()
 
         if args.run:
             scheduler.run(interval_sec=args.interval)
 
-        if not any([args.register_all, args.run_once, args.run]):
+        if not any([args.register_all, args.run_once, args.run, args.schedule]):
             parser.print_help()
 
     finally:
@@ -8,25 +8,195 @@ Zero-cost embedding generation using Mastra
 Automatically generates and updates embeddings for semantic tables
 
 Features:
-- Batch processing for efficiency
-- Automatic NULL handling
-- Progress tracking
-- Error recovery
-- Supports title, abstract, and description embeddings
+- Keyset pagination (id > last_id) over a snapshot fixed at MAX(id) on start
+- Multi-text batch requests, N in flight (MASTRA_EMBEDDING_CONCURRENCY)
+- Content-hash cache (sofia.embedding_cache): unchanged text is never re-embedded
+- Bulk write-back: UPDATE ... FROM (VALUES ...) per page, one transaction
+- Resumable checkpoints (sofia.embedding_checkpoints): a killed backfill
+  continues from the last committed page; the checkpoint never passes a row
+  whose embedding failed, so the next run retries it
+- No transaction is held open while the endpoint is called
+- Local stub embedder for tests (--stub, or --serve-stub PORT for the HTTP path)
 
 Usage:
     python3 scripts/mastra_embeddings.py --table arxiv_ai_papers
     python3 scripts/mastra_embeddings.py --all
+    python3 scripts/mastra_embeddings.py --table patents --restart   # ignore checkpoint
+    python3 scripts/mastra_embeddings.py --table trends --stub       # deterministic local vectors
+    python3 scripts/mastra_embeddings.py --serve-stub 3000           # fake Mastra endpoint
 """
 
+import hashlib
+import json
+import math
 import os
+import random
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import psycopg2
 import requests
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EMBED_DIM = int(os.getenv("MASTRA_EMBEDDING_DIM", "384"))
+MAX_TEXT_CHARS = 512
+PAGE_SIZE = int(os.getenv("MASTRA_EMBEDDING_PAGE", "1000"))
+MAX_RETRIES = 3
+
+
+def content_hash(model: str, text: str) -> str:
+    """Chave do cache: modelo + texto já truncado (o que de fato vai para o endpoint)."""
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def to_vector_literal(vec: Sequence[float]) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in vec) + "]"
+
+
+class MastraClient:
+    """
+    Cliente HTTP do endpoint Mastra.
+    Batch: POST {"texts": [...]} → {"embeddings": [...]}. Se o endpoint não aceitar
+    (4xx / resposta sem "embeddings"), cai para {"text": ...} por texto, ainda com
+    `concurrency` requests em paralelo.
+    """
+
+    def __init__(self, endpoint: str, batch_size: int = 32, concurrency: int = 4, timeout: float = 30.0,
+                 rpm: float = None, model: str = None):
+        self.endpoint = endpoint
+        self.model = model or endpoint  # entra no hash do cache: trocar de modelo re-embeda
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rpm = rpm
+        self.batch_supported = True
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="mastra-embed")
+        self.stats = {"requests": 0, "texts": 0, "failures": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1):
+        # stats são incrementados pelas threads do executor
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _post(self, payload: dict) -> Optional[dict]:
+        from lib.rate_limiter import get_limiter, parse_retry_after
+
+        for attempt in range(MAX_RETRIES):
+            if self.rpm:
+                get_limiter().acquire("mastra_embeddings", rpm=self.rpm)
+            self._count("requests")
+            try:
+                response = self._session().post(self.endpoint, json=payload, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                if attempt == MAX_RETRIES - 1:
+                    print(f"  ⚠ Mastra service unavailable: {e}")
+                    return None
+                self._count("retries")
+                time.sleep(2 ** attempt)
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 429 or response.status_code >= 500:
+                self._count("retries")
+                time.sleep(parse_retry_after(response.headers.get("Retry-After")) or 2 ** attempt)
+                continue
+            if "texts" in payload and response.status_code in (400, 404, 405, 422):
+                return {"batch_unsupported": True}
+            print(f"  ✗ Mastra API error: {response.status_code}")
+            return None
+        return None
+
+    def _embed_one(self, text: str) -> Optional[List[float]]:
+        result = self._post({"text": text})
+        return result.get("embedding") if result else None
+
+    def _embed_chunk(self, texts: List[str]) -> List[Optional[List[float]]]:
+        if self.batch_supported:
+            result = self._post({"texts": texts})
+            if result and isinstance(result.get("embeddings"), list) and len(result["embeddings"]) == len(texts):
+                return result["embeddings"]
+            if result is None:
+                return [None] * len(texts)
+            print("  ⚠ Endpoint has no batch support, falling back to one text per request")
+            self.batch_supported = False
+        return [self._embed_one(t) for t in texts]
+
+    def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Um vetor (ou None) por texto, na mesma ordem."""
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if not self.batch_supported:
+            # sem batch: o paralelismo é por texto
+            chunks = [[t] for t in texts]
+        vectors = [v for chunk in self._executor.map(self._embed_chunk, chunks) for v in chunk]
+        self._count("texts", len(texts))
+        self._count("failures", sum(1 for v in vectors if not v))
+        return vectors
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class StubEmbedder:
+    """Embedder local determinístico para testes: vetor unitário semeado pelo sha256 do texto."""
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+        self.model = f"stub-{dim}"
+        self.stats = {"requests": 0, "texts": 0, "failures": 0, "retries": 0}
+
+    @staticmethod
+    def vector(text: str, dim: int = EMBED_DIM) -> List[float]:
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+        norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+        return [x / norm for x in vec]
+
+    def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        self.stats["requests"] += 1
+        self.stats["texts"] += len(texts)
+        return [self.vector(t, self.dim) for t in texts]
+
+    def close(self):
+        pass
+
+
+def serve_stub(port: int, dim: int = EMBED_DIM):
+    """Endpoint fake compatível com o Mastra ({"text"} e {"texts"}) para testar o caminho HTTP."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if "texts" in body:
+                out = {"embeddings": [StubEmbedder.vector(t, dim) for t in body["texts"]]}
+            else:
+                out = {"embedding": StubEmbedder.vector(body.get("text", ""), dim)}
+            data = json.dumps(out).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Stub embedder listening on http://127.0.0.1:{port}/embed (dim={dim})")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
 
 
 class MastraEmbeddings:
@@ -35,9 +205,9 @@ class MastraEmbeddings:
     Generates 384-dimensional embeddings for semantic search
     """
 
-    def __init__(self):
+    def __init__(self, embedder=None, conn=None):
         # Database connection
-        self.conn = psycopg2.connect(
+        self.conn = conn or psycopg2.connect(
             host=os.getenv("POSTGRES_HOST", "localhost"),
             user=os.getenv("POSTGRES_USER", "sofia"),
             password=os.getenv("POSTGRES_PASSWORD"),
@@ -47,8 +217,16 @@ class MastraEmbeddings:
 
         # Mastra API endpoint (update with actual endpoint)
         self.mastra_endpoint = os.getenv("MASTRA_EMBEDDING_ENDPOINT", "http://localhost:3000/embed")
+        rpm = os.getenv("MASTRA_EMBEDDING_RPM")
+        self.embedder = embedder or MastraClient(
+            self.mastra_endpoint,
+            batch_size=int(os.getenv("MASTRA_EMBEDDING_BATCH", "32")),
+            concurrency=int(os.getenv("MASTRA_EMBEDDING_CONCURRENCY", "4")),
+            rpm=float(rpm) if rpm else None,
+            model=os.getenv("MASTRA_EMBEDDING_MODEL"),
+        )
 
-        # Table configuration
+        # Table configuration (batch_size = textos por request ao endpoint)
         self.tables_config = {
             "arxiv_ai_papers": {
                 "text_columns": ["title", "abstract"],
@@ -99,40 +277,116 @@ class MastraEmbeddings:
 
     def generate_embedding_via_mastra(self, text: str) -> Optional[List[float]]:
         """
-        Call Mastra API to generate embedding
-        Returns 384-dimensional vector
+        Single-text embedding (kept for ad-hoc callers; the table pipeline batches)
         """
         if not text or len(text.strip()) == 0:
             return None
-
-        try:
-            # TODO: Replace with actual Mastra API call
-            # For now, using a placeholder that returns a mock embedding
-            # In production, this should call the real Mastra endpoint
-
-            response = requests.post(
-                self.mastra_endpoint, json={"text": text[:512]}, timeout=5  # Truncate to max length
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("embedding")
+        return self.embedder.embed([text[:MAX_TEXT_CHARS]])[0]
+
+    # === Checkpoints (sofia.embedding_checkpoints) ===
+
+    def _load_checkpoint(self, table_name: str, mode: str) -> Optional[dict]:
+        self.cur.execute("""
+            SELECT last_id, max_id, processed, cache_hits, embedded
+            FROM sofia.embedding_checkpoints
+            WHERE table_name = %s AND mode = %s AND status = 'running'
+        """, (table_name, mode))
+        return self.cur.fetchone()
+
+    def _save_checkpoint(self, table_name: str, mode: str, last_id, max_id, counters: dict, status: str = "running"):
+        self.cur.execute("""
+            INSERT INTO sofia.embedding_checkpoints
+                (table_name, mode, last_id, max_id, processed, cache_hits, embedded, status, started_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+            ON CONFLICT (table_name) DO UPDATE SET
+                mode = EXCLUDED.mode, last_id = EXCLUDED.last_id, max_id = EXCLUDED.max_id,
+                processed = EXCLUDED.processed, cache_hits = EXCLUDED.cache_hits,
+                embedded = EXCLUDED.embedded, status = EXCLUDED.status, updated_at = NOW(),
+                started_at = CASE WHEN sofia.embedding_checkpoints.status = 'running'
+                                   AND sofia.embedding_checkpoints.mode = EXCLUDED.mode
+                                  THEN sofia.embedding_checkpoints.started_at ELSE NOW() END
+        """, (table_name, mode, None if last_id is None else str(last_id), None if max_id is None else str(max_id),
+              counters["processed"], counters["cache_hits"], counters["embedded"], status))
+
+    # === Content-hash cache (sofia.embedding_cache) ===
+
+    def _cache_get(self, hashes: List[str]) -> Dict[str, str]:
+        if not hashes:
+            return {}
+        self.cur.execute("""
+            SELECT content_hash, embedding::text AS embedding
+            FROM sofia.embedding_cache
+            WHERE content_hash = ANY(%s)
+        """, (hashes,))
+        return {r["content_hash"]: r["embedding"] for r in self.cur.fetchall()}
+
+    def _cache_put(self, rows: List[tuple]):
+        if rows:
+            execute_values(self.cur, """
+                INSERT INTO sofia.embedding_cache (content_hash, model, embedding)
+                VALUES %s ON CONFLICT (content_hash) DO NOTHING
+            """, rows, template="(%s, %s, %s::vector)", page_size=500)
+
+    def _write_back(self, table_name: str, emb_col: str, rows: List[tuple]):
+        if rows:
+            execute_values(self.cur, f"""
+                UPDATE sofia.{table_name} AS t SET {emb_col} = v.emb
+                FROM (VALUES %s) AS v(id, emb)
+                WHERE t.id = v.id
+            """, rows, template="(%s, %s::vector)", page_size=500)
+
+    def _embed_page(self, rows: List[dict], text_cols: List[str], emb_cols: List[str], batch_size: int,
+                    force_update: bool, counters: dict) -> Tuple[Dict[str, List[tuple]], set]:
+        """Resolve os vetores de uma página: cache primeiro, endpoint só para hashes novos.
+        Retorna (updates por coluna, ids com algum embedding que falhou)."""
+        jobs = []  # (row_id, emb_col, hash)
+        texts_by_hash = {}
+        for row in rows:
+            for text_col, emb_col in zip(text_cols, emb_cols):
+                text = row.get(text_col)
+                if not text or not text.strip() or not (force_update or row[f"{emb_col}_missing"]):
+                    continue
+                text = text[:MAX_TEXT_CHARS]
+                h = content_hash(self.embedder.model, text)
+                texts_by_hash.setdefault(h, text)
+                jobs.append((row["id"], emb_col, h))
+
+        vectors = self._cache_get(list(texts_by_hash))
+        counters["cache_hits"] += sum(1 for _, _, h in jobs if h in vectors)
+
+        pending = [h for h in texts_by_hash if h not in vectors]
+        if pending:
+            # fecha a transação de leitura: nada de lock/snapshot aberto durante as chamadas HTTP
+            self.conn.commit()
+        new_rows = []
+        for h, vec in zip(pending, self._embed_texts([texts_by_hash[h] for h in pending], batch_size)):
+            if vec:
+                vectors[h] = to_vector_literal(vec)
+                new_rows.append((h, self.embedder.model, vectors[h]))
+            else:
+                counters["errors"] += 1
+        counters["embedded"] += len(new_rows)
+        self._cache_put(new_rows)
+
+        updates = {col: [] for col in emb_cols}
+        failed = set()
+        for row_id, emb_col, h in jobs:
+            if h in vectors:
+                updates[emb_col].append((row_id, vectors[h]))
             else:
-                print(f"  ✗ Mastra API error: {response.status_code}")
-                return None
+                failed.add(row_id)
+        return updates, failed
 
-        except requests.exceptions.ConnectionError:
-            # Mastra service not available - fallback to zero vector for now
-            # TODO: Implement proper error handling or local embedding model
-            print(f"  ⚠ Mastra service unavailable, skipping embedding")
-            return None
-        except Exception as e:
-            print(f"  ✗ Embedding generation error: {e}")
-            return None
+    def _embed_texts(self, texts: List[str], batch_size: int) -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+        if isinstance(self.embedder, MastraClient):
+            self.embedder.batch_size = batch_size
+        return self.embedder.embed(texts)
 
-    def process_table(self, table_name: str, force_update: bool = False):
+    def process_table(self, table_name: str, force_update: bool = False, restart: bool = False):
         """
-        Generate embeddings for all rows in a table
+        Generate embeddings for all rows in a table (resumes from checkpoint)
         """
         if table_name not in self.tables_config:
             print(f"✗ Table {table_name} not configured for embeddings")
@@ -142,90 +396,104 @@ class MastraEmbeddings:
         text_cols = config["text_columns"]
         emb_cols = config["embedding_columns"]
         batch_size = config["batch_size"]
+        mode = "force" if force_update else "missing"
 
         print(f"\n{'='*80}")
         print(f"Processing: sofia.{table_name}")
         print(f"{'='*80}")
 
-        # Get rows that need embeddings
-        where_clause = "WHERE " + " OR ".join([f"{emb_col} IS NULL" for emb_col in emb_cols])
-
-        if force_update:
-            where_clause = ""  # Process all rows
-
-        # Count total rows
-        self.cur.execute(f"SELECT COUNT(*) as total FROM sofia.{table_name} {where_clause}")
+        # Rows that need embeddings (force: all rows; the hash cache skips unchanged text)
+        missing_clause = "(" + " OR ".join([f"{emb_col} IS NULL" for emb_col in emb_cols]) + ")"
+        where_missing = "" if force_update else f"AND {missing_clause}"
+
+        counters = {"processed": 0, "cache_hits": 0, "embedded": 0, "written": 0, "errors": 0}
+        checkpoint = None if restart else self._load_checkpoint(table_name, mode)
+        if checkpoint:
+            last_id, max_id = checkpoint["last_id"], checkpoint["max_id"]
+            for key in ("processed", "cache_hits", "embedded"):
+                counters[key] = checkpoint[key] or 0
+            print(f"Resuming from checkpoint: id > {last_id} (snapshot max id {max_id})")
+        else:
+            # Snapshot estável: linhas inseridas depois do início ficam para a próxima rodada
+            self.cur.execute(f"SELECT MAX(id) AS max_id FROM sofia.{table_name}")
+            last_id, max_id = None, self.cur.fetchone()["max_id"]
+            if max_id is None:
+                print(f"✓ Table is empty")
+                return
+
+        self.cur.execute(f"""
+            SELECT COUNT(*) AS total FROM sofia.{table_name}
+            WHERE id <= %s {'AND id > %s' if last_id is not None else ''} {where_missing}
+        """, (max_id, last_id) if last_id is not None else (max_id,))
         total = self.cur.fetchone()["total"]
 
         if total == 0:
+            self._save_checkpoint(table_name, mode, last_id, max_id, counters, status="done")
+            self.conn.commit()
             print(f"✓ All embeddings already generated")
             return
 
         print(f"Rows to process: {total:,}")
-        print(f"Batch size: {batch_size}")
-
-        # Process in batches
-        processed = 0
-        errors = 0
-
-        for offset in range(0, total, batch_size):
-            # Fetch batch
-            cols_to_fetch = ["id"] + text_cols
-            self.cur.execute(
-                f"""
-                SELECT {', '.join(cols_to_fetch)}
+        print(f"Page size: {PAGE_SIZE} | request batch: {batch_size}")
+
+        missing_flags = ", ".join(f"{c} IS NULL AS {c}_missing" for c in emb_cols)
+        start_time = time.time()
+        done = 0
+        page_no = 0
+        # last_id pagina; resume_id é o checkpoint e para antes da primeira linha com falha
+        resume_id = last_id
+        failed_at = None
+
+        while True:
+            self.cur.execute(f"""
+                SELECT id, {', '.join(text_cols)}, {missing_flags}
                 FROM sofia.{table_name}
-                {where_clause}
+                WHERE id <= %s {'AND id > %s' if last_id is not None else ''} {where_missing}
                 ORDER BY id
-                LIMIT {batch_size} OFFSET {offset}
-            """
-            )
-
+                LIMIT %s
+            """, (max_id, last_id, PAGE_SIZE) if last_id is not None else (max_id, PAGE_SIZE))
             rows = self.cur.fetchall()
-
-            print(f"  Batch {offset//batch_size + 1}/{(total + batch_size - 1)//batch_size}...", end=" ")
-
-            batch_start = time.time()
-            batch_success = 0
-
-            for row in rows:
-                row_id = row["id"]
-
-                # Generate embeddings for each text column
-                for text_col, emb_col in zip(text_cols, emb_cols):
-                    text = row.get(text_col)
-
-                    if text:
-                        embedding = self.generate_embedding_via_mastra(text)
-
-                        if embedding:
-                            # Update database
-                            self.cur.execute(
-                                f"""
-                                UPDATE sofia.{table_name}
-                                SET {emb_col} = %s
-                                WHERE id = %s
-                            """,
-                                (embedding, row_id),
-                            )
-
-                            batch_success += 1
-                        else:
-                            errors += 1
-
+            if not rows:
+                break
+
+            page_no += 1
+            page_start = time.time()
+            updates, failed = self._embed_page(rows, text_cols, emb_cols, batch_size, force_update, counters)
+            for emb_col, values in updates.items():
+                self._write_back(table_name, emb_col, values)
+                counters["written"] += len(values)
+
+            if failed_at is None:
+                for row in rows:
+                    if row["id"] in failed:
+                        failed_at = row["id"]
+                        break
+                    resume_id = row["id"]
+            last_id = rows[-1]["id"]
+            done += len(rows)
+            counters["processed"] += len(rows)
+            self._save_checkpoint(table_name, mode, resume_id, max_id, counters)
             self.conn.commit()
-            processed += batch_success
 
-            batch_time = time.time() - batch_start
-            print(f"{batch_success} embeddings in {batch_time:.2f}s")
+            elapsed = time.time() - start_time
+            rate = done / elapsed if elapsed > 0 else 0
+            print(f"  Page {page_no}: {done:,}/{total:,} rows | "
+                  f"{sum(len(v) for v in updates.values())} written in {time.time() - page_start:.2f}s | "
+                  f"{rate:.0f} rows/s")
+
+        # Com falhas o checkpoint fica 'running' parado antes da primeira: a próxima rodada retoma dali
+        self._save_checkpoint(table_name, mode, resume_id, max_id, counters,
+                              status="running" if failed_at is not None else "done")
+        self.conn.commit()
 
         print(f"\n{'='*80}")
-        print(f"✓ Completed: {processed:,} embeddings generated")
-        if errors > 0:
-            print(f"⚠ Errors: {errors}")
+        print(f"✓ Completed: {counters['written']:,} embeddings written "
+              f"({counters['embedded']:,} generated, {counters['cache_hits']:,} from cache)")
+        if counters["errors"] > 0:
+            print(f"⚠ Errors: {counters['errors']} (rows stay NULL; next run resumes at id {failed_at})")
         print(f"{'='*80}\n")
 
-    def process_all_tables(self, force_update: bool = False):
+    def process_all_tables(self, force_update: bool = False, restart: bool = False):
         """
         Process all configured tables
         """
@@ -235,14 +503,16 @@ class MastraEmbeddings:
         print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"Tables: {len(self.tables_config)}")
         print(f"Force update: {force_update}")
+        print(f"Embedder: {self.embedder.model}")
         print("=" * 80)
 
         start_time = time.time()
 
         for table_name in self.tables_config.keys():
             try:
-                self.process_table(table_name, force_update)
+                self.process_table(table_name, force_update, restart)
             except Exception as e:
+                self.conn.rollback()
                 print(f"✗ Error processing {table_name}: {e}")
 
         total_time = time.time() - start_time
@@ -250,10 +520,12 @@ class MastraEmbeddings:
         print("\n" + "=" * 80)
         print(f"ALL TABLES PROCESSED")
         print(f"Total time: {total_time/60:.2f} minutes")
+        print(f"Embedder: {self.embedder.stats}")
         print("=" * 80)
 
     def close(self):
         """Close database connection"""
+        self.embedder.close()
         if self.cur:
             self.cur.close()
         if self.conn:
@@ -267,16 +539,23 @@ def main():
     parser.add_argument("--table", type=str, help="Process specific table")
     parser.add_argument("--all", action="store_true", help="Process all tables")
     parser.add_argument("--force", action="store_true", help="Force update existing embeddings")
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoint and start a new snapshot")
+    parser.add_argument("--stub", action="store_true", help="Use the local deterministic stub embedder")
+    parser.add_argument("--serve-stub", type=int, metavar="PORT", help="Run a fake Mastra endpoint and exit")
 
     args = parser.parse_args()
 
-    embedder = MastraEmbeddings()
+    if args.serve_stub:
+        serve_stub(args.serve_stub)
+        return
+
+    embedder = MastraEmbeddings(embedder=StubEmbedder() if args.stub else None)
 
     try:
         if args.all:
-            embedder.process_all_tables(force_update=args.force)
+            embedder.process_all_tables(force_update=args.force, restart=args.restart)
         elif args.table:
-            embedder.process_table(args.table, force_update=args.force)
+            embedder.process_table(args.table, force_update=args.force, restart=args.restart)
         else:
             parser.print_help()
     finally:
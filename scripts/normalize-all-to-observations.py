@@ -1,39 +1,229 @@
 #!/usr/bin/env python3
 """
-Master Normalizer - Run all normalizers in sequence
+Master Normalizer - Run all normalizers as a small DAG
+
+Independent normalizers (ACLED, GDELT, World Bank, Brasil) run concurrently
+up to --workers; the observation views are refreshed ONCE after all of them
+finish. Each stage reports rows + seconds, and a failed stage is retried on
+its own (--retries) without redoing the others.
+
+Usage:
+  python3 scripts/normalize-all-to-observations.py
+  python3 scripts/normalize-all-to-observations.py --workers 2 --retries 2
+  python3 scripts/normalize-all-to-observations.py --stages gdelt,refresh   # re-run only these
 """
+import argparse
+import os
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
-normalizers = [
-    ("ACLED", "normalize-acled-to-observations.py"),
-    ("GDELT", "normalize-gdelt-to-observations.py"),
-    ("World Bank", "normalize-worldbank-to-observations.py"),
-    ("Brasil", "normalize-brasil-to-observations.py"),
-]
-
-print("="*70)
-print("MASTER NORMALIZER - Security Hybrid Model")
-print("="*70)
-
-for name, script in normalizers:
-    print(f"\n{'='*70}")
-    print(f"Running: {name}")
-    print(f"{'='*70}")
-    
-    result = subprocess.run(
-        [sys.executable, f"scripts/{script}"],
-        cwd=Path(__file__).parent.parent,
-        capture_output=False
+import psycopg2
+import psycopg2.errors
+
+ROOT = Path(__file__).parent.parent
+
+# name -> script (subprocess) or fn (in-process), source LIKE pattern for row counts, deps
+STAGES = {
+    "acled": {"label": "ACLED", "script": "normalize-acled-to-observations.py", "source": "ACLED"},
+    "gdelt": {"label": "GDELT", "script": "normalize-gdelt-to-observations.py", "source": "GDELT"},
+    "worldbank": {"label": "World Bank", "script": "normalize-worldbank-to-observations.py", "source": "WORLD_BANK"},
+    "brasil": {"label": "Brasil", "script": "normalize-brasil-to-observations.py", "source": "BRASIL_%"},
+    "refresh": {"label": "Views", "fn": "refresh_observation_views",
+                "deps": ["acled", "gdelt", "worldbank", "brasil"]},
+}
+
+_print_lock = threading.Lock()
+
+
+def load_env():
+    env_file = ROOT / ".env"
+    if env_file.exists():
+        with open(env_file, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    k, v = line.split("=", 1)
+                    os.environ[k] = v.strip()
+
+
+def get_conn():
+    return psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        database=os.getenv("POSTGRES_DB")
     )
-    
-    if result.returncode != 0:
-        print(f"\nWARNING: {name} normalizer failed")
-        print("Continuing with next normalizer...")
+
+
+def log(stage: str, line: str):
+    with _print_lock:
+        print(f"[{stage:<9}] {line}", flush=True)
+
+
+def count_observations(source: str) -> int:
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM sofia.security_observations WHERE source LIKE %s", (source,))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def refresh_observation_views(stage: str) -> int:
+    """Refresh views built on security_observations (once per run). Returns rows in the combined view."""
+    conn = get_conn()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            steps = [
+                ("sofia.refresh_security_hybrid_views()", "SELECT sofia.refresh_security_hybrid_views()",
+                 ["mv_security_country_acled", "mv_security_country_gdelt",
+                  "mv_security_country_structural", "mv_security_country_combined"]),
+                ("sofia.mv_security_map_clusters", "REFRESH MATERIALIZED VIEW CONCURRENTLY sofia.mv_security_map_clusters",
+                 ["mv_security_map_clusters"]),
+            ]
+            for name, sql, views in steps:
+                start = time.time()
+                try:
+                    cur.execute(sql)
+                except (psycopg2.errors.UndefinedFunction, psycopg2.errors.UndefinedTable):
+                    log(stage, f"Skipped {name} (not installed)")
+                    continue
+                for view in views:
+                    try:
+                        cur.execute("SELECT sofia.mark_mv_refreshed(%s)", (view,))
+                    except psycopg2.errors.UndefinedFunction:
+                        # Migration 105 not applied - API cache falls back to TTL
+                        break
+                log(stage, f"Refreshed {name} in {time.time() - start:.1f}s")
+
+            cur.execute("SELECT COUNT(*) FROM sofia.mv_security_country_combined")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def run_stage(name: str, spec: dict) -> int:
+    """Run one stage; returns rows, raises on failure"""
+    if "fn" in spec:
+        return globals()[spec["fn"]](name)
+
+    proc = subprocess.Popen(
+        [sys.executable, "-u", f"scripts/{spec['script']}"],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+    )
+    for line in proc.stdout:
+        log(name, line.rstrip())
+    if proc.wait() != 0:
+        raise RuntimeError(f"{spec['script']} exited with {proc.returncode}")
+    return count_observations(spec["source"])
+
+
+def run_dag(stages: dict, workers: int, retries: int) -> dict:
+    """
+    Execute stages respecting deps. A stage becomes ready once every dep has
+    FINISHED (ok or failed) - the refresh still publishes the sources that
+    did normalize, like the old sequential runner that kept going on errors.
+    """
+    results = {name: {"status": "pending", "attempts": 0, "rows": None, "seconds": 0.0} for name in stages}
+    running = {}
+
+    def ready():
+        for name, spec in stages.items():
+            if results[name]["status"] != "pending" or name in running.values():
+                continue
+            deps = [d for d in spec.get("deps", []) if d in stages]
+            if all(results[d]["status"] in ("ok", "failed") for d in deps):
+                yield name
+
+    def timed(name):
+        start = time.time()
+        try:
+            return run_stage(name, stages[name]), None, time.time() - start
+        except Exception as e:
+            return None, e, time.time() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for name in ready():
+                if len(running) >= workers:
+                    break
+                results[name]["attempts"] += 1
+                log(name, f"▶ {stages[name]['label']} (attempt {results[name]['attempts']})")
+                running[pool.submit(timed, name)] = name
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                rows, error, seconds = future.result()
+                result = results[name]
+                result["seconds"] += seconds
+                if error is None:
+                    result.update(status="ok", rows=rows)
+                    log(name, f"OK {rows if rows is not None else '-'} rows in {seconds:.1f}s")
+                elif result["attempts"] <= retries:
+                    log(name, f"WARNING: {error} - retrying")
+                else:
+                    result.update(status="failed", error=str(error))
+                    log(name, f"FAILED: {error}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all security_observations normalizers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("NORMALIZE_WORKERS", "4")),
+                        help="max stages running at once (default: 4)")
+    parser.add_argument("--retries", type=int, default=1, help="retries per failed stage (default: 1)")
+    parser.add_argument("--stages", help=f"comma-separated subset of: {', '.join(STAGES)}")
+    args = parser.parse_args()
+
+    stages = STAGES
+    if args.stages:
+        selected = [s.strip() for s in args.stages.split(",") if s.strip()]
+        unknown = [s for s in selected if s not in STAGES]
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(unknown)}")
+        stages = {name: STAGES[name] for name in selected}
+
+    load_env()
+
+    print("="*70)
+    print("MASTER NORMALIZER - Security Hybrid Model")
+    print(f"Stages: {', '.join(stages)} | workers={args.workers} retries={args.retries}")
+    print("="*70)
+
+    start = time.time()
+    results = run_dag(stages, max(1, args.workers), max(0, args.retries))
+
+    print("\n" + "="*70)
+    print(f"{'Stage':<12} {'Status':<8} {'Tries':>5} {'Rows':>12} {'Seconds':>9}")
+    print("-"*70)
+    for name, r in results.items():
+        rows = f"{r['rows']:,}" if r["rows"] is not None else "-"
+        print(f"{name:<12} {r['status']:<8} {r['attempts']:>5} {rows:>12} {r['seconds']:>9.1f}")
+    print("-"*70)
+    failed = [name for name, r in results.items() if r["status"] != "ok"]
+    print(f"Wall time: {time.time() - start:.1f}s")
+    if failed:
+        print(f"FAILED: {', '.join(failed)} (re-run with --stages {','.join(failed)})")
     else:
-        print(f"\nOK: {name} normalization complete")
+        print("ALL NORMALIZERS COMPLETE")
+    print("="*70)
+    sys.exit(1 if failed else 0)
+
 
-print("\n" + "="*70)
-print("ALL NORMALIZERS COMPLETE")
-print("="*70)
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,35 @@
 #!/usr/bin/env python3
 """
-GDELT Normalizer v3 - CORRETO com Z-score POR PAÍS e POR JANELA
+GDELT Normalizer v4 - Z-score POR PAÍS e POR JANELA, incremental
+
+Default: incremental. Only gdelt_events ingested after the watermark
+(sofia.normalizer_watermarks, minus WATERMARK_OVERLAP for late commits) are
+read; the (country, day) counts they touch are recounted into
+sofia.gdelt_country_daily, the 30-day mean/stddev comes from that rollup, and
+only observations whose z-score changed are upserted. Re-reading the overlap
+is harmless: the recount is idempotent.
+Everything runs in one transaction - the map never sees an empty GDELT layer.
+
+  --full   rebuild rollup + all 90-day observations (upsert, no DELETE of live rows)
+
+Requires sql/migrations/107_gdelt_country_daily.sql.
 """
-import psycopg2, os, json
+import argparse
+import os
+import time
+from datetime import timedelta
 from pathlib import Path
 
+import psycopg2
+
+SOURCE = 'GDELT'
+WINDOW_DAYS = 90
+STATS_DAYS = 30
+# ingested_at is set at INSERT time, not commit time: a long collector
+# transaction can commit rows older than MAX(ingested_at) seen by the last run
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+
 def load_env():
     env_file = Path(".env")
     if env_file.exists():
@@ -15,176 +40,312 @@ def load_env():
                     k, v = line.split("=", 1)
                     os.environ[k] = v.strip()
 
-load_env()
-
-conn = psycopg2.connect(
-    host=os.getenv("POSTGRES_HOST"),
-    port=os.getenv("POSTGRES_PORT"),
-    user=os.getenv("POSTGRES_USER"),
-    password=os.getenv("POSTGRES_PASSWORD"),
-    database=os.getenv("POSTGRES_DB")
-)
-conn.autocommit = True
-cur = conn.cursor()
-
-print("="*70)
-print("GDELT NORMALIZER v3: Z-Score POR PAÍS e POR JANELA")
-print("="*70)
-
-# Clear existing
-print("\nClearing existing GDELT data...")
-cur.execute("DELETE FROM sofia.security_observations WHERE source = 'GDELT'")
-print(f"Cleared {cur.rowcount:,} old records")
-
-# Check source
-cur.execute("SELECT COUNT(*) FROM sofia.gdelt_events WHERE event_date >= CURRENT_DATE - INTERVAL '90 days'")
-source_count = cur.fetchone()[0]
-print(f"\nSource: {source_count:,} GDELT events (last 90 days)")
-
-if source_count == 0:
-    print("No GDELT data to normalize")
-    cur.close()
-    conn.close()
-    exit(0)
-
-# Insert with Z-score POR PAÍS e POR JANELA
-print("\nNormalizing GDELT data (Z-score per country, 30-day window)...")
-cur.execute("""
-    WITH windowed_counts AS (
-        SELECT
-            action_geo_country,
-            DATE_TRUNC('day', event_date) as day,
-            COUNT(*) as daily_count
-        FROM sofia.gdelt_events
-        WHERE event_date >= CURRENT_DATE - INTERVAL '90 days'
-          AND action_geo_country IS NOT NULL
-        GROUP BY action_geo_country, DATE_TRUNC('day', event_date)
+
+# (country, day) pairs touched by events ingested in (watermark, upper]
+CHANGED_DAYS_SQL = f"""
+    CREATE TEMP TABLE gdelt_changed_days ON COMMIT DROP AS
+    SELECT DISTINCT action_geo_country AS country_code, event_date::date AS day
+    FROM sofia.gdelt_events
+    WHERE ingested_at > %(since)s AND ingested_at <= %(upper)s
+      AND event_date >= CURRENT_DATE - INTERVAL '{WINDOW_DAYS} days'
+      AND action_geo_country IS NOT NULL
+"""
+
+# Exact recount (re-ingested events don't double count)
+RECOUNT_SQL = """
+    INSERT INTO sofia.gdelt_country_daily (country_code, day, event_count, updated_at)
+    SELECT e.action_geo_country, e.event_date::date, COUNT(*), NOW()
+    FROM sofia.gdelt_events e
+    JOIN gdelt_changed_days c
+      ON e.action_geo_country = c.country_code
+     AND e.event_date >= c.day AND e.event_date < c.day + 1
+    GROUP BY e.action_geo_country, e.event_date::date
+    ON CONFLICT (country_code, day) DO UPDATE SET
+        event_count = EXCLUDED.event_count,
+        updated_at = NOW()
+"""
+
+# Recompute z-scores of affected countries from the rollup; keep the
+# (country, day) pairs whose z-score actually moved
+ZSCORE_SQL = f"""
+    CREATE TEMP TABLE gdelt_changed_z ON COMMIT DROP AS
+    WITH country_stats AS (
+        SELECT country_code,
+               AVG(event_count) AS mean_count,
+               STDDEV(event_count) AS stddev_count
+        FROM sofia.gdelt_country_daily
+        WHERE day >= CURRENT_DATE - INTERVAL '{STATS_DAYS} days'  -- Janela de 30 dias
+          AND (%(all_countries)s OR country_code IN (SELECT country_code FROM gdelt_changed_days))
+        GROUP BY country_code
     ),
-    country_stats AS (
-        SELECT
-            action_geo_country,
-            AVG(daily_count) as mean_count,
-            STDDEV(daily_count) as stddev_count
-        FROM windowed_counts
-        WHERE day >= CURRENT_DATE - INTERVAL '30 days'  -- Janela de 30 dias
-        GROUP BY action_geo_country
+    new_z AS (
+        SELECT d.country_code, d.day,
+               CASE
+                   WHEN cs.country_code IS NULL THEN NULL   -- sem dados na janela
+                   WHEN cs.stddev_count > 0.001 THEN        -- Epsilon para evitar divisão por zero
+                       ROUND(((d.event_count - cs.mean_count) / cs.stddev_count)::numeric, 6)::float8
+                   ELSE 0                                   -- variação zero = sem momentum
+               END AS zscore
+        FROM sofia.gdelt_country_daily d
+        LEFT JOIN country_stats cs ON cs.country_code = d.country_code
+        WHERE %(all_countries)s OR d.country_code IN (SELECT country_code FROM gdelt_changed_days)
     ),
-    recent_events AS (
-        SELECT
-            e.global_event_id,
-            e.action_geo_country,
-            e.action_geo_lat,
-            e.action_geo_lon,
-            e.event_date,
-            e.goldstein_scale,
-            e.avg_tone,
-            e.num_mentions,
-            e.num_articles,
-            e.actor1_name,
-            e.actor2_name,
-            e.ingested_at,
-            -- Z-score POR PAÍS com fallback para stddev=0
-            CASE 
-                WHEN cs.stddev_count > 0.001 THEN  -- Epsilon para evitar divisão por zero
-                    (wc.daily_count - cs.mean_count) / cs.stddev_count
-                ELSE 0  -- Fallback: país com variação zero = sem momentum
-            END as zscore_per_country
-        FROM sofia.gdelt_events e
-        JOIN windowed_counts wc 
-            ON e.action_geo_country = wc.action_geo_country 
-            AND DATE_TRUNC('day', e.event_date) = wc.day
-        JOIN country_stats cs 
-            ON e.action_geo_country = cs.action_geo_country
-        WHERE e.event_date >= CURRENT_DATE - INTERVAL '90 days'
-          AND e.action_geo_lat IS NOT NULL
-          AND e.action_geo_lon IS NOT NULL
+    updated AS (
+        UPDATE sofia.gdelt_country_daily d
+        SET zscore = n.zscore, updated_at = NOW()
+        FROM new_z n
+        WHERE d.country_code = n.country_code AND d.day = n.day
+          AND d.zscore IS DISTINCT FROM n.zscore
+        RETURNING d.country_code, d.day, d.zscore
     )
-    INSERT INTO sofia.security_observations (
-        source,
-        source_id,
-        signal_type,
-        coverage_scope,
-        country_code,
-        country_name,
-        latitude,
-        longitude,
-        severity_raw,
-        severity_norm,
-        confidence_score,
-        coverage_score_global,
-        coverage_score_local,
-        event_time_start,
-        event_time_end,
-        event_count,
-        fatalities,
-        raw_payload,
-        collected_at
+    SELECT * FROM updated
+"""
+
+OBSERVATION_COLUMNS = """
+        source, source_id, signal_type, coverage_scope, country_code, country_name,
+        latitude, longitude, severity_raw, severity_norm, confidence_score,
+        coverage_score_global, coverage_score_local, event_time_start, event_time_end,
+        event_count, fatalities, raw_payload, collected_at
+"""
+
+# New / re-ingested events (ingested_at in range) + every event on a day whose z-score moved
+UPSERT_SQL = f"""
+    WITH candidates AS (
+        SELECT e.id FROM sofia.gdelt_events e
+        WHERE e.ingested_at > %(since)s AND e.ingested_at <= %(upper)s
+          AND e.event_date >= CURRENT_DATE - INTERVAL '{WINDOW_DAYS} days'
+        UNION
+        SELECT e.id FROM sofia.gdelt_events e
+        JOIN gdelt_changed_z z
+          ON e.action_geo_country = z.country_code
+         AND e.event_date >= z.day AND e.event_date < z.day + 1
     )
+    INSERT INTO sofia.security_observations ({OBSERVATION_COLUMNS})
     SELECT
         'GDELT' as source,
-        global_event_id as source_id,
+        e.global_event_id as source_id,
         'acute' as signal_type,
         'global_comparable' as coverage_scope,
-        action_geo_country as country_code,
+        e.action_geo_country as country_code,
         NULL as country_name,
-        action_geo_lat as latitude,
-        action_geo_lon as longitude,
-        ABS(zscore_per_country) as severity_raw,
+        e.action_geo_lat as latitude,
+        e.action_geo_lon as longitude,
+        ABS(d.zscore) as severity_raw,
         -- severity_norm = clamp(abs(zscore_per_country) * 20, 0, 100)
-        LEAST(100, GREATEST(0, ABS(COALESCE(zscore_per_country, 0)) * 20)) as severity_norm,
+        LEAST(100, GREATEST(0, ABS(COALESCE(d.zscore, 0)) * 20)) as severity_norm,
         70.0 as confidence_score,
         0.0 as coverage_score_global,  -- Will be calculated per country
         0.0 as coverage_score_local,
-        event_date as event_time_start,
-        event_date as event_time_end,
+        e.event_date as event_time_start,
+        e.event_date as event_time_end,
         1 as event_count,
         0 as fatalities,
         jsonb_build_object(
-            'global_event_id', global_event_id,
-            'goldstein_scale', goldstein_scale,
-            'avg_tone', avg_tone,
-            'num_mentions', num_mentions,
-            'num_articles', num_articles,
-            'actor1_name', actor1_name,
-            'actor2_name', actor2_name,
-            'zscore_per_country', zscore_per_country,
+            'global_event_id', e.global_event_id,
+            'goldstein_scale', e.goldstein_scale,
+            'avg_tone', e.avg_tone,
+            'num_mentions', e.num_mentions,
+            'num_articles', e.num_articles,
+            'actor1_name', e.actor1_name,
+            'actor2_name', e.actor2_name,
+            'zscore_per_country', d.zscore,
             'interpretation', 'momentum_per_country'
         ) as raw_payload,
-        ingested_at
-    FROM recent_events
-""")
+        e.ingested_at
+    FROM candidates
+    JOIN sofia.gdelt_events e USING (id)
+    JOIN sofia.gdelt_country_daily d
+      ON d.country_code = e.action_geo_country AND d.day = e.event_date::date
+    WHERE d.zscore IS NOT NULL
+      AND e.action_geo_lat IS NOT NULL
+      AND e.action_geo_lon IS NOT NULL
+    ON CONFLICT (source_id) DO UPDATE SET
+        country_code = EXCLUDED.country_code,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        severity_raw = EXCLUDED.severity_raw,
+        severity_norm = EXCLUDED.severity_norm,
+        event_time_start = EXCLUDED.event_time_start,
+        event_time_end = EXCLUDED.event_time_end,
+        raw_payload = EXCLUDED.raw_payload,
+        collected_at = EXCLUDED.collected_at
+    WHERE sofia.security_observations.severity_norm IS DISTINCT FROM EXCLUDED.severity_norm
+       OR sofia.security_observations.raw_payload IS DISTINCT FROM EXCLUDED.raw_payload
+       OR sofia.security_observations.collected_at IS DISTINCT FROM EXCLUDED.collected_at
+"""
+
+# Days that lost their 30-day stats no longer produce observations (same as the full rebuild)
+DROP_UNSCORED_SQL = """
+    DELETE FROM sofia.security_observations o
+    USING gdelt_changed_z z
+    WHERE z.zscore IS NULL
+      AND o.source = 'GDELT'
+      AND o.country_code = z.country_code
+      AND o.event_time_start >= z.day AND o.event_time_start < z.day + 1
+"""
+
+RETENTION_SQL = [
+    f"""DELETE FROM sofia.security_observations
+        WHERE source = 'GDELT' AND event_time_start < CURRENT_DATE - INTERVAL '{WINDOW_DAYS} days'""",
+    f"""DELETE FROM sofia.gdelt_country_daily
+        WHERE day < CURRENT_DATE - INTERVAL '{WINDOW_DAYS} days'""",
+]
 
-inserted = cur.rowcount
-print(f"OK Inserted {inserted:,} GDELT observations")
+# --full only: observations whose source event is gone
+DROP_ORPHANS_SQL = """
+    DELETE FROM sofia.security_observations o
+    WHERE o.source = 'GDELT'
+      AND NOT EXISTS (SELECT 1 FROM sofia.gdelt_events e WHERE e.global_event_id = o.source_id)
+"""
 
-# Update country names
-print("\nUpdating country names...")
-cur.execute("""
+COUNTRY_NAMES_SQL = """
     UPDATE sofia.security_observations o
     SET country_name = c.name
     FROM sofia.dim_country c
     WHERE o.source = 'GDELT'
       AND o.country_name IS NULL
       AND o.country_code = c.iso_alpha2
-""")
-print(f"Updated {cur.rowcount:,} country names")
-
-# Verify
-cur.execute("""
-    SELECT COUNT(*), COUNT(DISTINCT country_code),
-           MIN(severity_norm), MAX(severity_norm), AVG(severity_norm)
-    FROM sofia.security_observations
-    WHERE source = 'GDELT'
-""")
-total, countries, min_sev, max_sev, avg_sev = cur.fetchone()
-print(f"\nVerification:")
-print(f"  Total: {total:,} observations")
-print(f"  Countries: {countries}")
-print(f"  Severity range: {min_sev:.2f} - {max_sev:.2f} (avg: {avg_sev:.2f})")
-
-cur.close()
-conn.close()
-
-print("\n" + "="*70)
-print("GDELT NORMALIZATION COMPLETE (Per-Country Z-Score)")
-print("="*70)
+"""
+
+
+def get_watermark(cur):
+    cur.execute("""
+        SELECT last_ingested_at, stats_date
+        FROM sofia.normalizer_watermarks
+        WHERE source = %s
+    """, (SOURCE,))
+    row = cur.fetchone()
+    return row if row else (None, None)
+
+
+def set_watermark(cur, upper):
+    cur.execute("""
+        INSERT INTO sofia.normalizer_watermarks (source, last_ingested_at, stats_date, updated_at)
+        VALUES (%s, %s, CURRENT_DATE, NOW())
+        ON CONFLICT (source) DO UPDATE SET
+            last_ingested_at = EXCLUDED.last_ingested_at,
+            stats_date = EXCLUDED.stats_date,
+            updated_at = NOW()
+    """, (SOURCE, upper))
+
+
+def normalize(conn, full: bool = False) -> dict:
+    """Run one (incremental or full) pass inside a single transaction"""
+    cur = conn.cursor()
+    stats = {}
+
+    since, stats_date = get_watermark(cur)
+    cur.execute("SELECT CURRENT_DATE, MAX(ingested_at) FROM sofia.gdelt_events")
+    today, upper = cur.fetchone()
+
+    if full or since is None:
+        full = True
+        since = '-infinity'
+    else:
+        since = since - WATERMARK_OVERLAP
+    stats['mode'] = 'full' if full else 'incremental'
+    if upper is None:
+        return stats
+
+    params = {
+        'since': since,
+        'upper': upper,
+        # 30-day window slides once per day: every country's stats move
+        'all_countries': full or stats_date != today,
+    }
+
+    cur.execute(CHANGED_DAYS_SQL, params)
+    stats['changed_days'] = cur.rowcount
+
+    cur.execute(RECOUNT_SQL)
+    stats['rollup_rows'] = cur.rowcount
+
+    cur.execute(ZSCORE_SQL, params)
+    stats['rescored_days'] = cur.rowcount
+
+    cur.execute(UPSERT_SQL, params)
+    stats['upserted'] = cur.rowcount
+
+    cur.execute(DROP_UNSCORED_SQL)
+    stats['deleted'] = cur.rowcount
+    for sql in RETENTION_SQL:
+        cur.execute(sql)
+        stats['deleted'] += cur.rowcount
+    if full:
+        cur.execute(DROP_ORPHANS_SQL)
+        stats['deleted'] += cur.rowcount
+
+    cur.execute(COUNTRY_NAMES_SQL)
+    stats['country_names'] = cur.rowcount
+
+    set_watermark(cur, upper)
+    stats['watermark'] = upper
+    cur.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GDELT → security_observations normalizer')
+    parser.add_argument('--full', action='store_true', help='rebuild rollup and all 90-day observations')
+    args = parser.parse_args()
+
+    load_env()
+    conn = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        database=os.getenv("POSTGRES_DB")
+    )
+
+    print("="*70)
+    print("GDELT NORMALIZER v4: Z-Score POR PAÍS e POR JANELA (incremental)")
+    print("="*70)
+
+    start = time.time()
+    try:
+        stats = normalize(conn, full=args.full)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+
+    print(f"\nMode: {stats['mode']}")
+    if 'watermark' not in stats:
+        print("No GDELT data to normalize")
+        conn.close()
+        return
+
+    print(f"  Changed (country, day): {stats['changed_days']:,}")
+    print(f"  Rollup rows recounted:  {stats['rollup_rows']:,}")
+    print(f"  Days re-scored:         {stats['rescored_days']:,}")
+    print(f"OK Upserted {stats['upserted']:,} GDELT observations, deleted {stats['deleted']:,}")
+    print(f"Updated {stats['country_names']:,} country names")
+    print(f"Watermark: {stats['watermark']} ({time.time() - start:.1f}s)")
+
+    # Verify
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT country_code),
+               MIN(severity_norm), MAX(severity_norm), AVG(severity_norm)
+        FROM sofia.security_observations
+        WHERE source = 'GDELT'
+    """)
+    total, countries, min_sev, max_sev, avg_sev = cur.fetchone()
+    print(f"\nVerification:")
+    print(f"  Total: {total:,} observations")
+    print(f"  Countries: {countries}")
+    if total:
+        print(f"  Severity range: {min_sev:.2f} - {max_sev:.2f} (avg: {avg_sev:.2f})")
+
+    cur.close()
+    conn.close()
+
+    print("\n" + "="*70)
+    print("GDELT NORMALIZATION COMPLETE (Per-Country Z-Score)")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    main()
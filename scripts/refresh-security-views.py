@@ -7,6 +7,7 @@ Run after ACLED data is collected to update maps
 import os
 import sys
 import psycopg2
+import psycopg2.errors
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -54,6 +55,26 @@ def main():
         print('🔄 Refreshing materialized views...')
         cur.execute('SELECT sofia.refresh_security_views()')
         conn.commit()
+        refreshed = ['mv_security_country_summary', 'mv_security_geo_points', 'mv_security_momentum']
+
+        # Hybrid views back /api/security/countries (mv_security_country_combined)
+        try:
+            cur.execute('SELECT sofia.refresh_security_hybrid_views()')
+            conn.commit()
+            refreshed += ['mv_security_country_acled', 'mv_security_country_gdelt',
+                          'mv_security_country_structural', 'mv_security_country_combined']
+        except psycopg2.errors.UndefinedFunction:
+            print('⚠️  sofia.refresh_security_hybrid_views() not installed (migration 054), skipping')
+            conn.rollback()
+
+        # Invalidate API response cache entries backed by these views
+        try:
+            for view in refreshed:
+                cur.execute('SELECT sofia.mark_mv_refreshed(%s)', (view,))
+            conn.commit()
+        except psycopg2.errors.UndefinedFunction:
+            # Migration 105 not applied yet - API cache falls back to TTL
+            conn.rollback()
         print('✅ Views refreshed!\n')
 
         # Check geo points
@@ -1,5 +1,6 @@
 import os
 import psycopg2
+import psycopg2.errors
 import time
 from dotenv import load_dotenv
 
@@ -12,6 +13,14 @@ DB_USER = os.getenv("POSTGRES_USER", "postgres")
 DB_PASS = os.getenv("POSTGRES_PASSWORD")
 DB_PORT = os.getenv("POSTGRES_PORT", "5432")
 
+def mark_refreshed(cur, view_name):
+    """Bump view version + NOTIFY so the API response cache drops stale entries."""
+    try:
+        cur.execute("SELECT sofia.mark_mv_refreshed(%s)", (view_name,))
+    except psycopg2.errors.UndefinedFunction:
+        # Migration 105 not applied yet - API cache falls back to TTL
+        pass
+
 def refresh_views():
     try:
         print(f"Connecting to database {DB_NAME} at {DB_HOST}...")
@@ -36,13 +45,24 @@ def refresh_views():
         print("Refreshing materialized view: sofia.mv_security_geo_points...")
         start_time = time.time()
         cur.execute("REFRESH MATERIALIZED VIEW sofia.mv_security_geo_points;")
+        mark_refreshed(cur, "mv_security_geo_points")
         print(f"Done in {time.time() - start_time:.2f}s")
 
         print("Refreshing materialized view: sofia.mv_security_country_summary...")
         start_time = time.time()
         cur.execute("REFRESH MATERIALIZED VIEW sofia.mv_security_country_summary;")
+        mark_refreshed(cur, "mv_security_country_summary")
         print(f"Done in {time.time() - start_time:.2f}s")
         
+        print("Refreshing materialized view: sofia.mv_security_map_clusters...")
+        start_time = time.time()
+        try:
+            cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY sofia.mv_security_map_clusters;")
+            mark_refreshed(cur, "mv_security_map_clusters")
+            print(f"Done in {time.time() - start_time:.2f}s")
+        except psycopg2.errors.UndefinedTable:
+            print("Skipped: run sql/migrations/106_security_map_clusters.sql first")
+        
         # Verify View Counts
         cur.execute("SELECT count(*) FROM sofia.mv_security_geo_points;")
         points_count = cur.fetchone()[0]
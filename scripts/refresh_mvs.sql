@@ -1,11 +1,14 @@
 -- ============================================================================
 -- Refresh Materialized Views (Dependencies in Order)
 -- Run after migrations and backfill scripts
+-- API cache invalidation: trg_sofia_mv_refresh (migration 105) bumps
+-- sofia.mv_refresh_versions + NOTIFY for each REFRESH below.
 -- ============================================================================
 
 -- Core domains (no dependencies)
 REFRESH MATERIALIZED VIEW CONCURRENTLY sofia.mv_capital_analytics;
 REFRESH MATERIALIZED VIEW CONCURRENTLY sofia.mv_security_country_combined;
+REFRESH MATERIALIZED VIEW CONCURRENTLY sofia.mv_security_map_clusters;
 
 -- Talent (depends on jobs + papers)
 REFRESH MATERIALIZED VIEW CONCURRENTLY sofia.mv_skill_gap_country_summary;
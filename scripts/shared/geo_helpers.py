@@ -9,20 +9,26 @@ UPDATED 2025-12-26: Added intelligent fallbacks for common mismatches
 """
 
 import re
-from typing import Optional
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from psycopg2.extras import execute_values
 
 # Support both relative and absolute imports
 # Try different import methods to work in various contexts
 try:
     # Method 1: Relative import (when used as package)
     from .geo_id_helpers import get_city_id, get_country_id, get_state_id
+    from .geo_resolver import get_resolver
 except (ImportError, ValueError):
     try:
         # Method 2: Absolute import from shared package
         from shared.geo_id_helpers import get_city_id, get_country_id, get_state_id
+        from shared.geo_resolver import get_resolver
     except ImportError:
         # Method 3: Direct import (when script in same directory)
         from geo_id_helpers import get_city_id, get_country_id, get_state_id
+        from geo_resolver import get_resolver
 
 
 # ============================================================================
@@ -859,6 +865,32 @@ CITY_NAME_FIXES = {
 }
 
 
+# ============================================================================
+# COMPILED RULES + MEMO - Same few thousand strings repeat across millions of
+# rows, so each raw input is normalized once per process (bounded LRU).
+# ============================================================================
+
+NORMALIZER_CACHE_SIZE = 65536
+
+# Any match → city filtered out (Remote, Hybrid, placeholders, regions, lists)
+_CITY_DROP_RE = re.compile(
+    r"^remote[\s\-]|[\s\-]remote$"
+    r"|hybrid"
+    r"|;"
+    r"|^(?:distributed|flexible|in-office|on-site|virtual|anywhere|worldwide|global)"
+    r"|^(?:location|n/a|na|tbd|tba|various|multiple|latam|emea|apac|americas|europe|asia)$"
+)
+
+# Any match → not a country (remote markers, regional aggregations, placeholders)
+_COUNTRY_DROP_RE = re.compile(
+    r"^(?:remote|anywhere|worldwide|global|flexible|hybrid)"
+    r"|^(?:us|uk|ca|au|eu|apac|emea|latam|americas|europe|asia)[\s\-](?:remote|nationwide|national)"
+    r"|^(?:emea|apac|latam|americas|europe|asia|oceania|north america|south america|central america)$"
+    r"|^(?:n/a|tbd|tba|various|multiple|na)$"
+)
+
+
+@lru_cache(maxsize=NORMALIZER_CACHE_SIZE)
 def normalize_city_name(city_name: str) -> str:
     """
     Normaliza nomes de cidades malformados
@@ -870,34 +902,10 @@ def normalize_city_name(city_name: str) -> str:
     if not normalized:
         return ""
 
-    # ========== PATTERN 1: Remote work patterns ==========
-    # "Remote", "Remote - USA", "Remote - Canada: Select locations", etc.
-    if re.match(r"^remote[\s\-]", normalized) or re.search(r"[\s\-]remote$", normalized, re.IGNORECASE):
-        return ""
-
-    # "Hybrid", "Hybrid - Luxembourg", "San Francisco; Hybrid", etc.
-    if "hybrid" in normalized:
-        return ""
-
-    # "Distributed", "Flexible", "In-Office", "On-Site", "Virtual"
-    if re.match(
-        r"^(distributed|flexible|in-office|on-site|virtual|anywhere|worldwide|global)", normalized, re.IGNORECASE
-    ):
-        return ""
-
-    # ========== PATTERN 2: Multi-city lists ==========
-    # "Denver, CO;San Francisco, CA;New York, NY;..."
-    # "San Francisco, CA; New York City, NY; Austin, TX"
-    if ";" in normalized or normalized.count(",") >= 3:
-        return ""  # Too many cities, can't pick one
-
-    # ========== PATTERN 3: Invalid placeholders ==========
-    # "LOCATION", "N/A", "TBD", "NA", etc.
-    if re.match(r"^(location|n/a|na|tbd|tba|various|multiple)$", normalized, re.IGNORECASE):
-        return ""
-
-    # Regional aggregations: "LATAM", "EMEA", "APAC"
-    if re.match(r"^(latam|emea|apac|americas|europe|asia)$", normalized, re.IGNORECASE):
+    # ========== PATTERNS 1-3: Remote/Hybrid, multi-city lists, placeholders ==========
+    # "Remote - USA", "San Francisco; Hybrid", "Denver, CO;San Francisco, CA;...",
+    # "N/A", "TBD", "LATAM", "EMEA", ...
+    if _CITY_DROP_RE.search(normalized) or normalized.count(",") >= 3:
         return ""
 
     # ========== PATTERN 4: Check exact match in fixes map ==========
@@ -907,59 +915,26 @@ def normalize_city_name(city_name: str) -> str:
 
     # ========== PATTERN 5: Extract city from "City, State" format ==========
     # "Charlotte, NC" → "Charlotte"
-    # But NOT "San Francisco, CA; New York" (already filtered above)
     if "," in normalized:
         parts = normalized.split(",")
         if len(parts) == 2:
             city_part = parts[0].strip()
-            # Recursively check if the extracted city part is valid
+            # Recursively check if the extracted city part is valid (memoized)
             clean_city = normalize_city_name(city_part)
             if clean_city:
                 return clean_city
 
-    # ========== PATTERN 6: Extract city from "City; Hybrid" format ==========
-    # "San Francisco; Hybrid" → "San Francisco"
-    # "Berlin; Hybrid" → "Berlin"
-    if ";" in normalized:
-        parts = normalized.split(";")
-        first_part = parts[0].strip()
-        # Recursively check if the first part is a valid city
-        clean_city = normalize_city_name(first_part)
-        if clean_city:
-            return clean_city
-
     # Return original if no fix/filter found
     return city_name.strip()
 
 
+@lru_cache(maxsize=NORMALIZER_CACHE_SIZE)
 def apply_intelligent_fallbacks(country_name: str) -> str:
     """Aplica fallbacks inteligentes para corrigir erros comuns"""
     normalized = country_name.lower().strip()
 
-    # Ignore "Remote" and similar patterns
-    if re.match(r"^(remote|anywhere|worldwide|global|flexible|hybrid)", normalized, re.IGNORECASE):
-        return ""
-
-    # Ignore remote work prefixes/suffixes
-    if re.match(
-        r"^(us|uk|ca|au|eu|apac|emea|latam|americas|europe|asia)[\s\-](remote|nationwide|national)",
-        normalized,
-        re.IGNORECASE,
-    ):
-        return ""
-    if re.match(r"^remote[\s\-](us|uk|ca|au|in|de|fr|nl|it|es)", normalized, re.IGNORECASE):
-        return ""
-
-    # Ignore regional aggregations
-    if re.match(
-        r"^(emea|apac|latam|americas|europe|asia|oceania|north america|south america|central america)$",
-        normalized,
-        re.IGNORECASE,
-    ):
-        return ""
-
-    # Ignore non-specific location markers
-    if re.match(r"^(n/a|tbd|tba|various|multiple|na)$", normalized, re.IGNORECASE):
+    # Ignore "Remote", regional aggregations and non-specific markers
+    if _COUNTRY_DROP_RE.match(normalized):
         return ""
 
     # Try alias first
@@ -978,6 +953,18 @@ def apply_intelligent_fallbacks(country_name: str) -> str:
     return country_name
 
 
+def normalizer_cache_stats() -> dict:
+    """Hit/miss counters of the memoized normalizers."""
+    stats = {}
+    for name, fn in (("normalize_city_name", normalize_city_name),
+                     ("apply_intelligent_fallbacks", apply_intelligent_fallbacks)):
+        info = fn.cache_info()
+        total = info.hits + info.misses
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize,
+                       "maxsize": info.maxsize, "hit_rate": round(info.hits / total, 4) if total else 0.0}
+    return stats
+
+
 def get_or_create_country(conn, country_name: Optional[str]) -> Optional[int]:
     """
     Obtém um país normalizado da tabela sofia.countries
@@ -1051,6 +1038,7 @@ def get_or_create_city(
                     if result:
                         city_id = result[0]
                         conn.commit()
+                        get_resolver(cursor).add_city(city_id, normalized_name, state_id, country_id)
                         print(f"✅ Auto-created city: {normalized_name} (state_id: {state_id})")
                 except Exception as create_error:
                     # If duplicate (race condition), try to get it again
@@ -1083,3 +1071,98 @@ def normalize_location(conn, location: dict) -> dict:
     city_id = get_or_create_city(conn, location.get("city"), state_id, country_id)
 
     return {"country_id": country_id, "state_id": state_id, "city_id": city_id}
+
+
+def normalize_locations_bulk(conn, locations: Iterable[dict]) -> List[dict]:
+    """
+    Versão em lote de normalize_location para imports grandes
+
+    - Nomes de cidade passam por normalize_city_name e são deduplicados
+    - Resolução em memória (GeoResolver); nomes desconhecidos em 1 query
+    - Cidades faltantes (com state_id) criadas em UM INSERT ... ON CONFLICT
+      ... RETURNING e um único commit, em vez de um commit por cidade
+
+    Args:
+        locations: iterável de dicts com keys 'country', 'state', 'city'
+
+    Returns:
+        lista de dicts {'country_id', 'state_id', 'city_id'} na ordem de entrada
+    """
+    locations = list(locations)
+    results = []
+    pending = []  # (index, normalized_city) still needing a city_id
+
+    with conn.cursor() as cursor:
+        resolver = get_resolver(cursor)
+        seen = {}
+
+        for i, location in enumerate(locations):
+            raw_key = (location.get("country"), location.get("state"), location.get("city"))
+            if raw_key in seen:
+                results.append(None)  # filled from first occurrence below
+                continue
+            seen[raw_key] = i
+
+            country_id = get_or_create_country(conn, location.get("country"))
+            state_id = get_or_create_state(conn, location.get("state"), country_id)
+            city_name = location.get("city")
+            city = normalize_city_name(city_name) if city_name and city_name.strip() and country_id else ""
+
+            results.append({"country_id": country_id, "state_id": state_id, "city_id": None})
+            if city:
+                pending.append((i, city))
+
+        # Miss path: one query for every city name the index doesn't know yet
+        resolver.prefetch_cities(cursor, [city for _, city in pending])
+
+        to_create = {}
+        for i, city in pending:
+            res = results[i]
+            res["city_id"] = resolver.city_id(city, res["state_id"], res["country_id"])
+            if not res["city_id"] and res["state_id"]:
+                to_create.setdefault((city.lower(), res["state_id"]), (city, res["state_id"], res["country_id"]))
+
+        if to_create:
+            try:
+                rows = execute_values(
+                    cursor,
+                    """INSERT INTO sofia.cities (name, state_id, country_id, created_at)
+                       VALUES %s
+                       ON CONFLICT (name, state_id, country_id) DO NOTHING
+                       RETURNING id, name, state_id, country_id""",
+                    list(to_create.values()),
+                    template="(%s, %s, %s, NOW())",
+                    fetch=True,
+                )
+                # Rows skipped by ON CONFLICT were created concurrently: fetch them
+                created = {(name.lower(), state_id) for _, name, state_id, _ in rows}
+                conflicted = [v for k, v in to_create.items() if k not in created]
+                if conflicted:
+                    cursor.execute(
+                        """SELECT c.id, c.name, c.state_id, c.country_id
+                           FROM sofia.cities c
+                           JOIN unnest(%s::text[], %s::int[], %s::int[]) AS t(name, state_id, country_id)
+                             ON c.name = t.name AND c.state_id = t.state_id AND c.country_id = t.country_id""",
+                        ([v[0] for v in conflicted], [v[1] for v in conflicted], [v[2] for v in conflicted]),
+                    )
+                    rows += cursor.fetchall()
+                conn.commit()
+                print(f"✅ Auto-created {len(created)} cities (bulk)")
+
+                for row in rows:
+                    resolver.add_city(*row)
+                for i, city in pending:
+                    res = results[i]
+                    if not res["city_id"]:
+                        res["city_id"] = resolver.city_id(city, res["state_id"], res["country_id"])
+            except Exception as e:
+                conn.rollback()
+                print(f"⚠️  Failed to bulk-create {len(to_create)} cities: {e}")
+
+    # Duplicates share the first occurrence's IDs
+    for i, location in enumerate(locations):
+        first = seen[(location.get("country"), location.get("state"), location.get("city"))]
+        if first != i:
+            results[i] = dict(results[first])
+
+    return results
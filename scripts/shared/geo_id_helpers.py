@@ -21,17 +21,21 @@ cursor.execute('''
 
 from typing import Optional
 
-# Eurostat-specific country code mappings
-EUROSTAT_MAPPINGS = {
-    "EL": "GR",  # Greece
-    "UK": "GB",  # United Kingdom
-}
+# Support both relative and absolute imports (same pattern as geo_helpers)
+try:
+    from .geo_resolver import get_resolver
+except (ImportError, ValueError):
+    try:
+        from shared.geo_resolver import get_resolver
+    except ImportError:
+        from geo_resolver import get_resolver
 
 
 def get_country_id(cursor, country_input: Optional[str]) -> Optional[int]:
     """
     Get country ID from normalized countries table.
-    Tries multiple strategies: ISO alpha2, ISO alpha3, common name.
+    Tries multiple strategies: ISO alpha2, ISO alpha3, common name, aliases.
+    Resolved in memory by the process-wide GeoResolver (loaded on first call).
 
     Args:
         cursor: Database cursor
@@ -43,43 +47,17 @@ def get_country_id(cursor, country_input: Optional[str]) -> Optional[int]:
     if not country_input:
         return None
 
-    country = country_input.strip()
-
-    # Strategy 1: Try ISO alpha2 (US, BR, GB, etc.)
-    if len(country) == 2:
-        cursor.execute("SELECT id FROM sofia.countries WHERE iso_alpha2 = %s", (country.upper(),))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-
-    # Strategy 2: Try ISO alpha3 (USA, BRA, GBR, etc.)
-    if len(country) == 3:
-        cursor.execute("SELECT id FROM sofia.countries WHERE iso_alpha3 = %s", (country.upper(),))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-
-    # Strategy 3: Try common name (case-insensitive)
-    cursor.execute("SELECT id FROM sofia.countries WHERE LOWER(common_name) = LOWER(%s)", (country,))
-    result = cursor.fetchone()
-    if result:
-        return result[0]
-
-    # Strategy 4: Try Eurostat-specific codes
-    if country.upper() in EUROSTAT_MAPPINGS:
-        mapped_code = EUROSTAT_MAPPINGS[country.upper()]
-        cursor.execute("SELECT id FROM sofia.countries WHERE iso_alpha2 = %s", (mapped_code,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
+    country_id = get_resolver(cursor).country_id(country_input)
+    if country_id:
+        return country_id
 
-    print(f'⚠️  Country not found: "{country}"')
+    print(f'⚠️  Country not found: "{country_input.strip()}"')
     return None
 
 
 def get_state_id(cursor, state_name: Optional[str], country_id: Optional[int]) -> Optional[int]:
     """
-    Get state ID from normalized states table.
+    Get state ID from normalized states table (in-memory index).
 
     Args:
         cursor: Database cursor
@@ -92,28 +70,19 @@ def get_state_id(cursor, state_name: Optional[str], country_id: Optional[int]) -
     if not state_name or not country_id:
         return None
 
-    state = state_name.strip()
-
-    # Try by state code (e.g., "CA" for California)
-    if len(state) == 2:
-        cursor.execute("SELECT id FROM sofia.states WHERE code = %s AND country_id = %s", (state.upper(), country_id))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-
-    # Try by state name (case-insensitive)
-    cursor.execute("SELECT id FROM sofia.states WHERE LOWER(name) = LOWER(%s) AND country_id = %s", (state, country_id))
-    result = cursor.fetchone()
-    if result:
-        return result[0]
+    state_id = get_resolver(cursor).state_id(state_name, country_id)
+    if state_id:
+        return state_id
 
-    print(f'⚠️  State not found: "{state}" in country {country_id}')
+    print(f'⚠️  State not found: "{state_name.strip()}" in country {country_id}')
     return None
 
 
 def get_city_id(cursor, city_name: Optional[str], state_id: Optional[int], country_id: Optional[int]) -> Optional[int]:
     """
-    Get city ID from normalized cities table.
+    Get city ID from normalized cities table (in-memory index).
+    Unknown names fall back to one DB query (cities created by other
+    processes after the index was loaded); confirmed misses are remembered.
 
     Args:
         cursor: Database cursor
@@ -127,31 +96,15 @@ def get_city_id(cursor, city_name: Optional[str], state_id: Optional[int], count
     if not city_name:
         return None
 
-    city = city_name.strip()
-
-    # Try with state_id if available
-    if state_id:
-        cursor.execute("SELECT id FROM sofia.cities WHERE LOWER(name) = LOWER(%s) AND state_id = %s", (city, state_id))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-
-    # Try with only country_id
-    if country_id:
-        cursor.execute(
-            "SELECT id FROM sofia.cities WHERE LOWER(name) = LOWER(%s) AND country_id = %s", (city, country_id)
-        )
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-
-    # Try without any parent (last resort)
-    cursor.execute("SELECT id FROM sofia.cities WHERE LOWER(name) = LOWER(%s) LIMIT 1", (city,))
-    result = cursor.fetchone()
-    if result:
-        return result[0]
+    resolver = get_resolver(cursor)
+    city_id = resolver.city_id(city_name, state_id, country_id)
+    if not city_id and not resolver.city_known_missing(city_name):
+        if resolver.prefetch_cities(cursor, [city_name]):
+            city_id = resolver.city_id(city_name, state_id, country_id)
+    if city_id:
+        return city_id
 
-    print(f'⚠️  City not found: "{city}"')
+    print(f'⚠️  City not found: "{city_name.strip()}"')
     return None
 
 
@@ -183,7 +136,7 @@ def get_religion_id(cursor, religion_name: Optional[str]) -> Optional[int]:
 def get_country_ids_batch(cursor) -> dict:
     """
     Batch load all countries into a dictionary for fast lookups.
-    More efficient than calling get_country_id repeatedly.
+    Prefer get_resolver(cursor).country_id(), which also covers aliases.
 
     Returns:
         Dictionary mapping country codes/names to IDs
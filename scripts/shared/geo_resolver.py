@@ -0,0 +1,212 @@
+"""
+Geographic Resolver (Python) - in-memory geo ID index
+
+Carrega países, estados e cidades (com aliases) UMA vez por processo e
+resolve tudo em memória. Substitui os 3-4 SELECTs sequenciais por registro
+de get_country_id / get_state_id / get_city_id.
+
+USAGE:
+```python
+from shared.geo_resolver import get_resolver
+
+resolver = get_resolver(cursor)           # loads once, then reused
+country_id = resolver.country_id('United States')
+state_id = resolver.state_id('CA', country_id)
+city_id = resolver.city_id('San Francisco', state_id, country_id)
+
+# Miss path: warm many unknown city names with a single query
+resolver.prefetch_cities(cursor, ['Campinas', 'Joinville', ...])
+```
+
+Lookup order is identical to geo_id_helpers (ISO2 → ISO3 → name →
+Eurostat), plus sofia.country_aliases as a last resort when present.
+"""
+
+import re
+import threading
+from typing import Iterable, Optional
+
+# Eurostat-specific country code mappings
+EUROSTAT_MAPPINGS = {
+    "EL": "GR",  # Greece
+    "UK": "GB",  # United Kingdom
+}
+
+_ALIAS_NORM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def _alias_norm(value: str) -> str:
+    # Same normalization as sofia.country_aliases.alias_norm (migration 015)
+    return _ALIAS_NORM_RE.sub("", value.lower())
+
+
+class GeoResolver:
+    """Dict indexes over sofia.countries / sofia.states / sofia.cities."""
+
+    def __init__(self):
+        self.loaded = False
+        self.country_by_iso2 = {}
+        self.country_by_iso3 = {}
+        self.country_by_name = {}
+        self.country_by_alias = {}
+        self.state_by_code = {}      # (CODE, country_id) -> id
+        self.state_by_name = {}      # (name_lower, country_id) -> id
+        self.city_by_state = {}      # (name_lower, state_id) -> id
+        self.city_by_country = {}    # (name_lower, country_id) -> id
+        self.city_by_name = {}       # name_lower -> lowest id
+        self._city_misses = set()    # names confirmed absent from sofia.cities
+        self.stats = {"hits": 0, "misses": 0, "db_queries": 0}
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load(self, cursor):
+        """Bulk-load all geo tables (one query per table)."""
+        cursor.execute("SELECT id, iso_alpha2, iso_alpha3, common_name FROM sofia.countries")
+        for country_id, iso2, iso3, name in cursor.fetchall():
+            if iso2:
+                self.country_by_iso2[iso2.upper()] = country_id
+            if iso3:
+                self.country_by_iso3[iso3.upper()] = country_id
+            if name:
+                self.country_by_name.setdefault(name.lower(), country_id)
+
+        cursor.execute("SELECT to_regclass('sofia.country_aliases') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT country_code, alias_norm FROM sofia.country_aliases")
+            for iso2, alias_norm in cursor.fetchall():
+                country_id = self.country_by_iso2.get((iso2 or "").strip().upper())
+                if country_id and alias_norm:
+                    self.country_by_alias.setdefault(alias_norm, country_id)
+
+        cursor.execute("SELECT id, code, name, country_id FROM sofia.states")
+        for state_id, code, name, country_id in cursor.fetchall():
+            if code:
+                self.state_by_code.setdefault((code.upper(), country_id), state_id)
+            if name:
+                self.state_by_name.setdefault((name.lower(), country_id), state_id)
+
+        cursor.execute("SELECT id, name, state_id, country_id FROM sofia.cities ORDER BY id")
+        for row in cursor.fetchall():
+            self.add_city(*row)
+
+        self.stats["db_queries"] += 5
+        self.loaded = True
+
+    def add_city(self, city_id: int, name: str, state_id: Optional[int], country_id: Optional[int]):
+        """Register a city (bulk load, prefetch or freshly INSERTed rows)."""
+        if not name:
+            return
+        key = name.lower()
+        if state_id:
+            self.city_by_state.setdefault((key, state_id), city_id)
+        if country_id:
+            self.city_by_country.setdefault((key, country_id), city_id)
+        self.city_by_name.setdefault(key, city_id)
+        self._city_misses.discard(key)
+
+    def prefetch_cities(self, cursor, names: Iterable[str]) -> int:
+        """
+        Miss path: resolve all unknown city names with ONE query.
+        Picks up cities created by other processes after load().
+        """
+        unknown = {n.strip().lower() for n in names if n and n.strip()}
+        unknown = [n for n in unknown if n not in self.city_by_name and n not in self._city_misses]
+        if not unknown:
+            return 0
+
+        cursor.execute(
+            "SELECT id, name, state_id, country_id FROM sofia.cities WHERE LOWER(name) = ANY(%s) ORDER BY id",
+            (unknown,),
+        )
+        rows = cursor.fetchall()
+        self.stats["db_queries"] += 1
+        for row in rows:
+            self.add_city(*row)
+        self._city_misses.update(n for n in unknown if n not in self.city_by_name)
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # Lookups (pure in-memory)
+    # ------------------------------------------------------------------
+
+    def _hit(self, value):
+        self.stats["hits" if value else "misses"] += 1
+        return value
+
+    def country_id(self, country_input: Optional[str]) -> Optional[int]:
+        if not country_input:
+            return None
+        country = country_input.strip()
+        upper = country.upper()
+
+        if len(country) == 2 and upper in self.country_by_iso2:
+            return self._hit(self.country_by_iso2[upper])
+        if len(country) == 3 and upper in self.country_by_iso3:
+            return self._hit(self.country_by_iso3[upper])
+
+        found = self.country_by_name.get(country.lower())
+        if found:
+            return self._hit(found)
+
+        if upper in EUROSTAT_MAPPINGS:
+            found = self.country_by_iso2.get(EUROSTAT_MAPPINGS[upper])
+            if found:
+                return self._hit(found)
+
+        return self._hit(self.country_by_alias.get(_alias_norm(country)))
+
+    def state_id(self, state_name: Optional[str], country_id: Optional[int]) -> Optional[int]:
+        if not state_name or not country_id:
+            return None
+        state = state_name.strip()
+
+        if len(state) == 2:
+            found = self.state_by_code.get((state.upper(), country_id))
+            if found:
+                return self._hit(found)
+
+        return self._hit(self.state_by_name.get((state.lower(), country_id)))
+
+    def city_id(self, city_name: Optional[str], state_id: Optional[int], country_id: Optional[int]) -> Optional[int]:
+        if not city_name:
+            return None
+        key = city_name.strip().lower()
+
+        if state_id:
+            found = self.city_by_state.get((key, state_id))
+            if found:
+                return self._hit(found)
+        if country_id:
+            found = self.city_by_country.get((key, country_id))
+            if found:
+                return self._hit(found)
+
+        return self._hit(self.city_by_name.get(key))
+
+    def city_known_missing(self, city_name: str) -> bool:
+        return city_name.strip().lower() in self._city_misses
+
+
+_resolver: Optional[GeoResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver(cursor) -> GeoResolver:
+    """Process-wide resolver; loaded on first call using the given cursor."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                resolver = GeoResolver()
+                resolver.load(cursor)
+                _resolver = resolver
+    return _resolver
+
+
+def reset_resolver():
+    """Drop the process-wide index (next get_resolver() reloads)."""
+    global _resolver
+    with _resolver_lock:
+        _resolver = None
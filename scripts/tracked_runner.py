@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
-import sys, os, json, subprocess, uuid, time, fcntl, socket
+import sys, os, json, uuid, time, fcntl, socket
 import psycopg2
 from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from lib.metrics_channel import MetricsChannel, format_event
+from lib.process_supervisor import LineProgress, supervise
+from lib.term_index import refresh_for_collector, sources_for_collector
 
 # OPTIONAL DOTENV
 try:
@@ -173,36 +179,36 @@ def run_collector(collector_id):
     start_ts = time.time()
     duration = None
 
-    # PATCH 1: file paths for stdout/stderr (anti-OOM)
-    out_path = os.path.join(LOG_DIR, collector_id, f"{run_id}.out")
-    err_path = os.path.join(LOG_DIR, collector_id, f"{run_id}.err")
+    # PATCH 1: file paths for stdout/stderr (anti-OOM) — streamed + rotated by lib/process_supervisor
+    log_prefix = os.path.join(LOG_DIR, collector_id, run_id)
+    out_path, err_path = f"{log_prefix}.out", f"{log_prefix}.err"
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
     try:
-        # C. EXECUTE — write directly to files, never to RAM
+        # C. EXECUTE — stream to rotating files, only bounded tails in RAM
         env = {**os.environ, "PYTHONUNBUFFERED": "1", "SOFIA_RUN_ID": run_id}
+        result = None
 
         # PATCH 3: BaseException to catch SIGTERM/KeyboardInterrupt
         try:
-            with open(out_path, "wb") as stdout_f, open(err_path, "wb") as stderr_f:
-                proc = subprocess.run(
+            # Canal de métricas: progresso ao vivo + resultado V2 sem parse de stdout
+            with MetricsChannel(on_event=_live_progress(collector_id)) as channel:
+                result = supervise(
                     cfg["cmd"],
-                    stdout=stdout_f,
-                    stderr=stderr_f,
-                    text=False,
                     timeout=cfg["timeout"],
-                    env=env,
+                    env={**env, **channel.env},
+                    pass_fds=channel.pass_fds,
+                    log_prefix=log_prefix,
+                    tail_bytes=20_000,  # large enough for JSON parse
+                    on_line=LineProgress(_live_progress(collector_id)),
                 )
-            exit_code = proc.returncode
-
-        except subprocess.TimeoutExpired:
-            status = "timeout"
-            exit_code = -1
-            error_msg = f"Timed out after {cfg['timeout']}s"
-            with open(err_path, "ab") as f:
-                f.write(f"\n[Runner] Timeout after {cfg['timeout']}s\n".encode())
+            exit_code = result.returncode
+            if result.timed_out:
+                status = "timeout"
+                exit_code = -1
+                error_msg = f"Timed out after {cfg['timeout']}s"
 
-        except BaseException as e:  # PATCH 3: catch kill/restart signals
+        except BaseException as e:  # PATCH 3: catch kill/restart signals (collector group already killed)
             status = "failed"
             exit_code = -1
             error_msg = f"[Runner] Aborted: {type(e).__name__}: {e}"
@@ -212,20 +218,21 @@ def run_collector(collector_id):
 
         duration = int((time.time() - start_ts) * 1000)
 
-        # D. READ TAILS (anti-OOM: only last N bytes)
-        stdout = _tail_file(out_path, 20_000)  # large enough for JSON parse
-        stderr = _tail_file(err_path, 20_000)
-        stdout_tail = _tail_file(out_path, 1_000)
-        stderr_tail = _tail_file(err_path, 1_000)
+        # D. TAILS (anti-OOM: ring buffers, never the full output)
+        stdout = result.stdout_tail
+        stderr = result.stderr_tail
+        stdout_tail = stdout[-1_000:]
+        stderr_tail = stderr[-1_000:]
 
         # E. PROCESS RESULT
         if status != "timeout":
             if exit_code == 0:
                 if cfg.get("v2"):
-                    metrics = _parse_json_last_lines(stdout)
+                    streamed = channel.snapshot()
+                    metrics = streamed["result"] or _parse_json_last_lines(stdout)
                     if not metrics:
                         status = "invalid_output"
-                        error_msg = "V2: No valid JSON in last 5 lines of stdout"
+                        error_msg = "V2: No result event on metrics channel and no valid JSON in last 5 lines of stdout"
                     else:
                         metrics = _normalize_metrics(metrics)
                         valid, err = _validate_schema(metrics)
@@ -237,6 +244,10 @@ def run_collector(collector_id):
                             error_msg = f"Collector reported failure: {json.dumps(metrics.get('meta', {}))}"
                         else:
                             status = "success"
+                        if streamed["phases_ms"] or streamed["counters"]:
+                            meta = dict(metrics.get("meta") or {})
+                            meta.update(phases_ms=streamed["phases_ms"], counters=streamed["counters"])
+                            metrics["meta"] = meta
                 else:
                     status = "success"
                     metrics = {"meta": {"legacy_mode": True}}
@@ -265,6 +276,16 @@ def run_collector(collector_id):
         else:
             print(f"⚠️ DB update skipped (init failed). Logs at {log_path}")
 
+        # I. TERM INDEX (lib/term_index.py) das fontes que esse collector alimenta
+        if status == "success" and sources_for_collector(collector_id):
+            try:
+                conn = psycopg2.connect(DB_URL)
+                for s in refresh_for_collector(collector_id, conn):
+                    print(f"[TermIndex] {s['source']}: {s['docs']} docs, {s['postings']} postings in {s['seconds']}s")
+                conn.close()
+            except Exception as e:
+                print(f"⚠️ Term index refresh failed: {e}")
+
     finally:
         # PATCH 3: ensure DB record is closed on SIGTERM/uncaught exception
         if db_started and not finalized:
@@ -419,6 +440,14 @@ def _save_final_state(cid, rid, status, exit_code, error_msg, metrics):
         pass  # Non-fatal
 
 
+def _live_progress(collector_id):
+    """Imprime progresso/fases do canal de métricas enquanto o collector roda."""
+    def on_event(event):
+        if event.get("type") in ("progress", "phase"):
+            print(f"   📈 {collector_id}: {format_event(event)}", flush=True)
+    return on_event
+
+
 def _parse_json_last_lines(stdout):
     if not stdout:
         return None
@@ -64,8 +64,21 @@ def render_cross_signals_block(json_path: Optional[Path] = None) -> str:
     block += f"HIGH={conf_dist.get('HIGH', 0)}, MEDIUM={conf_dist.get('MEDIUM', 0)}, LOW={conf_dist.get('LOW', 0)}\n"
     block += "\n"
 
-    # Data quality warnings
+    # Source health (snapshot shared with the builder and the operational report)
     data_quality = data.get('data_quality', {})
+    sources = data.get('sources', [])
+    if sources:
+        ok_count = sum(1 for s in sources if s.get('status') == 'ok')
+        degraded = [s['source_id'] for s in sources if s.get('status') in ('partial', 'offline', 'missing')]
+        snapshot_id = data_quality.get('source_health', {}).get('snapshot_id')
+        block += f"Source Health: {ok_count}/{len(sources)} ok"
+        if degraded:
+            block += f" (degraded: {', '.join(degraded)})"
+        if snapshot_id:
+            block += f" [snapshot #{snapshot_id}]"
+        block += "\n\n"
+
+    # Data quality warnings
     warnings = data_quality.get('warnings', [])
     if warnings:
         block += "⚠️  DATA QUALITY ALERTS:\n"
@@ -1,7 +1,8 @@
 """Sofia Skill: budget.guard — Block por padrão quando custo excede limite."""
 
-import os, time, psycopg2
-from lib.helpers import ok, fail, DB_URL
+import os, time
+from lib.helpers import ok, fail
+from lib.db_pool import db_connection
 
 
 def execute(trace_id, actor, dry_run, params, context):
@@ -9,21 +10,21 @@ def execute(trace_id, actor, dry_run, params, context):
     try:
         scope, scope_id = params["scope"], params["scope_id"]
         estimated = params.get("estimated_cost", 0)
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-
-        cur.execute("SELECT limit_cost FROM sofia.budget_limits WHERE scope=%s AND scope_id=%s AND active=TRUE", (scope, scope_id))
-        row = cur.fetchone()
-        if not row:
-            cur.execute("SELECT limit_cost FROM sofia.budget_limits WHERE scope='day' AND scope_id='global' AND active=TRUE")
+        with db_connection(context) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT limit_cost FROM sofia.budget_limits WHERE scope=%s AND scope_id=%s AND active=TRUE", (scope, scope_id))
             row = cur.fetchone()
-        limit_cost = float(row[0]) if row else 10.0
-
-        if scope == "day":
-            cur.execute("SELECT COALESCE(SUM(cost),0) FROM sofia.budget_usage WHERE scope=%s AND scope_id=%s AND created_at>=CURRENT_DATE", (scope, scope_id))
-        else:
-            cur.execute("SELECT COALESCE(SUM(cost),0) FROM sofia.budget_usage WHERE scope=%s AND scope_id=%s", (scope, scope_id))
-        current = float(cur.fetchone()[0])
-        cur.close(); conn.close()
+            if not row:
+                cur.execute("SELECT limit_cost FROM sofia.budget_limits WHERE scope='day' AND scope_id='global' AND active=TRUE")
+                row = cur.fetchone()
+            limit_cost = float(row[0]) if row else 10.0
+
+            if scope == "day":
+                cur.execute("SELECT COALESCE(SUM(cost),0) FROM sofia.budget_usage WHERE scope=%s AND scope_id=%s AND created_at>=CURRENT_DATE", (scope, scope_id))
+            else:
+                cur.execute("SELECT COALESCE(SUM(cost),0) FROM sofia.budget_usage WHERE scope=%s AND scope_id=%s", (scope, scope_id))
+            current = float(cur.fetchone()[0])
+            cur.close()
 
         remaining = limit_cost - current
         allowed = (current + estimated) <= limit_cost
@@ -47,8 +48,9 @@ def execute(trace_id, actor, dry_run, params, context):
 def record_usage(trace_id, scope, scope_id, skill, provider, cost, tokens_in=0, tokens_out=0, requests=1):
     """Registra gasto após execução."""
     try:
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-        cur.execute("INSERT INTO sofia.budget_usage (scope,scope_id,trace_id,skill,provider,cost,tokens_in,tokens_out,requests) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)",
-                    (scope, scope_id, trace_id, skill, provider, cost, tokens_in, tokens_out, requests))
-        conn.commit(); cur.close(); conn.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO sofia.budget_usage (scope,scope_id,trace_id,skill,provider,cost,tokens_in,tokens_out,requests) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)",
+                        (scope, scope_id, trace_id, skill, provider, cost, tokens_in, tokens_out, requests))
+            conn.commit(); cur.close()
     except Exception: pass
@@ -5,11 +5,41 @@ Nomenclatura canônica:
 - collector_path: path do script — OPCIONAL (resolvido do inventory se não passar)
 
 O cron/n8n/pipeline só passa collector_id. Ponto.
+
+Modo warm (params.warm ou SOFIA_COLLECT_WARM=true): collectors .py que
+expõem run(params) -> {"fetched","saved","skipped"} rodam num worker
+pré-aquecido (lib/collector_runtime.py) em vez de `python3 path`. Os
+demais continuam em subprocess.
+
+Métricas: contadores fetched/saved/skipped e fases vêm do canal tipado
+(lib/metrics_channel.py, fd SOFIA_METRICS_FD); regex no stdout só como
+fallback para collectors que ainda não emitem.
+
+Banco: conexões do pool injetado (context["db"], lib/db_pool.py); start/finish
+do run vão para o buffer em lote context["run_state"] (lib/run_state.py).
+
+Saída: stdout/stderr em streaming (lib/process_supervisor.py) para
+$SOFIA_LOG_DIR/collectors/<collector_id>/<run_id>.out|.err com rotação;
+em RAM só os tails.
 """
 
-import os, re, subprocess, time, uuid, json, psycopg2
-from lib.helpers import ok, fail, DB_URL
+import os, re, subprocess, time, uuid, json
+from lib.helpers import ok, fail
+from lib.db_pool import db_connection, get_pool
+from lib.run_state import get_run_state
 from lib.fs_bootstrap import ensure_directories
+from lib.collector_runtime import TaskTimeout, get_warm_pool, has_run_entry
+from lib.metrics_channel import STANDARD_COUNTERS, MetricsChannel
+from lib.process_supervisor import supervise
+from lib.term_index import refresh_for_collector
+
+
+def warmup(context):
+    """Preload do skill runner: diretórios, pool do banco e runtime warm (se ligado)."""
+    ensure_directories()
+    (context.get("db") or get_pool()).warm(1)
+    if os.getenv("SOFIA_COLLECT_WARM", "false").lower() == "true":
+        get_warm_pool()
 
 
 def execute(trace_id, actor, dry_run, params, context):
@@ -30,7 +60,7 @@ def execute(trace_id, actor, dry_run, params, context):
         # --- Resolver path: explícito ou via inventory ---
         path = params.get("collector_path")
         if not path:
-            path = _resolve_path(cid)
+            path = _resolve_path(cid, context)
         if not path:
             return fail("INVENTORY_NOT_FOUND", f"No path for collector_id={cid}. Pass collector_path or register in inventory.", start)
         if not os.path.exists(path):
@@ -56,18 +86,41 @@ def execute(trace_id, actor, dry_run, params, context):
         env_vars = {**os.environ, "SOFIA_TRACE_ID": trace_id, "SOFIA_RUN_ID": run_id}
         timeout_s = params.get("timeout_ms", 300000) // 1000
 
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout_s, env=env_vars)
+        warm = params.get("warm", os.getenv("SOFIA_COLLECT_WARM", "false").lower() == "true")
+        mode = "warm" if warm and has_run_entry(path) else "subprocess"
+        log_paths = []
+        if mode == "warm":
+            returncode, output, stderr, metrics, channel, error_code = _run_warm(path, params, timeout_s, trace_id, run_id)
+        else:
+            with MetricsChannel() as metrics_channel:
+                result = supervise(cmd, timeout=timeout_s, env={**env_vars, **metrics_channel.env},
+                                   pass_fds=metrics_channel.pass_fds,
+                                   log_prefix=os.path.join(fs_setup["collectors_dir"], cid, run_id))
+            if result.timed_out:
+                raise subprocess.TimeoutExpired(cmd, timeout_s)
+            returncode, stderr, error_code = result.returncode, result.stderr_tail, None
+            output = result.output_tail  # regex de fallback só precisa do fim
+            channel = metrics_channel.snapshot()
+            metrics = None
+            log_paths = result.log_paths
         duration_ms = round((time.time() - start) * 1000)
-        output = (result.stdout or "") + (result.stderr or "")
 
-        fetched = _extract(output, r"(?:fetched|collected|found)[:\s]+(\d+)") or 0
-        saved = _extract(output, r"(?:saved|inserted|upserted)[:\s]+(\d+)") or 0
-        skipped = _extract(output, r"(?:skipped|duplicat|ignored)[:\s]+(\d+)") or 0
+        # Métricas estruturadas (run() ou canal SOFIA_METRICS_FD) antes do regex
+        counters = channel.get("counters", {})
+        if not metrics and any(k in counters for k in STANDARD_COUNTERS):
+            metrics = counters
+        if metrics:
+            fetched = int(metrics.get("fetched") or 0)
+            saved = int(metrics.get("saved") or 0)
+            skipped = int(metrics.get("skipped") or 0)
+        else:
+            fetched = _extract(output, r"(?:fetched|collected|found)[:\s]+(\d+)") or 0
+            saved = _extract(output, r"(?:saved|inserted|upserted)[:\s]+(\d+)") or 0
+            skipped = _extract(output, r"(?:skipped|duplicat|ignored)[:\s]+(\d+)") or 0
 
         # --- Classificar erro baseado em stderr ---
-        error_code = None
-        stderr_lower = (result.stderr or "").lower()
-        if result.returncode != 0:
+        stderr_lower = stderr.lower()
+        if returncode != 0 and error_code is None:
             # FS_ERROR: permission denied, no such file or directory (paths), errno 2/13
             if any(x in stderr_lower for x in ["no such file or directory", "permission denied", "errno 2", "errno 13", "filenotfounderror"]):
                 # Distinguir: se é sobre módulo Python/Node → DEPENDENCY_MISSING
@@ -86,31 +139,54 @@ def execute(trace_id, actor, dry_run, params, context):
             else:
                 error_code = "SCRIPT_ERROR"
 
-        _record_finish(run_id, duration_ms, fetched, saved, skipped,
-                       result.returncode, result.returncode == 0, error_code, result.stderr[:500] if error_code else None)
+        _record_finish(context, run_id, duration_ms, fetched, saved, skipped,
+                       returncode, returncode == 0, error_code, stderr[-500:] if error_code else None)
 
-        if result.returncode != 0:
-            return fail(error_code, f"Exit {result.returncode}: {(result.stderr or '')[:500]}", start, retryable=(error_code == "COLLECT_SOURCE_DOWN"))
+        if returncode != 0:
+            return fail(error_code, f"Exit {returncode}: {stderr[-500:]}", start, retryable=(error_code == "COLLECT_SOURCE_DOWN"))
         if fetched == 0 and saved == 0 and not params.get("force"):
             return fail("COLLECT_EMPTY", "Zero records fetched and saved", start)
 
+        # Índice de termos (lib/term_index.py) das fontes que esse collector alimenta
+        if saved:
+            try:
+                refresh_for_collector(cid)
+            except Exception as e:
+                warnings.append({"code": "TERM_INDEX_STALE", "message": str(e)[:200]})
+
         return ok({"run_id": run_id, "collector_id": cid, "collector_path": path,
                     "fetched": fetched, "saved": saved, "skipped": skipped,
-                    "duration_ms": duration_ms, "exit_code": result.returncode}, start, warnings=warnings)
+                    "duration_ms": duration_ms, "exit_code": returncode,
+                    "mode": mode, "phases_ms": channel.get("phases_ms", {}),
+                    "log_paths": log_paths}, start, warnings=warnings)
 
-    except subprocess.TimeoutExpired:
-        _record_finish(run_id, round((time.time()-start)*1000), 0,0,0,-1, False, "TIMEOUT", "Timed out")
+    except (subprocess.TimeoutExpired, TaskTimeout):
+        _record_finish(context, run_id, round((time.time()-start)*1000), 0,0,0,-1, False, "TIMEOUT", "Timed out")
         return fail("TIMEOUT", "Collector timed out", start, retryable=True)
     except Exception as e:
         return fail("UNKNOWN_ERROR", str(e), start)
 
 
-def _resolve_path(collector_id):
+def _run_warm(path, params, timeout_s, trace_id, run_id):
+    """Executa run(params) num worker quente. Retorna (returncode, output, stderr, metrics, channel, error_code)."""
+    run_params = {k: params[k] for k in ("args", "since", "until", "limit", "force") if k in params}
+    result = get_warm_pool().submit(path, run_params, timeout_s,
+                                    env={"SOFIA_TRACE_ID": trace_id, "SOFIA_RUN_ID": run_id})
+    output = result.get("output", "")
+    channel = result.get("channel") or {}
+    if result["ok"]:
+        return 0, output, "", result.get("metrics") or {}, channel, None
+    stderr = f"{result.get('error', '')}\n{output[-2000:]}"
+    return 1, output, stderr, {}, channel, result.get("error_code", "SCRIPT_ERROR")
+
+
+def _resolve_path(collector_id, context=None):
     """Busca path no inventory. None se não encontrar."""
     try:
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-        cur.execute("SELECT path FROM sofia.collector_inventory WHERE collector_id=%s AND enabled=TRUE", (collector_id,))
-        row = cur.fetchone(); cur.close(); conn.close()
+        with db_connection(context) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT path FROM sofia.collector_inventory WHERE collector_id=%s AND enabled=TRUE", (collector_id,))
+            row = cur.fetchone(); cur.close()
         return row[0] if row else None
     except: return None
 
@@ -120,22 +196,13 @@ def _extract(text, pattern):
     return int(m.group(1)) if m else None
 
 
+def _run_state(ctx):
+    return (ctx or {}).get("run_state") or get_run_state()
+
+
 def _record_start(run_id, trace_id, cid, path, actor, params, ctx):
-    try:
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-        cur.execute("INSERT INTO sofia.collector_runs (run_id,trace_id,collector_name,collector_path,actor,params,env) VALUES (%s,%s,%s,%s,%s,%s::jsonb,%s)",
-                    (run_id, trace_id, cid, path, actor, json.dumps(params), ctx.get("env","prod")))
-        conn.commit(); cur.close(); conn.close()
-    except Exception as e:
-        # Debug: não silenciar erros
-        import sys
-        print(f"[DEBUG] _record_start failed: {e}", file=sys.stderr)
+    _run_state(ctx).start(run_id, trace_id, cid, path, actor, json.dumps(params), ctx.get("env", "prod"))
 
 
-def _record_finish(run_id, dur, fetched, saved, skipped, exit_code, is_ok, err_code, err_msg):
-    try:
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-        cur.execute("UPDATE sofia.collector_runs SET finished_at=NOW(),duration_ms=%s,fetched=%s,saved=%s,skipped=%s,exit_code=%s,ok=%s,error_code=%s,error_message=%s WHERE run_id=%s",
-                    (dur, fetched, saved, skipped, exit_code, is_ok, err_code, err_msg, run_id))
-        conn.commit(); cur.close(); conn.close()
-    except: pass
+def _record_finish(ctx, run_id, dur, fetched, saved, skipped, exit_code, is_ok, err_code, err_msg):
+    _run_state(ctx).finish(run_id, dur, fetched, saved, skipped, exit_code, is_ok, err_code, err_msg)
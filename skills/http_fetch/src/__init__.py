@@ -1,12 +1,157 @@
-"""Sofia Skill: http.fetch — HTTP client com retry, backoff, rate-limit."""
+"""Sofia Skill: http.fetch — HTTP client com retry, backoff, rate-limit, sessões e cache condicional."""
 
-import time, threading, requests as req
-from urllib.parse import urlencode
-from lib.helpers import ok, fail
+import hashlib, json, os, threading, time, requests as req
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlencode, urlsplit
+from lib.helpers import ok, fail, SOFIA_LOG_DIR
+from lib.rate_limiter import get_limiter, parse_retry_after
 
-_rates = {}
-_lock = threading.Lock()
 TRANSIENT = {429, 500, 502, 503, 504}
+POOL_SIZE = int(os.getenv("HTTP_FETCH_POOL_SIZE", "10"))
+CACHE_DIR = os.getenv("SOFIA_HTTP_CACHE_DIR", os.path.join(SOFIA_LOG_DIR, "http_cache"))
+CHUNK_SIZE = 256 * 1024
+
+try:
+    import brotli  # noqa: F401  (urllib3 decodifica "br" se instalado)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> req.Session:
+    """Session persistente por host (keep-alive + pool de conexões HTTP_FETCH_POOL_SIZE)."""
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = req.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount(f"{parts.scheme}://", adapter)
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            # Session é compartilhada entre chamadores: o jar dela nunca guarda
+            # cookies (redirects de uma mesma chamada usam o jar do request)
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _sessions[key] = session
+        return session
+
+
+# ----------------------------------------------------------------------------
+# Cache HTTP em disco (GET): validators ETag / Last-Modified, 304 → corpo do cache
+# ----------------------------------------------------------------------------
+
+def _cache_paths(url, headers):
+    vary = json.dumps({k.lower(): v for k, v in headers.items() if k.lower() in ("accept", "accept-language")},
+                      sort_keys=True)
+    key = hashlib.sha256(f"GET {url} {vary}".encode()).hexdigest()
+    base = os.path.join(CACHE_DIR, key[:2], key)
+    return base + ".json", base + ".body"
+
+
+def _cache_load(url, headers):
+    meta_path, body_path = _cache_paths(url, headers)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _cache_store(url, headers, resp, content):
+    meta_path, body_path = _cache_paths(url, headers)
+    meta = {"url": url, "status": resp.status_code, "headers": dict(resp.headers),
+            "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+            "encoding": resp.encoding, "stored_at": time.time()}
+    try:
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # body antes do meta, ambos via rename: leitor nunca vê meta sem body
+        for path, payload, mode in ((body_path, content, "wb"), (meta_path, json.dumps(meta), "w")):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, mode) as f:
+                f.write(payload)
+            os.replace(tmp, path)
+    except OSError:
+        pass  # cache é best-effort
+
+
+def _cache_touch(url, headers, meta):
+    meta_path, _ = _cache_paths(url, headers)
+    meta["stored_at"] = time.time()
+    try:
+        tmp = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+    except OSError:
+        pass
+
+
+def _conditional_headers(meta):
+    extra = {}
+    if meta.get("etag"):
+        extra["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        extra["If-Modified-Since"] = meta["last_modified"]
+    return extra
+
+
+def _payload(status, resp_headers, content, encoding, expect_json, max_body_chars):
+    text = content.decode(encoding or "utf-8", errors="replace")
+    resp_headers = req.structures.CaseInsensitiveDict(resp_headers)
+    data = {"status": status, "headers": dict(resp_headers),
+            "body": text[:max_body_chars] if max_body_chars else text, "json": None,
+            "bytes": len(content)}
+    if expect_json and "application/json" in resp_headers.get("content-type", ""):
+        try: data["json"] = json.loads(text)
+        except ValueError: pass
+    return data
+
+
+# ----------------------------------------------------------------------------
+# Streaming
+# ----------------------------------------------------------------------------
+
+def _stream_to_file(resp, path, chunk_size):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.part"
+    written = 0
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in resp.iter_content(chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp, path)
+    finally:
+        resp.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return written
+
+
+def stream_chunks(url, headers=None, timeout_s=30, chunk_size=CHUNK_SIZE):
+    """API in-process: itera o corpo em chunks pela Session do host (o envelope da skill não carrega iteradores)."""
+    resp = get_session(url).get(url, headers=headers or {}, timeout=timeout_s, stream=True)
+    try:
+        resp.raise_for_status()
+        yield from resp.iter_content(chunk_size)
+    finally:
+        resp.close()
+
+
+def warmup(context):
+    """Preload do skill runner: abre o SQLite do rate limiter e cria o diretório de cache."""
+    get_limiter()
+    os.makedirs(CACHE_DIR, exist_ok=True)
 
 
 def execute(trace_id, actor, dry_run, params, context):
@@ -24,43 +169,94 @@ def execute(trace_id, actor, dry_run, params, context):
         rate_rpm = params.get("rate_limit_rpm", 60)
         max_retries = retry_cfg.get("max", 3)
         backoff_ms = retry_cfg.get("backoff_ms", 1000)
+        max_body_chars = params.get("max_body_chars", 50000)
+        stream_to = params.get("stream_to")
+        chunk_size = params.get("chunk_size", CHUNK_SIZE)
+        streaming = bool(stream_to)
+        # Cache só para GET bufferizado e anônimo: a chave não distingue credenciais
+        credentialed = any(k.lower() in ("authorization", "cookie") for k in headers)
+        use_cache = params.get("cache", False) and method == "GET" and not streaming and not credentialed
+        cache_ttl_s = params.get("cache_ttl_s", 0)
+
+        if params.get("stream"):
+            return fail("INVALID_INPUT", "stream: true não é serializável; use stream_to ou stream_chunks() in-process", start)
 
         if dry_run:
             return ok({"status": 0, "dry_run": True, "url": url}, start)
 
-        if rate_key:
-            _wait(rate_key, rate_rpm)
+        limiter = get_limiter() if rate_key else None
+        rate_wait_s = 0.0
         if query:
             url = url + ("&" if "?" in url else "?") + urlencode(query)
 
+        cached_meta = cached_body = None
+        if use_cache:
+            cached_meta, cached_body = _cache_load(url, headers)
+            if cached_meta and cache_ttl_s and time.time() - cached_meta["stored_at"] < cache_ttl_s:
+                data = _payload(cached_meta["status"], cached_meta["headers"], cached_body,
+                                cached_meta.get("encoding"), expect_json, max_body_chars)
+                data.update(retries_used=0, rate_wait_ms=0, cache="hit")
+                return ok(data, start)
+
+        session = get_session(url)
         retries_used = 0
         for attempt in range(max_retries + 1):
+            if limiter:
+                # Reserva no bucket compartilhado; o sleep é fora de qualquer lock
+                rate_wait_s += limiter.acquire(rate_key, rate_rpm)
             try:
-                kw = {"headers": headers, "timeout": timeout_s}
+                kw = {"headers": headers, "timeout": timeout_s, "stream": streaming}
+                if cached_meta:
+                    kw["headers"] = {**headers, **_conditional_headers(cached_meta)}
                 if body and method in ("POST","PUT","PATCH"):
                     kw["json"] = body if isinstance(body, dict) else None
                     if not isinstance(body, dict): kw["data"] = body
 
-                resp = req.request(method, url, **kw)
-                if rate_key: _record(rate_key)
+                resp = session.request(method, url, **kw)
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                if limiter:
+                    if resp.status_code == 429:
+                        # Pausa a chave para TODOS os processos; o próximo acquire espera
+                        limiter.penalize(rate_key, retry_after)
+                    elif resp.status_code < 400:
+                        limiter.success(rate_key)
 
                 if resp.status_code in TRANSIENT and attempt < max_retries:
+                    resp.close()
                     retries_used += 1
-                    ra = resp.headers.get("Retry-After")
-                    time.sleep(int(ra) if ra and ra.isdigit() else (backoff_ms/1000)*(2**attempt))
+                    if not (limiter and resp.status_code == 429):
+                        time.sleep(retry_after if retry_after is not None else (backoff_ms/1000)*(2**attempt))
                     continue
 
                 if resp.status_code in (401, 403):
+                    resp.close()
                     return fail("HTTP_AUTH_FAILED", f"{resp.status_code}", start)
 
-                data = {"status": resp.status_code, "headers": dict(resp.headers),
-                        "body": resp.text[:50000], "json": None, "retries_used": retries_used}
-                if expect_json and "application/json" in resp.headers.get("content-type", ""):
-                    try: data["json"] = resp.json()
-                    except: pass
+                extra = {"retries_used": retries_used, "rate_wait_ms": round(rate_wait_s * 1000)}
+
+                if resp.status_code == 304 and cached_meta:
+                    _cache_touch(url, headers, cached_meta)
+                    data = _payload(cached_meta["status"], cached_meta["headers"], cached_body,
+                                    cached_meta.get("encoding"), expect_json, max_body_chars)
+                    data.update(extra, cache="revalidated")
+                    return ok(data, start)
 
                 if resp.status_code >= 400:
-                    return fail("HTTP_REQUEST_FAILED", f"{resp.status_code}: {resp.text[:200]}", start, retryable=resp.status_code in TRANSIENT)
+                    text = resp.text
+                    return fail("HTTP_REQUEST_FAILED", f"{resp.status_code}: {text[:200]}", start, retryable=resp.status_code in TRANSIENT)
+
+                if stream_to:
+                    written = _stream_to_file(resp, stream_to, chunk_size)
+                    return ok({"status": resp.status_code, "headers": dict(resp.headers), "body": None,
+                               "json": None, "path": stream_to, "bytes": written, **extra}, start)
+
+                content = resp.content
+                data = _payload(resp.status_code, resp.headers, content, resp.encoding, expect_json, max_body_chars)
+                data.update(extra)
+                if use_cache:
+                    if resp.status_code == 200 and (resp.headers.get("ETag") or resp.headers.get("Last-Modified") or cache_ttl_s):
+                        _cache_store(url, headers, resp, content)
+                    data["cache"] = "miss"
                 return ok(data, start)
 
             except req.exceptions.Timeout:
@@ -75,17 +271,3 @@ def execute(trace_id, actor, dry_run, params, context):
         return fail("HTTP_REQUEST_FAILED", "All retries exhausted", start, retryable=True)
     except Exception as e:
         return fail("UNKNOWN_ERROR", str(e), start)
-
-
-def _wait(key, rpm):
-    with _lock:
-        now = time.time()
-        _rates.setdefault(key, [])
-        _rates[key] = [t for t in _rates[key] if now - t < 60]
-        if len(_rates[key]) >= rpm:
-            time.sleep(60 - (now - _rates[key][0]) + 0.1)
-            _rates[key] = _rates[key][1:]
-
-def _record(key):
-    with _lock:
-        _rates.setdefault(key, []).append(time.time())
@@ -5,9 +5,11 @@ Critérios OBJETIVOS de healthy (não subjetivo):
 Cada critério é reportado individualmente.
 """
 
-import time, psycopg2
+import time
 from datetime import date
-from lib.helpers import ok, fail, DB_URL
+from lib.helpers import ok, fail
+from lib.db_pool import db_connection
+from lib.run_state import get_run_state
 
 # Critérios explícitos — se quiser mudar, mude AQUI, não no código
 HEALTHY_CRITERIA = {
@@ -25,48 +27,51 @@ def execute(trace_id, actor, dry_run, params, context):
         include_succeeded = params.get("include_succeeded", True)  # Default true para relatórios completos
         since_hours = params.get("since_hours")  # Opcional: últimas N horas ao invés de dia inteiro
         expected_collectors = params.get("expected_collectors")  # Lista opcional de collector_ids
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-
-        # 1. Collectors esperados
-        if expected_collectors:
-            # Modo explicit: usar lista fornecida
-            if isinstance(expected_collectors, list) and len(expected_collectors) > 0:
-                placeholders = ','.join(['%s'] * len(expected_collectors))
-                cur.execute(f"SELECT collector_id, path, expected_min_records, allow_empty FROM sofia.collector_inventory WHERE collector_id IN ({placeholders}) AND enabled=TRUE", expected_collectors)
+        # Runs ainda no buffer de lote (collect.run) entram antes da leitura
+        (context.get("run_state") or get_run_state()).flush()
+        with db_connection(context) as conn:
+            cur = conn.cursor()
+
+            # 1. Collectors esperados
+            if expected_collectors:
+                # Modo explicit: usar lista fornecida
+                if isinstance(expected_collectors, list) and len(expected_collectors) > 0:
+                    placeholders = ','.join(['%s'] * len(expected_collectors))
+                    cur.execute(f"SELECT collector_id, path, expected_min_records, allow_empty FROM sofia.collector_inventory WHERE collector_id IN ({placeholders}) AND enabled=TRUE", expected_collectors)
+                    expected = {r[0]: {"path": r[1], "min_records": r[2], "allow_empty": r[3]} for r in cur.fetchall()}
+                else:
+                    expected = {}
+            else:
+                # Modo legacy: buscar todos daily
+                cur.execute("SELECT collector_id, path, expected_min_records, allow_empty FROM sofia.collector_inventory WHERE schedule='daily' AND enabled=TRUE")
                 expected = {r[0]: {"path": r[1], "min_records": r[2], "allow_empty": r[3]} for r in cur.fetchall()}
+
+            # 2. Runs do dia (timezone Brasil: America/Sao_Paulo)
+            # Se since_hours fornecido, usa janela de horas; caso contrário, usa dia inteiro
+            if since_hours:
+                # Modo: últimas N horas
+                cur.execute("""
+                    SELECT collector_name, ok, fetched, saved, error_code, error_message, duration_ms
+                    FROM sofia.collector_runs
+                    WHERE started_at >= NOW() - interval '%s hours'
+                    ORDER BY started_at DESC
+                """, (since_hours,))
             else:
-                expected = {}
-        else:
-            # Modo legacy: buscar todos daily
-            cur.execute("SELECT collector_id, path, expected_min_records, allow_empty FROM sofia.collector_inventory WHERE schedule='daily' AND enabled=TRUE")
-            expected = {r[0]: {"path": r[1], "min_records": r[2], "allow_empty": r[3]} for r in cur.fetchall()}
-
-        # 2. Runs do dia (timezone Brasil: America/Sao_Paulo)
-        # Se since_hours fornecido, usa janela de horas; caso contrário, usa dia inteiro
-        if since_hours:
-            # Modo: últimas N horas
-            cur.execute("""
-                SELECT collector_name, ok, fetched, saved, error_code, error_message, duration_ms
-                FROM sofia.collector_runs
-                WHERE started_at >= NOW() - interval '%s hours'
-                ORDER BY started_at DESC
-            """, (since_hours,))
-        else:
-            # Modo: dia inteiro (timezone Brasil)
-            cur.execute("""
-                WITH day_bounds AS (
-                    SELECT
-                        date_trunc('day', %s::timestamp at time zone 'America/Sao_Paulo') AS start_br,
-                        date_trunc('day', %s::timestamp at time zone 'America/Sao_Paulo') + interval '1 day' AS end_br
-                )
-                SELECT collector_name, ok, fetched, saved, error_code, error_message, duration_ms
-                FROM sofia.collector_runs, day_bounds
-                WHERE (started_at at time zone 'America/Sao_Paulo') >= day_bounds.start_br
-                  AND (started_at at time zone 'America/Sao_Paulo') < day_bounds.end_br
-                ORDER BY started_at DESC
-            """, (audit_date, audit_date))
-        runs = cur.fetchall()
-        cur.close(); conn.close()
+                # Modo: dia inteiro (timezone Brasil)
+                cur.execute("""
+                    WITH day_bounds AS (
+                        SELECT
+                            date_trunc('day', %s::timestamp at time zone 'America/Sao_Paulo') AS start_br,
+                            date_trunc('day', %s::timestamp at time zone 'America/Sao_Paulo') + interval '1 day' AS end_br
+                    )
+                    SELECT collector_name, ok, fetched, saved, error_code, error_message, duration_ms
+                    FROM sofia.collector_runs, day_bounds
+                    WHERE (started_at at time zone 'America/Sao_Paulo') >= day_bounds.start_br
+                      AND (started_at at time zone 'America/Sao_Paulo') < day_bounds.end_br
+                    ORDER BY started_at DESC
+                """, (audit_date, audit_date))
+            runs = cur.fetchall()
+            cur.close()
 
         ran_names = set()
         succeeded, failed_list, empty_list = [], [], []
@@ -1,7 +1,15 @@
-"""Sofia Skill: search.semantic — RAG sobre pgvector. Sem alucinação: vazio se não achar."""
+"""Sofia Skill: search.semantic — RAG sobre pgvector. Sem alucinação: vazio se não achar.
 
-import os, time, json, requests, psycopg2
-from lib.helpers import ok, fail, DB_URL
+Caminho rápido: cache LRU de embeddings de query (texto normalizado) + índice ANN
+local (lib/vector_index.py) com pré-filtro entity_type/source/data. Filtros que o
+índice não cobre (country) ou índice ainda vazio → pgvector.
+"""
+
+import os, time, json, threading, requests
+from collections import OrderedDict
+from lib.helpers import ok, fail
+from lib.db_pool import db_connection
+from lib import vector_index
 
 EMB = {
     "gemini": {"url": "https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:embedContent",
@@ -9,6 +17,16 @@ EMB = {
     "openai": {"url": "https://api.openai.com/v1/embeddings",
                "key": "OPENAI_API_KEY", "dim": 1536, "cost": 0.00002},
 }
+EMB_CACHE_SIZE = int(os.getenv("SOFIA_SEARCH_EMB_CACHE", "1024"))
+PG_PROBES = int(os.getenv("SOFIA_SEARCH_PROBES", "10"))
+
+_emb_cache = OrderedDict()
+_emb_lock = threading.Lock()
+_emb_stats = {"hits": 0, "misses": 0}
+
+
+def warmup(context):
+    vector_index.get_index()  # carrega do disco e agenda refresh/build em fundo
 
 
 def execute(trace_id, actor, dry_run, params, context):
@@ -24,12 +42,14 @@ def execute(trace_id, actor, dry_run, params, context):
         if dry_run:
             return ok({"hits": [], "query": query, "total_searched": 0}, start)
 
-        embedding = _embed(query, provider)
+        embedding, cached = _embed_query(query, provider)
         if not embedding:
             return fail("SEARCH_EMBEDDING_FAILED", f"Failed with {provider}", start, retryable=True)
 
-        hits = _search(embedding, top_k, filters, threshold)
-        cost = EMB.get(provider, {}).get("cost", 0)
+        hits = _ann_search(embedding, top_k, filters, threshold, context)
+        if hits is None:
+            hits = _search(embedding, top_k, filters, threshold, context)
+        cost = 0 if cached else EMB.get(provider, {}).get("cost", 0)
 
         if not hits:
             return ok({"hits": [], "query": query, "total_searched": 0}, start, cost_estimate=cost,
@@ -55,46 +75,107 @@ def _embed(text, provider):
     except: return None
 
 
-def _search(embedding, top_k, filters, threshold):
+def _normalize_query(text):
+    return " ".join(text.lower().split())
+
+
+def _embed_query(query, provider):
+    """(embedding, veio_do_cache). LRU por (provider, texto normalizado); falhas não entram."""
+    key = (provider, _normalize_query(query))
+    with _emb_lock:
+        embedding = _emb_cache.get(key)
+        if embedding is not None:
+            _emb_cache.move_to_end(key)
+            _emb_stats["hits"] += 1
+            return embedding, True
+        _emb_stats["misses"] += 1
+    embedding = _embed(key[1], provider)
+    if embedding:
+        with _emb_lock:
+            _emb_cache[key] = embedding
+            while len(_emb_cache) > EMB_CACHE_SIZE:
+                _emb_cache.popitem(last=False)
+    return embedding, False
+
+
+def _ann_search(embedding, top_k, filters, threshold, context=None):
+    """Top-k no índice local + 1 SELECT por id. None → usar pgvector."""
+    index = vector_index.get_index()
+    if index is None or not len(index) or index.dim != len(embedding) or not vector_index.supports_filters(filters):
+        return None
+    found = [(doc_id, sim) for doc_id, sim in index.search(embedding, top_k, filters) if sim >= threshold]
+    if not found:
+        return []
     try:
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-        wheres, pvals = [], []
-        for col, key in [("entity_type","entity_type"),("source","source")]:
-            if filters.get(key): wheres.append(f"{col}=%s"); pvals.append(filters[key])
-        if filters.get("since"): wheres.append("created_at>=%s"); pvals.append(filters["since"])
-        if filters.get("until"): wheres.append("created_at<=%s"); pvals.append(filters["until"])
-        if filters.get("country"): wheres.append("metadata->>'country'=%s"); pvals.append(filters["country"])
-
-        where_sql = " AND ".join(wheres) if wheres else "TRUE"
-        emb_str = "[" + ",".join(str(x) for x in embedding) + "]"
-
-        cur.execute(f"""SELECT id, entity_type, source, title, content, url, metadata,
-                        1-(embedding <=> %s::vector) AS sim
-                    FROM sofia.embeddings WHERE {where_sql}
-                    ORDER BY embedding <=> %s::vector LIMIT %s""",
-                    [emb_str] + pvals + [emb_str, top_k])
-
-        hits = []
-        for r in cur.fetchall():
-            sim = float(r[7])
-            if sim < threshold: continue
-            hits.append({"id": str(r[0]), "entity_type": r[1], "source": r[2], "title": r[3] or "",
-                         "snippet": (r[4] or "")[:500], "url": r[5] or "", "score": round(sim, 4),
-                         "metadata": r[6] or {}})
-        cur.close(); conn.close()
+        with db_connection(context) as conn:
+            cur = conn.cursor()
+            cur.execute("""SELECT id::text, entity_type, source, title, content, url, metadata
+                           FROM sofia.embeddings WHERE id = ANY(%s::uuid[])""", ([d for d, _ in found],))
+            rows = {r[0]: r for r in cur.fetchall()}
+            cur.close()
+    except Exception:
+        return None
+    return [{"id": d, "entity_type": rows[d][1], "source": rows[d][2], "title": rows[d][3] or "",
+             "snippet": (rows[d][4] or "")[:500], "url": rows[d][5] or "", "score": round(sim, 4),
+             "metadata": rows[d][6] or {}} for d, sim in found if d in rows]
+
+
+def _search(embedding, top_k, filters, threshold, context=None):
+    try:
+        with db_connection(context) as conn:
+            cur = conn.cursor()
+            wheres, pvals = [], []
+            for col, key in [("entity_type","entity_type"),("source","source")]:
+                if filters.get(key): wheres.append(f"{col}=%s"); pvals.append(filters[key])
+            if filters.get("since"): wheres.append("created_at>=%s"); pvals.append(filters["since"])
+            if filters.get("until"): wheres.append("created_at<=%s"); pvals.append(filters["until"])
+            if filters.get("country"): wheres.append("metadata->>'country'=%s"); pvals.append(filters["country"])
+
+            where_sql = " AND ".join(wheres) if wheres else "TRUE"
+            if wheres:
+                # ivfflat filtra depois de visitar as listas: mais listas para ainda sobrar top_k
+                cur.execute("SET LOCAL ivfflat.probes = %s", (PG_PROBES,))
+
+            # vetor vai uma vez só (CTE); psycopg2 não tem bind binário
+            cur.execute(f"""WITH q AS (SELECT %s::vector AS v)
+                        SELECT e.id, e.entity_type, e.source, e.title, e.content, e.url, e.metadata,
+                            1-(e.embedding <=> q.v) AS sim
+                        FROM sofia.embeddings e, q WHERE {where_sql}
+                        ORDER BY e.embedding <=> q.v LIMIT %s""",
+                        [_vector_literal(embedding)] + pvals + [top_k])
+
+            hits = []
+            for r in cur.fetchall():
+                sim = float(r[7])
+                if sim < threshold: continue
+                hits.append({"id": str(r[0]), "entity_type": r[1], "source": r[2], "title": r[3] or "",
+                             "snippet": (r[4] or "")[:500], "url": r[5] or "", "score": round(sim, 4),
+                             "metadata": r[6] or {}})
+            cur.close()
         return hits
     except: return []
 
 
+def _vector_literal(embedding):
+    return "[" + ",".join(str(x) for x in embedding) + "]"
+
+
 def ingest(trace_id, entity_type, source, source_id, title, content, url="", metadata=None, provider="gemini"):
-    """Insere documento com embedding."""
+    """Insere documento com embedding (e já no índice local, se carregado)."""
     embedding = _embed(content[:5000], provider)
     if not embedding: return False
     try:
-        conn = psycopg2.connect(DB_URL); cur = conn.cursor()
-        emb_str = "[" + ",".join(str(x) for x in embedding) + "]"
-        cur.execute("""INSERT INTO sofia.embeddings (entity_type,source,source_id,title,content,embedding,url,metadata)
-                    VALUES (%s,%s,%s,%s,%s,%s::vector,%s,%s::jsonb) ON CONFLICT (id) DO NOTHING""",
-                    (entity_type, source, source_id, title, content[:10000], emb_str, url, json.dumps(metadata or {})))
-        conn.commit(); cur.close(); conn.close(); return True
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""INSERT INTO sofia.embeddings (entity_type,source,source_id,title,content,embedding,url,metadata)
+                        VALUES (%s,%s,%s,%s,%s,%s::vector,%s,%s::jsonb) ON CONFLICT (id) DO NOTHING
+                        RETURNING id::text, created_at""",
+                        (entity_type, source, source_id, title, content[:10000], _vector_literal(embedding), url,
+                         json.dumps(metadata or {})))
+            row = cur.fetchone()
+            conn.commit(); cur.close()
+        index = vector_index.get_index(build=False)
+        if row and index is not None and len(index) and index.dim == len(embedding):  # vazio: o build em fundo pega
+            index.add([(row[0], entity_type, source, row[1], embedding)])
+        return True
     except: return False
@@ -0,0 +1,63 @@
+-- Migration: Materialized View Refresh Versions
+-- Purpose: Version stamp per materialized view + NOTIFY on refresh, so the
+--          Security API response cache can invalidate exactly the endpoints
+--          backed by the view that changed.
+-- Date: 2026-10-17
+
+CREATE TABLE IF NOT EXISTS sofia.mv_refresh_versions (
+  view_name VARCHAR(128) PRIMARY KEY,   -- unqualified name, e.g. mv_capital_analytics
+  version BIGINT NOT NULL DEFAULT 1,
+  refreshed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE sofia.mv_refresh_versions IS 'Monotonic refresh counter per materialized view (API cache invalidation)';
+
+-- Bump version and notify listeners (channel: sofia_mv_refresh, payload: '<view>:<version>')
+CREATE OR REPLACE FUNCTION sofia.mark_mv_refreshed(p_view_name TEXT)
+RETURNS BIGINT AS $$
+DECLARE
+  v_name TEXT := regexp_replace(p_view_name, '^sofia\.', '');
+  v_version BIGINT;
+BEGIN
+  INSERT INTO sofia.mv_refresh_versions (view_name, version, refreshed_at)
+  VALUES (v_name, 1, NOW())
+  ON CONFLICT (view_name) DO UPDATE
+    SET version = sofia.mv_refresh_versions.version + 1,
+        refreshed_at = NOW()
+  RETURNING version INTO v_version;
+
+  PERFORM pg_notify('sofia_mv_refresh', v_name || ':' || v_version);
+  RETURN v_version;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION sofia.mark_mv_refreshed(TEXT) IS 'Bump refresh version of a materialized view and NOTIFY sofia_mv_refresh';
+
+-- Event trigger: catches every REFRESH MATERIALIZED VIEW (SQL files, psql,
+-- cron), not only the Python refresh scripts. Requires superuser; when the
+-- role lacks it, refresh scripts still call mark_mv_refreshed() explicitly.
+CREATE OR REPLACE FUNCTION sofia.on_mv_refresh()
+RETURNS event_trigger AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  FOR r IN SELECT * FROM pg_event_trigger_ddl_commands()
+           WHERE command_tag = 'REFRESH MATERIALIZED VIEW'
+             AND schema_name = 'sofia'
+  LOOP
+    PERFORM sofia.mark_mv_refreshed(r.object_identity);
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_event_trigger WHERE evtname = 'trg_sofia_mv_refresh') THEN
+    CREATE EVENT TRIGGER trg_sofia_mv_refresh ON ddl_command_end
+      WHEN TAG IN ('REFRESH MATERIALIZED VIEW')
+      EXECUTE FUNCTION sofia.on_mv_refresh();
+    RAISE NOTICE 'Created event trigger trg_sofia_mv_refresh';
+  END IF;
+EXCEPTION WHEN insufficient_privilege THEN
+  RAISE NOTICE 'Skipping event trigger (needs superuser); rely on mark_mv_refreshed() calls';
+END $$;
@@ -0,0 +1,62 @@
+-- ============================================================================
+-- Migration 106: Security Map Clusters (zoom-aware grid aggregation)
+-- Purpose: Pre-aggregate global_comparable observations into grid cells per
+--          zoom level so /api/security/map serves a few hundred clusters at
+--          low zoom instead of thousands of raw points.
+-- Cell size: 360 / (2^zoom * 4) degrees (~64px on a 256px web tile)
+-- Refresh: scripts/refresh_mvs.sql / scripts/refresh_map_views.py
+-- ============================================================================
+
+DROP MATERIALIZED VIEW IF EXISTS sofia.mv_security_map_clusters;
+
+CREATE MATERIALIZED VIEW sofia.mv_security_map_clusters AS
+WITH zooms AS (
+    -- Zoom >= 8 switches to raw points (Brasil local data kicks in there)
+    SELECT z AS zoom, 360.0 / (power(2, z) * 4) AS cell_deg
+    FROM generate_series(1, 7) z
+),
+pts AS (
+    SELECT
+        country_code,
+        country_name,
+        latitude::float8 AS lat,
+        longitude::float8 AS lon,
+        fatalities,
+        severity_norm,
+        signal_type,
+        source,
+        event_time_start,
+        coverage_score_global
+    FROM sofia.security_observations
+    WHERE event_time_start >= CURRENT_DATE - INTERVAL '90 days'
+      AND coverage_scope = 'global_comparable'
+      AND latitude IS NOT NULL
+      AND longitude IS NOT NULL
+)
+SELECT
+    z.zoom,
+    floor(p.lon / z.cell_deg)::int AS cell_x,
+    floor(p.lat / z.cell_deg)::int AS cell_y,
+    p.country_code,
+    MAX(p.country_name) AS country_name,
+    COUNT(*) AS incidents,
+    SUM(COALESCE(p.fatalities, 0)) AS fatalities,
+    AVG(p.severity_norm) AS severity_avg,
+    MAX(p.severity_norm) AS severity_max,
+    AVG(p.lat) AS latitude,
+    AVG(p.lon) AS longitude,
+    MODE() WITHIN GROUP (ORDER BY p.signal_type) AS top_event_type,
+    ARRAY_AGG(DISTINCT p.source ORDER BY p.source) AS sources,
+    MAX(p.event_time_start) AS last_event,
+    MAX(p.coverage_score_global) AS coverage_score_global
+FROM pts p
+CROSS JOIN zooms z
+GROUP BY z.zoom, 2, 3, p.country_code;
+
+-- Unique index required for REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_mv_security_map_clusters_cell
+    ON sofia.mv_security_map_clusters(zoom, cell_x, cell_y, country_code);
+CREATE INDEX idx_mv_security_map_clusters_bbox
+    ON sofia.mv_security_map_clusters(zoom, latitude, longitude);
+
+COMMENT ON MATERIALIZED VIEW sofia.mv_security_map_clusters IS 'Grid clusters of 90d global_comparable observations per zoom 1-7 (map low-zoom mode)';
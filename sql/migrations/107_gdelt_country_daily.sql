@@ -0,0 +1,34 @@
+-- ============================================================================
+-- Migration 107: GDELT daily rollup + normalizer watermarks
+-- Purpose: Let scripts/normalize-gdelt-to-observations.py run incrementally
+--          instead of DELETE + re-INSERT of 90 days of GDELT observations.
+--   * sofia.gdelt_country_daily  - events per (country, day) + z-score of
+--                                  that day vs the country's 30-day window
+--   * sofia.normalizer_watermarks - last source row ingested per normalizer
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS sofia.gdelt_country_daily (
+    country_code VARCHAR(10) NOT NULL,
+    day DATE NOT NULL,
+    event_count INT NOT NULL,
+    zscore DOUBLE PRECISION,        -- NULL = country has no data in the 30-day window
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (country_code, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gdelt_country_daily_day ON sofia.gdelt_country_daily(day);
+
+COMMENT ON TABLE sofia.gdelt_country_daily IS 'GDELT events per country/day (90d) with per-country 30-day z-score (normalizer rollup)';
+
+CREATE TABLE IF NOT EXISTS sofia.normalizer_watermarks (
+    source VARCHAR(50) PRIMARY KEY,       -- 'GDELT', ...
+    last_ingested_at TIMESTAMP,           -- highest source ingested_at already normalized
+    stats_date DATE,                      -- CURRENT_DATE of the last z-score recompute
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+COMMENT ON TABLE sofia.normalizer_watermarks IS 'Incremental watermark per security_observations normalizer';
+
+-- Watermark scan + per-(country, day) recount
+CREATE INDEX IF NOT EXISTS idx_gdelt_ingested_at ON sofia.gdelt_events(ingested_at);
+CREATE INDEX IF NOT EXISTS idx_gdelt_country_date ON sofia.gdelt_events(action_geo_country, event_date);
@@ -0,0 +1,17 @@
+-- ============================================================================
+-- Migration 108: IntelligentScheduler circuit-breaker state
+-- Purpose: Persist per-collector breaker state so an open circuit (and the
+--          failure streak that opened it) survives scheduler restarts.
+--          Written by scripts/intelligent_scheduler.py after every attempt.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS sofia.scheduler_circuit_state (
+    collector_name VARCHAR(100) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'healthy',   -- CollectorStatus value
+    consecutive_failures INT NOT NULL DEFAULT 0,
+    circuit_opened_at TIMESTAMP,                      -- NULL unless circuit_open
+    last_run TIMESTAMP,                               -- last successful run
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE sofia.scheduler_circuit_state IS 'Circuit breaker state per collector (intelligent_scheduler)';
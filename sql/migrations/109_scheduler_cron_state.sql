@@ -0,0 +1,10 @@
+-- ============================================================================
+-- Migration 109: IntelligentScheduler cron state
+-- Purpose: Remember the last cron slot each collector served so the
+--          long-running scheduler can coalesce slots missed during downtime
+--          (catch-up) instead of re-running everything on restart.
+-- ============================================================================
+
+ALTER TABLE sofia.scheduler_circuit_state
+    ADD COLUMN IF NOT EXISTS last_fire_at TIMESTAMP,   -- last cron slot served (ok or failed)
+    ADD COLUMN IF NOT EXISTS next_run TIMESTAMP;       -- next planned start (incl. jitter)
@@ -0,0 +1,32 @@
+-- ============================================================================
+-- Migration 110: Trigram indexes for cross-signals reaction matching
+-- Purpose: scripts/build-cross-signals.py matches every event term against
+--          each reaction source in one set-based query
+--          (col ILIKE '%' || term || '%'). gin_trgm_ops lets those
+--          substring matches use an index instead of scanning the window.
+--          Terms shorter than 3 chars still fall back to the scan.
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ArXiv: title / abstract (largest source on wide windows)
+CREATE INDEX IF NOT EXISTS idx_arxiv_ai_papers_title_trgm
+    ON sofia.arxiv_ai_papers USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_arxiv_ai_papers_abstract_trgm
+    ON sofia.arxiv_ai_papers USING gin (abstract gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_arxiv_ai_papers_published_date
+    ON sofia.arxiv_ai_papers(published_date);
+
+-- GitHub trending: full_name / description
+CREATE INDEX IF NOT EXISTS idx_github_trending_full_name_trgm
+    ON sofia.github_trending USING gin (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_github_trending_description_trgm
+    ON sofia.github_trending USING gin (description gin_trgm_ops);
+
+-- Funding rounds: company / sector (+ organization name via join)
+CREATE INDEX IF NOT EXISTS idx_funding_rounds_company_name_trgm
+    ON sofia.funding_rounds USING gin (company_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_funding_rounds_sector_trgm
+    ON sofia.funding_rounds USING gin (sector gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_organizations_name_trgm
+    ON sofia.organizations USING gin (name gin_trgm_ops);
@@ -0,0 +1,29 @@
+-- ============================================================================
+-- Migration 111: Inverted index of technology terms (lib/term_index.py)
+-- Purpose: Answer "docs mentioning any of these terms in this window" with an
+--          index probe instead of leading-wildcard ILIKE over
+--          arxiv_ai_papers.abstract, github_trending.description and
+--          funding_rounds.sector.
+--   * term  = canonical name from analytics/shared/tech_normalizer.TECH_ALIASES
+--   * source = 'arxiv' | 'github' | 'funding'
+-- Incremental watermarks live in sofia.normalizer_watermarks
+-- (source = 'term_index:<source>').
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS sofia.term_postings (
+    term VARCHAR(64) NOT NULL,
+    source VARCHAR(20) NOT NULL,
+    doc_id INT NOT NULL,              -- id in the source table
+    doc_date DATE,                    -- published/collected/announced date
+    PRIMARY KEY (source, doc_id, term)
+);
+
+-- Probe: term + source + window → doc ids (index-only scan)
+CREATE INDEX IF NOT EXISTS idx_term_postings_probe
+    ON sofia.term_postings(term, source, doc_date, doc_id);
+
+COMMENT ON TABLE sofia.term_postings IS 'Tech term → document postings maintained by lib/term_index.py after collector runs';
+
+-- Incremental scans by collected_at
+CREATE INDEX IF NOT EXISTS idx_arxiv_ai_papers_collected_at ON sofia.arxiv_ai_papers(collected_at);
+CREATE INDEX IF NOT EXISTS idx_funding_rounds_collected_at ON sofia.funding_rounds(collected_at);
@@ -0,0 +1,33 @@
+-- ============================================================================
+-- Migration 112: Source health snapshots (lib/source_health.py)
+-- Purpose: One scan per table (count, min/max timestamp, per-column null
+--          fractions) shared by build-cross-signals.py, the operational
+--          report and the cross-signals email block, instead of each one
+--          re-running COUNT/MIN/MAX over the same window.
+--   * one row per (snapshot_id, source_id)
+--   * reuse: same window length, collected_at within SOFIA_SOURCE_HEALTH_TTL
+-- ============================================================================
+
+CREATE SEQUENCE IF NOT EXISTS sofia.source_health_snapshot_seq;
+
+CREATE TABLE IF NOT EXISTS sofia.source_health (
+    snapshot_id BIGINT NOT NULL,
+    source_id VARCHAR(50) NOT NULL,
+    window_start TIMESTAMPTZ NOT NULL,
+    window_end TIMESTAMPTZ NOT NULL,
+    status VARCHAR(20) NOT NULL,      -- ok | partial | offline | missing
+    records BIGINT,                   -- NULL = not counted (patents)
+    min_at TIMESTAMPTZ,
+    max_at TIMESTAMPTZ,
+    null_rates JSONB NOT NULL DEFAULT '{}'::jsonb,  -- {column: null fraction}
+    scan_ms INT,
+    error TEXT,
+    collected_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (snapshot_id, source_id)
+);
+
+-- Lookup: latest snapshot
+CREATE INDEX IF NOT EXISTS idx_source_health_collected_at
+    ON sofia.source_health(collected_at DESC);
+
+COMMENT ON TABLE sofia.source_health IS 'Per-window source availability and null-rate snapshots (lib/source_health.py)';
@@ -0,0 +1,34 @@
+-- ============================================================================
+-- Migration 113: Embedding pipeline cache + checkpoints (scripts/mastra_embeddings.py)
+-- Purpose: Backfills page by id (keyset) and write back in bulk; these tables
+--          let them skip text that was already embedded and resume after a
+--          crash instead of starting over.
+--   * embedding_cache: sha256(model + text) → vector, shared by all tables
+--   * embedding_checkpoints: one row per table, last committed id of the
+--     current snapshot (ids <= max_id)
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS sofia.embedding_cache (
+    content_hash CHAR(64) PRIMARY KEY,   -- sha256 hex of model \0 text
+    model VARCHAR(200) NOT NULL,
+    embedding vector NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS sofia.embedding_checkpoints (
+    table_name VARCHAR(100) PRIMARY KEY,
+    mode VARCHAR(10) NOT NULL,            -- missing | force
+    last_id TEXT,                         -- last id committed (NULL = not started)
+    max_id TEXT,                          -- snapshot upper bound (MAX(id) at start)
+    processed BIGINT NOT NULL DEFAULT 0,
+    cache_hits BIGINT NOT NULL DEFAULT 0,
+    embedded BIGINT NOT NULL DEFAULT 0,
+    status VARCHAR(10) NOT NULL,          -- running | done
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE sofia.embedding_cache IS 'Content-hash → embedding cache used by scripts/mastra_embeddings.py';
+COMMENT ON TABLE sofia.embedding_checkpoints IS 'Resumable backfill state per table for scripts/mastra_embeddings.py';
@@ -0,0 +1,108 @@
+"""lib/cron.CronExpression: next_after / prev_before (tabelas de casos)."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from lib.cron import CronExpression
+
+D = datetime  # 2026-01-01 é quinta-feira
+
+
+@pytest.mark.parametrize("expr, now, expected", [
+    # passos e faixas com passo
+    ("*/15 * * * *", D(2026, 3, 10, 10, 7), D(2026, 3, 10, 10, 15)),
+    ("*/15 * * * *", D(2026, 3, 10, 10, 45), D(2026, 3, 10, 11, 0)),
+    ("*/15 * * * *", D(2026, 3, 10, 10, 15, 30), D(2026, 3, 10, 10, 30)),  # estritamente depois
+    ("5/20 * * * *", D(2026, 3, 10, 10, 46), D(2026, 3, 10, 11, 5)),
+    ("10-30/10 9 * * *", D(2026, 1, 5, 9, 15), D(2026, 1, 5, 9, 20)),
+    ("10-30/10 9 * * *", D(2026, 1, 5, 9, 30), D(2026, 1, 6, 9, 10)),
+    ("0 */6 * * *", D(2026, 1, 5, 19, 0), D(2026, 1, 6, 0, 0)),
+    # dia da semana
+    ("0 8,11,14 * * 1-5", D(2026, 1, 2, 14, 0), D(2026, 1, 5, 8, 0)),  # sexta 14h → segunda 8h
+    ("0 9 * * mon", D(2026, 1, 4, 10, 0), D(2026, 1, 5, 9, 0)),
+    ("0 0 * * 7", D(2026, 1, 1), D(2026, 1, 4)),  # 7 = domingo
+    # dia-do-mês OU dia-da-semana quando os dois são restritos
+    ("0 14 1-7 * 1", D(2026, 1, 7, 15, 0), D(2026, 1, 12, 14, 0)),  # segunda fora de 1-7
+    ("0 14 1-7 * 1", D(2026, 2, 1, 0, 0), D(2026, 2, 1, 14, 0)),  # dia 1, domingo
+    ("30 * 13 * 5", D(2026, 2, 12, 23, 45), D(2026, 2, 13, 0, 30)),  # sexta-feira 13
+    ("0 0 15 * sun", D(2026, 1, 12), D(2026, 1, 15)),
+    # calendário
+    ("@monthly", D(2026, 1, 31, 12, 0), D(2026, 2, 1)),
+    ("0 12 31 * *", D(2026, 4, 1), D(2026, 5, 31, 12, 0)),
+    ("0 0 29 2 *", D(2026, 3, 1), D(2028, 2, 29)),
+    ("0 9 * jan,jul *", D(2026, 2, 1), D(2026, 7, 1, 9, 0)),
+])
+def test_next_after(expr, now, expected):
+    assert CronExpression(expr).next_after(now) == expected
+
+
+@pytest.mark.parametrize("expr, now, expected", [
+    ("*/15 * * * *", D(2026, 3, 10, 10, 7), D(2026, 3, 10, 10, 0)),
+    ("*/15 * * * *", D(2026, 3, 10, 10, 15, 59), D(2026, 3, 10, 10, 15)),  # inclusivo
+    ("10-30/10 9 * * *", D(2026, 1, 5, 9, 25), D(2026, 1, 5, 9, 20)),
+    ("10-30/10 9 * * *", D(2026, 1, 5, 9, 5), D(2026, 1, 4, 9, 30)),
+    ("0 8,11,14 * * 1-5", D(2026, 1, 4, 12, 0), D(2026, 1, 2, 14, 0)),  # domingo → sexta
+    ("0 14 1-7 * 1", D(2026, 1, 11, 12, 0), D(2026, 1, 7, 14, 0)),  # último do bloco 1-7
+    ("0 14 1-7 * 1", D(2026, 1, 13, 0, 0), D(2026, 1, 12, 14, 0)),  # segunda fora de 1-7
+    ("0 0 1 * *", D(2026, 3, 1, 0, 0), D(2026, 3, 1, 0, 0)),
+    ("0 0 29 2 *", D(2027, 1, 1), D(2024, 2, 29)),
+])
+def test_prev_before(expr, now, expected):
+    assert CronExpression(expr).prev_before(now) == expected
+
+
+def _missed(cron, last, now):
+    slots, t = [], cron.next_after(last)
+    while t <= now:
+        slots.append(t)
+        t = cron.next_after(t)
+    return slots
+
+
+@pytest.mark.parametrize("expr, last, now, missed", [
+    # parado no fim de semana: só o slot de segunda 8h ficou para trás
+    ("0 8,11,14 * * 1-5", D(2026, 1, 2, 14, 0), D(2026, 1, 5, 10, 30), [D(2026, 1, 5, 8, 0)]),
+    ("0 * * * *", D(2026, 1, 5, 9, 0), D(2026, 1, 5, 12, 30),
+     [D(2026, 1, 5, 10), D(2026, 1, 5, 11), D(2026, 1, 5, 12)]),
+    ("0 3 * * *", D(2026, 1, 5, 3, 0), D(2026, 1, 5, 23, 0), []),
+])
+def test_catch_up_after_downtime(expr, last, now, missed):
+    """O scheduler coalesce os slots perdidos em um: prev_before(now) é o mais recente."""
+    cron = CronExpression(expr)
+    assert _missed(cron, last, now) == missed
+    prev = cron.prev_before(now)
+    assert (prev > last) == bool(missed)
+    if missed:
+        assert prev == missed[-1]
+    assert cron.next_after(now) > now >= prev
+
+
+@pytest.mark.parametrize("expr", ["*/7 * * * *", "0 14 1-7 * 1", "15 8-18/2 * * mon-fri", "0 0 13 * 5"])
+def test_agrees_with_brute_force(expr):
+    cron = CronExpression(expr)
+    rng = random.Random(expr)
+    for _ in range(20):
+        now = D(2026, 1, 1) + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        t = now.replace(second=0) + timedelta(minutes=1)
+        while not cron.matches(t):
+            t += timedelta(minutes=1)
+        assert cron.next_after(now) == t
+        t = now.replace(second=0)
+        while not cron.matches(t):
+            t -= timedelta(minutes=1)
+        assert cron.prev_before(now) == t
+
+
+@pytest.mark.parametrize("expr", [
+    "0 8 * *", "*/0 * * * *", "60 * * * *", "5-1 * * * *", "0 0 * * funday", "0 0 0 * *",
+])
+def test_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        CronExpression(expr)
+
+
+def test_impossible_date_never_fires():
+    with pytest.raises(ValueError):
+        CronExpression("0 0 30 2 *").next_after(D(2026, 1, 1))
@@ -0,0 +1,210 @@
+"""lib/db_pool.DatabasePool e lib/run_state.RunStateWriter com psycopg2 falso (sem banco)."""
+
+from contextlib import contextmanager
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+import psycopg2.extras  # noqa: E402
+import psycopg2.pool  # noqa: E402
+
+from lib.db_pool import DatabasePool, PoolTimeout  # noqa: E402
+from lib.run_state import RunStateWriter  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.ping_fails:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.conn.executed.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.ping_fails = False
+        self.rollback_fails = False
+        self.rollbacks = 0
+        self.commits = 0
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.rollback_fails:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.rollbacks += 1
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeThreadedPool:
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.kwargs = kwargs
+        self._used = {}
+        self.free = []
+        self.closed_conns = []
+
+    def getconn(self):
+        conn = self.free.pop() if self.free else FakeConn()
+        self._used[id(conn)] = conn
+        return conn
+
+    def putconn(self, conn, close=False):
+        self._used.pop(id(conn), None)
+        if close:
+            conn.closed = 1
+            self.closed_conns.append(conn)
+        else:
+            self.free.append(conn)
+
+    def closeall(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_psycopg2_pool(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", FakeThreadedPool)
+
+
+def test_acquire_timeout_when_exhausted():
+    pool = DatabasePool(dsn="dbname=test", maxconn=1, acquire_timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats["timeouts"] == 1
+
+    pool.putconn(conn)
+    again = pool.getconn()
+    assert again is conn  # slot liberado, conexão reaproveitada
+    pool.putconn(again)
+    assert pool.snapshot()["acquired"] == 2
+
+
+def test_closed_connection_is_replaced_on_checkout():
+    pool = DatabasePool(dsn="dbname=test", maxconn=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.closed = 1  # caiu enquanto estava no pool
+
+    fresh = pool.getconn()
+    assert fresh is not conn
+    assert pool.stats["discarded"] == 1
+    assert pool._pool.closed_conns == [conn]
+    pool.putconn(fresh)
+
+
+def test_idle_connection_failing_ping_is_replaced():
+    pool = DatabasePool(dsn="dbname=test", maxconn=2, max_idle_s=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.ping_fails = True
+
+    fresh = pool.getconn()
+    assert fresh is not conn
+    assert pool.stats["discarded"] == 1
+    assert pool.stats["connects"] == 2
+    pool.putconn(fresh)
+
+
+def test_putconn_rolls_back_and_drops_broken_connections():
+    pool = DatabasePool(dsn="dbname=test", maxconn=1)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert conn.rollbacks == 1 and not conn.closed
+
+    conn = pool.getconn()
+    conn.rollback_fails = True
+    pool.putconn(conn)
+    assert conn.closed  # não volta para o pool com transação em estado desconhecido
+    assert pool.getconn() is not conn  # e o slot foi devolvido
+
+
+def test_connect_kwargs_are_passed_without_dsn():
+    pool = DatabasePool(maxconn=1, host="db", database="sofia_db")
+    pool.open()
+    assert pool._pool.kwargs == {"host": "db", "database": "sofia_db"}
+
+
+# === RunStateWriter ===
+
+class RecordingPool:
+    @contextmanager
+    def connection(self):
+        yield FakeConn()
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    calls = []
+
+    def execute_values(cur, sql, rows, template=None, page_size=100):
+        if getattr(execute_values, "fail", False):
+            raise psycopg2.OperationalError("db down")
+        calls.append((sql.split()[0], list(rows)))
+
+    monkeypatch.setattr(psycopg2.extras, "execute_values", execute_values)
+    return calls, execute_values
+
+
+def _writer():
+    # sem thread de fundo interferindo: intervalo e lote grandes
+    return RunStateWriter(pool=RecordingPool(), batch_size=10_000, flush_interval_s=3600)
+
+
+def test_start_and_finish_in_buffer_merge_into_one_insert(recorded):
+    calls, _ = recorded
+    w = _writer()
+    w.start("r1", "t1", "github", "collectors/github.py", "cron", "{}", "prod")
+    w.finish("r1", 1200, 10, 8, 2, 0, True, None, None)
+
+    assert w.flush() == 1
+    assert [kind for kind, _ in calls] == ["INSERT"]
+    row = calls[0][1][0]
+    assert row[0] == "r1" and row[9] == 1200 and row[14] is True  # duration_ms, ok
+    assert w.stats["merged"] == 1
+
+
+def test_finish_after_flush_becomes_batched_update(recorded):
+    calls, _ = recorded
+    w = _writer()
+    w.start("r1", "t1", "github", "p", "cron", "{}", "prod")
+    w.start("r2", "t1", "arxiv", "p", "cron", "{}", "prod")
+    w.flush()
+    w.finish("r1", 10, 1, 1, 0, 0, True, None, None)
+    w.finish("r2", 20, 0, 0, 0, 1, False, "HTTP_500", "boom")
+    assert w.flush() == 2
+
+    kind, rows = calls[-1]
+    assert kind == "UPDATE"
+    assert [r[0] for r in rows] == ["r1", "r2"]
+    assert rows[1][7] is False and rows[1][8] == "HTTP_500"
+
+
+def test_failed_flush_requeues_rows(recorded):
+    calls, execute_values = recorded
+    w = _writer()
+    w.start("r1", "t1", "github", "p", "cron", "{}", "prod")
+    execute_values.fail = True
+    assert w.flush() == 0
+    assert w.stats["errors"] == 1
+
+    w.finish("r1", 5, 0, 0, 0, 0, True, None, None)  # chega enquanto o start está re-enfileirado
+    execute_values.fail = False
+    assert w.flush() == 1
+    assert [kind for kind, _ in calls] == ["INSERT"]
+    assert calls[0][1][0][9] == 5
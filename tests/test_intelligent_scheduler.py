@@ -0,0 +1,65 @@
+"""scripts/intelligent_scheduler.py: event loop com execute_collector falso (sem banco, sem subprocess)."""
+
+import importlib.util
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+
+_spec = importlib.util.spec_from_file_location(
+    "intelligent_scheduler", Path(__file__).resolve().parents[1] / "scripts" / "intelligent_scheduler.py")
+sched_mod = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sched_mod)
+
+
+class FakeConn:
+    def cursor(self, **kwargs):
+        return None
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(sched_mod.psycopg2, "connect", lambda **kwargs: FakeConn())
+    monkeypatch.setattr(sched_mod.IntelligentScheduler, "load_circuit_state", lambda self: None)
+    monkeypatch.setattr(sched_mod.IntelligentScheduler, "save_circuit_state", lambda self, task: None)
+    s = sched_mod.IntelligentScheduler(slots=2)
+    s.jitter_sec = 0
+    runs = []
+    lock = threading.Lock()
+
+    def execute(task):
+        with lock:
+            runs.append(task.collector_name)
+        time.sleep(0.05)
+        return True
+
+    monkeypatch.setattr(s, "execute_collector", execute)
+    return s, runs
+
+
+def test_dependent_runs_in_loop_mode(scheduler):
+    s, runs = scheduler
+    s.register_collector("brazil_ibge", "ibge.py")
+    s.register_collector("brazil_security", "security.py", dependencies=["brazil_ibge"])
+
+    threading.Timer(2.5, s.stop).start()
+    s.run(interval_sec=1, report_every_sec=3600)
+
+    assert runs.count("brazil_ibge") >= 2
+    assert runs.count("brazil_security") >= 2
+    # cada ciclo do dependente vem depois da dependência
+    assert runs.index("brazil_security") > runs.index("brazil_ibge")
+
+
+def test_dependent_waits_for_dependency_due_first(scheduler):
+    s, runs = scheduler
+    s.register_collector("base", "base.py")
+    s.register_collector("derived", "derived.py", dependencies=["base"], priority="critical")
+
+    s.run_once(max_runtime_minutes=1, slots=2)
+    assert runs == ["base", "derived"]  # prioridade maior não fura a dependência
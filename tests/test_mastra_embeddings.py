@@ -0,0 +1,208 @@
+"""scripts/mastra_embeddings.py: pipeline com StubEmbedder sobre um banco em memória."""
+
+import importlib.util
+import re
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("requests")
+
+_spec = importlib.util.spec_from_file_location(
+    "mastra_embeddings", Path(__file__).resolve().parents[1] / "scripts" / "mastra_embeddings.py")
+me = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(me)
+
+DIM = 8
+
+
+class FakeDB:
+    """Só o SQL que o pipeline emite: sofia.<tabela>, embedding_cache e embedding_checkpoints."""
+
+    def __init__(self, n):
+        self.rows = [{"id": i, "title": f"title {i % 7}", "abstract": None if i % 5 == 0 else f"abstract {i}",
+                      "title_embedding": None, "abstract_embedding": None} for i in range(1, n + 1)]
+        self.cache = {}
+        self.checkpoint = {}
+        self.commits = 0
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def execute_values(self, cur, sql, rows, template=None, page_size=100):
+        if "embedding_cache" in sql:
+            for h, _model, emb in rows:
+                self.cache.setdefault(h, emb)
+            return
+        col = re.search(r"SET (\w+)", sql).group(1)
+        by_id = {r["id"]: r for r in self.rows}
+        for row_id, emb in rows:
+            by_id[row_id][col] = emb
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=()):
+        db, q = self.db, " ".join(sql.split())
+        if "FROM sofia.embedding_checkpoints" in q:
+            self.result = [dict(db.checkpoint)] if db.checkpoint.get("status") == "running" else []
+        elif q.startswith("INSERT INTO sofia.embedding_checkpoints"):
+            keys = ["table_name", "mode", "last_id", "max_id", "processed", "cache_hits", "embedded", "status"]
+            db.checkpoint = dict(zip(keys, params))
+        elif "embedding_cache" in q:
+            self.result = [{"content_hash": h, "embedding": db.cache[h]} for h in params[0] if h in db.cache]
+        elif "MAX(id)" in q:
+            self.result = [{"max_id": max(r["id"] for r in db.rows)}]
+        else:
+            max_id = int(params[0])
+            last_id = int(params[1]) if "AND id >" in q else None
+            missing_only = "IS NULL)" in q
+            sel = [r for r in db.rows
+                   if r["id"] <= max_id and (last_id is None or r["id"] > last_id)
+                   and (not missing_only or r["title_embedding"] is None or r["abstract_embedding"] is None)]
+            if "COUNT(*)" in q:
+                self.result = [{"total": len(sel)}]
+            else:
+                self.result = [dict(r, title_embedding_missing=r["title_embedding"] is None,
+                                    abstract_embedding_missing=r["abstract_embedding"] is None)
+                               for r in sel[:params[-1]]]
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FlakyEmbedder(me.StubEmbedder):
+    """StubEmbedder que falha para textos escolhidos."""
+
+    def __init__(self, fail_texts=()):
+        super().__init__(DIM)
+        self.fail_texts = set(fail_texts)
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(len(texts))
+        vectors = super().embed(texts)
+        return [None if t in self.fail_texts else v for t, v in zip(texts, vectors)]
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(me, "PAGE_SIZE", 100)
+
+    def make(db, embedder):
+        monkeypatch.setattr(me, "execute_values", db.execute_values)
+        return me.MastraEmbeddings(embedder=embedder, conn=db)
+    return make
+
+
+def _missing(db):
+    return sum(r["title_embedding"] is None or bool(r["abstract"] and r["abstract_embedding"] is None)
+               for r in db.rows)
+
+
+def test_backfill_fills_every_row_and_dedupes_texts(pipeline):
+    db, stub = FakeDB(250), FlakyEmbedder()
+    pipeline(db, stub).process_table("arxiv_ai_papers")
+
+    assert _missing(db) == 0
+    assert db.checkpoint["status"] == "done" and db.checkpoint["last_id"] == "250"
+    assert len(stub.batches) == 3  # uma chamada por página
+    # títulos repetidos (7 distintos) viram um texto só
+    assert stub.stats["texts"] == 7 + sum(1 for i in range(1, 251) if i % 5)
+    assert db.rows[0]["title_embedding"] == me.to_vector_literal(me.StubEmbedder.vector("title 1", DIM))
+
+
+def test_forced_rerun_is_served_from_hash_cache(pipeline):
+    db, stub = FakeDB(120), FlakyEmbedder()
+    emb = pipeline(db, stub)
+    emb.process_table("arxiv_ai_papers")
+    texts_before = stub.stats["texts"]
+
+    emb.process_table("arxiv_ai_papers", force_update=True)
+    assert stub.stats["texts"] == texts_before  # nenhum texto novo para o endpoint
+    assert db.checkpoint["cache_hits"] == 120 + sum(1 for i in range(1, 121) if i % 5)
+    assert db.checkpoint["embedded"] == 0
+
+
+def test_changed_text_is_re_embedded(pipeline):
+    db, stub = FakeDB(20), FlakyEmbedder()
+    emb = pipeline(db, stub)
+    emb.process_table("arxiv_ai_papers")
+    db.rows[3]["abstract"] = "rewritten abstract"
+    texts_before = stub.stats["texts"]
+
+    emb.process_table("arxiv_ai_papers", force_update=True)
+    assert stub.stats["texts"] == texts_before + 1
+    assert db.rows[3]["abstract_embedding"] == me.to_vector_literal(me.StubEmbedder.vector("rewritten abstract", DIM))
+
+
+def test_checkpoint_stops_before_first_failure_and_resumes(pipeline):
+    db = FakeDB(250)
+    pipeline(db, FlakyEmbedder(fail_texts={"abstract 142"})).process_table("arxiv_ai_papers")
+
+    # linhas depois da falha foram gravadas, mas o checkpoint não passa dela
+    assert db.checkpoint["status"] == "running" and db.checkpoint["last_id"] == "141"
+    assert db.rows[141]["abstract_embedding"] is None
+    assert db.rows[200]["abstract_embedding"] is not None
+
+    healthy = FlakyEmbedder()
+    pipeline(db, healthy).process_table("arxiv_ai_papers")
+    assert _missing(db) == 0
+    assert db.checkpoint["status"] == "done"
+    assert healthy.stats["texts"] == 1  # só o texto que falhou
+
+
+def test_commits_before_calling_the_endpoint(pipeline):
+    db = FakeDB(10)
+    commits = []
+
+    class Recording(FlakyEmbedder):
+        def embed(self, texts):
+            commits.append(db.commits)
+            return super().embed(texts)
+
+    pipeline(db, Recording()).process_table("arxiv_ai_papers")
+    assert commits == [1]  # a transação da leitura da página já foi fechada
+
+
+def test_client_batches_and_falls_back_to_single_texts(monkeypatch):
+    client = me.MastraClient("http://embed.invalid", batch_size=3, concurrency=2)
+    payloads = []
+
+    def post(payload):
+        payloads.append(payload)
+        if "texts" in payload:
+            return {"embeddings": [me.StubEmbedder.vector(t, DIM) for t in payload["texts"]]}
+        return {"embedding": me.StubEmbedder.vector(payload["text"], DIM)}
+
+    monkeypatch.setattr(client, "_post", post)
+    texts = [f"t{i}" for i in range(7)]
+    assert client.embed(texts) == [me.StubEmbedder.vector(t, DIM) for t in texts]
+    assert sorted(len(p["texts"]) for p in payloads) == [1, 3, 3]
+
+    payloads.clear()
+    monkeypatch.setattr(client, "_post", lambda p: payloads.append(p) or (
+        {"batch_unsupported": True} if "texts" in p else {"embedding": [0.0] * DIM}))
+    assert len(client.embed(texts)) == 7
+    assert not client.batch_supported
+    assert sum("text" in p for p in payloads) == 7
+    client.close()
@@ -0,0 +1,150 @@
+"""lib/rate_limiter: token bucket SQLite (entre processos) e fallback em memória."""
+
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from lib import rate_limiter
+from lib.rate_limiter import MemoryRateLimiter, SQLiteRateLimiter
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class FakeTime:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(rate_limiter, "time", fake)
+    return fake
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteRateLimiter(str(tmp_path / "rl.sqlite"))
+    return MemoryRateLimiter()
+
+
+def test_burst_then_wait_at_rate(backend, clock):
+    # rpm=60 → 1 token/s, rajada de 5
+    waits = [backend.reserve("k", rpm=60) for _ in range(7)]
+    assert waits[:5] == [0.0] * 5
+    assert waits[5] == pytest.approx(1.0) and waits[6] == pytest.approx(2.0)  # fila no futuro
+    clock.sleep(10)
+    assert backend.reserve("k", rpm=60) == 0.0
+
+
+def test_keys_are_independent(backend, clock):
+    for _ in range(5):
+        backend.reserve("a", rpm=60)
+    assert backend.reserve("a", rpm=60) > 0
+    assert backend.reserve("b", rpm=60) == 0.0
+
+
+def test_penalize_pauses_key_and_halves_rate(backend, clock):
+    backend.reserve("k", rpm=600)
+    backend.penalize("k", retry_after_s=30)
+    s = backend.stats()["k"]
+    assert s["factor"] == pytest.approx(0.5) and s["throttled"] == 1
+    assert backend.reserve("k", rpm=600) == pytest.approx(30.0)
+
+    for _ in range(10):
+        backend.penalize("k", retry_after_s=1)
+    assert backend.stats()["k"]["factor"] == pytest.approx(rate_limiter.MIN_FACTOR)
+
+
+def test_penalty_expires(backend, clock):
+    backend.reserve("k", rpm=600)
+    backend.penalize("k", retry_after_s=5)
+    assert backend.reserve("k", rpm=600) == pytest.approx(5.0)
+    clock.sleep(6)
+    assert backend.reserve("k", rpm=600) == 0.0
+
+
+def test_queue_after_penalty_is_spaced_not_burst(backend, clock):
+    backend.reserve("k", rpm=60)
+    backend.penalize("k", retry_after_s=30)  # fator 0.5 → 0.5 token/s, rajada de 2.5
+    waits = [backend.reserve("k", rpm=60) for _ in range(10)]
+    assert min(waits) == pytest.approx(30.0)
+    # só a rajada (tokens em caixa) sai no fim da pausa; o resto vem a cada 1/rate = 2s
+    assert sum(w == pytest.approx(30.0) for w in waits) <= 3
+    gaps = [b - a for a, b in zip(waits, waits[1:])]
+    assert gaps[-6:] == [pytest.approx(2.0)] * 6
+
+
+def test_penalize_without_retry_after_uses_default(backend, clock):
+    backend.reserve("k", rpm=600)
+    backend.penalize("k")
+    assert backend.stats()["k"]["penalty_until"] == pytest.approx(clock.now + rate_limiter.DEFAULT_PENALTY_S)
+
+
+def test_success_recovers_factor_gradually(backend, clock):
+    backend.reserve("k", rpm=60)
+    backend.penalize("k", retry_after_s=0)
+    backend.success("k")
+    assert backend.stats()["k"]["factor"] == pytest.approx(0.5 * rate_limiter.RECOVERY_FACTOR)
+    for _ in range(20):
+        backend.success("k")
+    assert backend.stats()["k"]["factor"] == 1.0
+
+
+def test_reduced_factor_slows_refill(backend, clock):
+    for _ in range(5):
+        backend.reserve("k", rpm=60)
+    backend.penalize("k", retry_after_s=0)  # 0.5 token/s
+    assert backend.reserve("k", rpm=60) == pytest.approx(2.0)
+
+
+def test_stats_track_waits(backend, clock):
+    for _ in range(6):
+        backend.reserve("k", rpm=60)
+    s = backend.stats()["k"]
+    assert s["requests"] == 6 and s["waits"] == 1 and s["max_wait_ms"] == 1000
+
+
+def test_bucket_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "rl.sqlite")
+    # rpm=6 → 1 token a cada 10s, rajada de 1: o filho gasta o único token
+    child = subprocess.run(
+        [sys.executable, "-c",
+         "import sys; from lib.rate_limiter import SQLiteRateLimiter; "
+         "print(SQLiteRateLimiter(sys.argv[1]).reserve('shared', rpm=6))", path],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    assert float(child.stdout) == 0.0
+
+    limiter = SQLiteRateLimiter(path)
+    assert limiter.reserve("shared", rpm=6) > 5.0
+    assert limiter.stats()["shared"]["requests"] == 2
+
+
+def test_penalty_is_visible_to_other_connections(tmp_path):
+    path = str(tmp_path / "rl.sqlite")
+    a, b = SQLiteRateLimiter(path), SQLiteRateLimiter(path)
+    a.reserve("k", rpm=600)
+    a.penalize("k", retry_after_s=60)
+    assert b.reserve("k", rpm=600) > 50
+
+
+def test_get_limiter_falls_back_to_memory_with_notice_on_stderr(monkeypatch, capsys):
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(rate_limiter, "_limiter", None)
+    monkeypatch.setattr(rate_limiter, "SQLiteRateLimiter", broken)
+    limiter = rate_limiter.get_limiter()
+    assert isinstance(limiter.backend, MemoryRateLimiter)
+    out, err = capsys.readouterr()
+    assert out == "" and "SQLite backend unavailable" in err
@@ -0,0 +1,43 @@
+"""api/response_cache.py: ResponseCache e ciclo de vida do RefreshListener (sem banco)."""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "api"))
+import response_cache  # noqa: E402
+from response_cache import RefreshListener, ResponseCache  # noqa: E402
+
+
+def test_invalidate_view_drops_only_its_entries():
+    cache = ResponseCache(max_entries=8, ttl_sec=60)
+    cache.put("/a?", "mv_a", b'{"x": 1}', cache.generation("mv_a"))
+    cache.put("/b?", "mv_b", b'{"x": 2}', cache.generation("mv_b"))
+    cache.invalidate_view("mv_a")
+    assert cache.get("/a?") is None
+    assert cache.get("/b?").body == b'{"x": 2}'
+
+
+def test_listener_start_stop_join(monkeypatch):
+    attempts, tried = [], threading.Event()
+
+    def unreachable(**kwargs):
+        attempts.append(kwargs)
+        tried.set()
+        raise psycopg2.OperationalError("could not connect to server")
+
+    monkeypatch.setattr(response_cache.psycopg2, "connect", unreachable)
+    cache = ResponseCache()
+    listener = RefreshListener(cache, {"host": "db.invalid"}, retry_sec=30)
+    listener.start()
+    assert tried.wait(5)
+    assert listener.is_alive()
+
+    listener.stop()  # acorda a espera de retry_sec
+    listener.join(timeout=5)
+    assert not listener.is_alive()
+    assert attempts == [{"host": "db.invalid"}]
@@ -0,0 +1,101 @@
+"""lib/vector_index.VectorIndex sobre um índice sintético (sem banco)."""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lib import vector_index  # noqa: E402
+from lib.vector_index import VectorIndex  # noqa: E402
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+TYPES = ("paper", "repo", "news")
+
+
+def _rows(n=300, dim=16, seed=3):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    return [(f"doc-{i}", TYPES[i % 3], f"src{i % 4}", NOW - timedelta(days=i), vecs[i]) for i in range(n)]
+
+
+@pytest.fixture
+def index():
+    idx = VectorIndex()
+    idx.add(_rows())
+    return idx
+
+
+def test_add_ignores_known_ids_and_tracks_watermark(index):
+    assert len(index) == 300
+    assert index.add(_rows()[:10]) == 0
+    assert index.watermark == NOW
+
+
+@pytest.mark.parametrize("brute_max", [20000, 0])  # exato e (se hnswlib instalado) HNSW
+def test_search_finds_the_query_doc_first(index, monkeypatch, brute_max):
+    monkeypatch.setattr(vector_index, "BRUTE_FORCE_MAX", brute_max)
+    query = _rows()[42][4]
+    hits = index.search(query, 5)
+    assert hits[0][0] == "doc-42"
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-4)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"entity_type": "paper"}, lambda i: i % 3 == 0),
+    ({"source": "src1"}, lambda i: i % 4 == 1),
+    ({"entity_type": "repo", "source": "src1"}, lambda i: i % 3 == 1 and i % 4 == 1),
+    ({"since": (NOW - timedelta(days=9)).isoformat()}, lambda i: i <= 9),
+    ({"until": (NOW - timedelta(days=290)).isoformat()}, lambda i: i >= 290),
+    ({"entity_type": "unknown"}, lambda i: False),
+])
+def test_filters_restrict_results(index, filters, expected):
+    allowed = {f"doc-{i}" for i in range(300) if expected(i)}
+    hits = index.search(_rows()[0][4], 500, filters)
+    assert {doc_id for doc_id, _ in hits} == allowed
+
+
+def test_search_matches_exact(index):
+    query = np.ones(16, dtype=np.float32)
+    assert index.search(query, 10) == index.exact(query, 10)
+
+
+def test_save_load_round_trip(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path))
+
+    assert loaded.ids == index.ids
+    assert loaded.watermark == index.watermark
+    query = _rows()[7][4]
+    for filters in (None, {"entity_type": "news"}, {"since": (NOW - timedelta(days=50)).isoformat()}):
+        assert [d for d, _ in loaded.search(query, 10, filters)] == [d for d, _ in index.search(query, 10, filters)]
+    assert loaded.add(_rows()[:5]) == 0  # ids restaurados
+
+
+def test_save_swaps_generations_atomically(index, tmp_path):
+    for _ in range(4):
+        index.save(str(tmp_path))
+    gens = sorted(d for d in os.listdir(tmp_path) if d.startswith("gen-"))
+    assert len(gens) == vector_index.KEEP_GENERATIONS
+    assert os.path.basename(os.path.realpath(tmp_path / "current")) == gens[-1]
+    assert not [d for d in os.listdir(tmp_path) if d.endswith(".tmp")]
+
+
+def test_load_rejects_inconsistent_generation(index, tmp_path):
+    import json
+
+    index.save(str(tmp_path))
+    meta_path = tmp_path / "current" / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta["count"] += 1
+    meta_path.write_text(json.dumps(meta))
+    with pytest.raises(ValueError):
+        VectorIndex.load(str(tmp_path))
+
+
+def test_empty_index_round_trip(tmp_path):
+    VectorIndex(8).save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path))
+    assert len(loaded) == 0 and loaded.search(np.ones(8), 3) == []